@@ -0,0 +1,135 @@
+"""Tests of the discovery module."""
+import os
+from pathlib import Path
+
+import pytest
+
+from topostats.discovery import FileDiscovery, parse_shard, select_shard
+
+
+@pytest.fixture()
+def image_tree(tmp_path: Path) -> Path:
+    """Create a directory tree of images and other files."""
+    for relative_path in (
+        "scan_01.spm",
+        "notes.txt",
+        "2023-01/scan_02.spm",
+        "2023-01/scan_03.jpk",
+        "2023-02/scan_04.spm",
+        "2023-02/old/scan_05.spm",
+        "output/processed.spm",
+    ):
+        (tmp_path / relative_path).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / relative_path).write_bytes(b"scan")
+    return tmp_path
+
+
+def _relative(paths: list, base_dir: Path) -> list:
+    """Paths relative to the base directory as strings."""
+    return [path.relative_to(base_dir).as_posix() for path in paths]
+
+
+@pytest.mark.parametrize(
+    ("file_ext", "include", "exclude", "expected"),
+    [
+        pytest.param(
+            ".spm",
+            None,
+            None,
+            [
+                "2023-01/scan_02.spm",
+                "2023-02/old/scan_05.spm",
+                "2023-02/scan_04.spm",
+                "output/processed.spm",
+                "scan_01.spm",
+            ],
+            id="single extension",
+        ),
+        pytest.param(
+            [".spm", ".jpk"],
+            None,
+            ["output", "old"],
+            ["2023-01/scan_02.spm", "2023-01/scan_03.jpk", "2023-02/scan_04.spm", "scan_01.spm"],
+            id="multiple extensions and exclude directories",
+        ),
+        pytest.param(
+            ".spm",
+            ["2023-*/*"],
+            ["*/old/*"],
+            ["2023-01/scan_02.spm", "2023-02/scan_04.spm"],
+            id="include and exclude patterns",
+        ),
+    ],
+)
+def test_discover(image_tree: Path, file_ext, include: list, exclude: list, expected: list) -> None:
+    """Test images are found with different extensions and include/exclude patterns."""
+    discovery = FileDiscovery(image_tree, file_ext=file_ext, include=include, exclude=exclude, workers=2)
+    assert _relative(discovery.discover(), image_tree) == expected
+
+
+def test_discover_manifest(image_tree: Path) -> None:
+    """Test the manifest records new images and unchanged directories are not listed again."""
+    manifest_file = image_tree / "manifest.csv"
+    discovery = FileDiscovery(image_tree, file_ext=".spm", exclude=["output", "*.csv"], manifest_file=manifest_file)
+    found = discovery.discover()
+    assert len(found) == 4
+    assert len(discovery.get_new_files()) == 4
+    discovery.save_manifest()
+    assert manifest_file.is_file()
+
+    # Add an image to a directory, and another to a directory whose modification time is reset so it appears unchanged
+    (image_tree / "2023-02" / "scan_06.spm").write_bytes(b"scan")
+    unchanged_dir = image_tree / "2023-01"
+    stat = unchanged_dir.stat()
+    (unchanged_dir / "scan_07.spm").write_bytes(b"scan")
+    os.utime(unchanged_dir, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+    discovery = FileDiscovery(image_tree, file_ext=".spm", exclude=["output", "*.csv"], manifest_file=manifest_file)
+    found = discovery.discover()
+    assert "2023-02/scan_06.spm" in _relative(found, image_tree)
+    # The unchanged directory is taken from the manifest so the image added to it is not seen
+    assert "2023-01/scan_07.spm" not in _relative(found, image_tree)
+    assert _relative(discovery.get_new_files(), image_tree) == ["2023-02/scan_06.spm"]
+
+
+def test_discover_manifest_different_settings(image_tree: Path) -> None:
+    """Test a manifest written with different settings is not reused."""
+    manifest_file = image_tree / "manifest.csv"
+    discovery = FileDiscovery(image_tree, file_ext=".spm", manifest_file=manifest_file)
+    discovery.discover()
+    discovery.save_manifest()
+    discovery = FileDiscovery(image_tree, file_ext=".jpk", manifest_file=manifest_file)
+    assert discovery.read_manifest() == ({}, {})
+    assert _relative(discovery.discover(), image_tree) == ["2023-01/scan_03.jpk"]
+    assert len(discovery.get_new_files()) == 1
+
+
+def test_select_shard(tmp_path: Path) -> None:
+    """Test every image is assigned to exactly one shard, regardless of the other images found."""
+    img_files = [tmp_path / f"2023-{month:02d}" / f"scan_{index}.spm" for month in range(1, 13) for index in range(10)]
+    shards = [select_shard(img_files, tmp_path, f"{index}/4") for index in range(1, 5)]
+    assert sorted(img_file for shard in shards for img_file in shard) == sorted(img_files)
+    assert all(len(shard) > 0 for shard in shards)
+    assert select_shard(img_files[::-1][:50], tmp_path, "2/4") == [
+        img_file for img_file in img_files[::-1][:50] if img_file in shards[1]
+    ]
+
+
+@pytest.mark.parametrize(
+    ("shard", "expected"),
+    [
+        pytest.param("1/1", (1, 1), id="single shard"),
+        pytest.param("3/4", (3, 4), id="third of four"),
+        pytest.param("0/4", None, id="shards start at one"),
+        pytest.param("5/4", None, id="shard greater than number of shards"),
+        pytest.param("a/4", None, id="not a number"),
+        pytest.param("1-4", None, id="wrong separator"),
+    ],
+)
+def test_parse_shard(shard: str, expected: tuple) -> None:
+    """Test shards are parsed and invalid shards raise a ValueError."""
+    if expected is None:
+        with pytest.raises(ValueError, match="Invalid shard"):
+            parse_shard(shard)
+    else:
+        assert parse_shard(shard) == expected
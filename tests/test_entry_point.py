@@ -9,9 +9,11 @@ from topostats.entry_point import (
     entry_point,
     legacy_run_topostats_entry_point,
     legacy_toposum_entry_point,
+    run_inspect,
+    run_topostats,
+    run_toposum,
+    run_watch,
 )
-from topostats.plotting import run_toposum
-from topostats.run_topostats import run_topostats
 
 
 # Test "help" arguments
@@ -33,6 +35,10 @@ def test_entry_point_help(capsys, option) -> None:
     [
         ("process", "-h"),
         ("process", "--help"),
+        ("watch", "-h"),
+        ("watch", "--help"),
+        ("inspect", "-h"),
+        ("inspect", "--help"),
         ("summary", "-h"),
         ("summary", "--help"),
         ("load", "-h"),
@@ -84,6 +90,26 @@ def test_entry_point_subprocess_help(capsys, argument: str, option: str) -> None
             "config_file",
             "dummy/config/dir/config.yaml",
         ),
+        (
+            [
+                "watch",
+                "--base_dir",
+                "dummy/microscope/output",
+            ],
+            run_watch,
+            "base_dir",
+            "dummy/microscope/output",
+        ),
+        (
+            [
+                "inspect",
+                "--channel",
+                "Height",
+            ],
+            run_inspect,
+            "channel",
+            "Height",
+        ),
         (
             [
                 "summary",
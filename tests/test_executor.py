@@ -0,0 +1,301 @@
+"""Tests of the executor module."""
+import os
+import signal
+import threading
+import time
+from functools import partial
+from multiprocessing import Pool
+from multiprocessing.pool import ThreadPool
+from pathlib import Path
+
+import pytest
+
+from topostats import executor
+from topostats.executor import (
+    BYTES_PER_GIB,
+    FAILURES_FILENAME,
+    cgroup_cpu_limit,
+    cgroup_memory_limit,
+    estimate_image_memory,
+    imap_fault_tolerant,
+    imap_with_memory_budget,
+    limit_cores_to_memory,
+    read_failures,
+    resolve_cores,
+    resolve_memory_budget,
+    write_failures,
+)
+
+
+@pytest.mark.parametrize(
+    ("files", "expected"),
+    [
+        pytest.param({"cpu.max": "200000 100000"}, 2.0, id="v2 quota"),
+        pytest.param({"cpu.max": "max 100000"}, None, id="v2 no quota"),
+        pytest.param({"cpu/cpu.cfs_quota_us": "150000", "cpu/cpu.cfs_period_us": "100000"}, 1.5, id="v1 quota"),
+        pytest.param({"cpu/cpu.cfs_quota_us": "-1", "cpu/cpu.cfs_period_us": "100000"}, None, id="v1 no quota"),
+        pytest.param({}, None, id="no cgroup"),
+    ],
+)
+def test_cgroup_cpu_limit(tmp_path: Path, files: dict, expected: float) -> None:
+    """Test reading the CPU quota from cgroup v1 and v2 control files."""
+    for filename, content in files.items():
+        (tmp_path / filename).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / filename).write_text(content, encoding="utf-8")
+    assert cgroup_cpu_limit(tmp_path) == expected
+
+
+@pytest.mark.parametrize(
+    ("files", "expected"),
+    [
+        pytest.param({"memory.max": "1073741824"}, 1073741824, id="v2 limit"),
+        pytest.param({"memory.max": "max"}, None, id="v2 no limit"),
+        pytest.param({"memory/memory.limit_in_bytes": "1073741824"}, 1073741824, id="v1 limit"),
+        pytest.param({"memory/memory.limit_in_bytes": str(2**63 - 4096)}, None, id="v1 no limit"),
+    ],
+)
+def test_cgroup_memory_limit(tmp_path: Path, files: dict, expected: int) -> None:
+    """Test reading the memory limit from cgroup v1 and v2 control files."""
+    for filename, content in files.items():
+        (tmp_path / filename).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / filename).write_text(content, encoding="utf-8")
+    assert cgroup_memory_limit(tmp_path) == expected
+
+
+@pytest.mark.parametrize(("cores", "expected"), [(3, 3), ("auto", 7)])
+def test_resolve_cores(monkeypatch, cores, expected: int) -> None:
+    """Test resolving the number of cores."""
+    monkeypatch.setattr(executor, "available_cpus", lambda: 7)
+    assert resolve_cores(cores) == expected
+
+
+@pytest.mark.parametrize(("memory_budget", "expected"), [(None, None), (2, 2 * BYTES_PER_GIB), ("auto", 800)])
+def test_resolve_memory_budget(monkeypatch, memory_budget, expected: int) -> None:
+    """Test resolving the memory budget."""
+    monkeypatch.setattr(executor, "available_memory", lambda: 1000)
+    assert resolve_memory_budget(memory_budget) == expected
+
+
+@pytest.mark.parametrize(
+    ("direction", "dnatracing_run", "expected"),
+    [
+        ("above", True, 100 * 100 * 8 * (2 + 16 + 10 + 2 + 4 + 6)),
+        ("both", True, 100 * 100 * 8 * (2 + 16 + 20 + 2 + 4 + 6)),
+        ("above", False, 100 * 100 * 8 * (2 + 16 + 10 + 2 + 6)),
+    ],
+)
+def test_estimate_image_memory(default_config: dict, direction: str, dnatracing_run: bool, expected: int) -> None:
+    """Test estimating the memory required to process an image."""
+    default_config["grains"]["direction"] = direction
+    default_config["dnatracing"]["run"] = dnatracing_run
+    assert estimate_image_memory((100, 100), default_config) == expected
+
+
+@pytest.mark.parametrize(
+    ("cores", "memory_budget", "estimates", "expected"),
+    [
+        (4, None, [100], 4),
+        (4, 1000, [], 4),
+        (4, 1000, [100, 300], 3),
+        (4, 1000, [2000], 1),
+    ],
+)
+def test_limit_cores_to_memory(cores: int, memory_budget: int, estimates: list, expected: int) -> None:
+    """Test the number of workers is reduced to fit the memory budget."""
+    assert limit_cores_to_memory(cores, memory_budget, estimates) == expected
+
+
+class ConcurrencyTracker:
+    """Record the memory in use by concurrently running jobs."""
+
+    def __init__(self):
+        """Initialise the tracker."""
+        self.lock = threading.Lock()
+        self.in_use = 0
+        self.peak = 0
+
+    def __call__(self, job: int) -> int:
+        """Run a job that 'uses' memory equal to its value."""
+        with self.lock:
+            self.in_use += job
+            self.peak = max(self.peak, self.in_use)
+        time.sleep(0.01)
+        with self.lock:
+            self.in_use -= job
+        return job
+
+
+@pytest.mark.parametrize(
+    ("jobs", "memory_budget", "expected_peak"),
+    [
+        pytest.param([3, 3, 3, 3], 6, 6, id="two jobs fit"),
+        pytest.param([5, 2, 5, 2], 7, 7, id="small jobs fill budget"),
+        pytest.param([10, 1, 1], 5, 10, id="job larger than budget runs alone"),
+    ],
+)
+def test_imap_with_memory_budget(jobs: list, memory_budget: int, expected_peak: int) -> None:
+    """Test jobs are only admitted when they fit within the memory budget."""
+    tracker = ConcurrencyTracker()
+    with ThreadPool(processes=4) as pool:
+        results = list(imap_with_memory_budget(pool, tracker, jobs, jobs, memory_budget=memory_budget, processes=4))
+    assert sorted(results) == sorted(jobs)
+    assert tracker.peak <= expected_peak
+
+
+def test_imap_with_memory_budget_no_budget() -> None:
+    """Test all results are returned when there is no memory budget."""
+    with ThreadPool(processes=2) as pool:
+        results = list(imap_with_memory_budget(pool, abs, [-1, -2, -3], [1, 1, 1], memory_budget=None, processes=2))
+    assert sorted(results) == [1, 2, 3]
+
+
+def test_imap_with_memory_budget_error() -> None:
+    """Test errors raised by jobs are propagated."""
+
+    def fail(job):
+        raise ValueError(job)
+
+    with ThreadPool(processes=2) as pool, pytest.raises(ValueError, match="1"):
+        list(imap_with_memory_budget(pool, fail, [1], [1], memory_budget=10, processes=2))
+
+
+def flaky(job: tuple) -> int:
+    """Fail, sleep or kill the worker until the number of calls recorded in a file reaches a count, then return a value.
+
+    Parameters
+    ----------
+    job: tuple
+        Value to return, file counting calls, number of calls that fail and how they fail ('sleep', 'kill' or raise).
+
+    Returns
+    -------
+    int
+        Value of the job.
+    """
+    value, counter, failures, action = job
+    calls = int(counter.read_text()) if counter.exists() else 0
+    counter.write_text(str(calls + 1))
+    if calls < failures:
+        if action == "sleep":
+            time.sleep(60)
+        if action == "kill":
+            os.kill(os.getpid(), signal.SIGKILL)
+        raise ValueError(f"call {calls}")
+    return value
+
+
+@pytest.mark.parametrize(
+    ("failures", "retries", "expected_result", "expected_failure"),
+    [
+        pytest.param(0, 0, 1, None, id="succeeds"),
+        pytest.param(1, 1, 1, None, id="succeeds on retry"),
+        pytest.param(2, 1, None, {"status": "failed", "attempts": 2, "error": "ValueError: call 1"}, id="fails"),
+    ],
+)
+def test_imap_fault_tolerant(
+    tmp_path: Path, failures: int, retries: int, expected_result: int, expected_failure: dict
+) -> None:
+    """Test failed jobs are retried and then reported without affecting other jobs."""
+    jobs = [(1, tmp_path / "flaky", failures, "raise"), (2, tmp_path / "steady", 0, "raise")]
+    outcomes = {
+        index: (result, failure)
+        for index, result, failure in imap_fault_tolerant(
+            partial(ThreadPool, processes=2), flaky, jobs, [1, 1], memory_budget=None, processes=2, retries=retries
+        )
+    }
+    assert outcomes == {0: (expected_result, expected_failure), 1: (2, None)}
+
+
+def test_imap_fault_tolerant_lazy_jobs() -> None:
+    """Test jobs are only taken from a generator as workers become free and estimates can be made from each job."""
+    taken = []
+
+    def make_jobs():
+        for job in range(6):
+            taken.append(job)
+            yield job
+
+    outcomes = []
+    for index, result, _ in imap_fault_tolerant(
+        partial(ThreadPool, processes=2),
+        lambda job: job * 10,
+        make_jobs(),
+        lambda job: 1,
+        memory_budget=None,
+        processes=2,
+    ):
+        outcomes.append((index, result))
+        # No more than the jobs running, and those waiting to be admitted, are taken ahead of the results
+        assert len(taken) <= len(outcomes) + 2 * 2
+    assert sorted(outcomes) == [(job, job * 10) for job in range(6)]
+
+
+def test_imap_fault_tolerant_timeout(tmp_path: Path) -> None:
+    """Test jobs that time out are abandoned and retried, restarting the workers, and other jobs are unaffected."""
+    jobs = [(1, tmp_path / "hangs", 2, "sleep"), (2, tmp_path / "retried", 1, "sleep"), (3, tmp_path / "quick", 0, "")]
+    start = time.monotonic()
+    outcomes = {
+        index: (result, failure)
+        for index, result, failure in imap_fault_tolerant(
+            partial(Pool, processes=2), flaky, jobs, [1, 1, 1], memory_budget=None, processes=2, timeout=1, retries=1
+        )
+    }
+    assert time.monotonic() - start < 30
+    assert outcomes == {
+        0: (None, {"status": "timed_out", "attempts": 2, "error": "Exceeded the timeout of 1s"}),
+        1: (2, None),
+        2: (3, None),
+    }
+
+
+@pytest.mark.parametrize(
+    ("processes", "retries", "expected_outcome"),
+    [
+        pytest.param(
+            1,
+            0,
+            (
+                None,
+                {
+                    "status": "failed",
+                    "attempts": 1,
+                    "error": "A worker died with exit code -9 whilst running this or another job",
+                },
+            ),
+            id="fails",
+        ),
+        pytest.param(2, 1, (1, None), id="succeeds on retry"),
+    ],
+)
+def test_imap_fault_tolerant_worker_dies(tmp_path: Path, processes: int, retries: int, expected_outcome: tuple) -> None:
+    """Test jobs running when a worker is killed are failed or retried, restarting the workers, rather than hanging."""
+    jobs = [(1, tmp_path / "killed", 1, "kill"), (2, tmp_path / "quick", 0, "")]
+    start = time.monotonic()
+    outcomes = {
+        index: (result, failure)
+        for index, result, failure in imap_fault_tolerant(
+            partial(Pool, processes=processes),
+            flaky,
+            jobs,
+            [1, 1],
+            memory_budget=None,
+            processes=processes,
+            retries=retries,
+        )
+    }
+    assert time.monotonic() - start < 30
+    assert outcomes == {0: expected_outcome, 1: (2, None)}
+
+
+def test_write_read_failures(tmp_path: Path) -> None:
+    """Test the paths of failed images are read back from the failures manifest."""
+    failures_file = tmp_path / FAILURES_FILENAME
+    assert read_failures(failures_file) == set()
+    failures = [
+        {"img_path": tmp_path / "a.spm", "image": "a", "status": "failed", "attempts": 1, "error": "ValueError: a"},
+        {"img_path": tmp_path / "b.spm", "image": "b", "status": "skipped", "attempts": 0, "error": "Could not\nload"},
+    ]
+    write_failures(failures, failures_file)
+    assert read_failures(failures_file) == {tmp_path / "a.spm", tmp_path / "b.spm"}
+    write_failures([], failures_file)
+    assert read_failures(failures_file) == set()
@@ -6,7 +6,7 @@ import pytest
 
 # Pylint returns this error for from skimage.filters import gaussian
 # pylint: disable=no-name-in-module
-from topostats.grains import Grains
+from topostats.grains import GrainRegistry, Grains
 
 LOGGER = logging.getLogger(__name__)
 LOGGER.propagate = True
@@ -207,3 +207,57 @@ def test_remove_edge_intersecting_grains(
     number_of_grains = len(grains.region_properties["above"])
 
     assert number_of_grains == expected_number_of_grains
+
+
+def test_grain_registry() -> None:
+    """Test region properties and crops are calculated once and crops are padded."""
+    image = np.arange(grain_array.size, dtype=float).reshape(grain_array.shape)
+    registry = GrainRegistry(grain_array, image=image)
+    assert len(registry) == 3
+    assert registry.labels == [1, 2, 3]
+    assert registry.bounding_boxes == [(0, 1, 2, 7), (1, 7, 5, 10), (3, 0, 5, 5)]
+    assert registry.region_properties is registry.region_properties
+
+    cropped_images, cropped_masks = registry.get_crops(pad_width=1)
+    assert registry.get_crops(pad_width=1)[0] is cropped_images
+    # Bounding box of grain 3 expanded by 1 within the image then padded by 1
+    np.testing.assert_array_equal(cropped_images[2][1:-1, 1:-1], image[2:5, 0:6])
+    assert cropped_images[2].shape == (5, 8)
+    assert set(np.unique(cropped_masks[2])) == {0, 1}
+    np.testing.assert_array_equal(cropped_masks[2][1:-1, 1:-1], np.where(grain_array[2:5, 0:6] == 0, 0, 1))
+
+
+@pytest.mark.parametrize(
+    ("remove_edge_intersecting_grains", "absolute_area_threshold"),
+    [
+        pytest.param(True, [None, None], id="remove edge grains, minimum size from area distribution"),
+        pytest.param(False, [None, None], id="keep edge grains, minimum size from area distribution"),
+        pytest.param(True, [20, 300], id="remove edge grains, absolute area thresholds"),
+        pytest.param(False, [None, 100], id="keep edge grains, upper area threshold"),
+    ],
+)
+def test_find_grains_fused_matches_stepwise(
+    grains_config: dict, remove_edge_intersecting_grains: bool, absolute_area_threshold: list
+) -> None:
+    """Test the fused segmentation finds the same labelled grains as the stepwise segmentation."""
+    grains_config["remove_edge_intersecting_grains"] = remove_edge_intersecting_grains
+    grains_config["threshold_absolute"]["above"] = 1.0
+    grains_config["threshold_method"] = "absolute"
+    grains_config["smallest_grain_size_nm2"] = 20
+    grains_config["absolute_area_threshold"]["above"] = absolute_area_threshold
+    labelled = {}
+    for segmentation in ("stepwise", "fused"):
+        grains_config["segmentation"] = segmentation
+        grains = Grains(
+            image=np.load("./tests/resources/minicircle_cropped_flattened.npy"),
+            filename="minicircle_cropped_flattened",
+            pixel_to_nm_scaling=0.4940029296875,
+            **grains_config,
+        )
+        grains.find_grains()
+        labelled[segmentation] = grains.directions["above"]["labelled_regions_02"]
+    assert labelled["fused"].max() > 0
+    np.testing.assert_array_equal(labelled["fused"], labelled["stepwise"])
+    table = grains.grain_tables["above"]
+    assert table["kept"].sum() == labelled["fused"].max()
+    assert not remove_edge_intersecting_grains or not (table["kept"] & table["touches_border"]).any()
@@ -5,7 +5,7 @@ from pathlib import Path
 import numpy as np
 import pytest
 
-from topostats.grainstats import GrainStats
+from topostats.grainstats import GRAIN_STATISTICS, GrainStats
 from topostats.logs.logs import LOGGER_NAME
 
 # pylint: disable=protected-access
@@ -259,6 +259,62 @@ def test_random_grain_stats(caplog, tmp_path: Path) -> None:
     assert "No labelled regions for this image, grain statistics can not be calculated." in caplog.text
 
 
+@pytest.mark.parametrize(
+    "statistics",
+    [
+        pytest.param(["area", "height_max", "height_mean", "volume"], id="no intermediates"),
+        pytest.param(["centre_x", "max_feret"], id="points and edges"),
+        pytest.param(["aspect_ratio"], id="hull"),
+    ],
+)
+def test_calculate_stats_selected(statistics: list, tmp_path: Path) -> None:
+    """Test only selected statistics are calculated, others are NaN and the columns are those of all statistics."""
+    rng = np.random.default_rng(seed=1)
+    labelled_data = np.zeros((40, 40), dtype=int)
+    labelled_data[5:15, 5:20] = 1
+    labelled_data[22:35, 20:30] = 2
+    grainstats_options = {
+        "data": rng.random((40, 40)),
+        "labelled_data": labelled_data,
+        "pixel_to_nanometre_scaling": 0.5,
+        "direction": "above",
+        "base_output_dir": tmp_path,
+        "image_name": "selected",
+    }
+    all_stats, _ = GrainStats(**grainstats_options).calculate_stats()
+    selected_stats, _ = GrainStats(**grainstats_options, statistics=statistics).calculate_stats()
+
+    assert list(selected_stats.columns) == list(all_stats.columns)
+    np.testing.assert_array_equal(selected_stats[statistics], all_stats[statistics])
+    assert selected_stats[sorted(GRAIN_STATISTICS.keys() - set(statistics))].isna().values.all()
+
+
+def test_calculate_stats_molecule_numbers(tmp_path: Path) -> None:
+    """Test grains keep their index in the grain registry as their molecule number when smaller grains are skipped."""
+    labelled_data = np.zeros((40, 40), dtype=int)
+    labelled_data[2:20, 2:4] = 1
+    labelled_data[5:11, 10:16] = 2
+    labelled_data[22:35, 20:33] = 3
+    grainstats, _ = GrainStats(
+        data=np.random.default_rng(seed=1).random((40, 40)),
+        labelled_data=labelled_data,
+        pixel_to_nanometre_scaling=0.5,
+        direction="above",
+        base_output_dir=tmp_path,
+        image_name="skipped",
+    ).calculate_stats()
+
+    assert grainstats.index.name == "molecule_number"
+    assert grainstats.index.tolist() == [1, 2]
+    assert grainstats.loc[1, "area"] < grainstats.loc[2, "area"]
+
+
+def test_calculate_stats_unknown_statistic(tmp_path: Path) -> None:
+    """Test a ValueError is raised for statistics that can not be calculated."""
+    with pytest.raises(ValueError, match="Unknown grain statistics"):
+        GrainStats(None, None, 0.5, direction="above", base_output_dir=tmp_path, statistics=["area", "girth"])
+
+
 @pytest.mark.parametrize(
     ("coords", "shape", "expected"),
     [(np.asarray([5, 5]), 10, 0), (np.asarray([-3, 12]), 10, 3), (np.asarray([-3, 14]), 10, -4)],
@@ -0,0 +1,38 @@
+"""Test that importing TopoStats does not import slow, optional, libraries until they are needed."""
+import subprocess
+import sys
+
+import pytest
+
+SLOW_MODULES = (
+    "h5py",
+    "igor2",
+    "matplotlib",
+    "pySPM",
+    "seaborn",
+    "skimage",
+    "snoop",
+    "tifffile",
+    "topofileformats",
+)
+
+
+@pytest.mark.parametrize(
+    ("module", "not_imported"),
+    [
+        pytest.param("topostats", SLOW_MODULES, id="topostats"),
+        pytest.param("topostats.entry_point", SLOW_MODULES, id="entry point"),
+        pytest.param("topostats.io", SLOW_MODULES, id="io"),
+        pytest.param(
+            "topostats.tracing.dnatracing", ("seaborn", "pySPM", "h5py", "tifffile", "igor2"), id="dnatracing"
+        ),
+    ],
+)
+def test_import_does_not_load_slow_modules(module: str, not_imported: tuple) -> None:
+    """Test importing a module does not import slow libraries (run in a fresh interpreter)."""
+    code = (
+        f"import sys, {module}; "
+        f"print(' '.join(name for name in {not_imported!r} if name in sys.modules))"  # noqa: ISC003
+    )
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)  # noqa: S603
+    assert result.stdout.strip() == ""
@@ -1,5 +1,8 @@
 """Tests of IO."""
+import struct
+import time
 from datetime import datetime
+from functools import partial
 from pathlib import Path
 
 import h5py
@@ -9,6 +12,8 @@ import pytest
 
 from topostats.io import (
     LoadScans,
+    background_writes,
+    check_spm_header,
     convert_basename_to_relative_paths,
     find_files,
     get_date_time,
@@ -17,9 +22,11 @@ from topostats.io import (
     load_array,
     load_pkl,
     path_to_str,
+    prefetch_scans,
     read_64d,
     read_char,
     read_gwy_component_dtype,
+    read_ibw_header,
     read_null_terminated_string,
     read_u32i,
     read_yaml,
@@ -27,9 +34,12 @@ from topostats.io import (
     save_folder_grainstats,
     save_pkl,
     save_topostats_file,
+    with_background_writes,
     write_config_with_comments,
     write_yaml,
+    written_in_background,
 )
+from topostats.metrics import measure
 
 BASE_DIR = Path.cwd()
 RESOURCES = BASE_DIR / "tests" / "resources"
@@ -116,6 +126,42 @@ def test_save_array(synthetic_scars_image: np.ndarray, tmp_path: Path) -> None:
     assert outfile.is_file()
 
 
+def test_save_array_background_writes(synthetic_scars_image: np.ndarray, tmp_path: Path) -> None:
+    """Test arrays saved within background_writes() are written by the time the context exits and errors are raised."""
+    with background_writes(threads=2):
+        for index in range(4):
+            save_array(array=synthetic_scars_image, outpath=tmp_path, filename=f"test{index}", array_type="synthetic")
+    for index in range(4):
+        np.testing.assert_array_equal(np.load(tmp_path / f"test{index}_synthetic.npy"), synthetic_scars_image)
+    with pytest.raises(FileNotFoundError), background_writes(threads=2):
+        save_array(array=synthetic_scars_image, outpath=tmp_path / "missing", filename="test", array_type="synthetic")
+
+
+@written_in_background
+def slow_write(path: Path) -> None:
+    """Write a file slowly."""
+    time.sleep(0.05)
+    path.write_text("written", encoding="utf-8")
+
+
+def write_files(tmp_path: Path) -> int:
+    """Write two files."""
+    for index in range(2):
+        slow_write(tmp_path / f"{index}.txt")
+    return 2
+
+
+@pytest.mark.parametrize("threads", [pytest.param(0, id="in turn"), pytest.param(2, id="background")])
+def test_written_in_background_save_stage(tmp_path: Path, threads: int) -> None:
+    """Test writes are timed as the 'save' stage where they run, rather than when they are submitted."""
+    job = write_files if threads == 0 else partial(with_background_writes, write_files, threads=threads)
+    result, measurement = measure(job, tmp_path)
+    assert result == 2
+    assert sorted((tmp_path).glob("*.txt")) == [tmp_path / "0.txt", tmp_path / "1.txt"]
+    assert [stage for stage, _ in measurement["stage_timings"]] == ["save", "save"]
+    assert all(seconds >= 0.05 for _, seconds in measurement["stage_timings"])
+
+
 def test_load_array() -> None:
     """Test loading Numpy arrays."""
     target = load_array(RESOURCES / "test_scars_synthetic_scar_image.npy")
@@ -489,6 +535,199 @@ def test_load_scan_get_data(
     assert scan.img_dict[filename]["pixel_to_nm_scaling"] == pixel_to_nm_scaling
 
 
+@pytest.mark.parametrize(
+    ("load_scan_object", "shape", "frames", "pixel_to_nm_scaling"),
+    [
+        ("load_scan_spm", (1024, 1024), 1, 0.4940029296875),
+        ("load_scan_ibw", (512, 512), 1, 1.5625),
+        ("load_scan_jpk", (256, 256), 1, 1.2770176335964876),
+        ("load_scan_gwy", (512, 512), 1, 0.8468632812499975),
+        ("load_scan_topostats", (1024, 1024), 1, 0.4940029296875),
+        ("load_scan_asd", (200, 200), 197, 2.0),
+    ],
+)
+def test_load_scan_get_metadata(
+    load_scan_object: LoadScans, shape: tuple, frames: int, pixel_to_nm_scaling: float, request
+) -> None:
+    """Test the LoadScan.get_metadata() method agrees with the images loaded by LoadScans.get_data()."""
+    scan = request.getfixturevalue(load_scan_object)
+    metadata = scan.get_metadata()
+    assert len(metadata) == 1
+    assert metadata[0]["error"] is None
+    assert metadata[0]["shape"] == shape
+    assert metadata[0]["frames"] == frames
+    assert metadata[0]["pixel_to_nm_scaling"] == pixel_to_nm_scaling
+
+
+def test_load_scan_get_metadata_unreadable(tmp_path: Path) -> None:
+    """Test files that can not be read are reported with the error."""
+    (tmp_path / "notes.txt").write_text("not an image", encoding="utf-8")
+    metadata = LoadScans([tmp_path / "notes.txt", tmp_path / "missing.jpk"], channel="height_trace").get_metadata()
+    assert [row["error"].split(":")[0] for row in metadata] == ["ValueError", "FileNotFoundError"]
+    assert not any(row["channel_found"] for row in metadata)
+
+
+@pytest.mark.parametrize(
+    ("header", "message"),
+    [
+        pytest.param(b"not a scan", "is not a Bruker .spm file", id="not bruker"),
+        pytest.param(b"\\*File list\r\n\\Version: 0x09200201\r\n", "does not record the length", id="no length"),
+        pytest.param(b"\\*File list\r\n\\Data length: 40960\r\n\\*Ciao image list\r\n", "incomplete", id="truncated"),
+    ],
+)
+def test_check_spm_header(tmp_path: Path, header: bytes, message: str) -> None:
+    """Test files pySPM would never finish reading the header of are rejected."""
+    (tmp_path / "scan.spm").write_bytes(header)
+    with pytest.raises(ValueError, match=message):
+        check_spm_header(tmp_path / "scan.spm")
+
+
+def write_ibw(path: Path, note: str, labels: tuple, n_dim: tuple = (4, 5, 2)) -> None:
+    """Write a minimal version 5 Igor binary wave of 32-bit floats."""
+    data = np.arange(np.prod(n_dim), dtype="<f4")
+    wave_header = bytearray(320)
+    struct.pack_into("<i", wave_header, 12, data.size)
+    struct.pack_into("<h", wave_header, 16, 2)
+    struct.pack_into("<4i", wave_header, 68, *n_dim, *([0] * (4 - len(n_dim))))
+    raw_labels = b"".join(label.encode().ljust(32, b"\x00") for label in labels)
+    bin_header = struct.pack(
+        "<hh15i", 5, 0, 320 + data.nbytes, 0, len(note), 0, 0, 0, 0, 0, 0, 0, len(raw_labels), 0, 0, 0, 0
+    )
+    path.write_bytes(bin_header + bytes(wave_header) + data.tobytes() + note.encode() + raw_labels)
+
+
+def test_read_ibw_header(tmp_path: Path) -> None:
+    """Test reading the dimensions, note and labels of an .ibw file without reading the data."""
+    write_ibw(
+        tmp_path / "scan.ibw",
+        note="ScanRate: 1\rSlowScanSize: 2e-08\rFastScanSize: 2.5e-08\r",
+        labels=("", "HeightTrace", "ZSensor"),
+    )
+    header = read_ibw_header(tmp_path / "scan.ibw")
+    assert header["n_dim"] == [4, 5, 2]
+    assert header["note"] == "ScanRate: 1\rSlowScanSize: 2e-08\rFastScanSize: 2.5e-08\r"
+    assert header["labels"] == [[], [], ["", "HeightTrace", "ZSensor"], []]
+    metadata = LoadScans([tmp_path / "scan.ibw"], channel="ZSensor").get_metadata()[0]
+    assert metadata["channels"] == ["HeightTrace", "ZSensor"]
+    assert metadata["channel_found"]
+    assert metadata["shape"] == (5, 4)
+    assert metadata["pixel_to_nm_scaling"] == 5.0
+
+
+@pytest.mark.parametrize("channel", [pytest.param("HeightTrace", id="first"), pytest.param("ZSensor", id="last")])
+def test_load_ibw_reads_channel(tmp_path: Path, channel: str) -> None:
+    """Test reading only the requested channel of an .ibw file matches loading the whole wave with igor2."""
+    write_ibw(
+        tmp_path / "scan.ibw",
+        note="ScanRate: 1\rSlowScanSize: 2e-08\rFastScanSize: 2.5e-08\r",
+        labels=("", "HeightTrace", "ZSensor"),
+    )
+    scan = LoadScans([tmp_path / "scan.ibw"], channel=channel)
+    scan.img_path = scan.img_paths[0]
+    scan.filename = scan.img_path.stem
+    image, px_to_nm_scaling = scan.load_ibw()
+    expected_image, expected_px_to_nm_scaling = scan._load_ibw_igor2()
+    assert image.shape == (5, 4)
+    np.testing.assert_array_equal(image, expected_image)
+    assert px_to_nm_scaling == expected_px_to_nm_scaling
+
+
+def test_load_scan_get_data_multiple_channels(monkeypatch) -> None:
+    """Test several channels are extracted from a single read of a file and named by channel."""
+    import tifffile
+
+    opened = []
+
+    class CountingTiffFile(tifffile.TiffFile):
+        """TiffFile that records each time a file is opened."""
+
+        def __init__(self, *args, **kwargs):
+            opened.append(args[0])
+            super().__init__(*args, **kwargs)
+
+    monkeypatch.setattr(tifffile, "TiffFile", CountingTiffFile)
+    scan = LoadScans([RESOURCES / "file.jpk"], channel=["height_trace", "amplitude_trace"])
+    scan.get_data()
+    assert len(opened) == 1
+    assert list(scan.img_dict.keys()) == ["file_height_trace", "file_amplitude_trace"]
+    assert scan.img_dict["file_height_trace"]["image_original"].sum() == 286598232.9308627
+    assert scan.img_dict["file_amplitude_trace"]["img_path"] == RESOURCES / "file_amplitude_trace"
+    assert scan.opened_file is None
+
+
+def test_load_scan_get_data_skip_errors(tmp_path: Path) -> None:
+    """Test files that can not be loaded are recorded as skipped, rather than raising, when skipping errors."""
+    import tifffile
+
+    corrupt = tmp_path / "corrupt.jpk"
+    corrupt.write_bytes(b"not a jpk file")
+    scan = LoadScans([corrupt, RESOURCES / "file.jpk"], channel="height_trace")
+    with pytest.raises(tifffile.TiffFileError):
+        scan.get_data()
+    scan = LoadScans([corrupt, RESOURCES / "file.jpk"], channel="height_trace")
+    scan.get_data(skip_errors=True)
+    assert list(scan.img_dict.keys()) == ["file"]
+    assert list(scan.skipped.keys()) == ["corrupt"]
+    assert scan.skipped["corrupt"].startswith("Could not be loaded")
+    assert scan.source_files["corrupt"] == corrupt
+
+
+def test_load_scan_skipped_images(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    """Test channels that are missing or can not be loaded and frames that are too small are skipped individually."""
+
+    def load_asd(self) -> tuple:
+        """Return frames of the 'TP' channel, the second too small, there is no 'ERR' channel and 'PH' is corrupt."""
+        if self.channel == "ERR":
+            raise ValueError(f"Channel {self.channel} not found")
+        if self.channel == "PH":
+            raise KeyError(self.channel)
+        return [np.zeros((20, 20)), np.zeros((5, 5)), np.zeros((20, 20))], 1.0
+
+    monkeypatch.setattr(LoadScans, "load_asd", load_asd)
+    scan = LoadScans([tmp_path / "movie.asd"], channel=["TP", "ERR", "PH"])
+    scan.get_data(skip_errors=True)
+    assert list(scan.img_dict.keys()) == ["movie_TP_0", "movie_TP_2"]
+    assert scan.skipped == {
+        "movie_TP_1": "Image too small: (5, 5)",
+        "movie_ERR": "Channel ERR not found",
+        "movie_PH": "Could not be loaded, KeyError: 'PH'",
+    }
+    assert scan.source_files["movie_ERR"] == tmp_path / "movie.asd"
+
+
+@pytest.mark.parametrize("suffix", [pytest.param(".gwy", id="gwy"), pytest.param(".topostats", id="topostats")])
+def test_load_scan_single_channel_formats(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path, caplog: pytest.LogCaptureFixture, suffix: str
+) -> None:
+    """Test formats holding a single image are loaded once, under the filename, when several channels are requested."""
+    loaded = []
+
+    def load_single(self) -> tuple:
+        """Return the single image of the file, whatever the channel."""
+        loaded.append(self.channel)
+        return np.zeros((20, 20)), 1.0
+
+    monkeypatch.setattr(LoadScans, f"load_{suffix[1:]}", load_single)
+    scan = LoadScans([tmp_path / f"scan{suffix}"], channel=["Height", "Phase"])
+    scan.get_data()
+    assert loaded == ["Height"]
+    assert list(scan.img_dict.keys()) == ["scan"]
+    assert scan.img_dict["scan"]["img_path"] == tmp_path / "scan"
+    assert f"{suffix} files hold a single image, loading it once" in caplog.text
+
+
+@pytest.mark.parametrize("threads", [pytest.param(0, id="in turn"), pytest.param(2, id="threaded")])
+def test_prefetch_scans(tmp_path: Path, threads: int) -> None:
+    """Test scans are loaded a file at a time, in order, with files that can not be loaded recorded as skipped."""
+    corrupt = tmp_path / "corrupt.jpk"
+    corrupt.write_bytes(b"not a jpk file")
+    img_paths = [RESOURCES / "file.jpk", corrupt, RESOURCES / "file.jpk"]
+    scans = list(prefetch_scans(img_paths, channel="height_trace", threads=threads, depth=1))
+    assert [scan.img_paths for scan in scans] == [[img_path] for img_path in img_paths]
+    assert [list(scan.img_dict.keys()) for scan in scans] == [["file"], [], ["file"]]
+    assert list(scans[1].skipped.keys()) == ["corrupt"]
+
+
 @pytest.mark.parametrize(
     ("x", "y", "log_msg"),
     [
@@ -1,9 +1,21 @@
 """Tests for logging."""
 import logging
+import multiprocessing
+import time
+from pathlib import Path
 
 import pytest
 
-from topostats.logs.logs import LOGGER_NAME, setup_logger
+from topostats.logs.logs import (
+    GRAIN_LOG,
+    LOGGER_NAME,
+    GrainLogThrottle,
+    log_queue,
+    reset_grain_log_throttle,
+    setup_logger,
+    without_log_file,
+    worker_log_initialiser,
+)
 
 LOGGER = setup_logger(LOGGER_NAME)
 
@@ -39,3 +51,98 @@ def test_debug(caplog, log_level, message) -> None:
     with caplog.at_level(log_level):
         assert isinstance(LOGGER, logging.Logger)
         assert message in caplog.text
+
+
+class ListHandler(logging.Handler):
+    """Handler that keeps the formatted messages of records."""
+
+    def __init__(self):
+        """Initialise the handler."""
+        super().__init__()
+        self.messages = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        """Store the message of the record."""
+        self.messages.append(record.getMessage())
+
+
+@pytest.fixture()
+def list_logger() -> logging.Logger:
+    """Create a logger, separate to the TopoStats logger, that stores messages."""
+    logger = logging.getLogger("topostats_test_logs")
+    logger.handlers = [ListHandler()]
+    logger.filters = []
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    return logger
+
+
+def test_grain_log_throttle(list_logger: logging.Logger) -> None:
+    """Test per-grain messages are throttled for each image and other messages are not."""
+    list_logger.addFilter(GrainLogThrottle(max_messages=3))
+    for image in ("image_1", "image_2"):
+        for grain in range(10):
+            list_logger.info("[%s] : Processing grain: %s", image, grain, extra=GRAIN_LOG)
+    for _ in range(5):
+        list_logger.info("Not a per-grain message")
+    messages = list_logger.handlers[0].messages
+    assert len(messages) == 3 + 3 + 5
+    assert messages[2] == "[image_1] : Processing grain: 2 (further messages like this for this image are suppressed)"
+    assert messages[3] == "[image_2] : Processing grain: 0"
+    reset_grain_log_throttle(log_name="topostats_test_logs")
+    list_logger.info("[%s] : Processing grain: %s", "image_1", 10, extra=GRAIN_LOG)
+    assert messages[-1] == "[image_1] : Processing grain: 10"
+
+
+def _log_from_worker(queue, message: str) -> None:
+    """Log a message from a worker process."""
+    worker_log_initialiser(queue, logging.INFO, log_name="topostats_test_logs")
+    logging.getLogger("topostats_test_logs").info("%s from %s", message, "worker")
+
+
+def test_log_queue(list_logger: logging.Logger) -> None:
+    """Test records logged in worker processes are written by the handlers of the main process."""
+    with log_queue(log_name="topostats_test_logs") as queue:
+        worker = multiprocessing.get_context("fork").Process(target=_log_from_worker, args=(queue, "Hello"))
+        worker.start()
+        worker.join()
+    assert list_logger.handlers[0].messages == ["Hello from worker"]
+
+
+def _log_forever(message: str) -> None:
+    """Log a message repeatedly until the worker is terminated."""
+    while True:
+        logging.getLogger("topostats_test_logs").info(message)
+
+
+def test_log_queue_terminated_pool(list_logger: logging.Logger) -> None:
+    """Test records are still written from a new pool after a pool is terminated while its workers are logging."""
+    with log_queue(log_name="topostats_test_logs") as queue:
+        context = multiprocessing.get_context("fork")
+        pool = context.Pool(
+            1, initializer=worker_log_initialiser, initargs=(queue, logging.INFO, "topostats_test_logs")
+        )
+        pool.apply_async(_log_forever, ("Stuck",))
+        time.sleep(0.2)
+        pool.terminate()
+        pool.join()
+        with context.Pool(
+            1, initializer=worker_log_initialiser, initargs=(queue, logging.INFO, "topostats_test_logs")
+        ) as pool:
+            pool.apply(logging.getLogger("topostats_test_logs").info, ("After",))
+    assert list_logger.handlers[0].messages[-1] == "After"
+
+
+def test_without_log_file(list_logger: logging.Logger, tmp_path: Path) -> None:
+    """Test the log file is not written whilst in the context and its handler is restored afterwards."""
+    log_file = tmp_path / "test.log"
+    file_handler = logging.FileHandler(log_file, delay=True)
+    list_logger.addHandler(file_handler)
+    with without_log_file(log_name="topostats_test_logs"):
+        list_logger.info("In memory")
+    assert not log_file.exists()
+    assert list_logger.handlers[0].messages == ["In memory"]
+    assert file_handler in list_logger.handlers
+    list_logger.info("From the command line")
+    file_handler.close()
+    assert "From the command line" in log_file.read_text()
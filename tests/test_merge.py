@@ -0,0 +1,55 @@
+"""Tests of the merge module."""
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from topostats.merge import find_shards, merge_shards
+
+
+def _write_shard(output_dir: Path, index: int, n_shards: int, images: list, complete: bool = True) -> None:
+    """Write the statistics of a shard."""
+    shard_dir = output_dir / "shards" / f"shard_{index}_of_{n_shards}"
+    shard_dir.mkdir(parents=True)
+    if not complete:
+        return
+    pd.DataFrame({"image": images, "grains_number_above": [3] * len(images)}).set_index("image").to_csv(
+        shard_dir / "image_stats.csv"
+    )
+    if images:
+        pd.DataFrame(
+            {
+                "image": [image for image in images for _ in range(2)],
+                "threshold": "above",
+                "molecule_number": [0, 1] * len(images),
+                "area": range(2 * len(images)),
+                "basename": "data",
+            }
+        ).set_index(["image", "threshold", "molecule_number"]).to_csv(shard_dir / "all_statistics.csv")
+
+
+def test_merge_shards(tmp_path: Path) -> None:
+    """Test the statistics of shards are combined."""
+    _write_shard(tmp_path, 1, 3, ["scan_1", "scan_4"])
+    _write_shard(tmp_path, 2, 3, ["scan_2"])
+    _write_shard(tmp_path, 3, 3, [])
+    results, image_stats = merge_shards(tmp_path)
+    assert image_stats.index.tolist() == ["scan_1", "scan_4", "scan_2"]
+    assert results.index.names == ["image", "threshold", "molecule_number"]
+    assert results.reset_index()["image"].tolist() == ["scan_1", "scan_1", "scan_4", "scan_4", "scan_2", "scan_2"]
+
+
+def test_find_shards_missing_and_incomplete(tmp_path: Path, caplog) -> None:
+    """Test missing and incomplete shards are warned of and skipped."""
+    _write_shard(tmp_path, 1, 4, ["scan_1"])
+    _write_shard(tmp_path, 3, 4, ["scan_3"], complete=False)
+    shard_dirs = find_shards(tmp_path)
+    assert [shard_dir.name for shard_dir in shard_dirs] == ["shard_1_of_4"]
+    assert "Shards [2, 4] of 4 are missing" in caplog.text
+    assert "Shard shard_3_of_4 has not completed" in caplog.text
+
+
+def test_find_shards_none(tmp_path: Path) -> None:
+    """Test a FileNotFoundError is raised if there are no shards."""
+    with pytest.raises(FileNotFoundError):
+        find_shards(tmp_path)
@@ -0,0 +1,32 @@
+"""Tests of the metadata module."""
+from pathlib import Path
+
+import numpy as np
+
+from topostats.io import save_topostats_file
+from topostats.metadata import inspect_images
+
+BASE_DIR = Path.cwd()
+RESOURCES = BASE_DIR / "tests" / "resources"
+
+
+def test_inspect_images(tmp_path: Path) -> None:
+    """Test the metadata of images is summarised with one row per image."""
+    save_topostats_file(
+        output_dir=tmp_path,
+        filename="processed.topostats",
+        topostats_object={"image_flattened": np.zeros((64, 32)), "pixel_to_nm_scaling": 2.5, "grain_masks": {}},
+    )
+    (tmp_path / "broken.spm").write_bytes(b"not a scan")
+    df = inspect_images(
+        [RESOURCES / "file.jpk", tmp_path / "processed.topostats", tmp_path / "broken.spm"],
+        channel="height_trace",
+        workers=2,
+    )
+    assert list(df["file_ext"]) == [".jpk", ".topostats", ".spm"]
+    assert list(df["channel_found"]) == [True, True, False]
+    assert list(df["shape"][:2]) == [(256, 256), (64, 32)]
+    assert list(df["pixel_to_nm_scaling"][:2]) == [1.2770176335964876, 2.5]
+    assert "height_trace" in df["channels"][0].split(";")
+    assert df["error"][:2].isna().all()
+    assert df["error"][2] is not None
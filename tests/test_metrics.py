@@ -0,0 +1,73 @@
+"""Tests of the metrics module."""
+import socket
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+import pytest
+
+from topostats.metrics import Metrics, measure, report_metrics, stage_timer
+
+
+def staged_job(job: int) -> int:
+    """Run two timed stages."""
+    with stage_timer("filter"):
+        pass
+    with stage_timer("grains"):
+        time.sleep(0.01)
+    return job
+
+
+def test_measure() -> None:
+    """Test stages are only timed within a measured job and are returned with its result."""
+    assert staged_job(1) == 1
+    result, measurement = measure(staged_job, 2)
+    assert result == 2
+    assert [stage for stage, _ in measurement["stage_timings"]] == ["filter", "grains"]
+    assert measurement["stage_timings"][1][1] >= 0.01
+    assert measurement["rss"] is None or measurement["rss"] > 0
+
+
+def test_metrics_render() -> None:
+    """Test the metrics are rendered in the Prometheus text format."""
+    metrics = Metrics(total_jobs=4, window=60.0)
+    metrics.observe_job(images=1, grains=10, measurement={"stage_timings": [("filter", 0.3)], "rss": 100, "pid": 1})
+    metrics.observe_job(images=2, grains=5, measurement={"stage_timings": [("filter", 3.0)], "rss": 200, "pid": 1})
+    metrics.observe_failure("timed_out")
+    metrics.observe_failure("skipped")
+    rendered = metrics.render()
+    assert "topostats_images_processed_total 3\n" in rendered
+    assert "topostats_grains_total 15\n" in rendered
+    assert "topostats_images_per_minute 3\n" in rendered
+    assert "topostats_grains_per_second 0.25\n" in rendered
+    assert "topostats_queue_depth 1\n" in rendered
+    assert 'topostats_failures_total{status="timed_out"} 1\n' in rendered
+    assert 'topostats_failures_total{status="skipped"} 1\n' in rendered
+    assert 'topostats_stage_seconds_bucket{stage="filter",le="0.5"} 1\n' in rendered
+    assert 'topostats_stage_seconds_bucket{stage="filter",le="5"} 2\n' in rendered
+    assert 'topostats_stage_seconds_bucket{stage="filter",le="+Inf"} 2\n' in rendered
+    assert 'topostats_stage_seconds_sum{stage="filter"} 3.3\n' in rendered
+    assert 'topostats_worker_rss_bytes{pid="1"} 200\n' in rendered
+
+
+def test_report_metrics_disabled() -> None:
+    """Test no metrics are recorded unless a port or file is configured."""
+    with report_metrics({"port": None, "file": None, "interval": 1, "window": 60}, total_jobs=1) as metrics:
+        assert metrics is None
+
+
+def test_report_metrics(tmp_path: Path) -> None:
+    """Test metrics are served on localhost and written to a file that is updated when reporting ends."""
+    with socket.socket() as free_socket:
+        free_socket.bind(("127.0.0.1", 0))
+        port = free_socket.getsockname()[1]
+    metrics_config = {"port": port, "file": "metrics.prom", "interval": 60, "window": 60}
+    with report_metrics(metrics_config, total_jobs=2, output_dir=tmp_path) as metrics:
+        assert "topostats_queue_depth 2\n" in (tmp_path / "metrics.prom").read_text(encoding="utf-8")
+        metrics.observe_job(images=1, grains=3)
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics") as response:  # noqa: S310
+            assert "topostats_grains_total 3\n" in response.read().decode("utf-8")
+        with pytest.raises(urllib.error.HTTPError):
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/other")  # noqa: S310
+    assert "topostats_queue_depth 1\n" in (tmp_path / "metrics.prom").read_text(encoding="utf-8")
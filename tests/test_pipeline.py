@@ -0,0 +1,105 @@
+"""Tests of the pipeline module."""
+import logging
+from copy import deepcopy
+from pathlib import Path
+
+import numpy as np
+import pytest
+from schema import SchemaError
+
+import topostats
+from topostats.io import LoadScans
+from topostats.logs.logs import LOGGER_NAME
+from topostats.pipeline import Pipeline, process_array
+from topostats.processing import process_scan
+
+
+def test_pipeline_process_matches_process_scan(
+    process_scan_config: dict, load_scan_data: LoadScans, tmp_path: Path, monkeypatch
+) -> None:
+    """Test processing in memory gives the same results as process_scan() without writing any files."""
+    process_scan_config["plotting"]["run"] = False
+    topostats_object = load_scan_data.img_dict["minicircle_small"]
+    _, expected_results, expected_image_stats = process_scan(
+        topostats_object=deepcopy(topostats_object),
+        base_dir=tmp_path,
+        filter_config=deepcopy(process_scan_config["filter"]),
+        grains_config=deepcopy(process_scan_config["grains"]),
+        grainstats_config=deepcopy(process_scan_config["grainstats"]),
+        dnatracing_config=deepcopy(process_scan_config["dnatracing"]),
+        plotting_config=deepcopy(process_scan_config["plotting"]),
+        output_dir=tmp_path / "output",
+    )
+    working_dir = tmp_path / "cwd"
+    working_dir.mkdir()
+    monkeypatch.chdir(working_dir)
+
+    pipeline = Pipeline(process_scan_config)
+    for _ in range(2):
+        result = pipeline.process(
+            topostats_object["image_original"],
+            pixel_to_nm_scaling=topostats_object["pixel_to_nm_scaling"],
+            filename="minicircle_small",
+        )
+        assert result["grain_masks"]["above"].max() == len(expected_results)
+        np.testing.assert_array_equal(result["grainstats"], expected_results.drop(columns="basename"))
+        assert result["image_stats"].equals(expected_image_stats)
+    assert not any(working_dir.iterdir())
+
+
+def test_pipeline_video(process_scan_config: dict, load_scan_data: LoadScans) -> None:
+    """Test the pipeline reuses the mask and thresholds of earlier frames in video mode until it is reset."""
+    process_scan_config["dnatracing"]["run"] = False
+    process_scan_config["video"]["run"] = True
+    topostats_object = load_scan_data.img_dict["minicircle_small"]
+    pipeline = Pipeline(process_scan_config)
+    refitted = []
+    for offset in (0.0, 0.0, 50.0):
+        result = pipeline.process(
+            topostats_object["image_original"] + offset, pixel_to_nm_scaling=topostats_object["pixel_to_nm_scaling"]
+        )
+        refitted.append(result["refitted"])
+    pipeline.reset()
+    refitted.append(pipeline.process(result["image_original"], topostats_object["pixel_to_nm_scaling"])["refitted"])
+    assert refitted == [True, False, True, True]
+
+
+def test_process_array_default_config(load_scan_data: LoadScans) -> None:
+    """Test a single image is processed with the default configuration, also available from the package."""
+    topostats_object = load_scan_data.img_dict["minicircle_small"]
+    assert topostats.process_array is process_array
+    result = topostats.process_array(
+        topostats_object["image_original"], pixel_to_nm_scaling=topostats_object["pixel_to_nm_scaling"]
+    )
+    assert result["image_flattened"].shape == topostats_object["image_original"].shape
+    assert result["image_stats"].index.tolist() == ["image"]
+    assert "refitted" not in result
+
+
+def test_pipeline_invalid_config(process_scan_config: dict) -> None:
+    """Test the configuration is validated when the pipeline is created."""
+    process_scan_config["grains"]["threshold_method"] = "guess"
+    with pytest.raises(SchemaError, match="'grains'"):
+        Pipeline(process_scan_config)
+
+
+def test_pipeline_no_log_file(load_scan_data: LoadScans, tmp_path: Path) -> None:
+    """Test messages are not written to the log file when processing in memory."""
+    log_file = tmp_path / "topostats.log"
+    file_handler = logging.FileHandler(log_file, delay=True)
+    logger = logging.getLogger(LOGGER_NAME)
+    logger.addHandler(file_handler)
+    topostats_object = load_scan_data.img_dict["minicircle_small"]
+    try:
+        process_array(topostats_object["image_original"], pixel_to_nm_scaling=topostats_object["pixel_to_nm_scaling"])
+    finally:
+        logger.removeHandler(file_handler)
+        file_handler.close()
+    assert not log_file.exists()
+
+
+def test_pipeline_no_grains() -> None:
+    """Test an image without grains is processed, giving empty grain statistics."""
+    image = np.random.default_rng(seed=0).normal(size=(64, 64))
+    result = process_array(image, pixel_to_nm_scaling=1.0)
+    assert result["grainstats"].empty
@@ -394,8 +394,9 @@ def test_process_scan_align_grainstats_dnatracing(
     )
     tracing_to_check = ["contour_length", "circular", "end_to_end_distance"]
 
-    assert results.shape == (3, 25)
+    assert results.shape == (3, 26)
     assert np.isnan(results.loc[2, "contour_length"])
+    assert results.loc[2, "tracing_skip_reason"] == "skeleton_too_small"
     assert np.isnan(sum(results.loc[2, tracing_to_check]))
 
 
@@ -432,7 +433,7 @@ def test_run_grains(process_scan_config: dict, tmp_path: Path) -> None:
     grains_config["smallest_grain_size_nm2"] = 20
     grains_config["absolute_area_threshold"]["above"] = [20, 10000000]
 
-    grains = run_grains(
+    grains, grain_registries = run_grains(
         image=flattened_image,
         pixel_to_nm_scaling=0.4940029296875,
         filename="dummy filename",
@@ -451,6 +452,41 @@ def test_run_grains(process_scan_config: dict, tmp_path: Path) -> None:
     # thresholds.
     assert np.max(grains["below"]) > 0
     assert np.max(grains["above"]) < 10
+    assert list(grain_registries.keys()) == ["above", "below"]
+    assert grain_registries["above"].labelled_mask is grains["above"]
+    assert len(grain_registries["above"]) == 6
+
+
+@pytest.mark.parametrize(
+    ("image_set", "expected"),
+    [pytest.param("core", False, id="core"), pytest.param("all", True, id="all")],
+)
+def test_run_grains_step_images(process_scan_config: dict, tmp_path: Path, image_set: str, expected: bool) -> None:
+    """Test the image of each grain finding step is plotted with the default (fused) segmentation and image_set all."""
+    flattened_image = np.load("./tests/resources/minicircle_cropped_flattened.npy")
+    grains_config = process_scan_config["grains"]
+    grains_config["threshold_method"] = "absolute"
+    grains_config["threshold_absolute"]["above"] = 1.0
+    grains_config["smallest_grain_size_nm2"] = 20
+    grains_config["absolute_area_threshold"]["above"] = [20, 10000000]
+    assert grains_config["segmentation"] == "fused"
+    process_scan_config["plotting"]["image_set"] = image_set
+    process_scan_config["plotting"] = update_plotting_config(process_scan_config["plotting"])
+    (tmp_path / "above").mkdir()
+
+    grains, _ = run_grains(
+        image=flattened_image,
+        pixel_to_nm_scaling=0.4940029296875,
+        filename="dummy filename",
+        grain_out_path=tmp_path,
+        core_out_path=tmp_path,
+        grains_config=grains_config,
+        plotting_config=process_scan_config["plotting"],
+    )
+
+    assert np.max(grains["above"]) == 6
+    for step in ("18-labelled_regions", "19-tidy_borders", "20-noise_removed", "21-small_objects_removed"):
+        assert (tmp_path / "above" / f"{step}.png").exists() == expected
 
 
 def test_run_grainstats(process_scan_config: dict, tmp_path: Path) -> None:
@@ -497,4 +533,4 @@ def test_run_dnatracing(process_scan_config: dict, tmp_path: Path) -> None:
 
     assert isinstance(dnatracing_df, pd.DataFrame)
     assert dnatracing_df.shape[0] == 13
-    assert len(dnatracing_df.columns) == 26
+    assert len(dnatracing_df.columns) == 27
@@ -0,0 +1,58 @@
+"""Tests of the results module."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from topostats.results import STATISTICS_DTYPES, STATISTICS_INDEX, ResultsTable
+from topostats.utils import create_empty_dataframe
+
+
+def grain_statistics(image: str, n_grains: int, circular: bool | None = None) -> pd.DataFrame:
+    """Make grain statistics of an image, indexed by molecule number as returned by process_scan()."""
+    df = pd.DataFrame(
+        {
+            "area": np.arange(n_grains, dtype=float) + 1.0,
+            "threshold": "above",
+            "image": image,
+        },
+        index=pd.RangeIndex(n_grains, name="molecule_number"),
+    )
+    if circular is not None:
+        df["circular"] = circular
+    return df
+
+
+@pytest.mark.parametrize("capacity", [pytest.param(1, id="grown"), pytest.param(1024, id="preallocated")])
+def test_results_table(capacity: int) -> None:
+    """Test rows appended to a table give the same DataFrame as concatenating them."""
+    frames = [
+        grain_statistics("a", 3),
+        create_empty_dataframe(),
+        grain_statistics("b", 2, circular=True),
+        grain_statistics("c", 1),
+    ]
+    table = ResultsTable(dtypes=STATISTICS_DTYPES, capacity=capacity)
+    for df in frames:
+        table.append(df)
+    expected = pd.concat(frames).reset_index().set_index(STATISTICS_INDEX)
+    result = table.to_dataframe(index=STATISTICS_INDEX)
+
+    assert len(table) == 6
+    assert list(result.columns) == list(expected.columns)
+    assert result.to_csv() == expected.to_csv()
+    assert result["circular"].tolist()[3:5] == [True, True]
+    assert result["area"].dtype == np.float64
+
+
+def test_results_table_types() -> None:
+    """Test columns of unknown type take that of their first values and change type for missing or other values."""
+    table = ResultsTable()
+    table.append(pd.DataFrame({"count": [1, 2], "flag": [True, False]}, index=pd.Index(["a", "b"], name="image")))
+    assert table.columns["count"].dtype == np.int64
+    table.append(pd.DataFrame({"count": [3.5]}, index=pd.Index(["c"], name="image")))
+    table.append(pd.DataFrame({"count": ["many"], "flag": [True]}, index=pd.Index(["d"], name="image")))
+    result = table.to_dataframe(index="image")
+
+    assert result["count"].tolist() == [1, 2, 3.5, "many"]
+    assert result["flag"].tolist()[:2] == [True, False]
+    assert np.isnan(result.loc["c", "flag"])
@@ -4,8 +4,10 @@ from pathlib import Path
 
 import pytest
 
+from topostats.discovery import select_shard
 from topostats.entry_point import entry_point
 from topostats.logs.logs import LOGGER_NAME
+from topostats.merge import find_shards, merge_shards
 
 BASE_DIR = Path.cwd()
 
@@ -62,3 +64,32 @@ def test_run_topostats_process_debug(caplog) -> None:
         assert "File extension : .topostats" in caplog.text
         assert "Images processed : 1" in caplog.text
         assert "~~~~~~~~~~~~~~~~~~~~ COMPLETE ~~~~~~~~~~~~~~~~~~~~" in caplog.text
+
+
+def test_run_topostats_empty_shard(tmp_path: Path) -> None:
+    """Test shards without any images are complete, so the statistics of all shards can be merged."""
+    base_dir = BASE_DIR / "tests" / "resources" / "test_image"
+    img_files = sorted(base_dir.glob("*.topostats"))
+    empty_shards = [index for index in (1, 2, 3) if not select_shard(img_files, base_dir, f"{index}/3")]
+    assert empty_shards
+    for index in empty_shards:
+        with pytest.raises(SystemExit):
+            entry_point(
+                manually_provided_args=[
+                    "process",
+                    "--base_dir",
+                    str(base_dir),
+                    "--file_ext",
+                    ".topostats",
+                    "--output_dir",
+                    str(tmp_path),
+                    "--cores",
+                    "1",
+                    "--shard",
+                    f"{index}/3",
+                ]
+            )
+    shard_dirs = find_shards(tmp_path)
+    assert [shard_dir.name for shard_dir in shard_dirs] == [f"shard_{index}_of_3" for index in empty_shards]
+    _, image_stats = merge_shards(tmp_path)
+    assert len(image_stats) == 0
@@ -0,0 +1,113 @@
+"""Tests of the sweep module."""
+import shutil
+from pathlib import Path
+
+import pandas as pd
+import pytest
+import yaml
+from schema import SchemaError
+
+from topostats.entry_point import entry_point
+from topostats.io import LoadScans, read_yaml
+from topostats.sweep import apply_overrides, expand_grid, sweep_scan
+
+BASE_DIR = Path.cwd()
+
+
+def test_expand_grid(process_scan_config: dict) -> None:
+    """Test a grid is expanded to every combination of values."""
+    grid = {"grains.threshold_std_dev.above": [0.5, 1.0], "dnatracing.spline_step_size": [7.0e-9, 1.0e-8, 1.3e-8]}
+    overrides = expand_grid(process_scan_config, grid)
+    assert len(overrides) == 6
+    assert overrides[0] == {"grains.threshold_std_dev.above": 0.5, "dnatracing.spline_step_size": 7.0e-9}
+    assert overrides[-1] == {"grains.threshold_std_dev.above": 1.0, "dnatracing.spline_step_size": 1.3e-8}
+
+
+@pytest.mark.parametrize(
+    "dotted_key",
+    [
+        pytest.param("cores", id="not a stage"),
+        pytest.param("plotting.dpi", id="stage that can not be swept"),
+        pytest.param("grains.threshold_std_dev.sideways", id="not an option"),
+    ],
+)
+def test_expand_grid_invalid(process_scan_config: dict, dotted_key: str) -> None:
+    """Test a ValueError is raised for options that can not be swept."""
+    with pytest.raises(ValueError, match="Cannot sweep"):
+        expand_grid(process_scan_config, {dotted_key: [1, 2]})
+
+
+def test_apply_overrides(process_scan_config: dict) -> None:
+    """Test overrides are applied to copies of the stage configurations and validated."""
+    stage_configs = apply_overrides(process_scan_config, {"grains.threshold_std_dev.above": 0.5})
+    assert stage_configs["grains"]["threshold_std_dev"]["above"] == 0.5
+    assert process_scan_config["grains"]["threshold_std_dev"]["above"] == 1.0
+    with pytest.raises(SchemaError):
+        apply_overrides(process_scan_config, {"grains.threshold_std_dev.above": -1.0})
+
+
+def test_sweep_scan(process_scan_config: dict, load_scan_data: LoadScans, tmp_path: Path, caplog) -> None:
+    """Test stages shared by sweep points are run once and results are tagged with the sweep point."""
+    process_scan_config["dnatracing"]["run"] = False
+    process_scan_config["plotting"]["run"] = False
+    overrides = expand_grid(
+        process_scan_config,
+        {"grains.threshold_std_dev.above": [0.5, 1.0], "grainstats.cropped_size": [-1, 40.0, -1]},
+    )
+    sweep_points = [apply_overrides(process_scan_config, point_overrides) for point_overrides in overrides]
+
+    img_path, results, image_stats = sweep_scan(
+        load_scan_data.img_dict["minicircle_small"],
+        sweep_points=sweep_points,
+        base_dir=tmp_path,
+        plotting_config=process_scan_config["plotting"],
+        output_dir=tmp_path,
+    )
+
+    assert img_path == load_scan_data.img_dict["minicircle_small"]["img_path"]
+    assert "6 sweep points processed with 1 filter, 2 grain finding, 4 grainstats and 4 tracing runs" in caplog.text
+    assert image_stats["sweep_point"].tolist() == [0, 1, 2, 3, 4, 5]
+    assert sorted(results["sweep_point"].unique()) == [0, 1, 2, 3, 4, 5]
+    # Points 0 and 2 have the same configuration so share all stages
+    assert (
+        results[results["sweep_point"] == 0]
+        .drop(columns="sweep_point")
+        .equals(results[results["sweep_point"] == 2].drop(columns="sweep_point"))
+    )
+    assert len(results[results["sweep_point"] == 0]) != len(results[results["sweep_point"] == 3])
+
+
+def test_run_sweep_failed_images(tmp_path: Path) -> None:
+    """Test files that can not be loaded are recorded in the failures manifest rather than stopping the sweep."""
+    base_dir = tmp_path / "scans"
+    base_dir.mkdir()
+    shutil.copy(BASE_DIR / "tests" / "resources" / "test_image" / "minicircle_small.topostats", base_dir)
+    (base_dir / "corrupt.topostats").write_bytes(b"not a topostats file")
+    config = read_yaml(BASE_DIR / "topostats" / "default_config.yaml")
+    config["dnatracing"]["run"] = False
+    config["plotting"]["run"] = False
+    config["summary_stats"]["run"] = False
+    config["sweep"] = {"grains.threshold_std_dev.above": [0.5, 1.0]}
+    config_file = tmp_path / "config.yaml"
+    config_file.write_text(yaml.dump(config), encoding="utf-8")
+    entry_point(
+        manually_provided_args=[
+            "sweep",
+            "--config_file",
+            str(config_file),
+            "--base_dir",
+            str(base_dir),
+            "--file_ext",
+            ".topostats",
+            "--output_dir",
+            str(tmp_path / "output"),
+            "--cores",
+            "1",
+        ]
+    )
+    failures = pd.read_csv(tmp_path / "output" / "failures.csv")
+    assert failures["image"].tolist() == ["corrupt"]
+    assert failures["status"].tolist() == ["skipped"]
+    image_stats = pd.read_csv(tmp_path / "output" / "sweep_image_stats.csv")
+    assert image_stats["image"].tolist() == ["minicircle_small", "minicircle_small"]
+    assert image_stats["sweep_point"].tolist() == [0, 1]
@@ -4,7 +4,7 @@ import numpy as np
 import pytest
 from skimage.filters import threshold_mean, threshold_minimum, threshold_otsu, threshold_triangle, threshold_yen
 
-from topostats.thresholds import threshold
+from topostats.thresholds import ThresholdEngine, threshold
 
 OPTIONS = {
     "nbins": 10,
@@ -148,3 +148,32 @@ def test_threshold_triangle_keywords(image_random: np.array) -> None:
 
     assert isinstance(_threshold, float)
     assert _threshold == threshold_triangle(image_random, **OPTIONS)
+
+
+def test_threshold_engine_shares_histogram(image_random: np.array) -> None:
+    """Test the histogram is calculated once and shared between methods, and thresholds are cached."""
+    engine = ThresholdEngine(image_random)
+    assert threshold(engine, method="otsu", otsu_threshold_multiplier=1.0) == threshold_otsu(image_random)
+    assert threshold(engine, method="yen") == threshold_yen(image_random)
+    assert threshold(engine, method="minimum") == threshold_minimum(image_random)
+    assert list(engine._histograms) == [256]  # pylint: disable=protected-access
+    engine._thresholds[("yen", None, ())] = -1.0  # pylint: disable=protected-access
+    assert engine.threshold("yen") == -1.0
+
+
+def test_threshold_engine_uniform_image() -> None:
+    """Test the Otsu threshold of an image with a single value is that value."""
+    image = np.full((10, 10), 3.0)
+    assert threshold(image, method="otsu", otsu_threshold_multiplier=1.0) == threshold_otsu(image)
+
+
+def test_threshold_engine_subsample() -> None:
+    """Test thresholds of a subsampled image are within a bin width of those of all pixels."""
+    rng = np.random.default_rng(seed=1)
+    image = np.concatenate([rng.normal(0.0, 1.0, 600_000), rng.normal(5.0, 1.0, 400_000)]).reshape(1000, 1000)
+    engine = ThresholdEngine(image, max_pixels=50_000)
+    assert engine.sample.size == 50_000
+    bin_width = np.ptp(image) / 256
+    assert abs(engine.threshold("otsu", otsu_threshold_multiplier=1.0) - threshold_otsu(image)) < bin_width
+    assert abs(engine.mean - threshold_mean(image)) < 0.05
+    assert abs(engine.std - np.std(image)) < 0.05
@@ -5,7 +5,7 @@ from pathlib import Path
 import pytest
 from schema import Or, Schema, SchemaError
 
-from topostats.validation import validate_config
+from topostats.validation import validate_config, validate_trace_filter
 
 TEST_SCHEMA = Schema(
     {
@@ -36,3 +36,18 @@ def test_validate(config, expectation) -> None:
     """Test various configurations."""
     with expectation:
         validate_config(config, schema=TEST_SCHEMA, config_type="Test YAML")
+
+
+@pytest.mark.parametrize(
+    ("statistics", "trace_filter", "expectation"),
+    [
+        pytest.param("all", {"area": [1.0, None]}, does_not_raise(), id="all statistics"),
+        pytest.param(["area", "volume"], {"area": [1.0, None]}, does_not_raise(), id="statistic calculated"),
+        pytest.param(["area"], {}, does_not_raise(), id="no filter"),
+        pytest.param(["volume"], {"area": [1.0, None]}, pytest.raises(SchemaError), id="statistic not calculated"),
+    ],
+)
+def test_validate_trace_filter(statistics, trace_filter: dict, expectation) -> None:
+    """Test tracing filters on statistics that are not calculated are rejected."""
+    with expectation:
+        validate_trace_filter({"statistics": statistics}, {"trace_filter": trace_filter})
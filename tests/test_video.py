@@ -0,0 +1,90 @@
+"""Tests of the video module."""
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from topostats.io import LoadScans
+from topostats.video import StackState, group_frames, process_stack
+
+
+@pytest.mark.parametrize(
+    ("second_frame", "warm"),
+    [
+        pytest.param(lambda frame: frame + 0.01, True, id="small shift"),
+        pytest.param(lambda frame: frame + 5.0, False, id="mean shifted"),
+        pytest.param(lambda frame: frame * 2.0, False, id="standard deviation changed"),
+        pytest.param(lambda frame: frame[:-1], False, id="shape changed"),
+    ],
+)
+def test_stack_state_update(second_frame, warm: bool) -> None:
+    """Test a frame is only warm if its statistics and shape are close to those of the last refitted frame."""
+    frame = np.random.default_rng(seed=1).normal(0.0, 1.0, (32, 32))
+    stack_state = StackState(tolerance=0.1)
+    assert not stack_state.update(frame)
+    stack_state.filter_mask = np.zeros_like(frame, dtype=bool)
+    stack_state.grain_thresholds = {"above": 1.0}
+    assert stack_state.update(second_frame(frame)) == warm
+    assert stack_state.frames_refitted == (1 if warm else 2)
+    assert (stack_state.grain_thresholds is not None) == warm
+
+
+def load_video(monkeypatch: pytest.MonkeyPatch, image: dict, offsets: list[float]) -> None:
+    """Make LoadScans load .asd files as frames of an image, as loaded by LoadScans, shifted by each offset."""
+
+    def load_asd(self) -> tuple:
+        """Frames of the image, with the channel added so channels differ."""
+        frames = np.stack([image["image_original"] + offset + self.channels.index(self.channel) for offset in offsets])
+        return frames, image["pixel_to_nm_scaling"]
+
+    monkeypatch.setattr(LoadScans, "load_asd", load_asd)
+
+
+def test_group_frames(monkeypatch: pytest.MonkeyPatch, load_scan_data: LoadScans, tmp_path: Path) -> None:
+    """Test the frames of each channel of each file loaded by LoadScans are grouped into a stack, in order."""
+    load_video(monkeypatch, load_scan_data.img_dict["minicircle_small"], [0.0, 1.0, 2.0])
+    scan = LoadScans([tmp_path / "movie.asd", tmp_path / "other.asd"], channel=["TP", "ERR"])
+    scan.get_data()
+    stacks = group_frames(scan.img_dict)
+
+    assert [[frame["filename"] for frame in stack] for stack in stacks] == [
+        [f"{stack}_{frame}" for frame in range(3)] for stack in ("movie_TP", "movie_ERR", "other_TP", "other_ERR")
+    ]
+    assert all(frame["source_file"] == tmp_path / "other.asd" for frame in stacks[3])
+    assert [frame["image_original"].mean() for frame in stacks[1]] == pytest.approx(
+        [frame["image_original"].mean() + 1.0 for frame in stacks[0]]
+    )
+
+
+def test_process_stack(
+    process_scan_config: dict, monkeypatch: pytest.MonkeyPatch, load_scan_data: LoadScans, tmp_path: Path
+) -> None:
+    """Test frames are processed in order, reusing the mask and thresholds of frames whose statistics are unchanged."""
+    process_scan_config["dnatracing"]["run"] = False
+    process_scan_config["plotting"]["run"] = False
+    load_video(monkeypatch, load_scan_data.img_dict["minicircle_small"], [0.0, 0.0, 50.0])
+    scan = LoadScans([tmp_path / "minicircle_small.asd"], channel="TP")
+    scan.get_data()
+    stacks = group_frames(scan.img_dict)
+    assert len(stacks) == 1
+    frames = stacks[0]
+
+    img_path, results, image_stats = process_stack(
+        stacks[0],
+        base_dir=tmp_path,
+        filter_config=process_scan_config["filter"],
+        grains_config=process_scan_config["grains"],
+        grainstats_config=process_scan_config["grainstats"],
+        dnatracing_config=process_scan_config["dnatracing"],
+        plotting_config=process_scan_config["plotting"],
+        output_dir=tmp_path,
+    )
+
+    assert img_path == tmp_path / "minicircle_small.asd"
+    assert image_stats["refitted"].tolist() == [True, False, True]
+    assert sorted(results["frame"].unique()) == [0, 1, 2]
+    # Reusing the mask of an identical frame gives the same result as deriving it afresh
+    np.testing.assert_array_almost_equal(frames[1]["image_flattened"], frames[0]["image_flattened"])
+    np.testing.assert_array_almost_equal(frames[2]["image_flattened"], frames[0]["image_flattened"])
+    assert len(results[results["frame"] == 1]) == len(results[results["frame"] == 0])
+    assert len(list(tmp_path.rglob("processed/minicircle_small_video_statistics.csv"))) == 1
@@ -0,0 +1,155 @@
+"""Tests of the watch module."""
+import os
+import shutil
+from multiprocessing.pool import ThreadPool
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from topostats import watch
+from topostats.watch import FolderWatcher, append_to_csv, process_batch
+
+BASE_DIR = Path.cwd()
+RESOURCES = BASE_DIR / "tests" / "resources"
+
+
+def test_folder_watcher_settle_time(tmp_path: Path) -> None:
+    """Test images are only returned once they have been unchanged for the settle time."""
+    image = tmp_path / "scan_01.spm"
+    image.write_bytes(b"partial")
+    watcher = FolderWatcher(base_dir=tmp_path, file_ext=".spm", settle_time=2.0, use_inotify=False)
+    watcher.start()
+    assert watcher.poll(now=0.0) == []
+    # Still being written
+    image.write_bytes(b"partially written")
+    assert watcher.poll(now=1.0) == []
+    assert watcher.poll(now=2.0) == []
+    assert watcher.poll(now=3.0) == [image]
+    # Images are only returned once
+    assert watcher.poll(now=10.0) == []
+
+
+def test_folder_watcher_new_files(tmp_path: Path) -> None:
+    """Test images written after starting, in sub-directories, are detected and others ignored."""
+    watcher = FolderWatcher(base_dir=tmp_path, file_ext=".spm", settle_time=0.0, use_inotify=False)
+    watcher.start()
+    assert watcher.poll(now=0.0) == []
+    (tmp_path / "session").mkdir()
+    image = tmp_path / "session" / "scan_02.spm"
+    image.write_bytes(b"scan")
+    (tmp_path / "notes.txt").write_text("not an image", encoding="utf-8")
+    watcher.poll(now=1.0)
+    assert watcher.poll(now=2.0) == [image]
+
+
+def test_folder_watcher_exclude(tmp_path: Path) -> None:
+    """Test images under the excluded directory are ignored."""
+    output_dir = tmp_path / "output"
+    output_dir.mkdir()
+    (output_dir / "scan_01.spm").write_bytes(b"scan")
+    watcher = FolderWatcher(base_dir=tmp_path, file_ext=".spm", settle_time=0.0, use_inotify=False, exclude=output_dir)
+    watcher.start()
+    watcher.poll(now=0.0)
+    assert watcher.poll(now=1.0) == []
+
+
+def test_folder_watcher_retry(tmp_path: Path) -> None:
+    """Test files that failed are returned again once they have settled, until they have been retried enough."""
+    image = tmp_path / "scan_01.spm"
+    image.write_bytes(b"scan")
+    watcher = FolderWatcher(base_dir=tmp_path, file_ext=".spm", settle_time=1.0, use_inotify=False, retries=1)
+    watcher.start()
+    watcher.poll(now=0.0)
+    assert watcher.poll(now=1.0) == [image]
+    watcher.retry({image})
+    assert watcher.poll(now=2.0) == []
+    assert watcher.poll(now=3.0) == [image]
+    watcher.retry({image})
+    assert watcher.poll(now=4.0) == []
+    assert watcher.poll(now=5.0) == []
+    assert image in watcher.processed
+
+
+def test_folder_watcher_lists_changed_directories(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test polling only lists the directories that have changed since they were last listed."""
+    (tmp_path / "session_1").mkdir()
+    (tmp_path / "session_2").mkdir()
+    listed = []
+    scandir = os.scandir
+
+    def counting_scandir(path):
+        """Record the directories that are listed."""
+        listed.append(Path(path))
+        return scandir(path)
+
+    monkeypatch.setattr(watch.os, "scandir", counting_scandir)
+    watcher = FolderWatcher(base_dir=tmp_path, file_ext=".spm", settle_time=0.0, use_inotify=False)
+    # Directories last modified well before they are listed are not listed again until they change
+    for directory in (tmp_path, tmp_path / "session_1", tmp_path / "session_2"):
+        os.utime(directory, (0, 0))
+    watcher.start()
+    assert sorted(listed) == [tmp_path, tmp_path / "session_1", tmp_path / "session_2"]
+    listed.clear()
+    watcher.poll(now=0.0)
+    assert listed == []
+    image = tmp_path / "session_2" / "scan_01.spm"
+    image.write_bytes(b"scan")
+    watcher.poll(now=1.0)
+    assert listed == [tmp_path / "session_2"]
+    assert watcher.poll(now=2.0) == [image]
+
+
+def test_process_batch_failed_files(tmp_path: Path) -> None:
+    """Test files that can not be loaded, or an image of which fails, are returned as failed and are not appended."""
+    for name in ("good", "bad"):
+        shutil.copy(RESOURCES / "file.jpk", tmp_path / f"{name}.jpk")
+    (tmp_path / "corrupt.jpk").write_bytes(b"not a jpk file")
+    img_files = [tmp_path / "good.jpk", tmp_path / "bad.jpk", tmp_path / "corrupt.jpk"]
+    config = {"loading": {"channel": "height_trace"}, "output_dir": tmp_path}
+
+    def processing_function(topostats_object: dict) -> tuple:
+        """Return the statistics of an image, failing for the 'bad' image."""
+        if topostats_object["filename"] == "bad":
+            raise ValueError("bad image")
+        image_stats = pd.DataFrame({"image": [topostats_object["filename"]], "area": [1.0]}).set_index("image")
+        return topostats_object["img_path"], pd.DataFrame(), image_stats
+
+    with ThreadPool(processes=2) as pool:
+        processed, failed = process_batch(img_files, pool, processing_function, config, None, 2)
+    assert processed == 1
+    assert failed == {tmp_path / "bad.jpk", tmp_path / "corrupt.jpk"}
+    assert list(pd.read_csv(tmp_path / "image_stats.csv")["image"]) == ["good"]
+
+
+def test_append_to_csv(tmp_path: Path) -> None:
+    """Test dataframes are appended with a single header."""
+    csv_file = tmp_path / "all_statistics.csv"
+    append_to_csv(pd.DataFrame({"image": ["a"], "area": [1.0]}), csv_file)
+    append_to_csv(pd.DataFrame({"image": ["b"], "area": [2.0]}), csv_file)
+    df = pd.read_csv(csv_file, index_col=0)
+    assert list(df["image"]) == ["a", "b"]
+    assert list(df["area"]) == [1.0, 2.0]
+
+
+def test_append_to_csv_column_order(tmp_path: Path) -> None:
+    """Test batches with columns in a different order are appended under the columns of the existing header."""
+    csv_file = tmp_path / "all_statistics.csv"
+    index = ["image", "threshold", "molecule_number"]
+    append_to_csv(
+        pd.DataFrame(
+            {"image": ["a"], "threshold": ["above"], "molecule_number": [0], "area": [1.0], "volume": [3.0]}
+        ).set_index(index),
+        csv_file,
+    )
+    append_to_csv(
+        pd.DataFrame({"volume": [4.0, None], "area": [2.0, None], "image": ["b", "c"], "threshold": ["above", None]})
+        .assign(molecule_number=[0, None])
+        .set_index(index),
+        csv_file,
+    )
+    df = pd.read_csv(csv_file)
+    assert list(df.columns) == ["image", "threshold", "molecule_number", "area", "volume"]
+    assert list(df["image"]) == ["a", "b", "c"]
+    assert list(df["area"][:2]) == [1.0, 2.0]
+    assert list(df["volume"][:2]) == [3.0, 4.0]
@@ -782,3 +782,45 @@ def test_remove_duplicate_consecutive_tuples(tuple_list: list[tuple], expected_r
     result = dnaTrace.remove_duplicate_consecutive_tuples(tuple_list)
 
     np.testing.assert_array_equal(result, expected_result)
+
+
+@pytest.mark.parametrize(
+    ("mol_is_circular", "angles"),
+    [
+        pytest.param(True, np.linspace(0, 2 * np.pi, 120, endpoint=False), id="circular"),
+        pytest.param(False, np.linspace(0, np.pi, 60), id="linear"),
+    ],
+)
+def test_get_splined_traces_single(dnatrace_spline: dnaTrace, mol_is_circular: bool, angles: np.ndarray) -> None:
+    """Test the 'single' spline method follows a pixelated arc and keeps the ends of linear traces."""
+    radius = 20
+    fitted_trace = np.round(np.column_stack((radius * np.cos(angles), radius * np.sin(angles)))) + 30
+    dnatrace_spline.fitted_trace = fitted_trace
+    dnatrace_spline.spline_step_size = 4.0
+    dnatrace_spline.mol_is_circular = mol_is_circular
+    dnatrace_spline.spline_method = "single"
+    dnatrace_spline.get_splined_traces()
+    splined_trace = dnatrace_spline.splined_trace
+
+    assert splined_trace.shape == (len(fitted_trace) * 4, 2)
+    distance_from_centre = np.linalg.norm(splined_trace - 30, axis=1)
+    np.testing.assert_allclose(distance_from_centre, radius, atol=0.6)
+    if mol_is_circular:
+        np.testing.assert_array_equal(splined_trace[0], splined_trace[-1])
+    else:
+        np.testing.assert_allclose(splined_trace[[0, -1]], fitted_trace[[0, -1]], atol=0.6)
+
+
+@pytest.mark.parametrize("knot_spacing", [1, 2, 4])
+def test_fit_single_spline_closed_trace(knot_spacing: int) -> None:
+    """Test a loop whose trace is already closed, as returned by reorderTrace.circularTrace(), is splined."""
+    angles = np.linspace(0, 2 * np.pi, 60, endpoint=False)
+    trace = np.round(np.column_stack((20 * np.cos(angles), 20 * np.sin(angles)))) + 30
+    closed_trace = np.vstack((trace, trace[:1]))
+    ev_array = np.linspace(0, 1, 240)
+
+    splined_trace = dnaTrace.fit_single_spline(closed_trace, knot_spacing, 3, True, ev_array)
+
+    assert not np.isnan(splined_trace).any()
+    np.testing.assert_allclose(np.linalg.norm(splined_trace - 30, axis=1), 20, atol=0.6)
+    np.testing.assert_array_equal(splined_trace, dnaTrace.fit_single_spline(trace, knot_spacing, 3, True, ev_array))
@@ -5,7 +5,9 @@ import numpy as np
 import pandas as pd
 import pytest
 
-from topostats.tracing.dnatracing import prep_arrays, trace_image, trace_mask
+from topostats.grainstats import GrainStats
+from topostats.tracing import dnatracing
+from topostats.tracing.dnatracing import grains_outside_limits, prep_arrays, trace_image, trace_mask
 
 # This is required because of the inheritance used throughout
 # pylint: disable=redefined-outer-name
@@ -326,6 +328,7 @@ def test_trace_mask(
                     "contour_length": [5.684734982126663e-08, 7.574136072208753e-08],
                     "circular": [False, True],
                     "end_to_end_distance": [3.120049919984285e-08, 0.000000e00],
+                    "tracing_skip_reason": [None, None],
                 }
             ),
             [np.asarray([6, 25]), np.asarray([31, 32])],
@@ -342,6 +345,7 @@ def test_trace_mask(
                     "contour_length": [6.194694383968301e-08, 8.187508931608563e-08],
                     "circular": [False, False],
                     "end_to_end_distance": [2.257869018994927e-08, 1.2389530445725336e-08],
+                    "tracing_skip_reason": [None, None],
                 }
             ),
             [np.asarray([5, 28]), np.asarray([16, 66])],
@@ -358,6 +362,7 @@ def test_trace_mask(
                     "contour_length": [5.6550320018177204e-08, 8.062559919860786e-08],
                     "circular": [False, False],
                     "end_to_end_distance": [3.13837693459974e-08, 6.7191662793734405e-09],
+                    "tracing_skip_reason": [None, None],
                 }
             ),
             [np.asarray([4, 23]), np.asarray([18, 65])],
@@ -374,6 +379,7 @@ def test_trace_mask(
                     "contour_length": [5.4926652806911664e-08, 3.6512544238919696e-08],
                     "circular": [False, False],
                     "end_to_end_distance": [4.367667613976452e-08, 3.440332307376993e-08],
+                    "tracing_skip_reason": [None, None],
                 }
             ),
             [np.asarray([5, 23]), np.asarray([10, 58])],
@@ -407,3 +413,138 @@ def test_trace_image(
     for ordered_trace, start, end in zip(results["ordered_traces"], ordered_trace_start, ordered_trace_end):
         np.testing.assert_array_equal(ordered_trace[1], start)
         np.testing.assert_array_equal(ordered_trace[-1], end)
+
+
+@pytest.mark.parametrize("skeletonisation_method", ["topostats", "zhang"])
+def test_trace_image_gaussian_whole_image(skeletonisation_method: str) -> None:
+    """Test filtering the whole image once gives the same statistics as filtering each grain for these grains."""
+    per_grain = trace_image(
+        image=MULTIGRAIN_IMAGE,
+        grains_mask=MULTIGRAIN_MASK,
+        filename="multigrain",
+        pixel_to_nm_scaling=PIXEL_SIZE,
+        min_skeleton_size=MIN_SKELETON_SIZE,
+        skeletonisation_method=skeletonisation_method,
+        pad_width=PAD_WIDTH,
+    )
+    whole_image = trace_image(
+        image=MULTIGRAIN_IMAGE,
+        grains_mask=MULTIGRAIN_MASK,
+        filename="multigrain",
+        pixel_to_nm_scaling=PIXEL_SIZE,
+        min_skeleton_size=MIN_SKELETON_SIZE,
+        skeletonisation_method=skeletonisation_method,
+        pad_width=PAD_WIDTH,
+        gaussian_whole_image=True,
+    )
+    pd.testing.assert_frame_equal(whole_image["statistics"], per_grain["statistics"])
+
+
+@pytest.mark.parametrize(
+    ("trace_filter", "expected"),
+    [
+        pytest.param({}, {}, id="no filter"),
+        pytest.param({"area": [2.0, None]}, {0: "area_outside_limits"}, id="lower limit"),
+        pytest.param({"area": [None, 2.5]}, {2: "area_outside_limits"}, id="upper limit"),
+        pytest.param(
+            {"aspect_ratio": [None, 2.0], "area": [2.0, 2.5]},
+            {0: "aspect_ratio_outside_limits", 2: "area_outside_limits"},
+            id="first statistic outside limits",
+        ),
+        pytest.param({"volume": [1.0, 2.0]}, {}, id="missing values"),
+    ],
+)
+def test_grains_outside_limits(trace_filter: dict, expected: dict) -> None:
+    """Test grains with statistics outside the limits of the trace filter are found."""
+    grainstats = pd.DataFrame(
+        {"area": [1.0, 2.0, 3.0], "aspect_ratio": [3.0, 1.0, 1.0], "volume": np.nan},
+        index=pd.Index([0, 1, 2], name="molecule_number"),
+    )
+    assert grains_outside_limits(grainstats, trace_filter) == expected
+
+
+def test_trace_image_trace_filter() -> None:
+    """Test grains outside the limits of the trace filter are not traced and the others are traced as usual."""
+    traced = trace_image(
+        image=MULTIGRAIN_IMAGE,
+        grains_mask=MULTIGRAIN_MASK,
+        filename="multigrain",
+        pixel_to_nm_scaling=PIXEL_SIZE,
+        min_skeleton_size=MIN_SKELETON_SIZE,
+        skeletonisation_method="topostats",
+        pad_width=PAD_WIDTH,
+    )
+    filtered = trace_image(
+        image=MULTIGRAIN_IMAGE,
+        grains_mask=MULTIGRAIN_MASK,
+        filename="multigrain",
+        pixel_to_nm_scaling=PIXEL_SIZE,
+        min_skeleton_size=MIN_SKELETON_SIZE,
+        skeletonisation_method="topostats",
+        pad_width=PAD_WIDTH,
+        trace_filter={"area": [2.0, None]},
+        grainstats=pd.DataFrame({"area": [1.0, 3.0]}, index=pd.Index([0, 1], name="molecule_number")),
+    )
+    assert np.isnan(filtered["statistics"].loc[0, "contour_length"])
+    assert filtered["statistics"].loc[0, "tracing_skip_reason"] == "area_outside_limits"
+    pd.testing.assert_series_equal(filtered["statistics"].loc[1], traced["statistics"].loc[1])
+    np.testing.assert_array_equal(filtered["ordered_traces"][1], traced["ordered_traces"][1])
+
+
+def test_trace_image_trace_filter_grainstats(tmp_path: Path) -> None:
+    """Test the grains skipped are those outside the limits when GrainStats skips grains too small for statistics."""
+    image = np.random.default_rng(seed=1).random((40, 40))
+    grains_mask = np.zeros((40, 40), dtype=int)
+    grains_mask[2:20, 2:4] = 1
+    grains_mask[5:11, 10:16] = 2
+    grains_mask[22:35, 20:33] = 3
+    grainstats, _ = GrainStats(
+        data=image,
+        labelled_data=grains_mask,
+        pixel_to_nanometre_scaling=PIXEL_SIZE,
+        direction="above",
+        base_output_dir=tmp_path,
+        image_name="filtered",
+    ).calculate_stats()
+    trace_filter = {"area": [None, grainstats["area"].min()]}
+    assert grains_outside_limits(grainstats, trace_filter) == {2: "area_outside_limits"}
+
+    results = trace_image(
+        image=image,
+        grains_mask=grains_mask,
+        filename="filtered",
+        pixel_to_nm_scaling=PIXEL_SIZE,
+        min_skeleton_size=MIN_SKELETON_SIZE,
+        skeletonisation_method="topostats",
+        pad_width=PAD_WIDTH,
+        trace_filter=trace_filter,
+        grainstats=grainstats,
+    )
+    assert results["statistics"]["tracing_skip_reason"].tolist()[2] == "area_outside_limits"
+    assert "area_outside_limits" not in results["statistics"]["tracing_skip_reason"].tolist()[:2]
+
+
+def test_trace_image_grain_error(monkeypatch: pytest.MonkeyPatch, caplog: pytest.LogCaptureFixture) -> None:
+    """Test a grain that raises an error whilst tracing is skipped, logging the traceback, and others are traced."""
+    trace_grain = dnatracing.trace_grain
+
+    def failing_trace_grain(*args, **kwargs) -> dict:
+        """Trace grains, raising an error for the first."""
+        if args[9] == 0:
+            raise IndexError("index 5 is out of bounds")
+        return trace_grain(*args, **kwargs)
+
+    monkeypatch.setattr(dnatracing, "trace_grain", failing_trace_grain)
+    results = trace_image(
+        image=MULTIGRAIN_IMAGE,
+        grains_mask=MULTIGRAIN_MASK,
+        filename="multigrain",
+        pixel_to_nm_scaling=PIXEL_SIZE,
+        min_skeleton_size=MIN_SKELETON_SIZE,
+        skeletonisation_method="topostats",
+        pad_width=PAD_WIDTH,
+    )
+    assert results["statistics"]["tracing_skip_reason"].tolist() == ["error", None]
+    assert "Grain skipped, error whilst tracing" in caplog.text
+    assert "IndexError: index 5 is out of bounds" in caplog.text
+    assert any(record.levelname == "ERROR" and "Traceback" in record.getMessage() for record in caplog.records)
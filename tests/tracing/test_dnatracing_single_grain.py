@@ -480,3 +480,50 @@ def test_trace_grain(
     assert trace_stats["end_to_end_distance"] == pytest.approx(end_to_end_distance)
     assert trace_stats["circular"] == circular
     assert trace_stats["contour_length"] == pytest.approx(contour_length)
+    assert trace_stats["tracing_skip_reason"] is None
+
+
+@pytest.mark.parametrize(
+    ("limits", "skip_reason"),
+    [
+        pytest.param({"max_skeleton_pixels": 100}, "skeleton_pixels", id="skeleton pixels"),
+        pytest.param({"max_ordering_iterations": 50}, "ordering_iterations", id="ordering iterations"),
+        pytest.param({"max_grain_time": 1e-9}, "time", id="time"),
+        pytest.param({"max_skeleton_pixels": 1000, "max_ordering_iterations": 1000}, None, id="within limits"),
+    ],
+)
+def test_trace_grain_limits(limits: dict, skip_reason: str) -> None:
+    """Test grains exceeding a limit are skipped and the reason recorded."""
+    trace_stats = trace_grain(
+        cropped_image=LINEAR_IMAGE,
+        cropped_mask=LINEAR_MASK,
+        pixel_to_nm_scaling=PIXEL_SIZE,
+        filename="linear",
+        min_skeleton_size=MIN_SKELETON_SIZE,
+        skeletonisation_method="topostats",
+        **limits,
+    )
+    assert trace_stats["tracing_skip_reason"] == skip_reason
+    if skip_reason is None:
+        assert trace_stats["contour_length"] == pytest.approx(5.684734982126664e-08)
+    else:
+        assert np.isnan(trace_stats["contour_length"])
+        assert trace_stats["ordered_trace"] is None
+        assert trace_stats["splined_trace"] is None
+
+
+def test_trace_dna_gauss_image() -> None:
+    """Test a Gaussian filtered image that is passed in is used rather than filtering the grain."""
+    gauss_image = np.ones_like(LINEAR_IMAGE)
+    dnatrace = dnaTrace(
+        image=LINEAR_IMAGE,
+        grain=LINEAR_MASK,
+        filename="linear",
+        pixel_to_nm_scaling=PIXEL_SIZE,
+        min_skeleton_size=MIN_SKELETON_SIZE,
+        skeletonisation_method="zhang",
+        gauss_image=gauss_image,
+    )
+    dnatrace.trace_dna()
+    np.testing.assert_array_equal(dnatrace.gauss_image, gauss_image * 1e-9)
+    assert dnatrace.skip_reason is None
@@ -0,0 +1,79 @@
+"""Test the ordering of traces in the tracingfuncs module."""
+import numpy as np
+import pytest
+
+# pylint: disable=import-error
+from topostats.tracing.tracingfuncs import (
+    PointIndex,
+    TracingLimitExceeded,
+    check_tracing_limits,
+    genTracingFuncs,
+    reorderTrace,
+)
+
+
+def test_point_index() -> None:
+    """Test points are added, removed and found within a window."""
+    index = PointIndex([[0, 0], [3, 4], [10, 10], [-9, 2]], cell_size=4)
+    assert len(index) == 4
+    assert [3, 4] in index
+    assert [4, 3] not in index
+    np.testing.assert_array_equal(index.within(1, 1, 3), [[0, 0], [3, 4]])
+    index.remove([3, 4])
+    index.remove([100, 100])
+    assert len(index) == 3
+    assert [3, 4] not in index
+    np.testing.assert_array_equal(index.within(1, 1, 3), [[0, 0]])
+    assert index.within(50, 50, 7).shape == (0, 2)
+
+
+@pytest.mark.parametrize(
+    ("candidate_points", "expected"),
+    [
+        pytest.param([[12, 11], [15, 13]], [12, 11], id="neighbour"),
+        pytest.param([[13, 13], [16, 10], [10, 17]], [13, 13], id="nearest across gap"),
+        pytest.param([[14, 10], [14, 13], [6, 10]], [14, 10], id="smallest change in angle of equally near points"),
+        pytest.param([[19, 10], [2, 2]], None, id="no points within search"),
+    ],
+)
+def test_find_best_next_point(candidate_points: list, expected: list) -> None:
+    """Test the next point is the nearest candidate, or that continuing in the same direction, up to 7 pixels away."""
+    ordered_points = [[7, 10], [8, 10], [9, 10], [10, 10], [11, 10]]
+    x, y = ordered_points[-1]
+    assert genTracingFuncs.findBestNextPoint(x, y, ordered_points, candidate_points) == expected
+    assert genTracingFuncs.findBestNextPoint(x, y, ordered_points, PointIndex(candidate_points)) == expected
+
+
+def test_linear_trace_bridges_gaps() -> None:
+    """Test a linear trace is ordered across a gap, stopping at the end point on the far side of it."""
+    trace = [[5, y] for y in range(5, 15)] + [[6, y] for y in range(17, 25)]
+    ordered = np.asarray(reorderTrace.linearTrace([point[:] for point in trace])).tolist()
+    assert ordered == trace[:11]
+
+
+@pytest.mark.parametrize(
+    ("iteration", "max_iterations", "deadline", "reason"),
+    [
+        pytest.param(10, 10, None, None, id="within limits"),
+        pytest.param(11, 10, None, "ordering_iterations", id="too many iterations"),
+        pytest.param(1, None, 0.0, "time", id="past deadline"),
+    ],
+)
+def test_check_tracing_limits(iteration: int, max_iterations: int, deadline: float, reason: str) -> None:
+    """Test exceeding a limit raises TracingLimitExceeded with the reason."""
+    if reason is None:
+        check_tracing_limits(iteration, max_iterations, deadline)
+    else:
+        with pytest.raises(TracingLimitExceeded) as limit:
+            check_tracing_limits(iteration, max_iterations, deadline)
+        assert limit.value.reason == reason
+
+
+def test_circular_trace_max_iterations() -> None:
+    """Test ordering a circular trace raises TracingLimitExceeded if it takes more than the maximum iterations."""
+    circle = [[5, y] for y in range(5, 15)] + [[x, 15] for x in range(5, 15)]
+    circle += [[15, y] for y in range(15, 5, -1)] + [[x, 5] for x in range(15, 5, -1)]
+    _, completed = reorderTrace.circularTrace([point[:] for point in circle], max_iterations=100)
+    assert completed
+    with pytest.raises(TracingLimitExceeded):
+        reorderTrace.circularTrace([point[:] for point in circle], max_iterations=10)
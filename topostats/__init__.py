@@ -1,19 +1,18 @@
 """Topostats."""
 from importlib.metadata import version
 
-import matplotlib.pyplot as plt
-import snoop
-
 from .logs.logs import setup_logger
-from .theme import Colormap
 
 LOGGER = setup_logger()
 
 release = version("topostats")
 __version__ = ".".join(release.split("."[:2]))
 
-plt.register_cmap(cmap=Colormap("nanoscope").get_cmap())
-plt.register_cmap(cmap=Colormap("gwyddion").get_cmap())
 
-# Disable snoop
-snoop.install(enabled=False)
+def __getattr__(name: str):
+    """Import the in-memory processing API, ``topostats.Pipeline`` and ``topostats.process_array``, when first used."""
+    if name in ("Pipeline", "process_array"):
+        from topostats import pipeline  # pylint: disable=import-outside-toplevel
+
+        return getattr(pipeline, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,321 @@
+"""Find images to process, in parallel, recording what was found in a manifest that later searches reuse.
+
+Searching a large directory tree, particularly on a network filesystem, can take minutes. Directories are listed
+concurrently using ``os.scandir`` and the images and directories found, along with their size and modification times,
+are saved to a manifest. When the search is repeated the contents of any directory whose modification time has not
+changed (files have not been added, removed or renamed in it) are taken from the manifest rather than listed again and
+images that are not in the manifest, or whose size or modification time differ, are reported as new. Note that an image
+that is overwritten in place in an unchanged directory is therefore not detected as new.
+"""
+from __future__ import annotations
+
+import csv
+import json
+import logging
+import os
+import zlib
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from fnmatch import fnmatch
+from pathlib import Path, PurePosixPath
+
+from topostats.logs.logs import LOGGER_NAME
+
+LOGGER = logging.getLogger(LOGGER_NAME)
+
+MANIFEST_FILENAME = "manifest.csv"
+MANIFEST_FIELDS = ("type", "path", "size", "mtime_ns", "new")
+
+# pylint: disable=too-many-arguments
+# pylint: disable=too-many-instance-attributes
+
+
+def _matches(relative_path: str, patterns: list[str]) -> bool:
+    """Check whether a path, relative to the base directory, matches any of a list of glob patterns.
+
+    Patterns are matched against both the relative path and the name of the file or directory so that, for example,
+    'output' matches any directory called output and '2023-*/*.spm' matches images in directories starting '2023-'.
+
+    Parameters
+    ----------
+    relative_path: str
+        POSIX path relative to the base directory.
+    patterns: list[str]
+        Glob patterns.
+
+    Returns
+    -------
+    bool
+        Whether the path matches any of the patterns.
+    """
+    name = PurePosixPath(relative_path).name
+    return any(fnmatch(relative_path, pattern) or fnmatch(name, pattern) for pattern in patterns)
+
+
+def _parent(relative_path: str) -> str:
+    """Relative path of the directory containing a path, the base directory is '.'."""
+    return str(PurePosixPath(relative_path).parent)
+
+
+def parse_shard(shard: str) -> tuple[int, int]:
+    """Parse a shard of the form 'i/N' into the shard number and number of shards.
+
+    Parameters
+    ----------
+    shard: str
+        Shard, 'i/N' where 1 <= i <= N.
+
+    Returns
+    -------
+    tuple[int, int]
+        Shard number (starting at 1) and number of shards.
+
+    Raises
+    ------
+    ValueError
+        If the shard is not of the form 'i/N' with 1 <= i <= N.
+    """
+    try:
+        index, n_shards = (int(part) for part in shard.split("/"))
+    except ValueError as error:
+        raise ValueError(f"Invalid shard '{shard}', shards should be of the form 'i/N' e.g. '1/4'.") from error
+    if not 1 <= index <= n_shards:
+        raise ValueError(f"Invalid shard '{shard}', the shard number should be between 1 and {n_shards}.")
+    return index, n_shards
+
+
+def select_shard(img_files: list[Path], base_dir: str | Path, shard: str) -> list[Path]:
+    """Select the images assigned to a shard.
+
+    Images are assigned by a checksum of their path relative to the base directory so each image is always in the same
+    shard, regardless of which other images are found, the order they are found in or the machine the shard runs on.
+
+    Parameters
+    ----------
+    img_files: list[Path]
+        Images found.
+    base_dir: str | Path
+        Directory images were found in.
+    shard: str
+        Shard to select, 'i/N' where 1 <= i <= N.
+
+    Returns
+    -------
+    list[Path]
+        Images assigned to the shard, in their original order.
+    """
+    index, n_shards = parse_shard(shard)
+    base_dir = Path(base_dir)
+    selected = []
+    for img_file in img_files:
+        try:
+            relative_path = Path(img_file).relative_to(base_dir).as_posix()
+        except ValueError:
+            relative_path = Path(img_file).as_posix()
+        if zlib.crc32(relative_path.encode("utf-8")) % n_shards == index - 1:
+            selected.append(img_file)
+    return selected
+
+
+class FileDiscovery:
+    """Find images under a directory, optionally reusing and updating a manifest of a previous search.
+
+    Parameters
+    ----------
+    base_dir: str | Path
+        Directory to recursively search for images.
+    file_ext: str | list[str]
+        File extension, or list of file extensions, of images.
+    include: list[str] | None
+        Glob patterns, relative to base_dir, images must match at least one of. If empty or None all images are
+        included.
+    exclude: list[str] | None
+        Glob patterns, relative to base_dir, of images and directories to skip. Excluded directories are not searched.
+    manifest_file: str | Path | None
+        Manifest to reuse and update, if None no manifest is used.
+    workers: int
+        Number of threads used to list directories concurrently.
+    """
+
+    def __init__(
+        self,
+        base_dir: str | Path,
+        file_ext: str | list[str] = ".spm",
+        include: list[str] | None = None,
+        exclude: list[str] | None = None,
+        manifest_file: str | Path | None = None,
+        workers: int = 8,
+    ):
+        """Initialise the class."""
+        self.base_dir = Path(base_dir)
+        self.file_ext = (file_ext,) if isinstance(file_ext, str) else tuple(file_ext)
+        self.include = list(include) if include else []
+        self.exclude = list(exclude) if exclude else []
+        self.manifest_file = Path(manifest_file) if manifest_file is not None else None
+        self.workers = max(int(workers), 1)
+        self.directories = {}
+        self.files = {}
+        self.new_files = set()
+
+    @property
+    def settings(self) -> dict:
+        """Settings that determine which files are found, a manifest is only reused if these are unchanged."""
+        return {
+            "base_dir": str(self.base_dir.resolve()),
+            "file_ext": list(self.file_ext),
+            "include": self.include,
+            "exclude": self.exclude,
+        }
+
+    def read_manifest(self) -> tuple[dict, dict]:
+        """Read the directories and files recorded in the manifest.
+
+        Returns
+        -------
+        tuple[dict, dict]
+            Dictionaries of directory modification times and file (size, modification time) indexed by path relative
+            to base_dir. Both are empty if there is no manifest or it was written with different settings.
+        """
+        directories = {}
+        files = {}
+        if self.manifest_file is None or not self.manifest_file.is_file():
+            return directories, files
+        with self.manifest_file.open(encoding="utf-8", newline="") as manifest:
+            header = manifest.readline()
+            try:
+                settings = json.loads(header.lstrip("#"))
+            except json.JSONDecodeError:
+                settings = None
+            if settings != self.settings:
+                LOGGER.info(f"Manifest {self.manifest_file} was written with different settings, not reusing it.")
+                return directories, files
+            for row in csv.DictReader(manifest):
+                if row["type"] == "directory":
+                    directories[row["path"]] = int(row["mtime_ns"])
+                else:
+                    files[row["path"]] = (int(row["size"]), int(row["mtime_ns"]))
+        LOGGER.info(f"Read manifest of {len(files)} images in {len(directories)} directories from {self.manifest_file}")
+        return directories, files
+
+    def save_manifest(self) -> None:
+        """Save the directories and images found to the manifest."""
+        if self.manifest_file is None:
+            return
+        self.manifest_file.parent.mkdir(parents=True, exist_ok=True)
+        with self.manifest_file.open("w", encoding="utf-8", newline="") as manifest:
+            manifest.write(f"# {json.dumps(self.settings)}\n")
+            writer = csv.writer(manifest)
+            writer.writerow(MANIFEST_FIELDS)
+            for path, mtime_ns in sorted(self.directories.items()):
+                writer.writerow(("directory", path, "", mtime_ns, ""))
+            for path, (size, mtime_ns) in sorted(self.files.items()):
+                writer.writerow(("file", path, size, mtime_ns, path in self.new_files))
+        LOGGER.info(f"Manifest of {len(self.files)} images saved to : {self.manifest_file}")
+
+    def _list_directory(self, relative_dir: str) -> tuple[str, int, dict, list]:
+        """List a directory for images and sub-directories to search.
+
+        Parameters
+        ----------
+        relative_dir: str
+            Directory to list, relative to base_dir.
+
+        Returns
+        -------
+        tuple[str, int, dict, list]
+            The directory, its modification time, images found with their (size, modification time) and
+            sub-directories, all relative to base_dir.
+        """
+        directory = self.base_dir / relative_dir
+        files = {}
+        sub_directories = []
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                relative_path = entry.name if relative_dir == "." else f"{relative_dir}/{entry.name}"
+                if self.exclude and _matches(relative_path, self.exclude):
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    sub_directories.append(relative_path)
+                elif entry.name.endswith(self.file_ext) and (not self.include or _matches(relative_path, self.include)):
+                    stat = entry.stat()
+                    files[relative_path] = (stat.st_size, stat.st_mtime_ns)
+        return relative_dir, directory.stat().st_mtime_ns, files, sub_directories
+
+    def _reuse_or_list_directory(self, relative_dir: str, previous_directories: dict, previous_children: dict) -> tuple:
+        """Reuse the contents of a directory from the manifest if it has not changed, otherwise list it.
+
+        Parameters
+        ----------
+        relative_dir: str
+            Directory, relative to base_dir.
+        previous_directories: dict
+            Modification times of directories recorded in the manifest.
+        previous_children: dict
+            Images and sub-directories recorded in the manifest, indexed by their parent directory.
+
+        Returns
+        -------
+        tuple[str, int, dict, list]
+            See ``_list_directory()``.
+        """
+        mtime_ns = (self.base_dir / relative_dir).stat().st_mtime_ns
+        if previous_directories.get(relative_dir) == mtime_ns:
+            files, sub_directories = previous_children.get(relative_dir, ({}, []))
+            return relative_dir, mtime_ns, dict(files), list(sub_directories)
+        return self._list_directory(relative_dir)
+
+    def discover(self) -> list[Path]:
+        """Search base_dir for images.
+
+        Returns
+        -------
+        list[Path]
+            Sorted list of images found, those that are new since the manifest was saved are in ``new_files``.
+        """
+        previous_directories, previous_files = self.read_manifest()
+        previous_children = {}
+        for path in previous_directories:
+            if path != ".":
+                previous_children.setdefault(_parent(path), ({}, []))[1].append(path)
+        for path, stat in previous_files.items():
+            previous_children.setdefault(_parent(path), ({}, []))[0][path] = stat
+
+        self.directories = {}
+        self.files = {}
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            pending = {
+                executor.submit(self._reuse_or_list_directory, ".", previous_directories, previous_children),
+            }
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    try:
+                        relative_dir, mtime_ns, files, sub_directories = future.result()
+                    except OSError as error:
+                        # Directories can be removed, or be unreadable, whilst searching
+                        LOGGER.warning(f"Unable to search directory : {error}")
+                        continue
+                    self.directories[relative_dir] = mtime_ns
+                    self.files.update(files)
+                    for sub_directory in sub_directories:
+                        pending.add(
+                            executor.submit(
+                                self._reuse_or_list_directory, sub_directory, previous_directories, previous_children
+                            )
+                        )
+        self.new_files = {path for path, stat in self.files.items() if previous_files.get(path) != stat}
+        unchanged = sum(previous_directories.get(path) == mtime_ns for path, mtime_ns in self.directories.items())
+        LOGGER.info(
+            f"Found {len(self.files)} images ({len(self.new_files)} new) in {len(self.directories)} directories, "
+            f"{unchanged} directories unchanged since the manifest was saved."
+        )
+        return [self.base_dir / path for path in sorted(self.files)]
+
+    def get_new_files(self) -> list[Path]:
+        """Images found that are new, or have changed, since the manifest was saved.
+
+        Returns
+        -------
+        list[Path]
+            Sorted list of new images.
+        """
+        return [self.base_dir / path for path in sorted(self.new_files)]
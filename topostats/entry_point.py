@@ -2,13 +2,126 @@
 
 Parses command-line arguments and passes input on to the relevant functions / modules.
 """
+from __future__ import annotations
 
 import argparse as arg
 import sys
 
 from topostats import __version__
-from topostats.plotting import run_toposum
-from topostats.run_topostats import run_topostats
+
+# The programs are imported when they are run rather than here as they import the image processing and plotting
+# libraries, which are slow to import, and would make every invocation (e.g. 'topostats --help') slow.
+# pylint: disable=import-outside-toplevel
+
+
+def run_topostats(args=None) -> None:
+    """Process AFM images, see topostats.run_topostats.run_topostats().
+
+    Parameters
+    ----------
+    args: Namespace
+        Command line arguments.
+    """
+    from topostats.run_topostats import run_topostats as _run_topostats
+
+    _run_topostats(args=args)
+
+
+def run_toposum(args=None) -> None:
+    """Plot and summarise statistics, see topostats.plotting.run_toposum().
+
+    Parameters
+    ----------
+    args: Namespace
+        Command line arguments.
+    """
+    from topostats.plotting import run_toposum as _run_toposum
+
+    _run_toposum(args=args)
+
+
+def run_watch(args=None) -> None:
+    """Watch a directory and process AFM images as they are written, see topostats.watch.run_watch().
+
+    Parameters
+    ----------
+    args: Namespace
+        Command line arguments.
+    """
+    from topostats.watch import run_watch as _run_watch
+
+    _run_watch(args=args)
+
+
+def run_inspect(args=None) -> None:
+    """Summarise the metadata of AFM images without loading them, see topostats.metadata.run_inspect().
+
+    Parameters
+    ----------
+    args: Namespace
+        Command line arguments.
+    """
+    from topostats.metadata import run_inspect as _run_inspect
+
+    _run_inspect(args=args)
+
+
+def run_sweep(args=None) -> None:
+    """Process AFM images with a grid of configurations, see topostats.sweep.run_sweep().
+
+    Parameters
+    ----------
+    args: Namespace
+        Command line arguments.
+    """
+    from topostats.sweep import run_sweep as _run_sweep
+
+    _run_sweep(args=args)
+
+
+def run_merge(args=None) -> None:
+    """Combine the statistics of shards and make summary plots, see topostats.merge.run_merge().
+
+    Parameters
+    ----------
+    args: Namespace
+        Command line arguments.
+    """
+    from topostats.merge import run_merge as _run_merge
+
+    _run_merge(args=args)
+
+
+def cores_or_auto(value: str) -> int | str:
+    """Convert the value of the cores command line argument to an integer unless it is 'auto'.
+
+    Parameters
+    ----------
+    value: str
+        Value passed on the command line.
+
+    Returns
+    -------
+    int | str
+        Number of cores or 'auto'.
+    """
+    return value if value == "auto" else int(value)
+
+
+def memory_budget_or_auto(value: str) -> float | str:
+    """Convert the value of the memory budget command line argument to a float unless it is 'auto'.
+
+    Parameters
+    ----------
+    value: str
+        Value passed on the command line.
+
+    Returns
+    -------
+    float | str
+        Memory budget in GiB or 'auto'.
+    """
+    return value if value == "auto" else float(value)
 
 
 def create_parser() -> arg.ArgumentParser:
@@ -70,9 +183,23 @@ def create_parser() -> arg.ArgumentParser:
         "-j",
         "--cores",
         dest="cores",
-        type=int,
+        type=cores_or_auto,
+        required=False,
+        help="Number of CPU cores to use when processing, 'auto' uses all CPUs available.",
+    )
+    process_parser.add_argument(
+        "--memory_budget",
+        dest="memory_budget",
+        type=memory_budget_or_auto,
+        required=False,
+        help="Memory (GiB) that images processed simultaneously may use, 'auto' derives this from available memory.",
+    )
+    process_parser.add_argument(
+        "--shard",
+        dest="shard",
+        type=str,
         required=False,
-        help="Number of CPU cores to use when processing.",
+        help="Process only shard i of N of the images found, e.g. '2/4', combine the shards with 'topostats merge'.",
     )
     process_parser.add_argument(
         "-l",
@@ -123,6 +250,235 @@ def create_parser() -> arg.ArgumentParser:
     )
     process_parser.set_defaults(func=run_topostats)
 
+    # watch parser
+    watch_parser = subparsers.add_parser(
+        "watch",
+        description="Watch a directory and process AFM images as they are written, appending to the statistics. "
+        "Additional arguments over-ride those in the configuration file.",
+        help="Watch a directory and process AFM images as they are written.",
+    )
+    watch_parser.add_argument(
+        "-c",
+        "--config_file",
+        dest="config_file",
+        required=False,
+        help="Path to a YAML configuration file.",
+    )
+    watch_parser.add_argument(
+        "-b",
+        "--base_dir",
+        dest="base_dir",
+        type=str,
+        required=False,
+        help="Base directory to watch for images.",
+    )
+    watch_parser.add_argument(
+        "-j",
+        "--cores",
+        dest="cores",
+        type=cores_or_auto,
+        required=False,
+        help="Number of CPU cores to use when processing, 'auto' uses all CPUs available.",
+    )
+    watch_parser.add_argument(
+        "--memory_budget",
+        dest="memory_budget",
+        type=memory_budget_or_auto,
+        required=False,
+        help="Memory (GiB) that images processed simultaneously may use, 'auto' derives this from available memory.",
+    )
+    watch_parser.add_argument(
+        "-l",
+        "--log_level",
+        dest="log_level",
+        type=str,
+        required=False,
+        help="Logging level to use, default is 'info' for verbose output use 'debug'.",
+    )
+    watch_parser.add_argument(
+        "-f",
+        "--file_ext",
+        dest="file_ext",
+        type=str,
+        required=False,
+        help="File extension to watch for.",
+    )
+    watch_parser.add_argument(
+        "--channel",
+        dest="channel",
+        type=str,
+        required=False,
+        help="Channel to extract.",
+    )
+    watch_parser.add_argument(
+        "-o",
+        "--output_dir",
+        dest="output_dir",
+        type=str,
+        required=False,
+        help="Output directory to write results to.",
+    )
+    watch_parser.set_defaults(func=run_watch, create_config_file=None)
+
+    # inspect parser
+    inspect_parser = subparsers.add_parser(
+        "inspect",
+        description="Summarise the channels, shape, pixel to nanometre scaling and number of frames of AFM images "
+        "without loading the image data. Additional arguments over-ride those in the configuration file.",
+        help="Summarise the metadata of AFM images without loading them.",
+    )
+    inspect_parser.add_argument(
+        "-c",
+        "--config_file",
+        dest="config_file",
+        required=False,
+        help="Path to a YAML configuration file.",
+    )
+    inspect_parser.add_argument(
+        "-b",
+        "--base_dir",
+        dest="base_dir",
+        type=str,
+        required=False,
+        help="Base directory to scan for images.",
+    )
+    inspect_parser.add_argument(
+        "-f",
+        "--file_ext",
+        dest="file_ext",
+        type=str,
+        required=False,
+        help="File extension to scan for.",
+    )
+    inspect_parser.add_argument(
+        "--channel",
+        dest="channel",
+        type=str,
+        required=False,
+        help="Channel to check images have.",
+    )
+    inspect_parser.add_argument(
+        "-l",
+        "--log_level",
+        dest="log_level",
+        type=str,
+        required=False,
+        help="Logging level to use, default is 'info' for verbose output use 'debug'.",
+    )
+    inspect_parser.add_argument(
+        "-o",
+        "--output_dir",
+        dest="output_dir",
+        type=str,
+        required=False,
+        help="Output directory to write the metadata to.",
+    )
+    inspect_parser.set_defaults(func=run_inspect, create_config_file=None)
+
+    # sweep parser
+    sweep_parser = subparsers.add_parser(
+        "sweep",
+        description="Process AFM images with every combination of the options in the 'sweep' section of the "
+        "configuration file, running stages the combinations share once. Additional arguments over-ride those in the "
+        "configuration file.",
+        help="Process AFM images with a grid of configurations.",
+    )
+    sweep_parser.add_argument(
+        "-c",
+        "--config_file",
+        dest="config_file",
+        required=False,
+        help="Path to a YAML configuration file.",
+    )
+    sweep_parser.add_argument(
+        "-b",
+        "--base_dir",
+        dest="base_dir",
+        type=str,
+        required=False,
+        help="Base directory to scan for images.",
+    )
+    sweep_parser.add_argument(
+        "-f",
+        "--file_ext",
+        dest="file_ext",
+        type=str,
+        required=False,
+        help="File extension to scan for.",
+    )
+    sweep_parser.add_argument(
+        "-j",
+        "--cores",
+        dest="cores",
+        type=cores_or_auto,
+        required=False,
+        help="Number of CPU cores to use when processing, 'auto' uses all CPUs available.",
+    )
+    sweep_parser.add_argument(
+        "-l",
+        "--log_level",
+        dest="log_level",
+        type=str,
+        required=False,
+        help="Logging level to use, default is 'info' for verbose output use 'debug'.",
+    )
+    sweep_parser.add_argument(
+        "-o",
+        "--output_dir",
+        dest="output_dir",
+        type=str,
+        required=False,
+        help="Output directory to write results to.",
+    )
+    sweep_parser.set_defaults(func=run_sweep, create_config_file=None)
+
+    # merge parser
+    merge_parser = subparsers.add_parser(
+        "merge",
+        description="Combine the statistics of the shards of a 'topostats process --shard i/N' run, saving them along "
+        "with the statistics of each folder and summary plots to the output directory.",
+        help="Combine the statistics of shards processed separately.",
+    )
+    merge_parser.add_argument(
+        "-c",
+        "--config_file",
+        dest="config_file",
+        required=False,
+        help="Path to a YAML configuration file.",
+    )
+    merge_parser.add_argument(
+        "-s",
+        "--summary_config",
+        dest="summary_config",
+        required=False,
+        help="Path to a YAML configuration file for summary plots and statistics.",
+    )
+    merge_parser.add_argument(
+        "-b",
+        "--base_dir",
+        dest="base_dir",
+        type=str,
+        required=False,
+        help="Base directory the shards scanned for images.",
+    )
+    merge_parser.add_argument(
+        "-l",
+        "--log_level",
+        dest="log_level",
+        type=str,
+        required=False,
+        help="Logging level to use, default is 'info' for verbose output use 'debug'.",
+    )
+    merge_parser.add_argument(
+        "-o",
+        "--output_dir",
+        dest="output_dir",
+        type=str,
+        required=False,
+        help="Output directory the shards wrote results to.",
+    )
+    merge_parser.set_defaults(func=run_merge, create_config_file=None)
+
     # toposum parser
     toposum_parser = subparsers.add_parser(
         "summary",
@@ -305,9 +661,23 @@ def create_legacy_run_topostats_parser() -> arg.ArgumentParser:
         "-j",
         "--cores",
         dest="cores",
-        type=int,
+        type=cores_or_auto,
+        required=False,
+        help="Number of CPU cores to use when processing, 'auto' uses all CPUs available.",
+    )
+    parser.add_argument(
+        "--memory_budget",
+        dest="memory_budget",
+        type=memory_budget_or_auto,
+        required=False,
+        help="Memory (GiB) that images processed simultaneously may use, 'auto' derives this from available memory.",
+    )
+    parser.add_argument(
+        "--shard",
+        dest="shard",
+        type=str,
         required=False,
-        help="Number of CPU cores to use when processing.",
+        help="Process only shard i of N of the images found, e.g. '2/4', combine the shards with 'topostats merge'.",
     )
     parser.add_argument(
         "-l",
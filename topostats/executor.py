@@ -0,0 +1,726 @@
+"""Sizing and scheduling of the worker pool used to process images."""
+from __future__ import annotations
+
+import csv
+import logging
+import os
+import queue
+import time
+import traceback
+from collections.abc import Callable, Iterable, Iterator
+from functools import partial
+from pathlib import Path
+
+from topostats.logs.logs import LOGGER_NAME
+
+LOGGER = logging.getLogger(LOGGER_NAME)
+
+CGROUP_ROOT = Path("/sys/fs/cgroup")
+BYTES_PER_GIB = 1024**3
+# Fraction of available memory used when 'memory_budget: auto' so the parent process and the OS have headroom.
+AUTO_MEMORY_FRACTION = 0.8
+# Bytes per pixel of the float64 arrays that hold images and their intermediates.
+BYTES_PER_PIXEL = 8
+# Approximate number of full size float64 arrays each stage holds at its peak. Filters keeps every intermediate in
+# Filters.images, Grains keeps several labelled arrays and an RGB image per direction, tracing builds whole image trace
+# masks and plotting rasterises figures.
+STAGE_ARRAY_COUNTS = {
+    "loading": 2,
+    "filter": 16,
+    "grains": 10,
+    "grainstats": 2,
+    "dnatracing": 4,
+    "plotting": 6,
+}
+# Seconds between checks, whilst waiting for jobs, that no worker has died.
+WORKER_CHECK_INTERVAL = 1.0
+FAILURES_FILENAME = "failures.csv"
+FAILURES_FIELDS = ("img_path", "image", "status", "attempts", "error")
+
+# pylint: disable=too-many-arguments
+
+
+def _read_cgroup_file(path: Path) -> str | None:
+    """Read a single value from a cgroup control file.
+
+    Parameters
+    ----------
+    path: Path
+        Path to the cgroup file.
+
+    Returns
+    -------
+    str | None
+        Stripped contents of the file or None if it does not exist or can not be read.
+    """
+    try:
+        return path.read_text(encoding="utf-8").strip()
+    except OSError:
+        return None
+
+
+def cgroup_cpu_limit(cgroup_root: Path = CGROUP_ROOT) -> float | None:
+    """Determine the CPU quota imposed by the cgroup (v2 or v1) the process runs in.
+
+    Parameters
+    ----------
+    cgroup_root: Path
+        Mount point of the cgroup filesystem.
+
+    Returns
+    -------
+    float | None
+        Number of CPUs the quota allows or None if no quota is set.
+    """
+    # cgroup v2 : "<quota> <period>" or "max <period>"
+    cpu_max = _read_cgroup_file(cgroup_root / "cpu.max")
+    if cpu_max is not None:
+        quota, _, period = cpu_max.partition(" ")
+        if quota != "max" and period:
+            return int(quota) / int(period)
+        return None
+    # cgroup v1 : quota of -1 means unlimited
+    quota = _read_cgroup_file(cgroup_root / "cpu" / "cpu.cfs_quota_us")
+    period = _read_cgroup_file(cgroup_root / "cpu" / "cpu.cfs_period_us")
+    if quota is not None and period is not None and int(quota) > 0:
+        return int(quota) / int(period)
+    return None
+
+
+def cgroup_memory_limit(cgroup_root: Path = CGROUP_ROOT) -> int | None:
+    """Determine the memory limit imposed by the cgroup (v2 or v1) the process runs in.
+
+    Parameters
+    ----------
+    cgroup_root: Path
+        Mount point of the cgroup filesystem.
+
+    Returns
+    -------
+    int | None
+        Memory limit in bytes or None if no limit is set.
+    """
+    memory_max = _read_cgroup_file(cgroup_root / "memory.max")
+    if memory_max is not None:
+        return None if memory_max == "max" else int(memory_max)
+    limit = _read_cgroup_file(cgroup_root / "memory" / "memory.limit_in_bytes")
+    # cgroup v1 reports "unlimited" as a very large number (page counter maximum), treat anything above the physical
+    # memory as unlimited.
+    if limit is not None and int(limit) < physical_memory():
+        return int(limit)
+    return None
+
+
+def physical_memory() -> int:
+    """Total physical memory of the host in bytes.
+
+    Returns
+    -------
+    int
+        Physical memory in bytes.
+    """
+    return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+
+
+def available_memory(cgroup_root: Path = CGROUP_ROOT) -> int:
+    """Memory available to this process, respecting any cgroup limit.
+
+    Parameters
+    ----------
+    cgroup_root: Path
+        Mount point of the cgroup filesystem.
+
+    Returns
+    -------
+    int
+        Available memory in bytes.
+    """
+    available = physical_memory()
+    try:
+        with Path("/proc/meminfo").open(encoding="utf-8") as meminfo:
+            for line in meminfo:
+                if line.startswith("MemAvailable:"):
+                    available = int(line.split()[1]) * 1024
+                    break
+    except OSError:
+        pass
+    limit = cgroup_memory_limit(cgroup_root)
+    return available if limit is None else min(available, limit)
+
+
+def available_cpus(cgroup_root: Path = CGROUP_ROOT) -> int:
+    """Return the number of CPUs this process may use, respecting CPU affinity and any cgroup quota.
+
+    ``os.cpu_count()`` reports the CPUs of the host which overstates what is usable inside containers.
+
+    Parameters
+    ----------
+    cgroup_root: Path
+        Mount point of the cgroup filesystem.
+
+    Returns
+    -------
+    int
+        Number of usable CPUs, always at least one.
+    """
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    quota = cgroup_cpu_limit(cgroup_root)
+    if quota is not None:
+        cpus = min(cpus, int(quota))
+    return max(cpus, 1)
+
+
+def resolve_cores(cores: int | str) -> int:
+    """Convert the 'cores' configuration option to a number of processes.
+
+    Parameters
+    ----------
+    cores: int | str
+        Number of cores or 'auto' to use all CPUs available to the process.
+
+    Returns
+    -------
+    int
+        Number of worker processes to use.
+    """
+    if cores == "auto":
+        cores = available_cpus()
+        LOGGER.info(f"Automatically detected CPUs available : {cores}")
+    return cores
+
+
+def resolve_memory_budget(memory_budget: float | str | None) -> int | None:
+    """Convert the 'memory_budget' configuration option to bytes.
+
+    Parameters
+    ----------
+    memory_budget: float | str | None
+        Memory budget in GiB, 'auto' to derive one from the memory available to the process or None for no budget.
+
+    Returns
+    -------
+    int | None
+        Memory budget in bytes or None if there is no budget.
+    """
+    if memory_budget is None:
+        return None
+    if memory_budget == "auto":
+        budget = int(available_memory() * AUTO_MEMORY_FRACTION)
+        LOGGER.info(f"Automatically derived memory budget : {budget / BYTES_PER_GIB:.2f} GiB")
+        return budget
+    return int(memory_budget * BYTES_PER_GIB)
+
+
+def estimate_image_memory(image_shape: tuple, config: dict) -> int:
+    """Estimate the peak memory needed to process an image of a given shape.
+
+    The estimate is the number of full size arrays each enabled stage holds at its peak multiplied by the size of the
+    image, grain finding is counted once for each direction.
+
+    Parameters
+    ----------
+    image_shape: tuple
+        Shape of the image (or stack of frames) to be processed.
+    config: dict
+        TopoStats configuration dictionary, used to determine which stages are enabled.
+
+    Returns
+    -------
+    int
+        Estimated peak memory in bytes.
+    """
+    n_pixels = 1
+    for dimension in image_shape:
+        n_pixels *= dimension
+    n_arrays = STAGE_ARRAY_COUNTS["loading"]
+    for stage in ("filter", "grains", "grainstats", "dnatracing", "plotting"):
+        if config.get(stage, {}).get("run", False):
+            directions = 2 if stage == "grains" and config[stage].get("direction") == "both" else 1
+            n_arrays += STAGE_ARRAY_COUNTS[stage] * directions
+    return n_pixels * BYTES_PER_PIXEL * n_arrays
+
+
+def limit_cores_to_memory(cores: int, memory_budget: int | None, estimates: list[int]) -> int:
+    """Reduce the number of workers so that the largest job can run on every worker within the memory budget.
+
+    Parameters
+    ----------
+    cores: int
+        Number of worker processes requested.
+    memory_budget: int | None
+        Memory budget in bytes, if None the number of cores is returned unchanged.
+    estimates: list[int]
+        Estimated peak memory of each job in bytes.
+
+    Returns
+    -------
+    int
+        Number of worker processes to use, always at least one.
+    """
+    if memory_budget is None or not estimates:
+        return cores
+    fits = max(int(memory_budget // max(estimates)), 1)
+    if fits < cores:
+        LOGGER.info(f"Reducing processes from {cores} to {fits} to fit within the memory budget.")
+        return fits
+    return cores
+
+
+def _next_admissible(
+    estimates: list[int], in_use: int, running: int, memory_budget: int | None, processes: int
+) -> int | None:
+    """Find the first pending job that can be admitted to the pool now.
+
+    Parameters
+    ----------
+    estimates: list[int]
+        Estimated peak memory of each pending job in bytes, in the order they were submitted.
+    in_use: int
+        Estimated memory of the jobs that are running in bytes.
+    running: int
+        Number of jobs that are running.
+    memory_budget: int | None
+        Memory budget in bytes, None disables admission control.
+    processes: int
+        Number of processes in the pool.
+
+    Returns
+    -------
+    int | None
+        Position of the job in the pending jobs or None if no job can be admitted until a running job completes.
+    """
+    if running >= processes:
+        return None
+    for position, estimate in enumerate(estimates):
+        if memory_budget is None or running == 0 or in_use + estimate <= memory_budget:
+            if memory_budget is not None and estimate > memory_budget:
+                LOGGER.warning(
+                    f"Estimated memory for a job ({estimate / BYTES_PER_GIB:.2f} GiB) exceeds the memory budget, "
+                    "running it on its own."
+                )
+            return position
+    return None
+
+
+def imap_with_memory_budget(
+    pool,
+    func: Callable,
+    jobs: Iterable,
+    estimates: list[int],
+    memory_budget: int | None,
+    processes: int,
+) -> Iterator:
+    """Submit jobs to a pool only when their estimated memory fits in the budget, yielding results as they complete.
+
+    Jobs are admitted in order, skipping over jobs that do not currently fit so that smaller jobs can fill the
+    remaining budget. A job larger than the whole budget is run on its own once all other jobs have finished. Without a
+    budget this is equivalent to ``pool.imap_unordered(func, jobs)``.
+
+    Parameters
+    ----------
+    pool: multiprocessing.pool.Pool
+        Pool (or ThreadPool) to submit jobs to.
+    func: Callable
+        Function to apply to each job.
+    jobs: Iterable
+        Arguments, one per job, to be passed to func.
+    estimates: list[int]
+        Estimated peak memory of each job in bytes.
+    memory_budget: int | None
+        Memory budget in bytes, None disables admission control.
+    processes: int
+        Number of processes in the pool, no more than this many jobs are admitted at once.
+
+    Yields
+    ------
+    Any
+        The result of each job in order of completion.
+    """
+    if memory_budget is None:
+        yield from pool.imap_unordered(func, jobs)
+        return
+    pending = list(zip(jobs, estimates))
+    completed = queue.Queue()
+    in_use = 0
+    running = 0
+    while pending or running:
+        while (
+            position := _next_admissible(
+                [estimate for _, estimate in pending], in_use, running, memory_budget, processes
+            )
+        ) is not None:
+            job, estimate = pending.pop(position)
+            in_use += estimate
+            running += 1
+            pool.apply_async(
+                func,
+                (job,),
+                callback=lambda result, estimate=estimate: completed.put((result, None, estimate)),
+                error_callback=lambda error, estimate=estimate: completed.put((None, error, estimate)),
+            )
+        result, error, estimate = completed.get()
+        in_use -= estimate
+        running -= 1
+        if error is not None:
+            raise error
+        yield result
+
+
+def _guarded_call(func: Callable, job) -> tuple:
+    """Run a job, capturing any exception it raises so that the worker and the remaining jobs are unaffected.
+
+    Parameters
+    ----------
+    func: Callable
+        Function to apply to the job.
+    job: Any
+        Argument to be passed to func.
+
+    Returns
+    -------
+    tuple
+        The result of the job and None, or None and a description of the exception it raised.
+    """
+    try:
+        return func(job), None
+    except Exception as error:  # pylint: disable=broad-except
+        LOGGER.error(f"Job failed :\n{traceback.format_exc()}")
+        return None, f"{type(error).__name__}: {error}"
+
+
+class _RestartablePool:
+    """Pool that is replaced, abandoning the jobs it was running, when a job times out or a worker dies.
+
+    Outcomes of jobs arrive through the callbacks of ``apply_async()``, neither of which is called for a job whose
+    worker is killed (e.g. by the out of memory killer or a crash in a C extension). The workers are therefore checked
+    every ``WORKER_CHECK_INTERVAL`` seconds whilst waiting, a worker that exited with a non-zero exit code has died.
+
+    Parameters
+    ----------
+    pool_factory: Callable
+        Callable returning a new pool (or ThreadPool).
+    func: Callable
+        Function to apply to each job.
+    timeout: float | None
+        Seconds a job may run for before it is abandoned, None for no limit.
+    """
+
+    def __init__(self, pool_factory: Callable, func: Callable, timeout: float | None):
+        """Initialise the class."""
+        self.pool_factory = pool_factory
+        self.func = partial(_guarded_call, func)
+        self.timeout = timeout
+        self.pool = pool_factory()
+        self.generation = 0
+        self.completed = queue.Queue()
+        # Position of each running job mapped to the time it must complete by
+        self.deadlines = {}
+        # Workers that have been seen, held so that their exit code can be read after the pool has replaced them
+        self.workers = set()
+        self.expired = []
+        self.exit_codes = []
+
+    def submit(self, index: int, job) -> None:
+        """Submit a job to the pool, tagging its outcome with its position and the current generation of pool.
+
+        Parameters
+        ----------
+        index: int
+            Position of the job.
+        job: Any
+            Argument to be passed to the function.
+        """
+        self.deadlines[index] = time.monotonic() + self.timeout if self.timeout is not None else None
+        self.pool.apply_async(
+            self.func,
+            (job,),
+            callback=lambda outcome, index=index, generation=self.generation: self.completed.put(
+                (generation, index, *outcome)
+            ),
+            error_callback=lambda error, index=index, generation=self.generation: self.completed.put(
+                (generation, index, None, f"{type(error).__name__}: {error}")
+            ),
+        )
+        self.workers.update(self.pool._pool)  # pylint: disable=protected-access
+
+    def _check(self) -> bool:
+        """Record the jobs that have exceeded the timeout and the exit codes of workers that have died.
+
+        Returns
+        -------
+        bool
+            Whether the pool needs to be restarted.
+        """
+        now = time.monotonic()
+        self.expired = [index for index, deadline in self.deadlines.items() if deadline is not None and deadline <= now]
+        self.workers.update(self.pool._pool)  # pylint: disable=protected-access
+        exited = {worker for worker in self.workers if worker.exitcode is not None}
+        self.workers -= exited
+        # Workers exit with 0 once they have completed max_tasks_per_child tasks
+        self.exit_codes = [worker.exitcode for worker in exited if worker.exitcode != 0]
+        return bool(self.expired or self.exit_codes)
+
+    def wait(self) -> tuple | None:
+        """Wait for a running job to complete.
+
+        Returns
+        -------
+        tuple | None
+            Position of the job, its result and None or None and a description of the exception it raised. None if
+            instead a job timed out or a worker died, in which case ``restart()`` must be called.
+        """
+        while True:
+            next_deadline = min(
+                (deadline for deadline in self.deadlines.values() if deadline is not None), default=None
+            )
+            wait = WORKER_CHECK_INTERVAL
+            if next_deadline is not None:
+                wait = min(max(next_deadline - time.monotonic(), 0), wait)
+            try:
+                generation, index, result, error = self.completed.get(timeout=wait)
+            except queue.Empty:
+                if self._check():
+                    return None
+                continue
+            # Outcomes of jobs abandoned by an earlier generation of pool are ignored
+            if generation == self.generation and index in self.deadlines:
+                del self.deadlines[index]
+                return index, result, error
+
+    def restart(self) -> tuple[list[int], set[int], dict]:
+        """Replace the pool, abandoning the jobs it was running.
+
+        It is not known which job a worker that died was running, so as with ``concurrent.futures.ProcessPoolExecutor``
+        every job that was running is held responsible.
+
+        Returns
+        -------
+        tuple[list[int], set[int], dict]
+            Positions of the jobs that were running, the positions of those responsible and the 'status' and 'error'
+            to record for them.
+        """
+        interrupted = list(self.deadlines)
+        if self.exit_codes:
+            LOGGER.warning(f"Worker process(es) died with exit code(s) {self.exit_codes}, restarting the workers.")
+            culprits = set(interrupted)
+            failure = {
+                "status": "failed",
+                "error": f"A worker died with exit code {self.exit_codes[0]} whilst running this or another job",
+            }
+        else:
+            LOGGER.warning(
+                f"{len(self.expired)} job(s) exceeded the timeout of {self.timeout}s, restarting the workers."
+            )
+            culprits = set(self.expired)
+            failure = {"status": "timed_out", "error": f"Exceeded the timeout of {self.timeout}s"}
+        self.pool.terminate()
+        self.generation += 1
+        self.pool = self.pool_factory()
+        self.deadlines = {}
+        self.workers = set()
+        return interrupted, culprits, failure
+
+    def close(self) -> None:
+        """Wait for the workers to exit once all jobs are complete."""
+        self.pool.close()
+        self.pool.join()
+
+    def terminate(self) -> None:
+        """Stop the workers immediately."""
+        self.pool.terminate()
+
+
+def _take_jobs(source: Iterator, jobs: list, estimates: list, attempts: list, pending: list, processes: int) -> None:
+    """Take jobs from the source, until as many are pending as there are processes, recording their estimates.
+
+    Parameters
+    ----------
+    source: Iterator
+        Iterator of jobs and their estimated memory.
+    jobs: list
+        Jobs taken so far, to which jobs are appended.
+    estimates: list
+        Estimated memory of the jobs taken so far.
+    attempts: list
+        Number of times each job taken so far has been attempted.
+    pending: list
+        Positions of the jobs that are waiting to be admitted, to which new jobs are appended.
+    processes: int
+        Number of processes in the pool.
+    """
+    while len(pending) < processes:
+        try:
+            job, estimate = next(source)
+        except StopIteration:
+            return
+        pending.append(len(jobs))
+        jobs.append(job)
+        estimates.append(estimate)
+        attempts.append(0)
+
+
+def _requeue_abandoned(abandoned: tuple, jobs: list, attempts: list, pending: list, retries: int) -> Iterator:
+    """Return jobs abandoned when the pool was restarted to those pending, yielding those that have no attempts left.
+
+    Parameters
+    ----------
+    abandoned: tuple
+        Jobs that were running, those responsible for the restart and their failure, see ``_RestartablePool.restart()``.
+    jobs: list
+        Jobs taken so far.
+    attempts: list
+        Number of times each job taken so far has been attempted.
+    pending: list
+        Positions of the jobs that are waiting to be admitted.
+    retries: int
+        Number of times a job is retried.
+
+    Yields
+    ------
+    tuple[int, None, dict]
+        Position of each job that will not be retried, None and its failure.
+    """
+    interrupted, culprits, failure = abandoned
+    for index in interrupted:
+        if index not in culprits:
+            # Interrupted through no fault of its own, so the attempt does not count
+            attempts[index] -= 1
+            pending.insert(0, index)
+        elif attempts[index] <= retries:
+            pending.append(index)
+        else:
+            jobs[index] = None
+            yield index, None, {"status": failure["status"], "attempts": attempts[index], "error": failure["error"]}
+
+
+def imap_fault_tolerant(
+    pool_factory: Callable,
+    func: Callable,
+    jobs: Iterable,
+    estimates: Iterable[int] | Callable,
+    memory_budget: int | None,
+    processes: int,
+    timeout: float | None = None,
+    retries: int = 0,
+) -> Iterator[tuple[int, object, dict | None]]:
+    """Run jobs on a pool within a memory budget, retrying jobs that fail or time out rather than aborting.
+
+    Jobs are admitted as in ``imap_with_memory_budget()``. A job that raises an exception or runs for longer than the
+    timeout is retried, after the other pending jobs, until it has been attempted ``retries + 1`` times. Workers can not
+    be interrupted individually so when a job times out the pool is terminated and replaced, the other jobs that were
+    running are resubmitted without counting the attempt against them. When a worker dies (e.g. is killed for using
+    too much memory) the pool is also replaced and, as it is not known which job the worker was running, the attempt
+    counts against every job that was running.
+
+    Jobs may be lazy (e.g. a generator loading each scan), they are only taken as needed to keep the pool busy so that
+    jobs are prepared while earlier jobs run.
+
+    Parameters
+    ----------
+    pool_factory: Callable
+        Callable returning a new pool (or ThreadPool), e.g. ``partial(Pool, processes=4, maxtasksperchild=10)``.
+    func: Callable
+        Function to apply to each job.
+    jobs: Iterable
+        Arguments, one per job, to be passed to func.
+    estimates: Iterable[int] | Callable
+        Estimated peak memory of each job in bytes, or a function estimating it from a job.
+    memory_budget: int | None
+        Memory budget in bytes, None disables admission control.
+    processes: int
+        Number of processes in the pool, no more than this many jobs are admitted at once.
+    timeout: float | None
+        Seconds a job may run for before it is abandoned, None for no limit.
+    retries: int
+        Number of times a job that fails, times out or is running when a worker dies is retried.
+
+    Yields
+    ------
+    tuple[int, object, dict | None]
+        Position of the job in jobs, its result (None if it did not succeed) and None or, if it did not succeed after
+        all attempts, a dictionary of the 'status' ('failed' or 'timed_out'), 'attempts' and 'error'.
+    """
+    if callable(estimates):
+        source = map(lambda job, estimator=estimates: (job, estimator(job)), jobs)
+    else:
+        source = zip(jobs, estimates)
+    # Jobs taken from the source so far, released once they are complete, with their estimates and attempts
+    jobs, estimates, attempts = [], [], []
+    pending = []
+    workers = _RestartablePool(pool_factory, func, timeout)
+    try:
+        while True:
+            _take_jobs(source, jobs, estimates, attempts, pending, processes)
+            if not (pending or workers.deadlines):
+                break
+            while (
+                position := _next_admissible(
+                    [estimates[index] for index in pending],
+                    sum(estimates[index] for index in workers.deadlines),
+                    len(workers.deadlines),
+                    memory_budget,
+                    processes,
+                )
+            ) is not None:
+                index = pending.pop(position)
+                attempts[index] += 1
+                workers.submit(index, jobs[index])
+            outcome = workers.wait()
+            if outcome is None:
+                yield from _requeue_abandoned(workers.restart(), jobs, attempts, pending, retries)
+                continue
+            index, result, error = outcome
+            if error is not None and attempts[index] <= retries:
+                LOGGER.warning(f"Job failed on attempt {attempts[index]} of {retries + 1}, retrying : {error}")
+                pending.append(index)
+                continue
+            # Release the job, it is not needed again
+            jobs[index] = None
+            if error is None:
+                yield index, result, None
+            else:
+                yield index, None, {"status": "failed", "attempts": attempts[index], "error": error}
+        workers.close()
+    finally:
+        workers.terminate()
+
+
+def write_failures(failures: list[dict], failures_file: str | Path) -> None:
+    """Write the images that failed, timed out or were skipped to a CSV manifest.
+
+    Parameters
+    ----------
+    failures: list[dict]
+        Dictionaries of 'img_path', 'image', 'status', 'attempts' and 'error' for each image.
+    failures_file: str | Path
+        CSV file to write, it is written (without rows) even if there are no failures so that any from an earlier run
+        are not mistaken for this run's.
+    """
+    with Path(failures_file).open("w", encoding="utf-8", newline="") as manifest:
+        writer = csv.DictWriter(manifest, fieldnames=FAILURES_FIELDS)
+        writer.writeheader()
+        writer.writerows(failures)
+    if failures:
+        LOGGER.warning(f"{len(failures)} image(s) failed, timed out or were skipped, see : {failures_file}")
+
+
+def read_failures(failures_file: str | Path) -> set[Path]:
+    """Read the paths of the files in a manifest of failures.
+
+    Parameters
+    ----------
+    failures_file: str | Path
+        CSV file written by ``write_failures()``.
+
+    Returns
+    -------
+    set[Path]
+        Paths of the files that failed, timed out or were skipped, empty if the manifest does not exist.
+    """
+    if not Path(failures_file).is_file():
+        return set()
+    with Path(failures_file).open(encoding="utf-8", newline="") as manifest:
+        return {Path(row["img_path"]) for row in csv.DictReader(manifest)}
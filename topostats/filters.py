@@ -39,6 +39,7 @@ class Filters:
         otsu_threshold_multiplier: float = 1.7,
         threshold_std_dev: dict = None,
         threshold_absolute: dict = None,
+        threshold_max_pixels: int = None,
         gaussian_size: float = None,
         gaussian_mode: str = "nearest",
         remove_scars: dict = None,
@@ -66,6 +67,9 @@ class Filters:
         threshold_absolute: dict
             If using the 'absolute' threshold method. Dictionary that contains above and below
             absolute threshold values for flattening.
+        threshold_max_pixels: int
+            Maximum number of pixels thresholds are calculated from, larger images are subsampled. If None all pixels
+            are used.
         remove_scars: dict
             Dictionary containing configuration parameters for the scar removal function.
         """
@@ -78,6 +82,7 @@ class Filters:
         self.otsu_threshold_multiplier = otsu_threshold_multiplier
         self.threshold_std_dev = threshold_std_dev
         self.threshold_absolute = threshold_absolute
+        self.threshold_max_pixels = threshold_max_pixels
         self.remove_scars_config = remove_scars
         self.images = {
             "pixels": image,
@@ -397,9 +402,20 @@ processed, please refer to <url to page where we document common problems> for m
             **kwargs,
         )
 
-    def filter_image(self) -> None:
+    def filter_image(self, mask: np.ndarray | None = None, thresholds: dict | None = None) -> None:
         """Process a single image, filtering, finding grains and calculating their statistics.
 
+        If a mask is given, e.g. that of the previous frame of a video, the initial unmasked flattening and
+        thresholding are skipped and the image is flattened using the mask.
+
+        Parameters
+        ----------
+        mask: np.ndarray | None
+            Mask of data to exclude when flattening, if None it is derived by thresholding the initially flattened
+            image.
+        thresholds: dict | None
+            Thresholds the mask was derived from, recorded in ``thresholds`` when a mask is given.
+
         Example
         -------
         from topostats.io import LoadScan
@@ -416,45 +432,53 @@ processed, please refer to <url to page where we document common problems> for m
             self.images["pixels"], mask=None, row_alignment_quantile=self.row_alignment_quantile
         )
         self.images["initial_tilt_removal"] = self.remove_tilt(self.images["initial_median_flatten"], mask=None)
-        self.images["initial_quadratic_removal"] = self.remove_quadratic(self.images["initial_tilt_removal"], mask=None)
-        self.images["initial_nonlinear_polynomial_removal"] = self.remove_nonlinear_polynomial(
-            self.images["initial_quadratic_removal"], mask=None
-        )
-
-        # Remove scars
         run_scar_removal = self.remove_scars_config.pop("run")
-        if run_scar_removal:
-            LOGGER.info(f"[{self.filename}] : Initial scar removal")
-            self.images["initial_scar_removal"], _ = scars.remove_scars(
-                self.images["initial_nonlinear_polynomial_removal"],
-                filename=self.filename,
-                **self.remove_scars_config,
+        if mask is None:
+            self.images["initial_quadratic_removal"] = self.remove_quadratic(
+                self.images["initial_tilt_removal"], mask=None
+            )
+            self.images["initial_nonlinear_polynomial_removal"] = self.remove_nonlinear_polynomial(
+                self.images["initial_quadratic_removal"], mask=None
             )
-        else:
-            LOGGER.info(f"[{self.filename}] : Skipping scar removal as requested from config")
-            self.images["initial_scar_removal"] = self.images["initial_nonlinear_polynomial_removal"]
 
-        # Zero the data before thresholding, helps with absolute thresholding
-        self.images["initial_zero_average_background"] = self.average_background(
-            self.images["initial_scar_removal"], mask=None
-        )
+            # Remove scars
+            if run_scar_removal:
+                LOGGER.info(f"[{self.filename}] : Initial scar removal")
+                self.images["initial_scar_removal"], _ = scars.remove_scars(
+                    self.images["initial_nonlinear_polynomial_removal"],
+                    filename=self.filename,
+                    **self.remove_scars_config,
+                )
+            else:
+                LOGGER.info(f"[{self.filename}] : Skipping scar removal as requested from config")
+                self.images["initial_scar_removal"] = self.images["initial_nonlinear_polynomial_removal"]
 
-        # Get the thresholds
-        try:
-            self.thresholds = get_thresholds(
+            # Zero the data before thresholding, helps with absolute thresholding
+            self.images["initial_zero_average_background"] = self.average_background(
+                self.images["initial_scar_removal"], mask=None
+            )
+
+            # Get the thresholds
+            try:
+                self.thresholds = get_thresholds(
+                    image=self.images["initial_zero_average_background"],
+                    threshold_method=self.threshold_method,
+                    otsu_threshold_multiplier=self.otsu_threshold_multiplier,
+                    threshold_std_dev=self.threshold_std_dev,
+                    absolute=self.threshold_absolute,
+                    max_pixels=self.threshold_max_pixels,
+                )
+            except TypeError as type_error:
+                raise type_error
+            self.images["mask"] = get_mask(
                 image=self.images["initial_zero_average_background"],
-                threshold_method=self.threshold_method,
-                otsu_threshold_multiplier=self.otsu_threshold_multiplier,
-                threshold_std_dev=self.threshold_std_dev,
-                absolute=self.threshold_absolute,
+                thresholds=self.thresholds,
+                img_name=self.filename,
             )
-        except TypeError as type_error:
-            raise type_error
-        self.images["mask"] = get_mask(
-            image=self.images["initial_zero_average_background"],
-            thresholds=self.thresholds,
-            img_name=self.filename,
-        )
+        else:
+            LOGGER.info(f"[{self.filename}] : Flattening using the mask provided, skipping initial thresholding")
+            self.images["mask"] = mask
+            self.thresholds = thresholds
         self.images["masked_median_flatten"] = self.median_flatten(
             self.images["initial_tilt_removal"],
             self.images["mask"],
@@ -1,4 +1,6 @@
 """Find grains in an image."""
+from __future__ import annotations
+
 # pylint: disable=no-name-in-module
 import logging
 from collections import defaultdict
@@ -23,6 +25,95 @@ LOGGER = logging.getLogger(LOGGER_NAME)
 # pylint: disable=dangerous-default-value
 
 
+class GrainRegistry:
+    """Region properties and crops of the labelled grains in an image, calculated once and shared between stages.
+
+    Grain finding, grain statistics and DNA tracing all need the region properties of the same labelled mask and
+    tracing crops each grain from the image and mask. A registry is created for each direction when grains are found
+    and passed to later stages, calculating each of these on first use and caching them so the labelled mask is only
+    measured once, and every stage numbers molecules in the same order, that of ``skimage.measure.regionprops()``
+    (ascending label).
+
+    Parameters
+    ----------
+    labelled_mask: np.ndarray
+        2D Numpy array of labelled grains, background is zero.
+    image: np.ndarray
+        2D Numpy array of the image in which the grains were found, required for ``get_crops()``.
+    """
+
+    def __init__(self, labelled_mask: np.ndarray, image: np.ndarray = None):
+        """Initialise the class."""
+        self.labelled_mask = labelled_mask
+        self.image = image
+        self._region_properties = None
+        self._crops = {}
+
+    @property
+    def region_properties(self) -> list:
+        """Region properties of each grain, see ``skimage.measure.regionprops()``."""
+        if self._region_properties is None:
+            self._region_properties = regionprops(self.labelled_mask)
+        return self._region_properties
+
+    @property
+    def labels(self) -> list[int]:
+        """Label of each grain, index in this list is the molecule number."""
+        return [region.label for region in self.region_properties]
+
+    @property
+    def bounding_boxes(self) -> list[tuple]:
+        """Bounding box (min_row, min_col, max_row, max_col) of each grain."""
+        return [region.bbox for region in self.region_properties]
+
+    def __len__(self) -> int:
+        """Return the number of grains."""
+        return len(self.region_properties)
+
+    def crop(self, array: np.ndarray, pad_width: int) -> list[np.ndarray]:
+        """Crop each grain from an array the shape of the image.
+
+        The bounding box of each grain is expanded by pad_width (within the bounds of the array) before cropping and the
+        crop is then padded with a further pad_width of zeros, see ``topostats.tracing.dnatracing.crop_array()``.
+
+        Parameters
+        ----------
+        array: np.ndarray
+            2D Numpy array the same shape as the labelled mask.
+        pad_width: int
+            Cells by which to pad cropped regions by.
+
+        Returns
+        -------
+        list[np.ndarray]
+            Cropped array for each grain.
+        """
+        # pylint: disable=import-outside-toplevel
+        from topostats.tracing.dnatracing import crop_array
+
+        return [
+            np.pad(crop_array(array, region.bbox, pad_width), pad_width=pad_width) for region in self.region_properties
+        ]
+
+    def get_crops(self, pad_width: int) -> tuple[list, list]:
+        """Crops of the image and binary masks of each grain, as used for tracing, cached for each pad_width.
+
+        Parameters
+        ----------
+        pad_width: int
+            Cells by which to pad cropped regions by.
+
+        Returns
+        -------
+        tuple[list, list]
+            Lists of the cropped image and the cropped mask, with every labelled pixel set to 1, of each grain.
+        """
+        if pad_width not in self._crops:
+            cropped_masks = [np.where(grain == 0, 0, 1) for grain in self.crop(self.labelled_mask, pad_width)]
+            self._crops[pad_width] = (self.crop(self.image, pad_width), cropped_masks)
+        return self._crops[pad_width]
+
+
 class Grains:
     """Find grains in an image."""
 
@@ -35,10 +126,12 @@ class Grains:
         otsu_threshold_multiplier: float = None,
         threshold_std_dev: dict = None,
         threshold_absolute: dict = None,
+        threshold_max_pixels: int = None,
         absolute_area_threshold: dict = None,
         direction: str = None,
         smallest_grain_size_nm2: float = None,
         remove_edge_intersecting_grains: bool = True,
+        segmentation: str = "fused",
     ):
         """Initialise the class.
 
@@ -58,12 +151,19 @@ class Grains:
             Dictionary of 'below' and 'above' factors by which standard deviation is multiplied to derive the threshold if threshold_method is 'std_dev'.
         threshold_absolute: dict
             Dictionary of absolute 'below' and 'above' thresholds for grain finding.
+        threshold_max_pixels: int
+            Maximum number of pixels thresholds are calculated from, larger images are subsampled. If None all pixels
+            are used.
         absolute_area_threshold: dict
             Dictionary of above and below grain's area thresholds
         direction: str
             Direction for which grains are to be detected, valid values are above, below and both.
         remove_edge_intersecting_grains: bool
             Whether or not to remove grains that intersect the edge of the image.
+        segmentation: str
+            How grains are filtered, 'fused' labels the mask once and filters a table of the grains, 'stepwise' labels,
+            clears the border and filters the image in separate steps, saving each step. Both find the same grains, see
+            find_grains().
         """
         if absolute_area_threshold is None:
             absolute_area_threshold = {"above": [None, None], "below": [None, None]}
@@ -74,11 +174,13 @@ class Grains:
         self.otsu_threshold_multiplier = otsu_threshold_multiplier
         self.threshold_std_dev = threshold_std_dev
         self.threshold_absolute = threshold_absolute
+        self.threshold_max_pixels = threshold_max_pixels
         self.absolute_area_threshold = absolute_area_threshold
         # Only detect grains for the desired direction
         self.direction = [direction] if direction != "both" else ["above", "below"]
         self.smallest_grain_size_nm2 = smallest_grain_size_nm2
         self.remove_edge_intersecting_grains = remove_edge_intersecting_grains
+        self.segmentation = segmentation
         self.thresholds = None
         self.images = {
             "mask_grains": None,
@@ -91,6 +193,8 @@ class Grains:
         self.directions = defaultdict()
         self.minimum_grain_size = None
         self.region_properties = defaultdict()
+        self.grain_registries = defaultdict()
+        self.grain_tables = defaultdict()
         self.bounding_boxes = defaultdict()
         self.grainstats = None
 
@@ -135,7 +239,16 @@ class Grains:
         Very small objects are first removed via thresholding before calculating the below extreme.
         """
         region_properties = self.get_region_properties(image)
-        grain_areas = np.array([grain.area for grain in region_properties])
+        self.calc_minimum_grain_size_from_areas(np.array([grain.area for grain in region_properties]))
+
+    def calc_minimum_grain_size_from_areas(self, grain_areas: np.ndarray) -> None:
+        """Calculate the minimum grain size in pixels squared from the areas of grains.
+
+        Parameters
+        ----------
+        grain_areas: np.ndarray
+            Areas of the grains in pixels squared.
+        """
         if len(grain_areas > 0):
             # Exclude small objects less than a given threshold first
             grain_areas = grain_areas[
@@ -289,16 +402,103 @@ class Grains:
         """
         return {region.area: region.area_bbox for region in self.region_properties[direction]}
 
-    def find_grains(self):
-        """Find grains."""
-        LOGGER.info(f"[{self.filename}] : Thresholding method (grains) : {self.threshold_method}")
-        self.thresholds = get_thresholds(
-            image=self.image,
-            threshold_method=self.threshold_method,
-            otsu_threshold_multiplier=self.otsu_threshold_multiplier,
-            threshold_std_dev=self.threshold_std_dev,
-            absolute=self.threshold_absolute,
-        )
+    def segment_fused(self, mask: np.ndarray, direction: str) -> np.ndarray:
+        """Label a mask and remove grains touching the border, noise and grains outside the area thresholds.
+
+        The mask is labelled once and a table of the area and border contact of each grain is built from the labels
+        (saved in ``grain_tables``), the filters of the stepwise path (``tidy_border()``, ``area_thresholding()``,
+        ``calc_minimum_grain_size()`` / ``remove_small_objects()``) are applied to the table and the grains kept are
+        renumbered with a single lookup, giving the same labelled image as the stepwise path.
+
+        Parameters
+        ----------
+        mask: np.ndarray
+            2D boolean Numpy array of pixels above/below the threshold.
+        direction: str
+            Direction of the threshold, used to select the absolute area thresholds.
+
+        Returns
+        -------
+        np.ndarray
+            Labelled image of the grains kept, numbered in the order they are first found scanning the image.
+        """
+        labelled = self.label_regions(mask)
+        area_px = np.bincount(labelled.ravel()).astype(float)
+        area_nm2 = area_px * (self.pixel_to_nm_scaling**2)
+        touches_border = np.zeros(len(area_px), dtype=bool)
+        touches_border[np.concatenate((labelled[0], labelled[-1], labelled[:, 0], labelled[:, -1]))] = True
+        # Row 0 of the table is the background
+        keep = np.ones(len(area_px), dtype=bool)
+        keep[0] = False
+        if self.remove_edge_intersecting_grains:
+            keep &= ~touches_border
+        keep &= self._within_area_thresholds(area_nm2, [self.smallest_grain_size_nm2, None], labelled.size)
+        if self.absolute_area_threshold[direction].count(None) == 2:
+            self.calc_minimum_grain_size_from_areas(area_px[keep])
+            if self.minimum_grain_size != -1:
+                keep &= area_px >= self.minimum_grain_size
+        else:
+            keep &= self._within_area_thresholds(area_nm2, self.absolute_area_threshold[direction], labelled.size)
+        self.grain_tables[direction] = {
+            "label": np.arange(len(area_px))[1:],
+            "area_px": area_px[1:],
+            "area_nm2": area_nm2[1:],
+            "touches_border": touches_border[1:],
+            "kept": keep[1:],
+        }
+        LOGGER.info(f"[{self.filename}] : Kept {int(keep.sum())} of {len(area_px) - 1} grains ({direction})")
+        relabel = np.zeros(len(area_px), dtype=labelled.dtype)
+        relabel[keep] = np.arange(1, int(keep.sum()) + 1)
+        return relabel[labelled]
+
+    def _within_area_thresholds(self, area_nm2: np.ndarray, area_thresholds: list, image_size: int) -> np.ndarray:
+        """Whether grain areas are within thresholds, with the same limits as ``area_thresholding()``.
+
+        Parameters
+        ----------
+        area_nm2: np.ndarray
+            Areas of grains in nanometres squared.
+        area_thresholds: list
+            Lower and upper area thresholds in nanometres squared, either may be None.
+        image_size: int
+            Number of pixels in the image, the upper limit if none is given.
+
+        Returns
+        -------
+        np.ndarray
+            Boolean array of whether each area is within the thresholds.
+        """
+        lower_size_limit, upper_size_limit = area_thresholds
+        if upper_size_limit is None:
+            upper_size_limit = image_size * self.pixel_to_nm_scaling**2
+        if lower_size_limit is None:
+            lower_size_limit = 0
+        return (area_nm2 >= lower_size_limit) & (area_nm2 <= upper_size_limit)
+
+    def find_grains(self, thresholds: dict | None = None):
+        """Find grains.
+
+        With the 'fused' segmentation the mask is labelled and filtered in one step (see ``segment_fused()``) and only
+        'mask_grains', 'labelled_regions_02' and 'coloured_regions' are saved for each direction, with 'stepwise' the
+        image of each step is saved.
+
+        Parameters
+        ----------
+        thresholds: dict | None
+            Thresholds to use, e.g. those of the previous frame of a video, rather than deriving them from the image.
+        """
+        if thresholds is None:
+            LOGGER.info(f"[{self.filename}] : Thresholding method (grains) : {self.threshold_method}")
+            self.thresholds = get_thresholds(
+                image=self.image,
+                threshold_method=self.threshold_method,
+                otsu_threshold_multiplier=self.otsu_threshold_multiplier,
+                threshold_std_dev=self.threshold_std_dev,
+                absolute=self.threshold_absolute,
+                max_pixels=self.threshold_max_pixels,
+            )
+        else:
+            self.thresholds = thresholds
         for direction in self.direction:
             LOGGER.info(f"[{self.filename}] : Finding {direction} grains, threshold: ({self.thresholds[direction]})")
             self.directions[direction] = {}
@@ -308,45 +508,61 @@ class Grains:
                 threshold_direction=direction,
                 img_name=self.filename,
             )
-            self.directions[direction]["labelled_regions_01"] = self.label_regions(
-                self.directions[direction]["mask_grains"]
-            )
-
-            if self.remove_edge_intersecting_grains:
-                self.directions[direction]["tidied_border"] = self.tidy_border(
-                    self.directions[direction]["labelled_regions_01"]
-                )
-            else:
-                self.directions[direction]["tidied_border"] = self.directions[direction]["labelled_regions_01"]
-
-            LOGGER.info(f"[{self.filename}] : Removing noise ({direction})")
-            self.directions[direction]["removed_noise"] = self.area_thresholding(
-                self.directions[direction]["tidied_border"],
-                [self.smallest_grain_size_nm2, None],
-            )
-
-            LOGGER.info(f"[{self.filename}] : Removing small / large grains ({direction})")
-            # if no area thresholds specified, use otsu
-            if self.absolute_area_threshold[direction].count(None) == 2:
-                self.calc_minimum_grain_size(self.directions[direction]["removed_noise"])
-                self.directions[direction]["removed_small_objects"] = self.remove_small_objects(
-                    self.directions[direction]["removed_noise"]
+            if self.segmentation == "fused":
+                self.directions[direction]["labelled_regions_02"] = self.segment_fused(
+                    self.directions[direction]["mask_grains"], direction
                 )
             else:
-                self.directions[direction]["removed_small_objects"] = self.area_thresholding(
-                    self.directions[direction]["removed_noise"],
-                    self.absolute_area_threshold[direction],
-                )
-            self.directions[direction]["labelled_regions_02"] = self.label_regions(
-                self.directions[direction]["removed_small_objects"]
-            )
+                self._segment_stepwise(direction)
 
-            self.region_properties[direction] = self.get_region_properties(
-                self.directions[direction]["labelled_regions_02"]
+            self.grain_registries[direction] = GrainRegistry(
+                self.directions[direction]["labelled_regions_02"], image=self.image
             )
+            self.region_properties[direction] = self.grain_registries[direction].region_properties
             LOGGER.info(f"[{self.filename}] : Region properties calculated ({direction})")
             self.directions[direction]["coloured_regions"] = self.colour_regions(
                 self.directions[direction]["labelled_regions_02"]
             )
             self.bounding_boxes[direction] = self.get_bounding_boxes(direction=direction)
             LOGGER.info(f"[{self.filename}] : Extracted bounding boxes ({direction})")
+
+    def _segment_stepwise(self, direction: str) -> None:
+        """Label, clear the border of and filter the grain mask of a direction, saving the image of each step.
+
+        Parameters
+        ----------
+        direction: str
+            Direction of the threshold.
+        """
+        self.directions[direction]["labelled_regions_01"] = self.label_regions(
+            self.directions[direction]["mask_grains"]
+        )
+
+        if self.remove_edge_intersecting_grains:
+            self.directions[direction]["tidied_border"] = self.tidy_border(
+                self.directions[direction]["labelled_regions_01"]
+            )
+        else:
+            self.directions[direction]["tidied_border"] = self.directions[direction]["labelled_regions_01"]
+
+        LOGGER.info(f"[{self.filename}] : Removing noise ({direction})")
+        self.directions[direction]["removed_noise"] = self.area_thresholding(
+            self.directions[direction]["tidied_border"],
+            [self.smallest_grain_size_nm2, None],
+        )
+
+        LOGGER.info(f"[{self.filename}] : Removing small / large grains ({direction})")
+        # if no area thresholds specified, use otsu
+        if self.absolute_area_threshold[direction].count(None) == 2:
+            self.calc_minimum_grain_size(self.directions[direction]["removed_noise"])
+            self.directions[direction]["removed_small_objects"] = self.remove_small_objects(
+                self.directions[direction]["removed_noise"]
+            )
+        else:
+            self.directions[direction]["removed_small_objects"] = self.area_thresholding(
+                self.directions[direction]["removed_noise"],
+                self.absolute_area_threshold[direction],
+            )
+        self.directions[direction]["labelled_regions_02"] = self.label_regions(
+            self.directions[direction]["removed_small_objects"]
+        )
@@ -10,10 +10,10 @@ import numpy as np
 import pandas as pd
 import scipy.ndimage
 import skimage.feature as skimage_feature
-import skimage.measure as skimage_measure
 import skimage.morphology as skimage_morphology
 
-from topostats.logs.logs import LOGGER_NAME
+from topostats.grains import GrainRegistry
+from topostats.logs.logs import GRAIN_LOG, LOGGER_NAME
 from topostats.utils import create_empty_dataframe
 
 # pylint: disable=too-many-lines
@@ -54,6 +54,31 @@ GRAIN_STATS_COLUMNS = [
     "aspect_ratio",
 ]
 
+# Statistics that can be calculated for each grain mapped to the intermediate results they need, beyond the mask and
+# heights of the grain. The points (pixel coordinates) of the grain, its edges and the convex hull of the edges are only
+# found if a selected statistic needs them. The hull is needed for the minimum bounding rectangle.
+GRAIN_STATISTICS = {
+    "centre_x": ("points",),
+    "centre_y": ("points",),
+    "radius_min": ("points", "edges"),
+    "radius_max": ("points", "edges"),
+    "radius_mean": ("points", "edges"),
+    "radius_median": ("points", "edges"),
+    "height_min": (),
+    "height_max": (),
+    "height_median": (),
+    "height_mean": (),
+    "volume": (),
+    "area": (),
+    "area_cartesian_bbox": (),
+    "smallest_bounding_width": ("edges", "hull"),
+    "smallest_bounding_length": ("edges", "hull"),
+    "smallest_bounding_area": ("edges", "hull"),
+    "aspect_ratio": ("edges", "hull"),
+    "max_feret": ("edges",),
+    "min_feret": ("edges",),
+}
+
 
 class GrainStats:
     """Class for calculating grain stats."""
@@ -70,6 +95,8 @@ class GrainStats:
         cropped_size: float = -1,
         plot_opts: dict = None,
         metre_scaling_factor: float = 1e-9,
+        grain_registry: GrainRegistry = None,
+        statistics: str | list[str] = "all",
     ):
         """Initialise the class.
 
@@ -97,6 +124,12 @@ class GrainStats:
         metre_scaling_factor : float
             Multiplier to convert the current length scale to metres. Default: 1e-9 for the
             usual AFM length scale of nanometres.
+        grain_registry : GrainRegistry
+            Registry of the grains in labelled_data, if None one is created. Region properties are taken from the
+            registry so they are not calculated again.
+        statistics : str | list[str]
+            Statistics to calculate, "all" or a list of those in GRAIN_STATISTICS. Only the intermediate results the
+            statistics need are calculated, the others are NaN so the columns are the same whichever are selected.
         """
         self.data = data
         self.labelled_data = labelled_data
@@ -109,6 +142,16 @@ class GrainStats:
         self.cropped_size = cropped_size
         self.plot_opts = plot_opts
         self.metre_scaling_factor = metre_scaling_factor
+        self.grain_registry = grain_registry
+        self.statistics = set(GRAIN_STATISTICS) if statistics == "all" else set(statistics)
+        unknown = self.statistics - set(GRAIN_STATISTICS)
+        if unknown:
+            raise ValueError(
+                f"Unknown grain statistics {sorted(unknown)}, valid statistics are {list(GRAIN_STATISTICS)}"
+            )
+        self.intermediates = {
+            intermediate for statistic in self.statistics for intermediate in GRAIN_STATISTICS[statistic]
+        }
 
     @staticmethod
     def get_angle(point_1: tuple, point_2: tuple) -> float:
@@ -158,7 +201,8 @@ class GrainStats:
         Returns
         -------
         grainstats: pd.DataFrame
-            A DataFrame containing all the grain stats that have been calculated for the labelled image.
+            A DataFrame containing all the grain stats that have been calculated for the labelled image, indexed by
+            molecule number, the index of the grain in the grain registry.
         grains_plot_data:
             A list of dictionaries containing grain data to be plotted.
         """
@@ -170,20 +214,29 @@ class GrainStats:
             return pd.DataFrame(columns=GRAIN_STATS_COLUMNS), grains_plot_data
 
         # Calculate region properties
-        region_properties = skimage_measure.regionprops(self.labelled_data)
+        if self.grain_registry is None:
+            self.grain_registry = GrainRegistry(self.labelled_data, image=self.data)
+        region_properties = self.grain_registry.region_properties
 
-        # Iterate over all the grains in the image
+        # Iterate over all the grains in the image, grains too small for statistics are skipped but the others keep
+        # their index in the registry as their molecule number so they match the grains traced by trace_image()
         stats_array = []
+        molecule_numbers = []
         # List to hold all the plot data for all the grains. Each entry is a dictionary of plotting data.
         # There are multiple entries for each grain.
         for index, region in enumerate(region_properties):
-            LOGGER.info(f"[{self.image_name}] : Processing grain: {index}")
+            # Messages logged for every grain are formatted lazily and throttled (see topostats.logs.logs)
+            LOGGER.info("[%s] : Processing grain: %s", self.image_name, index, extra=GRAIN_LOG)
 
             # Skip grain if too small to calculate stats for
-            LOGGER.debug(f"[{self.image_name}] : Grain size: {region.image.size}")
+            if LOGGER.isEnabledFor(logging.DEBUG):
+                LOGGER.debug("[%s] : Grain size: %s", self.image_name, region.image.size, extra=GRAIN_LOG)
             if min(region.image.shape) < 5:
                 LOGGER.info(
-                    f"[{self.image_name}] : Skipping grain due to being too small (size: {region.image.shape}) to calculate stats for."
+                    "[%s] : Skipping grain due to being too small (size: %s) to calculate stats for.",
+                    self.image_name,
+                    region.image.shape,
+                    extra=GRAIN_LOG,
                 )
                 continue
 
@@ -236,15 +289,59 @@ class GrainStats:
                         }
                     )
 
-            points = self.calculate_points(grain_mask)
+            stats = self._grain_statistics(region, grain_mask, grain_mask_image, output_grain)
+            stats_array.append(stats)
+            molecule_numbers.append(index)
+        if len(stats_array) > 0:
+            grainstats_df = pd.DataFrame(data=stats_array, index=molecule_numbers)
+        else:
+            grainstats_df = create_empty_dataframe()
+        grainstats_df.index.name = "molecule_number"
+        grainstats_df["image"] = self.image_name
+
+        return grainstats_df, grains_plot_data
+
+    def _grain_statistics(
+        self, region, grain_mask: np.ndarray, grain_mask_image: np.ndarray, output_grain: Path
+    ) -> dict:
+        """Calculate the selected statistics of a grain.
+
+        Parameters
+        ----------
+        region:
+            Region properties of the grain, as returned by skimage.measure.regionprops().
+        grain_mask : np.ndarray
+            2D boolean array of the grain, cropped to its bounding box.
+        grain_mask_image : np.ndarray
+            Image cropped to the bounding box of the grain with pixels outside the grain set to NaN.
+        output_grain : Path
+            Directory for the plots of the grain.
+
+        Returns
+        -------
+        dict
+            Statistics of the grain, those not selected are NaN.
+        """
+        minr, minc, _, _ = region.bbox
+        # Only the intermediate results needed by the selected statistics are calculated, see GRAIN_STATISTICS
+        points = self.calculate_points(grain_mask) if "points" in self.intermediates else None
+        edges = None
+        if "edges" in self.intermediates:
             edges = self.calculate_edges(grain_mask, edge_detection_method=self.edge_detection_method)
+        radius_stats = dict.fromkeys(("min", "max", "mean", "median"), np.nan)
+        if not self.statistics.isdisjoint(("radius_min", "radius_max", "radius_mean", "radius_median")):
             radius_stats = self.calculate_radius_stats(edges, points)
-            # hull, hull_indices, hull_simplexes = self.convex_hull(edges, output_grain)
-            _, _, hull_simplexes = self.convex_hull(edges, output_grain)
+        centre_x, centre_y = np.nan, np.nan
+        if not self.statistics.isdisjoint(("centre_x", "centre_y")):
             centroid = self._calculate_centroid(points)
-            # Centroids for the grains (minc and minr added because centroid returns values local to the cropped grain images)
+            # Centroids for the grains (minc and minr added because centroid returns values local to the cropped
+            # grain images)
             centre_x = centroid[0] + minc
             centre_y = centroid[1] + minr
+        smallest_bounding_width, smallest_bounding_length, aspect_ratio = np.nan, np.nan, np.nan
+        if "hull" in self.intermediates:
+            # hull, hull_indices, hull_simplexes = self.convex_hull(edges, output_grain)
+            _, _, hull_simplexes = self.convex_hull(edges, output_grain)
             (
                 smallest_bounding_width,
                 smallest_bounding_length,
@@ -255,49 +352,45 @@ class GrainStats:
                 path=output_grain,
             )
 
-            # Calculate minimum and maximum feret diameters
+        # Calculate minimum and maximum feret diameters
+        min_feret, max_feret = np.nan, np.nan
+        if not self.statistics.isdisjoint(("min_feret", "max_feret")):
             min_feret, max_feret = self.get_max_min_ferets(edge_points=edges)
 
-            # Save the stats to dictionary. Note that many of the stats are multiplied by a scaling factor to convert
-            # from pixel units to nanometres.
-            # Removed formatting, better to keep accurate until the end, including in CSV, then shorten display
-            length_scaling_factor = self.pixel_to_nanometre_scaling * self.metre_scaling_factor
-            area_scaling_factor = length_scaling_factor**2
-            stats = {
-                "centre_x": centre_x * length_scaling_factor,
-                "centre_y": centre_y * length_scaling_factor,
-                "radius_min": radius_stats["min"] * length_scaling_factor,
-                "radius_max": radius_stats["max"] * length_scaling_factor,
-                "radius_mean": radius_stats["mean"] * length_scaling_factor,
-                "radius_median": radius_stats["median"] * length_scaling_factor,
-                "height_min": np.nanmin(grain_mask_image) * self.metre_scaling_factor,
-                "height_max": np.nanmax(grain_mask_image) * self.metre_scaling_factor,
-                "height_median": np.nanmedian(grain_mask_image) * self.metre_scaling_factor,
-                "height_mean": np.nanmean(grain_mask_image) * self.metre_scaling_factor,
-                # [volume] = [pixel] * [pixel] * [height] = px * px * nm.
-                # To turn into m^3, multiply by pixel_to_nanometre_scaling^2 and metre_scaling_factor^3.
-                "volume": np.nansum(grain_mask_image)
-                * self.pixel_to_nanometre_scaling**2
-                * (self.metre_scaling_factor**3),
-                "area": region.area * area_scaling_factor,
-                "area_cartesian_bbox": region.area_bbox * area_scaling_factor,
-                "smallest_bounding_width": smallest_bounding_width * length_scaling_factor,
-                "smallest_bounding_length": smallest_bounding_length * length_scaling_factor,
-                "smallest_bounding_area": smallest_bounding_length * smallest_bounding_width * area_scaling_factor,
-                "aspect_ratio": aspect_ratio,
-                "threshold": self.direction,
-                "max_feret": max_feret * length_scaling_factor,
-                "min_feret": min_feret * length_scaling_factor,
-            }
-            stats_array.append(stats)
-        if len(stats_array) > 0:
-            grainstats_df = pd.DataFrame(data=stats_array)
-        else:
-            grainstats_df = create_empty_dataframe()
-        grainstats_df.index.name = "molecule_number"
-        grainstats_df["image"] = self.image_name
-
-        return grainstats_df, grains_plot_data
+        # Save the stats to dictionary. Note that many of the stats are multiplied by a scaling factor to convert
+        # from pixel units to nanometres.
+        # Removed formatting, better to keep accurate until the end, including in CSV, then shorten display
+        length_scaling_factor = self.pixel_to_nanometre_scaling * self.metre_scaling_factor
+        area_scaling_factor = length_scaling_factor**2
+        stats = {
+            "centre_x": centre_x * length_scaling_factor,
+            "centre_y": centre_y * length_scaling_factor,
+            "radius_min": radius_stats["min"] * length_scaling_factor,
+            "radius_max": radius_stats["max"] * length_scaling_factor,
+            "radius_mean": radius_stats["mean"] * length_scaling_factor,
+            "radius_median": radius_stats["median"] * length_scaling_factor,
+            "height_min": np.nanmin(grain_mask_image) * self.metre_scaling_factor,
+            "height_max": np.nanmax(grain_mask_image) * self.metre_scaling_factor,
+            "height_median": np.nanmedian(grain_mask_image) * self.metre_scaling_factor,
+            "height_mean": np.nanmean(grain_mask_image) * self.metre_scaling_factor,
+            # [volume] = [pixel] * [pixel] * [height] = px * px * nm.
+            # To turn into m^3, multiply by pixel_to_nanometre_scaling^2 and metre_scaling_factor^3.
+            "volume": np.nansum(grain_mask_image)
+            * self.pixel_to_nanometre_scaling**2
+            * (self.metre_scaling_factor**3),
+            "area": region.area * area_scaling_factor,
+            "area_cartesian_bbox": region.area_bbox * area_scaling_factor,
+            "smallest_bounding_width": smallest_bounding_width * length_scaling_factor,
+            "smallest_bounding_length": smallest_bounding_length * length_scaling_factor,
+            "smallest_bounding_area": smallest_bounding_length * smallest_bounding_width * area_scaling_factor,
+            "aspect_ratio": aspect_ratio,
+            "threshold": self.direction,
+            "max_feret": max_feret * length_scaling_factor,
+            "min_feret": min_feret * length_scaling_factor,
+        }
+        # Statistics that are not selected are missing, whether or not their intermediate results were calculated
+        stats.update(dict.fromkeys(GRAIN_STATISTICS.keys() - self.statistics, np.nan))
+        return stats
 
     @staticmethod
     def calculate_points(grain_mask: np.ndarray):
@@ -1,25 +1,31 @@
 """Functions for reading and writing data."""
 from __future__ import annotations
 
+import functools
 import io
 import logging
 import os
 import pickle as pkl
 import struct
+from collections import deque
+from collections.abc import Callable, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
-from typing import Any
+from typing import TYPE_CHECKING, Any
 
-import h5py
 import numpy as np
 import pandas as pd
-import pySPM
-import tifffile
-from igor2 import binarywave
 from ruamel.yaml import YAML, YAMLError
-from topofileformats import asd
 
+from topostats.discovery import FileDiscovery
 from topostats.logs.logs import LOGGER_NAME
+from topostats.metrics import stage_timer
+
+if TYPE_CHECKING:
+    import pySPM
+    import tifffile
 
 LOGGER = logging.getLogger(LOGGER_NAME)
 
@@ -29,6 +35,102 @@ CONFIG_DOCUMENTATION_REFERENCE = """# For more information on configuration and
 
 # pylint: disable=broad-except
 # pylint: disable=too-many-lines
+# Readers for each file format are imported by the loader that uses them so that only the backend that is needed is
+# imported, keeping start up (and spawning of worker processes) quick.
+# pylint: disable=import-outside-toplevel
+
+# Threads, and the writes submitted to them, of the background_writes() context this process is in, if any
+_BACKGROUND_WRITER: ThreadPoolExecutor | None = None
+_BACKGROUND_WRITES: list[Future] = []
+
+
+@contextmanager
+def background_writes(threads: int = 1) -> Iterator[None]:
+    """Write arrays and .topostats files on background threads, waiting for the writes to complete on exit.
+
+    Functions decorated with ``written_in_background`` that are called within the context return immediately, so that
+    processing continues while the output is written, which helps when the output directory is on slow (e.g. network)
+    storage. Data passed to them must not be modified until the context exits.
+
+    Parameters
+    ----------
+    threads: int
+        Number of threads writing concurrently.
+
+    Raises
+    ------
+    Exception
+        The first error raised by a write, once all writes have completed.
+    """
+    global _BACKGROUND_WRITER  # pylint: disable=global-statement
+    if _BACKGROUND_WRITER is not None:
+        yield
+        return
+    _BACKGROUND_WRITER = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="topostats-writer")
+    try:
+        yield
+    finally:
+        writer, _BACKGROUND_WRITER = _BACKGROUND_WRITER, None
+        writer.shutdown(wait=True)
+        writes = list(_BACKGROUND_WRITES)
+        _BACKGROUND_WRITES.clear()
+    for write in writes:
+        write.result()
+
+
+def written_in_background(func: Callable) -> Callable:
+    """Decorate a function that writes output so that it runs on a background thread within ``background_writes()``.
+
+    Each write is timed as the 'save' stage, see ``topostats.metrics.stage_timer()``.
+
+    Parameters
+    ----------
+    func: Callable
+        Function writing output, its return value is discarded when it runs in the background.
+
+    Returns
+    -------
+    Callable
+        The decorated function.
+    """
+
+    @functools.wraps(func)
+    def write(*args, **kwargs):
+        # Writes are timed where they run so the 'save' stage measures writing rather than submitting the write
+        if _BACKGROUND_WRITER is None:
+            with stage_timer("save"):
+                return func(*args, **kwargs)
+        _BACKGROUND_WRITES.append(_BACKGROUND_WRITER.submit(_timed_write, func, *args, **kwargs))
+        return None
+
+    return write
+
+
+def _timed_write(func: Callable, *args, **kwargs) -> Any:
+    """Run a write on a background thread, timing it as the 'save' stage of the job that made it."""
+    with stage_timer("save"):
+        return func(*args, **kwargs)
+
+
+def with_background_writes(func: Callable, job, threads: int = 1) -> Any:
+    """Run a job with its arrays and .topostats files written on background threads, see ``background_writes()``.
+
+    Parameters
+    ----------
+    func: Callable
+        Function to apply to the job, e.g. ``process_scan``.
+    job: Any
+        Argument to be passed to func.
+    threads: int
+        Number of threads writing concurrently.
+
+    Returns
+    -------
+    Any
+        The result of the job, once all of its output has been written.
+    """
+    with background_writes(threads):
+        return func(job)
 
 
 def read_yaml(filename: str | Path) -> dict:
@@ -133,6 +235,7 @@ def write_config_with_comments(config: str, output_dir: Path, filename: str = "c
     LOGGER.info(CONFIG_DOCUMENTATION_REFERENCE)
 
 
+@written_in_background
 def save_array(array: np.ndarray, outpath: Path, filename: str, array_type: str) -> None:
     """Save a Numpy array to disk.
 
@@ -230,15 +333,26 @@ def get_out_path(image_path: str | Path = None, base_dir: str | Path = None, out
         raise
 
 
-def find_files(base_dir: str | Path = None, file_ext: str = ".spm") -> list:
+def find_files(
+    base_dir: str | Path = None,
+    file_ext: str | list[str] = ".spm",
+    include: list[str] | None = None,
+    exclude: list[str] | None = None,
+) -> list:
     """Recursively scan the specified directory for images with the given file extension.
 
+    See topostats.discovery.FileDiscovery for searching with a manifest.
+
     Parameters
     ----------
     base_dir: Union[str, Path]
         Directory to recursively search for files, if not specified the current directory is scanned.
-    file_ext: str
-        File extension to search for.
+    file_ext: str | list[str]
+        File extension, or list of file extensions, to search for.
+    include: list[str] | None
+        Glob patterns, relative to base_dir, files must match at least one of.
+    exclude: list[str] | None
+        Glob patterns, relative to base_dir, of files and directories to skip.
 
     Returns
     -------
@@ -246,7 +360,7 @@ def find_files(base_dir: str | Path = None, file_ext: str = ".spm") -> list:
         List of files found with the extension in the given directory.
     """
     base_dir = Path("./") if base_dir is None else Path(base_dir)
-    return list(base_dir.glob("**/*" + file_ext))
+    return FileDiscovery(base_dir, file_ext=file_ext, include=include, exclude=exclude).discover()
 
 
 def save_folder_grainstats(output_dir: str | Path, base_dir: str | Path, all_stats_df: pd.DataFrame) -> None:
@@ -390,6 +504,99 @@ def read_gwy_component_dtype(open_file: io.TextIOWrapper) -> str:
     return open_file.read(1).decode("ascii")
 
 
+# Igor wave data types (complex waves are not supported)
+IBW_DATA_TYPES = {
+    2: np.float32,
+    4: np.float64,
+    8: np.int8,
+    16: np.int16,
+    32: np.int32,
+    72: np.uint8,
+    80: np.uint16,
+    96: np.uint32,
+}
+
+
+def check_spm_header(img_path: str | Path) -> None:
+    """Check a file has a complete Bruker .spm header.
+
+    pySPM reads the header line by line until the end of header marker so would never return for files that are not
+    Bruker files or whose header is incomplete.
+
+    Parameters
+    ----------
+    img_path: str | Path
+        Path to a .spm file.
+    """
+    with Path(img_path).open("rb") as open_file:
+        if not open_file.readline().startswith(b"\\*File list"):
+            raise ValueError(f"{img_path} is not a Bruker .spm file.")
+        header_length = None
+        for _ in range(10):
+            line = open_file.readline()
+            if line.startswith(b"\\Data length:"):
+                header_length = int(line.split(b":")[1])
+                break
+        if header_length is None:
+            raise ValueError(f"{img_path} does not record the length of its header.")
+        open_file.seek(0)
+        if b"\\*File list end" not in open_file.read(header_length):
+            raise ValueError(f"{img_path} has an incomplete header.")
+
+
+def read_ibw_header(img_path: str | Path) -> dict:
+    """Read the header, note and dimension labels of a version 5 Igor binary wave (.ibw) without reading the data.
+
+    The binary header records the size of each section of the file so the wave data, which follows the wave header, can
+    be skipped over to read the note and labels that are stored after it.
+
+    Parameters
+    ----------
+    img_path: str | Path
+        Path to a .ibw file.
+
+    Returns
+    -------
+    dict
+        Dictionary with the number of points in each dimension ('n_dim'), the wave note ('note'), the dimension labels
+        ('labels') as a list of lists of strings in the same layout as 'igor2.binarywave.load()', the data type
+        ('dtype', None for complex waves) and the position of the data in the file ('data_offset'). The data is stored
+        in column-major (Fortran) order.
+    """
+    with Path(img_path).open("rb") as open_file:
+        bin_header = open_file.read(64)
+        # The version is written in the byte order of the machine that saved the file
+        byte_order = "<" if struct.unpack("<h", bin_header[:2])[0] in (1, 2, 3, 5) else ">"
+        version = struct.unpack(f"{byte_order}h", bin_header[:2])[0]
+        if version != 5:
+            raise ValueError(f"Only version 5 .ibw files can be read without loading the data, found version {version}")
+        fields = struct.unpack(f"{byte_order}hh15i", bin_header)
+        wave_size, formula_size, note_size, data_units_size = fields[2:6]
+        dim_units_sizes = fields[6:10]
+        dim_labels_sizes = fields[10:14]
+        # The data type is 16 and nDim 68 bytes into the wave header, which immediately follows the binary header
+        open_file.seek(64 + 16)
+        data_type = struct.unpack(f"{byte_order}h", open_file.read(2))[0]
+        open_file.seek(64 + 68)
+        n_dim = [size for size in struct.unpack(f"{byte_order}4i", open_file.read(16)) if size]
+        open_file.seek(64 + wave_size + formula_size)
+        note = open_file.read(note_size).decode("latin1")
+        open_file.seek(data_units_size + sum(dim_units_sizes), os.SEEK_CUR)
+        labels = []
+        for size in dim_labels_sizes:
+            # Labels are fixed width, null padded, strings
+            raw_labels = open_file.read(size)
+            labels.append([raw_labels[i : i + 32].split(b"\x00", 1)[0].decode() for i in range(0, size, 32)])
+    dtype = IBW_DATA_TYPES.get(data_type)
+    return {
+        "n_dim": n_dim,
+        "note": note,
+        "labels": labels,
+        "dtype": np.dtype(dtype).newbyteorder(byte_order) if dtype is not None else None,
+        "data_offset": 64 + 320,
+    }
+
+
 def get_relative_paths(paths: list[Path]) -> list[str]:
     """Extract a list of relative paths, removing the common suffix.
 
@@ -447,6 +654,10 @@ def convert_basename_to_relative_paths(df: pd.DataFrame):
     return df
 
 
+# Formats holding a single image, which is loaded whatever the channel
+SINGLE_CHANNEL_FORMATS = (".gwy", ".topostats")
+
+
 # pylint: disable=too-many-instance-attributes
 class LoadScans:
     """Load the image and image parameters from a file path."""
@@ -454,7 +665,7 @@ class LoadScans:
     def __init__(
         self,
         img_paths: list,
-        channel: str,
+        channel: str | list[str],
     ):
         """Initialise the class.
 
@@ -462,18 +673,26 @@ class LoadScans:
         ----------
         img_path: Union[str, Path]
             Path to a valid AFM scan to load.
-        channel: str
-            Image channel to extract from the scan.
+        channel: str | list[str]
+            Image channel, or list of channels, to extract from the scan. When more than one channel is extracted the
+            images are named '<filename>_<channel>'. .gwy and .topostats files hold a single image, which is loaded
+            once.
         """
         self.img_paths = img_paths
         self.img_path = None
-        self.channel = channel
+        self.channels = [channel] if isinstance(channel, str) else list(channel)
+        self.channel = self.channels[0]
+        self.opened_file = None
         self.channel_data = None
         self.filename = None
         self.image = None
         self.pixel_to_nm_scaling = None
         self.grain_masks = {}
         self.img_dict = {}
+        # Files each image in img_dict, or in skipped, was loaded from and the images (a file, a channel of it or a
+        # frame) that are not processed mapped to the reason why
+        self.source_files = {}
+        self.skipped = {}
         self.MINIMUM_IMAGE_SIZE = 10
 
     def load_spm(self) -> tuple:
@@ -484,13 +703,16 @@ class LoadScans:
         tuple(np.ndarray, float)
             A tuple containing the image and its pixel to nanometre scaling value.
         """
+        import pySPM
+
         LOGGER.info(f"Loading image from : {self.img_path}")
         try:
-            scan = pySPM.Bruker(self.img_path)
+            scan = self._open_file(pySPM.Bruker, self.img_path)
             LOGGER.info(f"[{self.filename}] : Loaded image from : {self.img_path}")
             self.channel_data = scan.get_channel(self.channel)
             LOGGER.info(f"[{self.filename}] : Extracted channel {self.channel}")
-            image = np.flipud(np.array(self.channel_data.pixels))
+            # pySPM reads only the requested channel, the flipped view of its pixels avoids copying them
+            image = np.flipud(self.channel_data.pixels)
         except FileNotFoundError:
             LOGGER.info(f"[{self.filename}] File not found : {self.img_path}")
             raise
@@ -547,6 +769,8 @@ class LoadScans:
         tuple(np.ndarray, float)
             A tuple containing the image and its pixel to nanometre scaling value.
         """
+        import h5py
+
         LOGGER.info(f"Loading image from : {self.img_path}")
         try:
             with h5py.File(self.img_path, "r") as f:
@@ -578,6 +802,8 @@ class LoadScans:
         tuple: (np.ndarray, float)
             A tuple containing the image and its pixel to nanometre scaling value.
         """
+        from topofileformats import asd
+
         try:
             frames: np.ndarray
             pixel_to_nm_scaling: float
@@ -593,12 +819,56 @@ class LoadScans:
     def load_ibw(self) -> tuple:
         """Load image from Asylum Research (Igor) .ibw files.
 
+        Only the requested channel is read from version 5 files, other versions are loaded in full with igor2.
+
         Returns
         -------
         tuple(np.ndarray, float)
             A tuple containing the image and its pixel to nanometre scaling value.
         """
         LOGGER.info(f"Loading image from : {self.img_path}")
+        try:
+            header = self._open_file(read_ibw_header, self.img_path)
+        except FileNotFoundError:
+            LOGGER.info(f"[{self.filename}] File not found : {self.img_path}")
+            raise
+        except ValueError:
+            header = None
+        if header is None or header["dtype"] is None or len(header["n_dim"]) != 3:
+            return self._load_ibw_igor2()
+
+        labels = [label for label_list in header["labels"] for label in label_list if label]
+        try:
+            channel_idx = labels.index(self.channel)
+        except ValueError:
+            LOGGER.error(f"[{self.filename}] : {self.channel} not in {self.img_path.suffix} channel list: {labels}")
+            raise
+        rows, columns = header["n_dim"][:2]
+        channel_size = rows * columns
+        # Data is column-major so each channel is a contiguous block that, read in row-major order, is the transposed
+        # image.
+        image = np.fromfile(
+            self.img_path,
+            dtype=header["dtype"],
+            count=channel_size,
+            offset=header["data_offset"] + channel_idx * channel_size * header["dtype"].itemsize,
+        ).reshape((columns, rows))
+        LOGGER.info(f"[{self.filename}] : Extracted channel {self.channel}")
+        # Scale in place, integer data is converted to floats as it would be by multiplying
+        image = image.astype(image.dtype.newbyteorder("=") if image.dtype.kind == "f" else np.float64, copy=False)
+        image *= 1e9  # Looks to be in m
+        return (np.flipud(image), self._ibw_pixel_to_nm_scaling(header["note"], (rows, columns)))
+
+    def _load_ibw_igor2(self) -> tuple:
+        """Load image from Asylum Research (Igor) .ibw files, reading the whole wave with igor2.
+
+        Returns
+        -------
+        tuple(np.ndarray, float)
+            A tuple containing the image and its pixel to nanometre scaling value.
+        """
+        from igor2 import binarywave
+
         try:
             scan = binarywave.load(self.img_path)
             LOGGER.info(f"[{self.filename}] : Loaded image from : {self.img_path}")
@@ -620,15 +890,18 @@ class LoadScans:
         except Exception as exception:
             LOGGER.error(f"[{self.filename}] : {exception}")
 
-        return (image, self._ibw_pixel_to_nm_scaling(scan))
+        note = scan["wave"]["note"].decode("latin1")
+        return (image, self._ibw_pixel_to_nm_scaling(note, scan["wave"]["wData"].shape))
 
-    def _ibw_pixel_to_nm_scaling(self, scan: dict) -> float:
+    def _ibw_pixel_to_nm_scaling(self, note: str, shape: tuple) -> float:
         """Extract pixel to nm scaling from the IBW image metadata.
 
         Parameters
         ----------
-        scan: dict
-            The loaded binary wave object.
+        note: str
+            The wave note holding the scan parameters.
+        shape: tuple
+            Shape of the wave, the first two dimensions are the slow and fast scan directions.
 
         Returns
         -------
@@ -637,14 +910,14 @@ class LoadScans:
         """
         # Get metadata
         notes = {}
-        for line in str(scan["wave"]["note"]).split("\\r"):
+        for line in note.split("\r"):
             if line.count(":"):
                 key, val = line.split(":", 1)
                 notes[key] = val.strip()
         # Has potential for non-square pixels but not yet implemented
         pixel_to_nm_scaling = (
-            float(notes["SlowScanSize"]) / scan["wave"]["wData"].shape[0] * 1e9,  # as in m
-            float(notes["FastScanSize"]) / scan["wave"]["wData"].shape[1] * 1e9,  # as in m
+            float(notes["SlowScanSize"]) / shape[0] * 1e9,  # as in m
+            float(notes["FastScanSize"]) / shape[1] * 1e9,  # as in m
         )[0]
         LOGGER.info(f"[{self.filename}] : Pixel to nm scaling : {pixel_to_nm_scaling}")
         return pixel_to_nm_scaling
@@ -657,42 +930,48 @@ class LoadScans:
         tuple(np.ndarray, float)
             A tuple containing the image and its pixel to nanometre scaling value.
         """
+        import tifffile
+
         # Load the file
         img_path = str(self.img_path)
         try:
-            tif = tifffile.TiffFile(img_path)
+            tif = self._open_file(tifffile.TiffFile, img_path)
         except FileNotFoundError:
             LOGGER.info(f"[{self.filename}] File not found : {self.img_path}")
             raise
-        # Obtain channel list for all channels in file
+        # Find the page of the channel, pages are only parsed as they are reached so stop at the requested channel
         channel_list = {}
-        for i, page in enumerate(tif.pages[1:]):  # [0] is thumbnail
+        channel_page = None
+        for page in tif.pages[1:]:  # [0] is thumbnail
             available_channel = page.tags["32848"].value  # keys are hexadecimal values
             if page.tags["32849"].value == 0:  # whether img is trace or retrace
                 tr_rt = "trace"
             else:
                 tr_rt = "retrace"
-            channel_list[f"{available_channel}_{tr_rt}"] = i + 1
-        try:
-            channel_idx = channel_list[self.channel]
-        except KeyError:
+            channel_list[f"{available_channel}_{tr_rt}"] = page.index
+            if f"{available_channel}_{tr_rt}" == self.channel:
+                channel_page = page
+                break
+        if channel_page is None:
             LOGGER.error(f"{self.channel} not in channel list: {channel_list}")
-            raise
-        # Get image and if applicable, scale it
-        channel_page = tif.pages[channel_idx]
+            raise KeyError(self.channel)
+        # Get image and if applicable, scale it in place
         image = channel_page.asarray()
         scaling_type = channel_page.tags["33027"].value
         if scaling_type == "LinearScaling":
             scaling = channel_page.tags["33028"].value
             offset = channel_page.tags["33029"].value
-            image = (image * scaling) + offset
+            image = image.astype(np.result_type(image, scaling, offset), copy=False)
+            image *= scaling
+            image += offset
         elif scaling_type == "NullScaling":
-            pass
+            image = image.astype(np.result_type(image, 1e9), copy=False)
         else:
             raise ValueError(f"Scaling type {scaling_type} is not 'NullScaling' or 'LinearScaling'")
+        image *= 1e9
         # Get page for common metadata between scans
         metadata_page = tif.pages[0]
-        return (image * 1e9, self._jpk_pixel_to_nm_scaling(metadata_page))
+        return (image, self._jpk_pixel_to_nm_scaling(metadata_page))
 
     @staticmethod
     def _jpk_pixel_to_nm_scaling(tiff_page: tifffile.tifffile.TiffPage) -> float:
@@ -720,7 +999,7 @@ class LoadScans:
         return px_to_nm * 1e9
 
     @staticmethod
-    def _gwy_read_object(open_file: io.TextIOWrapper, data_dict: dict) -> None:
+    def _gwy_read_object(open_file: io.TextIOWrapper, data_dict: dict, skip_data: bool = False) -> None:
         """Parse and extract data from a `.gwy` file object, starting at the current open file read position.
 
         Parameters
@@ -729,6 +1008,8 @@ class LoadScans:
             An open file object.
         data_dict: dict
             Dictionary of `.gwy` file image properties.
+        skip_data: bool
+            Whether to skip over data arrays rather than reading them, used when only metadata is required.
 
         Returns
         -------
@@ -744,11 +1025,14 @@ class LoadScans:
                 open_file=open_file,
                 initial_byte_pos=open_file.tell(),
                 data_dict=data_dict,
+                skip_data=skip_data,
             )
             read_data_size += component_data_size
 
     @staticmethod
-    def _gwy_read_component(open_file: io.TextIOWrapper, initial_byte_pos: int, data_dict: dict) -> int:
+    def _gwy_read_component(
+        open_file: io.TextIOWrapper, initial_byte_pos: int, data_dict: dict, skip_data: bool = False
+    ) -> int:
         """Parse and extract data from a `.gwy` file object, starting at the current open file read position.
 
         Parameters
@@ -757,6 +1041,9 @@ class LoadScans:
             An open file object.
         data_dict: dict
             Dictionary of `.gwy` file image properties.
+        skip_data: bool
+            Whether to skip over data arrays rather than reading them, used when only metadata is required. The size of
+            a skipped array is stored under 'data_size'.
 
         Returns
         -------
@@ -769,7 +1056,7 @@ class LoadScans:
         if data_type == "o":
             LOGGER.debug(f"component name: {component_name} | dtype: {data_type} |")
             sub_dict = {}
-            LoadScans._gwy_read_object(open_file=open_file, data_dict=sub_dict)
+            LoadScans._gwy_read_object(open_file=open_file, data_dict=sub_dict, skip_data=skip_data)
             data_dict[component_name] = sub_dict
         elif data_type == "c":
             value = read_char(open_file=open_file)
@@ -791,6 +1078,11 @@ class LoadScans:
             array_size = read_u32i(open_file=open_file)
             LOGGER.debug(f"component name: {component_name} | dtype: {data_type}")
             LOGGER.debug(f"array size: {array_size}")
+            if skip_data:
+                # Each element is a 64-bit double
+                open_file.seek(array_size * 8, os.SEEK_CUR)
+                data_dict["data_size"] = array_size
+                return open_file.tell() - initial_byte_pos
             data = np.zeros(array_size)
             for index in range(array_size):
                 data[index] = read_64d(open_file=open_file)
@@ -886,8 +1178,202 @@ class LoadScans:
 
         return (image, px_to_nm)
 
-    def get_data(self) -> None:
-        """Extract image, filepath and pixel to nm scaling value, and append these to the img_dic object."""
+    def metadata_spm(self) -> dict:
+        """Read the channels, image shape and pixel to nm scaling from the header of a Bruker .spm file.
+
+        Returns
+        -------
+        dict
+            Dictionary of 'channels', 'shape', 'frames' and 'pixel_to_nm_scaling'.
+        """
+        import pySPM
+
+        check_spm_header(self.img_path)
+        # pySPM only parses the header when opening a file, the image data is read by get_channel()
+        scan = pySPM.Bruker(self.img_path)
+        channels = [layer[b"@2:Image Data"][0].decode("latin1").split('"')[1] for layer in scan.layers]
+        if self.channel not in channels:
+            shape = scan._get_res(0)  # pylint: disable=protected-access
+            return {"channels": channels, "shape": shape, "frames": 1, "pixel_to_nm_scaling": None}
+        channel_data = scan.get_channel(self.channel, mock_data=True)
+        return {
+            "channels": channels,
+            "shape": channel_data.pixels.shape,
+            "frames": 1,
+            "pixel_to_nm_scaling": self._spm_pixel_to_nm_scaling(channel_data),
+        }
+
+    def metadata_topostats(self) -> dict:
+        """Read the image shape and pixel to nm scaling from a .topostats file without reading the image.
+
+        Returns
+        -------
+        dict
+            Dictionary of 'channels', 'shape', 'frames' and 'pixel_to_nm_scaling'.
+        """
+        import h5py
+
+        with h5py.File(self.img_path, "r") as f:
+            return {
+                # .topostats files hold a single, already extracted, channel
+                "channels": list(self.channels),
+                "shape": f["image"].shape,
+                "frames": 1,
+                "pixel_to_nm_scaling": f["pixel_to_nm_scaling"][()],
+            }
+
+    def metadata_asd(self) -> dict:
+        """Read the number of frames, frame shape and pixel to nm scaling of a .asd file.
+
+        The .asd reader does not provide a way of reading only the header so all frames are loaded.
+
+        Returns
+        -------
+        dict
+            Dictionary of 'channels', 'shape', 'frames' and 'pixel_to_nm_scaling'.
+        """
+        frames, pixel_to_nm_scaling = self.load_asd()
+        return {
+            "channels": [self.channel],
+            "shape": frames.shape[1:],
+            "frames": frames.shape[0],
+            "pixel_to_nm_scaling": pixel_to_nm_scaling,
+        }
+
+    def metadata_ibw(self) -> dict:
+        """Read the channels, image shape and pixel to nm scaling from the header and note of an .ibw file.
+
+        Returns
+        -------
+        dict
+            Dictionary of 'channels', 'shape', 'frames' and 'pixel_to_nm_scaling'.
+        """
+        header = read_ibw_header(self.img_path)
+        channels = [label for label_list in header["labels"] for label in label_list if label]
+        rows, columns = header["n_dim"][:2]
+        return {
+            "channels": channels,
+            # Images are transposed when loaded
+            "shape": (columns, rows),
+            "frames": 1,
+            "pixel_to_nm_scaling": self._ibw_pixel_to_nm_scaling(header["note"], (rows, columns)),
+        }
+
+    def metadata_jpk(self) -> dict:
+        """Read the channels, image shape and pixel to nm scaling from the tags of a .jpk file.
+
+        Returns
+        -------
+        dict
+            Dictionary of 'channels', 'shape', 'frames' and 'pixel_to_nm_scaling'.
+        """
+        import tifffile
+
+        # Only the image file directories are parsed when opening a file, pages are decoded by asarray()
+        with tifffile.TiffFile(str(self.img_path)) as tif:
+            channels = []
+            shape = None
+            for page in tif.pages[1:]:  # [0] is thumbnail
+                tr_rt = "trace" if page.tags["32849"].value == 0 else "retrace"
+                channels.append(f"{page.tags['32848'].value}_{tr_rt}")
+                if channels[-1] == self.channel or shape is None:
+                    shape = page.shape
+            return {
+                "channels": channels,
+                "shape": shape,
+                "frames": 1,
+                "pixel_to_nm_scaling": self._jpk_pixel_to_nm_scaling(tif.pages[0]),
+            }
+
+    def metadata_gwy(self) -> dict:
+        """Read the channels, image shape and pixel to nm scaling of a .gwy file, skipping over the image data.
+
+        Returns
+        -------
+        dict
+            Dictionary of 'channels', 'shape', 'frames' and 'pixel_to_nm_scaling'.
+        """
+        image_data_dict = {}
+        with Path.open(self.img_path, "rb") as open_file:  # pylint: disable=unspecified-encoding
+            open_file.read(4)
+            LoadScans._gwy_read_object(open_file, data_dict=image_data_dict, skip_data=True)
+        channels = [value for key, value in image_data_dict.items() if key.endswith("/data/title")]
+        data_key = "/0/data" if "/0/data" in image_data_dict else "/1/data"
+        if data_key not in image_data_dict:
+            return {
+                "channels": channels,
+                "channel_found": False,
+                "shape": None,
+                "frames": 1,
+                "pixel_to_nm_scaling": None,
+            }
+        data = image_data_dict[data_key]
+        return {
+            "channels": channels,
+            # The first data field is loaded regardless of the channel
+            "channel_found": True,
+            "shape": (data["xres"], data["yres"]),
+            "frames": 1,
+            "pixel_to_nm_scaling": data["xreal"] * 1e9 / data["yres"],
+        }
+
+    def get_metadata(self) -> list[dict]:
+        """Read the metadata of each image without loading the image data where the file format allows.
+
+        Files that can not be read are reported with the error rather than raising an exception.
+
+        Returns
+        -------
+        list[dict]
+            For each image a dictionary of the 'image' path, 'file_ext', available 'channels', whether the configured
+            channel(s) are available ('channel_found'), image 'shape', number of 'frames', 'pixel_to_nm_scaling' and any
+            'error'.
+        """
+        suffix_to_reader = {
+            ".spm": self.metadata_spm,
+            ".jpk": self.metadata_jpk,
+            ".ibw": self.metadata_ibw,
+            ".gwy": self.metadata_gwy,
+            ".topostats": self.metadata_topostats,
+            ".asd": self.metadata_asd,
+        }
+        all_metadata = []
+        for img_path in self.img_paths:
+            self.img_path = Path(img_path)
+            self.filename = self.img_path.stem
+            metadata = {
+                "image": str(self.img_path),
+                "file_ext": self.img_path.suffix,
+                "channels": None,
+                "channel_found": False,
+                "shape": None,
+                "frames": None,
+                "pixel_to_nm_scaling": None,
+                "error": None,
+            }
+            try:
+                if self.img_path.suffix not in suffix_to_reader:
+                    raise ValueError(f"File type {self.img_path.suffix} not yet supported.")
+                file_metadata = suffix_to_reader[self.img_path.suffix]()
+            except Exception as error:
+                LOGGER.warning(f"[{self.filename}] Unable to read metadata : {error}")
+                metadata["error"] = f"{type(error).__name__}: {error}"
+            else:
+                metadata["channel_found"] = all(channel in file_metadata["channels"] for channel in self.channels)
+                metadata.update(file_metadata)
+                metadata["shape"] = tuple(int(size) for size in metadata["shape"]) if metadata["shape"] else None
+            all_metadata.append(metadata)
+        return all_metadata
+
+    def get_data(self, skip_errors: bool = False) -> None:
+        """Extract image, filepath and pixel to nm scaling value, and append these to the img_dic object.
+
+        Parameters
+        ----------
+        skip_errors: bool
+            Log and skip files, or channels of them, that can not be loaded, recording them in ``skipped`` rather than
+            raising the error.
+        """
         suffix_to_loader = {
             ".spm": self.load_spm,
             ".jpk": self.load_jpk,
@@ -906,19 +1392,25 @@ class LoadScans:
 
             # Check that the file extension is supported
             if suffix in suffix_to_loader:
+                channels = self.channels
+                if suffix in SINGLE_CHANNEL_FORMATS and len(channels) > 1:
+                    LOGGER.warning(
+                        f"[{self.filename}] {suffix} files hold a single image, loading it once rather than for each of"
+                        f" the channels {channels}."
+                    )
+                    channels = channels[:1]
                 try:
-                    self.image, self.pixel_to_nm_scaling = suffix_to_loader[suffix]()
-                except Exception as e:
-                    if "Channel" in str(e) and "not found" in str(e):
-                        LOGGER.warning(f"[{self.filename}] Channel {self.channel} not found, skipping image.")
-                    else:
-                        raise
-                else:
-                    if suffix == ".asd":
-                        for index, frame in enumerate(self.image):
-                            self._check_image_size_and_add_to_dict(image=frame, filename=f"{self.filename}_{index}")
-                    else:
-                        self._check_image_size_and_add_to_dict(image=self.image, filename=self.filename)
+                    for channel in channels:
+                        try:
+                            self._load_channel(loader=suffix_to_loader[suffix], channel=channel)
+                        except Exception as error:
+                            if not skip_errors:
+                                raise
+                            image = self._image_name(channel)
+                            LOGGER.error(f"[{image}] Skipping, image could not be loaded : {error}")
+                            self._skip(image, f"Could not be loaded, {type(error).__name__}: {error}")
+                finally:
+                    self._close_file()
             else:
                 raise ValueError(
                     f"File type {suffix} not yet supported. Please make an issue at \
@@ -926,6 +1418,78 @@ class LoadScans:
                 this file type."
                 )
 
+    def _load_channel(self, loader: Callable, channel: str) -> None:
+        """Extract a channel from the current file and add the image(s) to the img_dict object.
+
+        Parameters
+        ----------
+        loader: Callable
+            Loader for the file format.
+        channel: str
+            Channel to extract.
+        """
+        self.channel = channel
+        filename = self._image_name(channel)
+        try:
+            self.image, self.pixel_to_nm_scaling = loader()
+        except Exception as e:
+            if "Channel" in str(e) and "not found" in str(e):
+                LOGGER.warning(f"[{self.filename}] Channel {self.channel} not found, skipping image.")
+                self._skip(filename, f"Channel {self.channel} not found")
+            else:
+                raise
+        else:
+            if self.img_path.suffix == ".asd":
+                for index, frame in enumerate(self.image):
+                    self._check_image_size_and_add_to_dict(image=frame, filename=f"{filename}_{index}")
+            else:
+                self._check_image_size_and_add_to_dict(image=self.image, filename=filename)
+
+    def _image_name(self, channel: str) -> str:
+        """Name of the image of a channel of the current file, '<filename>_<channel>' if several are extracted.
+
+        Parameters
+        ----------
+        channel: str
+            Channel extracted.
+
+        Returns
+        -------
+        str
+            Name of the image, frames of .asd files are suffixed with their index.
+        """
+        if len(self.channels) == 1 or self.img_path.suffix in SINGLE_CHANNEL_FORMATS:
+            return self.filename
+        return f"{self.filename}_{channel}"
+
+    def _open_file(self, opener: Callable, img_path: str | Path) -> Any:
+        """Open the current file, reusing it if it has already been opened to extract another channel.
+
+        Parameters
+        ----------
+        opener: Callable
+            Function that opens (or reads the header of) the file.
+        img_path: str | Path
+            Path to the file.
+
+        Returns
+        -------
+        Any
+            The object returned by the opener.
+        """
+        if self.opened_file is None or self.opened_file[0] != (opener, str(img_path)):
+            self._close_file()
+            self.opened_file = ((opener, str(img_path)), opener(img_path))
+        return self.opened_file[1]
+
+    def _close_file(self) -> None:
+        """Close the file opened by _open_file(), if there is one."""
+        if self.opened_file is not None:
+            opened = self.opened_file[1]
+            self.opened_file = None
+            if hasattr(opened, "close"):
+                opened.close()
+
     def _check_image_size_and_add_to_dict(self, image: np.ndarray, filename: str) -> None:
         """Check the image is above a minimum size in both dimensions.
 
@@ -940,10 +1504,24 @@ class LoadScans:
         """
         if image.shape[0] < self.MINIMUM_IMAGE_SIZE or image.shape[1] < self.MINIMUM_IMAGE_SIZE:
             LOGGER.warning(f"[{filename}] Skipping, image too small: {image.shape}")
+            self._skip(filename, f"Image too small: {image.shape}")
         else:
             self.add_to_dict(image=image, filename=filename)
             LOGGER.info(f"[{filename}] Image added to processing.")
 
+    def _skip(self, filename: str, reason: str) -> None:
+        """Record an image that is not processed and why.
+
+        Parameters
+        ----------
+        filename: str
+            Name the image would have been added to img_dict under.
+        reason: str
+            Why the image is not processed.
+        """
+        self.skipped[filename] = reason
+        self.source_files[filename] = self.img_path
+
     def add_to_dict(self, image: np.ndarray, filename: str) -> None:
         """Add an image and metadata to the img_dict dictionary under the key filename.
 
@@ -965,9 +1543,63 @@ class LoadScans:
             "image_original": image,
             "image_flattened": None,
             "grain_masks": self.grain_masks,
+            "source_file": self.img_path,
+            "channel": self.channel,
         }
+        self.source_files[filename] = self.img_path
+
+
+def prefetch_scans(
+    img_paths: list[Path], channel: str | list[str], threads: int = 0, depth: int | None = None
+) -> Iterator[LoadScans]:
+    """Load scans one file at a time, reading the next files on background threads while earlier ones are processed.
+
+    Reading and decoding a scan is mostly waiting on storage, or in libraries that release the GIL, so a few threads
+    keep images ready for the processes doing the CPU bound stages. Files that can not be loaded are recorded in
+    ``skipped`` of the ``LoadScans`` they are yielded in, as with ``LoadScans.get_data(skip_errors=True)``.
 
+    Parameters
+    ----------
+    img_paths: list[Path]
+        Paths of the scans to load.
+    channel: str | list[str]
+        Image channel, or list of channels, to extract from each scan.
+    threads: int
+        Number of threads loading scans, 0 loads each scan in the calling thread when it is needed.
+    depth: int | None
+        Maximum number of scans loaded ahead of the one being processed, twice the number of threads if None.
+
+    Yields
+    ------
+    LoadScans
+        The loaded scans of each file, in the order of img_paths.
+    """
 
+    def load(img_path: Path) -> LoadScans:
+        scan = LoadScans([img_path], channel)
+        scan.get_data(skip_errors=True)
+        return scan
+
+    if threads == 0:
+        yield from (load(img_path) for img_path in img_paths)
+        return
+    depth = 2 * threads if depth is None else max(depth, 1)
+    img_paths = iter(img_paths)
+    with ThreadPoolExecutor(max_workers=threads, thread_name_prefix="topostats-loader") as loaders:
+        loading = deque(loaders.submit(load, img_path) for _, img_path in zip(range(depth), img_paths))
+        try:
+            while loading:
+                scan = loading.popleft().result()
+                for img_path in img_paths:
+                    loading.append(loaders.submit(load, img_path))
+                    break
+                yield scan
+        finally:
+            for future in loading:
+                future.cancel()
+
+
+@written_in_background
 def save_topostats_file(output_dir: Path, filename: str, topostats_object: dict) -> None:
     """Save a topostats dictionary object to a .topostats (hdf5 format) file.
 
@@ -981,6 +1613,8 @@ def save_topostats_file(output_dir: Path, filename: str, topostats_object: dict)
         Dictionary of the topostats data to save. Must include a flattened image and
         pixel to nanometre scaling factor. May also include grain masks.
     """
+    import h5py
+
     LOGGER.info(f"[{filename}] : Saving image to .topostats file")
 
     if ".topostats" not in filename:
@@ -1,8 +1,16 @@
 """Standardise logging."""
+from __future__ import annotations
+
 import logging
+import multiprocessing
 import sys
+from collections import Counter
+from collections.abc import Iterator
+from contextlib import contextmanager
 from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
 from pathlib import Path
+from queue import Queue
 
 # pylint: disable=assignment-from-no-return
 
@@ -17,6 +25,71 @@ LOG_ERROR_FORMATTER = logging.Formatter(
 
 LOGGER_NAME = "topostats"
 
+# Messages logged for every grain pass 'extra=GRAIN_LOG' so that they can be throttled by GrainLogThrottle.
+GRAIN_LOG = {"per_grain": True}
+# Maximum number of times each per-grain message is logged for an image.
+MAX_GRAIN_MESSAGES = 20
+
+
+class GrainLogThrottle(logging.Filter):
+    """Limit the number of times each per-grain message is logged for an image.
+
+    Images can have thousands of grains and logging several messages for each produces enormous log files. Records
+    flagged with ``extra=GRAIN_LOG`` are counted by their (unformatted) message and first argument, which by convention
+    is the image filename, and dropped once ``max_messages`` have been logged. The last message that is logged notes
+    that further messages are suppressed. Counts are reset by ``reset_grain_log_throttle()`` when an image starts
+    processing.
+    """
+
+    def __init__(self, max_messages: int = MAX_GRAIN_MESSAGES):
+        """Initialise the filter.
+
+        Parameters
+        ----------
+        max_messages: int
+            Maximum number of times each per-grain message is logged for an image.
+        """
+        super().__init__()
+        self.max_messages = max_messages
+        self.counts = Counter()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        """Determine whether a record is logged.
+
+        Parameters
+        ----------
+        record: logging.LogRecord
+            Record to be logged.
+
+        Returns
+        -------
+        bool
+            Whether the record should be logged.
+        """
+        if not getattr(record, "per_grain", False):
+            return True
+        image = record.args[0] if isinstance(record.args, tuple) and record.args else None
+        key = (record.msg, image)
+        self.counts[key] += 1
+        if self.counts[key] > self.max_messages:
+            return False
+        if self.counts[key] == self.max_messages:
+            record.msg = f"{record.msg} (further messages like this for this image are suppressed)"
+        return True
+
+
+def reset_grain_log_throttle(log_name: str = LOGGER_NAME) -> None:
+    """Reset the counts of per-grain messages, called when processing of an image starts.
+
+    Parameters
+    ----------
+    log_name : str
+        Name of the logger.
+    """
+    for log_filter in logging.getLogger(log_name).filters:
+        if isinstance(log_filter, GrainLogThrottle):
+            log_filter.counts.clear()
+
 
 def setup_logger(log_name: str = LOGGER_NAME) -> logging.Logger:
     """Logger setup.
@@ -56,7 +129,9 @@ def setup_logger(log_name: str = LOGGER_NAME) -> logging.Logger:
     err_stream_handler.setLevel(logging.ERROR)
     err_stream_handler.setFormatter(LOG_ERROR_FORMATTER)
 
-    file_handler = logging.FileHandler(Path().cwd().stem + f"-{start.strftime('%Y-%m-%d-%H-%M-%S')}.log")
+    # Delay opening the log file until the first message is written so that importing topostats (e.g. for --help) does
+    # not create empty log files.
+    file_handler = logging.FileHandler(Path().cwd().stem + f"-{start.strftime('%Y-%m-%d-%H-%M-%S')}.log", delay=True)
     file_handler.setFormatter(LOG_ERROR_FORMATTER)
 
     logger = logging.getLogger(log_name)
@@ -66,5 +141,88 @@ def setup_logger(log_name: str = LOGGER_NAME) -> logging.Logger:
         logger.addHandler(out_stream_handler)
         logger.addHandler(err_stream_handler)
         logger.addHandler(file_handler)
+    if not any(isinstance(log_filter, GrainLogThrottle) for log_filter in logger.filters):
+        logger.addFilter(GrainLogThrottle())
 
     return logger
+
+
+@contextmanager
+def log_queue(log_name: str = LOGGER_NAME) -> Iterator[Queue]:
+    """Write log records sent to a queue by worker processes using the handlers of the logger.
+
+    A single listener thread in the main process writes all records so that workers do not write to the streams and
+    log file concurrently. Worker processes should be started with ``worker_log_initialiser`` as the initializer, e.g.
+
+        with log_queue() as queue, Pool(initializer=worker_log_initialiser, initargs=(queue, LOGGER.level)) as pool:
+            ...
+
+    The queue is held by a manager process rather than being a ``multiprocessing.Queue``. Pools are terminated when a
+    job times out and a worker killed while sending a record would corrupt a ``multiprocessing.Queue`` or leave its lock
+    held, stalling the listener and the workers of later pools.
+
+    Parameters
+    ----------
+    log_name : str
+        Name of the logger whose handlers write the records.
+
+    Yields
+    ------
+    Queue
+        Proxy of the queue that worker processes send log records to.
+    """
+    with multiprocessing.Manager() as manager:
+        records = manager.Queue(-1)
+        listener = QueueListener(records, *logging.getLogger(log_name).handlers, respect_handler_level=True)
+        listener.start()
+        try:
+            yield records
+        finally:
+            listener.stop()
+
+
+@contextmanager
+def without_log_file(log_name: str = LOGGER_NAME) -> Iterator[None]:
+    """Write log records to the streams only, not the log file, whilst in the context.
+
+    ``setup_logger`` adds a handler that writes a log file to the working directory. This suits the command line but not
+    processing images in memory, e.g. with ``topostats.pipeline.Pipeline``, which should not write any files. The file
+    handlers of the logger are removed on entry and restored on exit.
+
+    Parameters
+    ----------
+    log_name : str
+        Name of the logger.
+
+    Yields
+    ------
+    None
+    """
+    logger = logging.getLogger(log_name)
+    file_handlers = [handler for handler in logger.handlers if isinstance(handler, logging.FileHandler)]
+    for handler in file_handlers:
+        logger.removeHandler(handler)
+    try:
+        yield
+    finally:
+        for handler in file_handlers:
+            logger.addHandler(handler)
+
+
+def worker_log_initialiser(queue: Queue, level: int, log_name: str = LOGGER_NAME) -> None:
+    """Send the log records of a worker process to a queue rather than writing them directly.
+
+    Parameters
+    ----------
+    queue : Queue
+        Queue to send log records to, see ``log_queue``.
+    level : int
+        Logging level of the main process.
+    log_name : str
+        Name of the logger.
+    """
+    logger = logging.getLogger(log_name)
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    logger.addHandler(QueueHandler(queue))
+    logger.setLevel(level)
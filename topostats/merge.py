@@ -0,0 +1,105 @@
+"""Combine the statistics of shards of images processed separately, e.g. by the array jobs of a cluster scheduler.
+
+``topostats process --shard i/N`` processes the images assigned to shard i of N (see
+``topostats.discovery.select_shard()``). Images are saved to the shared output directory as usual but the statistics,
+manifest and configuration of each shard are saved to 'shards/shard_<i>_of_<N>' of it, so shards can run at the same
+time without shared services. Once all shards are complete ``topostats merge`` combines their statistics, saves them,
+along with the statistics of each folder, to the output directory and makes the summary plots.
+"""
+from __future__ import annotations
+
+import logging
+import re
+from pathlib import Path
+
+import pandas as pd
+
+from topostats.logs.logs import LOGGER_NAME
+from topostats.run_topostats import SHARDS_DIRNAME, prepare_config, save_statistics, summarise_results
+
+LOGGER = logging.getLogger(LOGGER_NAME)
+
+SHARD_DIR_PATTERN = re.compile(r"^shard_(\d+)_of_(\d+)$")
+
+
+def find_shards(output_dir: str | Path) -> list[Path]:
+    """Find the directories of shards, warning of any that are missing or incomplete.
+
+    Parameters
+    ----------
+    output_dir: str | Path
+        Output directory shared by the shards.
+
+    Returns
+    -------
+    list[Path]
+        Directories of complete shards, those with 'image_stats.csv', in order.
+
+    Raises
+    ------
+    FileNotFoundError
+        If there are no shards in the output directory.
+    """
+    shards = {}
+    for shard_dir in (Path(output_dir) / SHARDS_DIRNAME).glob("shard_*_of_*"):
+        match = SHARD_DIR_PATTERN.match(shard_dir.name)
+        if match and shard_dir.is_dir():
+            shards[(int(match.group(2)), int(match.group(1)))] = shard_dir
+    if not shards:
+        raise FileNotFoundError(f"No shards found in {Path(output_dir) / SHARDS_DIRNAME}")
+    n_shards = {n_shards for n_shards, _ in shards}
+    if len(n_shards) > 1:
+        LOGGER.warning(f"Shards of runs split into different numbers of shards ({sorted(n_shards)}) are being merged.")
+    for total in n_shards:
+        missing = [index for index in range(1, total + 1) if (total, index) not in shards]
+        if missing:
+            LOGGER.warning(f"Shards {missing} of {total} are missing, their images will not be included.")
+    complete = []
+    for key in sorted(shards):
+        if (shards[key] / "image_stats.csv").is_file():
+            complete.append(shards[key])
+        else:
+            LOGGER.warning(f"Shard {shards[key].name} has not completed, its images will not be included.")
+    return complete
+
+
+def merge_shards(output_dir: str | Path) -> tuple[pd.DataFrame | None, pd.DataFrame]:
+    """Combine the grain and tracing statistics and image statistics of complete shards.
+
+    Parameters
+    ----------
+    output_dir: str | Path
+        Output directory shared by the shards.
+
+    Returns
+    -------
+    tuple[pd.DataFrame | None, pd.DataFrame]
+        Grain and tracing statistics, None if no shard has any, and image statistics of all shards.
+    """
+    shard_dirs = find_shards(output_dir)
+    image_stats = pd.concat([pd.read_csv(shard_dir / "image_stats.csv", index_col=0) for shard_dir in shard_dirs])
+    all_statistics = [
+        pd.read_csv(shard_dir / "all_statistics.csv", index_col=["image", "threshold", "molecule_number"])
+        for shard_dir in shard_dirs
+        if (shard_dir / "all_statistics.csv").is_file()
+    ]
+    results = pd.concat(all_statistics) if all_statistics else None
+    LOGGER.info(f"Merged the statistics of {len(image_stats)} images from {len(shard_dirs)} shards.")
+    return results, image_stats
+
+
+def run_merge(args=None) -> None:
+    """Combine the statistics of shards, saving them to the output directory and making summary plots.
+
+    Parameters
+    ----------
+    args: Namespace
+        Command line arguments.
+    """
+    config = prepare_config(args)
+    results, image_stats = merge_shards(config["output_dir"])
+    image_stats.to_csv(config["output_dir"] / "image_stats.csv")
+    LOGGER.info(f"Image stats saved to : {config['output_dir']}/image_stats.csv.")
+    summarise_results(results, config, summary_config_file=getattr(args, "summary_config", None))
+    images_processed = save_statistics(results, config)
+    LOGGER.info(f"Statistics of {images_processed} images saved to : {config['output_dir']}")
@@ -0,0 +1,110 @@
+"""Summarise the channels, size and scaling of images by reading their metadata without loading the image data.
+
+Checking that a batch of scans has the expected channel, resolution and scan size before processing it finds files that
+would fail, or be skipped, without the cost of decoding every image. Files are read concurrently by a pool of threads as
+reading headers is dominated by waiting on the filesystem.
+"""
+from __future__ import annotations
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+
+from topostats.discovery import FileDiscovery
+from topostats.io import LoadScans
+from topostats.logs.logs import LOGGER_NAME
+
+LOGGER = logging.getLogger(LOGGER_NAME)
+
+METADATA_FILENAME = "metadata.csv"
+
+
+def read_metadata(img_path: Path, channel: str) -> dict:
+    """Read the metadata of a single image.
+
+    Parameters
+    ----------
+    img_path: Path
+        Path to the image.
+    channel: str
+        Channel that is to be extracted when processing.
+
+    Returns
+    -------
+    dict
+        Metadata of the image, see ``LoadScans.get_metadata()``.
+    """
+    return LoadScans([img_path], channel=channel).get_metadata()[0]
+
+
+def inspect_images(img_files: list[Path], channel: str, workers: int = 8) -> pd.DataFrame:
+    """Read the metadata of images concurrently.
+
+    Parameters
+    ----------
+    img_files: list[Path]
+        Images to inspect.
+    channel: str
+        Channel that is to be extracted when processing.
+    workers: int
+        Number of threads used to read files concurrently.
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per image of its path, file extension, channels, whether the channel is present, shape, number of
+        frames, pixel to nanometre scaling and any error reading it.
+    """
+    with ThreadPoolExecutor(max_workers=max(int(workers), 1)) as executor:
+        all_metadata = list(executor.map(lambda img_path: read_metadata(img_path, channel), img_files))
+    df = pd.DataFrame(
+        all_metadata,
+        columns=[
+            "image",
+            "file_ext",
+            "channels",
+            "channel_found",
+            "shape",
+            "frames",
+            "pixel_to_nm_scaling",
+            "error",
+        ],
+    )
+    df["frames"] = df["frames"].astype("Int64")
+    df["channels"] = df["channels"].apply(lambda channels: ";".join(channels) if channels else None)
+    return df
+
+
+def run_inspect(args=None) -> None:
+    """Find images and summarise their metadata, writing it to 'metadata.csv' in the output directory.
+
+    Parameters
+    ----------
+    args: Namespace
+        Command line arguments.
+    """
+    # pylint: disable=import-outside-toplevel
+    from topostats.run_topostats import prepare_config
+
+    config = prepare_config(args)
+    if getattr(args, "channel", None) is not None:
+        config["loading"]["channel"] = args.channel
+    img_files = FileDiscovery(
+        base_dir=config["base_dir"],
+        file_ext=config["file_ext"],
+        include=config["discovery"]["include"],
+        exclude=config["discovery"]["exclude"],
+        workers=config["discovery"]["workers"],
+    ).discover()
+    df = inspect_images(img_files, channel=config["loading"]["channel"], workers=config["discovery"]["workers"])
+    metadata_file = config["output_dir"] / METADATA_FILENAME
+    df.to_csv(metadata_file, index=False)
+    if len(df):
+        LOGGER.info(f"Metadata of {len(df)} images :\n{df.drop(columns='channels').to_string(index=False)}")
+    missing_channel = int((~df["channel_found"] & df["error"].isna()).sum())
+    LOGGER.info(
+        f"{len(df)} images inspected, {int(df['error'].notna().sum())} could not be read and {missing_channel} do not"
+        f" have the channel '{config['loading']['channel']}'. Metadata saved to : {metadata_file}"
+    )
@@ -0,0 +1,336 @@
+"""Report the throughput of processing as metrics, in the Prometheus text format, for monitoring long runs.
+
+Metrics are served on ``http://localhost:<port>/metrics`` and/or rewritten to a file at a regular interval (e.g. for the
+textfile collector of the Prometheus node exporter) while images are processed. They include counters of images,
+grains and failures, the rate of images and grains over a recent window, a histogram of the time each stage takes,
+the number of jobs waiting or running and the resident memory of each worker process.
+
+Stages time themselves with ``stage_timer()``, which records durations in the process it runs in. When metrics are
+enabled the processing function is wrapped by ``measure()`` so each worker returns its stage timings and memory with
+its result, these are added to the ``Metrics`` of the main process.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from collections import Counter, deque
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from topostats.logs.logs import LOGGER_NAME
+
+LOGGER = logging.getLogger(LOGGER_NAME)
+
+# Upper bounds (seconds) of the buckets of the stage latency histograms
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Durations of the stages run in this process by the job being measured, None when no job is being measured
+_STAGE_TIMINGS: list[tuple[str, float]] | None = None
+
+
+@contextmanager
+def stage_timer(stage: str) -> Iterator[None]:
+    """Record how long a stage of processing takes, if the job it is part of is being measured by ``measure()``.
+
+    Parameters
+    ----------
+    stage: str
+        Name of the stage, e.g. 'filter'.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if _STAGE_TIMINGS is not None:
+            _STAGE_TIMINGS.append((stage, time.perf_counter() - start))
+
+
+def resident_memory() -> int | None:
+    """Resident memory of this process in bytes.
+
+    Returns
+    -------
+    int | None
+        Resident set size in bytes, or None if it can not be determined on this platform.
+    """
+    try:
+        with Path("/proc/self/statm").open(encoding="utf-8") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def measure(func: Callable, job) -> tuple:
+    """Run a job, returning the durations of the stages it ran and the memory of the worker along with its result.
+
+    Parameters
+    ----------
+    func: Callable
+        Function to apply to the job.
+    job: Any
+        Argument to be passed to func.
+
+    Returns
+    -------
+    tuple
+        The result of the job and a dictionary of the 'stage_timings', worker 'rss' and 'pid'.
+    """
+    global _STAGE_TIMINGS  # pylint: disable=global-statement
+    _STAGE_TIMINGS = []
+    try:
+        result = func(job)
+        return result, {"stage_timings": _STAGE_TIMINGS, "rss": resident_memory(), "pid": os.getpid()}
+    finally:
+        _STAGE_TIMINGS = None
+
+
+class Metrics:
+    """Thread safe store of the metrics of a run, rendered in the Prometheus text format.
+
+    Parameters
+    ----------
+    total_jobs: int
+        Number of jobs (images, or videos in video mode) to be processed, jobs can also be added as they are queued with
+        ``observe_queued()``.
+    window: float
+        Seconds over which the rates of images and grains are calculated.
+    """
+
+    def __init__(self, total_jobs: int = 0, window: float = 60.0):
+        """Initialise the class."""
+        self.lock = threading.Lock()
+        self.window = window
+        self.total_jobs = total_jobs
+        self.jobs_done = 0
+        self.images = 0
+        self.grains = 0
+        self.failures = Counter()
+        # Stage mapped to the count of durations in each bucket, the total seconds and the number of durations
+        self.stages = {}
+        self.worker_rss = {}
+        self.recent = deque()
+
+    def observe_queued(self, jobs: int = 1) -> None:
+        """Record jobs added to the queue, when jobs are prepared as processing proceeds.
+
+        Parameters
+        ----------
+        jobs: int
+            Number of jobs queued.
+        """
+        with self.lock:
+            self.total_jobs += jobs
+
+    def observe_stage(self, stage: str, seconds: float) -> None:
+        """Add the duration of a stage to its latency histogram.
+
+        Parameters
+        ----------
+        stage: str
+            Name of the stage.
+        seconds: float
+            Seconds the stage took.
+        """
+        with self.lock:
+            buckets, total, count = self.stages.get(stage, ([0] * len(LATENCY_BUCKETS), 0.0, 0))
+            buckets = [n + (seconds <= bound) for n, bound in zip(buckets, LATENCY_BUCKETS)]
+            self.stages[stage] = (buckets, total + seconds, count + 1)
+
+    def observe_job(self, images: int, grains: int, measurement: dict | None = None) -> None:
+        """Record a completed job.
+
+        Parameters
+        ----------
+        images: int
+            Number of images (frames) the job processed.
+        grains: int
+            Number of grains found.
+        measurement: dict | None
+            Stage timings and worker memory returned by ``measure()``.
+        """
+        if measurement is not None:
+            for stage, seconds in measurement["stage_timings"]:
+                self.observe_stage(stage, seconds)
+        with self.lock:
+            self.jobs_done += 1
+            self.images += images
+            self.grains += grains
+            self.recent.append((time.monotonic(), images, grains))
+            if measurement is not None and measurement["rss"] is not None:
+                self.worker_rss[measurement["pid"]] = measurement["rss"]
+
+    def observe_failure(self, status: str) -> None:
+        """Record a job that failed, timed out or was skipped.
+
+        Parameters
+        ----------
+        status: str
+            Status of the job, e.g. 'failed', 'timed_out' or 'skipped'.
+        """
+        with self.lock:
+            self.failures[status] += 1
+            if status != "skipped":
+                self.jobs_done += 1
+
+    def rates(self) -> tuple[float, float]:
+        """Images per minute and grains per second over the window.
+
+        Returns
+        -------
+        tuple[float, float]
+            Images per minute and grains per second.
+        """
+        now = time.monotonic()
+        with self.lock:
+            while self.recent and self.recent[0][0] < now - self.window:
+                self.recent.popleft()
+            images = sum(images for _, images, _ in self.recent)
+            grains = sum(grains for _, _, grains in self.recent)
+        return images * 60 / self.window, grains / self.window
+
+    def render(self) -> str:
+        """Render the metrics in the Prometheus text exposition format.
+
+        Returns
+        -------
+        str
+            Metrics, one sample per line.
+        """
+        images_per_minute, grains_per_second = self.rates()
+        with self.lock:
+            lines = [
+                "# HELP topostats_images_processed_total Images (or frames) processed.",
+                "# TYPE topostats_images_processed_total counter",
+                f"topostats_images_processed_total {self.images}",
+                "# HELP topostats_grains_total Grains found.",
+                "# TYPE topostats_grains_total counter",
+                f"topostats_grains_total {self.grains}",
+                f"# HELP topostats_images_per_minute Images processed per minute over the last {self.window:g}s.",
+                "# TYPE topostats_images_per_minute gauge",
+                f"topostats_images_per_minute {images_per_minute:g}",
+                f"# HELP topostats_grains_per_second Grains found per second over the last {self.window:g}s.",
+                "# TYPE topostats_grains_per_second gauge",
+                f"topostats_grains_per_second {grains_per_second:g}",
+                "# HELP topostats_queue_depth Jobs waiting to be processed or being processed.",
+                "# TYPE topostats_queue_depth gauge",
+                f"topostats_queue_depth {max(self.total_jobs - self.jobs_done, 0)}",
+                "# HELP topostats_failures_total Images that failed, timed out or were skipped.",
+                "# TYPE topostats_failures_total counter",
+            ]
+            for status in ("failed", "timed_out", "skipped"):
+                lines.append(f'topostats_failures_total{{status="{status}"}} {self.failures[status]}')
+            lines += [
+                "# HELP topostats_stage_seconds Time taken by each stage of processing an image.",
+                "# TYPE topostats_stage_seconds histogram",
+            ]
+            for stage, (buckets, total, count) in sorted(self.stages.items()):
+                for bound, n in zip(LATENCY_BUCKETS, buckets):
+                    lines.append(f'topostats_stage_seconds_bucket{{stage="{stage}",le="{bound:g}"}} {n}')
+                lines.append(f'topostats_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {count}')
+                lines.append(f'topostats_stage_seconds_sum{{stage="{stage}"}} {total:g}')
+                lines.append(f'topostats_stage_seconds_count{{stage="{stage}"}} {count}')
+            lines += [
+                "# HELP topostats_worker_rss_bytes Resident memory of each worker when it last completed a job.",
+                "# TYPE topostats_worker_rss_bytes gauge",
+            ]
+            for pid, rss in sorted(self.worker_rss.items()):
+                lines.append(f'topostats_worker_rss_bytes{{pid="{pid}"}} {rss}')
+        return "\n".join(lines) + "\n"
+
+
+def write_metrics(metrics: Metrics, metrics_file: str | Path) -> None:
+    """Write the metrics to a file, replacing it atomically so readers never see a partial file.
+
+    Parameters
+    ----------
+    metrics: Metrics
+        Metrics to write.
+    metrics_file: str | Path
+        File to write.
+    """
+    metrics_file = Path(metrics_file)
+    partial_file = metrics_file.with_name(f".{metrics_file.name}.tmp")
+    partial_file.write_text(metrics.render(), encoding="utf-8")
+    partial_file.replace(metrics_file)
+
+
+def _metrics_handler(metrics: Metrics) -> type[BaseHTTPRequestHandler]:
+    """Create a request handler serving the metrics on '/metrics'."""
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        """Serve the metrics in the Prometheus text format."""
+
+        def do_GET(self) -> None:  # noqa: N802 pylint: disable=invalid-name
+            """Respond with the metrics, or 404 for any other path."""
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = metrics.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args) -> None:  # noqa: A002 pylint: disable=redefined-builtin
+            """Do not log each request."""
+
+    return MetricsHandler
+
+
+@contextmanager
+def report_metrics(metrics_config: dict, total_jobs: int, output_dir: str | Path = ".") -> Iterator[Metrics | None]:
+    """Serve and/or periodically write metrics while processing, as configured.
+
+    Parameters
+    ----------
+    metrics_config: dict
+        The 'metrics' section of the configuration, 'port', 'file' and 'interval'.
+    total_jobs: int
+        Number of jobs to be processed.
+    output_dir: str | Path
+        Directory a relative metrics file is written to.
+
+    Yields
+    ------
+    Metrics | None
+        Metrics to record the run in, None if neither a port nor a file is configured.
+    """
+    if metrics_config["port"] is None and metrics_config["file"] is None:
+        yield None
+        return
+    metrics = Metrics(total_jobs=total_jobs, window=metrics_config["window"])
+    server = None
+    stop = threading.Event()
+    writer = None
+    if metrics_config["port"] is not None:
+        server = ThreadingHTTPServer(("127.0.0.1", metrics_config["port"]), _metrics_handler(metrics))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        LOGGER.info(f"Serving metrics on : http://localhost:{server.server_address[1]}/metrics")
+    if metrics_config["file"] is not None:
+        metrics_file = Path(output_dir) / metrics_config["file"]
+
+        def write_periodically() -> None:
+            """Rewrite the metrics file every interval until stopped."""
+            while not stop.wait(metrics_config["interval"]):
+                write_metrics(metrics, metrics_file)
+
+        write_metrics(metrics, metrics_file)
+        writer = threading.Thread(target=write_periodically, daemon=True)
+        writer.start()
+        LOGGER.info(f"Writing metrics every {metrics_config['interval']}s to : {metrics_file}")
+    try:
+        yield metrics
+    finally:
+        stop.set()
+        if writer is not None:
+            writer.join()
+            write_metrics(metrics, metrics_file)
+        if server is not None:
+            server.shutdown()
+            server.server_close()
@@ -0,0 +1,256 @@
+"""Process images held in memory, e.g. frames as they are acquired, without reading or writing any files.
+
+``process_scan()`` works through files, creating output directories and saving arrays, ``.topostats`` files and plots
+as it goes. ``Pipeline`` runs the same stages on an array and returns the flattened image, grain masks and statistics
+instead. The configuration is validated once when the pipeline is created so each call only does the processing.
+
+    from topostats.pipeline import Pipeline
+
+    pipeline = Pipeline(config)  # e.g. read_yaml("my_config.yaml"), None for the default configuration
+    for image in frames:
+        result = pipeline.process(image, pixel_to_nm_scaling=0.5)
+        result["grainstats"], result["image_stats"]
+
+When ``video.run`` is enabled in the configuration the pipeline treats successive images as the frames of a video,
+reusing the flattening mask and grain thresholds of earlier frames as described in ``topostats.video``.
+"""
+from __future__ import annotations
+
+import importlib.resources as pkg_resources
+import logging
+from copy import deepcopy
+
+import numpy as np
+import pandas as pd
+import yaml
+from schema import Schema
+
+from topostats.filters import Filters
+from topostats.grains import Grains
+from topostats.grainstats import GrainStats
+from topostats.logs.logs import LOGGER_NAME, reset_grain_log_throttle, without_log_file
+from topostats.processing import check_run_steps
+from topostats.statistics import image_statistics
+from topostats.tracing.dnatracing import trace_image
+from topostats.utils import create_empty_dataframe
+from topostats.validation import DEFAULT_CONFIG_SCHEMA, validate_config, validate_trace_filter
+from topostats.video import StackState
+
+LOGGER = logging.getLogger(LOGGER_NAME)
+
+PIPELINE_SECTIONS = ("filter", "grains", "grainstats", "dnatracing", "video")
+
+
+class Pipeline:
+    """Filter images, find grains and calculate their statistics in memory.
+
+    Parameters
+    ----------
+    config: dict | None
+        TopoStats configuration, as loaded by ``topostats.io.read_yaml()``. Only the 'filter', 'grains', 'grainstats',
+        'dnatracing' and 'video' sections are used, any that are missing are taken from the default configuration. If
+        None the default configuration is used.
+
+    Notes
+    -----
+    Messages are logged to the console but not to the log file that ``topostats.logs.logs.setup_logger()`` writes to the
+    working directory.
+    """
+
+    def __init__(self, config: dict | None = None):
+        """Initialise the class."""
+        default_config = yaml.safe_load(pkg_resources.open_text(__package__, "default_config.yaml").read())
+        config = {} if config is None else config
+        self.config = {section: deepcopy(config.get(section, default_config[section])) for section in PIPELINE_SECTIONS}
+        with without_log_file():
+            for section, section_config in self.config.items():
+                validate_config(
+                    section_config, schema=Schema(DEFAULT_CONFIG_SCHEMA.schema[section]), config_type=f"'{section}'"
+                )
+            validate_trace_filter(self.config["grainstats"], self.config["dnatracing"])
+            check_run_steps(
+                filter_run=self.config["filter"]["run"],
+                grains_run=self.config["grains"]["run"],
+                grainstats_run=self.config["grainstats"]["run"],
+                dnatracing_run=self.config["dnatracing"]["run"],
+            )
+        # Options passed to each stage, without the 'run' key. Stages remove keys from nested options so each call is
+        # given a copy.
+        self.options = {
+            stage: {key: value for key, value in self.config[stage].items() if key != "run"}
+            for stage in ("filter", "grains", "grainstats", "dnatracing")
+        }
+        self.stack_state = StackState(self.config["video"]["tolerance"]) if self.config["video"]["run"] else None
+
+    def reset(self) -> None:
+        """Forget the frames processed so far, the next image is flattened and thresholded afresh."""
+        if self.stack_state is not None:
+            self.stack_state = StackState(self.config["video"]["tolerance"])
+
+    def process(self, image: np.ndarray, pixel_to_nm_scaling: float, filename: str = "image") -> dict:
+        """Process a single image.
+
+        Parameters
+        ----------
+        image: np.ndarray
+            Unprocessed image.
+        pixel_to_nm_scaling: float
+            Length of a pixel in nanometres.
+        filename: str
+            Name of the image, used in log messages and the statistics.
+
+        Returns
+        -------
+        dict
+            Dictionary of the 'image_original', 'image_flattened', 'grain_masks' (labelled masks keyed by direction,
+            empty if grains are not found), 'grainstats' (grain and tracing statistics) and 'image_stats'. In video mode
+            'refitted' records whether the image was flattened and thresholded afresh.
+        """
+        with without_log_file():
+            return self._process(image, pixel_to_nm_scaling, filename)
+
+    def _process(self, image: np.ndarray, pixel_to_nm_scaling: float, filename: str) -> dict:
+        """Process a single image, see ``process()``."""
+        reset_grain_log_throttle()
+        warm = self.stack_state.update(image) if self.stack_state is not None else False
+        image_flattened = self._filter(image, pixel_to_nm_scaling, filename) if self.config["filter"]["run"] else image
+        grain_masks, grain_registries = {}, {}
+        if self.config["grains"]["run"]:
+            grain_masks, grain_registries = self._find_grains(image_flattened, pixel_to_nm_scaling, filename)
+        results_df = create_empty_dataframe()
+        if grain_masks and self.config["grainstats"]["run"]:
+            results_df = self._grainstats(image_flattened, pixel_to_nm_scaling, filename, grain_masks, grain_registries)
+            if self.config["dnatracing"]["run"]:
+                results_df = self._trace(
+                    image_flattened, pixel_to_nm_scaling, filename, grain_masks, grain_registries, results_df
+                )
+        image_stats = image_statistics(
+            image=image_flattened, filename=filename, results_df=results_df, pixel_to_nm_scaling=pixel_to_nm_scaling
+        )
+        result = {
+            "image_original": image,
+            "image_flattened": image_flattened,
+            "grain_masks": grain_masks,
+            "grainstats": results_df,
+            "image_stats": image_stats,
+        }
+        if self.stack_state is not None:
+            result["refitted"] = not warm
+        return result
+
+    def _filter(self, image: np.ndarray, pixel_to_nm_scaling: float, filename: str) -> np.ndarray:
+        """Flatten an image, reusing the mask of the previous frame in video mode if it is unchanged."""
+        filters = Filters(
+            image=image,
+            filename=filename,
+            pixel_to_nm_scaling=pixel_to_nm_scaling,
+            **deepcopy(self.options["filter"]),
+        )
+        if self.stack_state is not None and self.stack_state.warm:
+            filters.filter_image(mask=self.stack_state.filter_mask, thresholds=self.stack_state.filter_thresholds)
+        else:
+            filters.filter_image()
+        if self.stack_state is not None:
+            self.stack_state.filter_mask = filters.images["mask"]
+            self.stack_state.filter_thresholds = filters.thresholds
+        return filters.images["gaussian_filtered"]
+
+    def _find_grains(self, image: np.ndarray, pixel_to_nm_scaling: float, filename: str) -> tuple[dict, dict]:
+        """Find grains, returning labelled masks and the grain registries keyed by direction."""
+        grains = Grains(
+            image=image,
+            filename=filename,
+            pixel_to_nm_scaling=pixel_to_nm_scaling,
+            **deepcopy(self.options["grains"]),
+        )
+        warm = self.stack_state is not None and self.stack_state.warm
+        grains.find_grains(thresholds=self.stack_state.grain_thresholds if warm else None)
+        if self.stack_state is not None:
+            self.stack_state.grain_thresholds = grains.thresholds
+        grain_masks = {direction: arrays["labelled_regions_02"] for direction, arrays in grains.directions.items()}
+        return grain_masks, dict(grains.grain_registries)
+
+    def _grainstats(
+        self,
+        image: np.ndarray,
+        pixel_to_nm_scaling: float,
+        filename: str,
+        grain_masks: dict,
+        grain_registries: dict,
+    ) -> pd.DataFrame:
+        """Calculate the statistics of the grains in each direction."""
+        grainstats = []
+        # Grains below the threshold are listed first, as they are by run_grainstats()
+        for direction in sorted(grain_masks, key=lambda direction: direction != "below"):
+            if np.max(grain_masks[direction]) == 0:
+                LOGGER.warning(f"[{filename}] : No grains exist for the {direction} direction.")
+                continue
+            direction_stats, _ = GrainStats(
+                data=image,
+                labelled_data=grain_masks[direction],
+                pixel_to_nanometre_scaling=pixel_to_nm_scaling,
+                direction=direction,
+                base_output_dir=".",
+                image_name=filename,
+                grain_registry=grain_registries.get(direction),
+                **deepcopy(self.options["grainstats"]),
+            ).calculate_stats()
+            direction_stats["threshold"] = direction
+            grainstats.append(direction_stats)
+        return pd.concat(grainstats) if grainstats else create_empty_dataframe()
+
+    def _trace(
+        self,
+        image: np.ndarray,
+        pixel_to_nm_scaling: float,
+        filename: str,
+        grain_masks: dict,
+        grain_registries: dict,
+        results_df: pd.DataFrame,
+    ) -> pd.DataFrame:
+        """Trace the grains in each direction, adding the tracing statistics to the grain statistics."""
+        tracing_stats = []
+        for direction in sorted(grain_masks, key=lambda direction: direction != "below"):
+            if np.max(grain_masks[direction]) == 0:
+                continue
+            direction_stats = trace_image(
+                image=image,
+                grains_mask=grain_masks[direction],
+                filename=filename,
+                pixel_to_nm_scaling=pixel_to_nm_scaling,
+                grain_registry=grain_registries.get(direction),
+                grainstats=results_df[results_df["threshold"] == direction],
+                **deepcopy(self.options["dnatracing"]),
+            )["statistics"]
+            direction_stats["threshold"] = direction
+            tracing_stats.append(direction_stats)
+        if not tracing_stats:
+            return results_df
+        return results_df.merge(pd.concat(tracing_stats), on=["image", "threshold", "molecule_number"], how="left")
+
+
+def process_array(
+    image: np.ndarray, pixel_to_nm_scaling: float, config: dict | None = None, filename: str = "image"
+) -> dict:
+    """Process a single image held in memory without writing any files.
+
+    Creates a ``Pipeline`` for the one image, when processing many images create a pipeline once and call its
+    ``process()`` method for each.
+
+    Parameters
+    ----------
+    image: np.ndarray
+        Unprocessed image.
+    pixel_to_nm_scaling: float
+        Length of a pixel in nanometres.
+    config: dict | None
+        TopoStats configuration, None for the default configuration, see ``Pipeline``.
+    filename: str
+        Name of the image, used in log messages and the statistics.
+
+    Returns
+    -------
+    dict
+        Flattened image, grain masks and statistics, see ``Pipeline.process()``.
+    """
+    return Pipeline(config).process(image, pixel_to_nm_scaling=pixel_to_nm_scaling, filename=filename)
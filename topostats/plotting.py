@@ -309,7 +309,10 @@ def toposum(config: dict) -> Dict:
 
     # Plot each variable on its own graph
     for var in all_stats_to_sum:
-        if var in config["df"].columns:
+        # Statistics that were not calculated, e.g. not selected in grainstats.statistics, are entirely missing
+        if var in config["df"].columns and config["df"][var].isna().all():
+            LOGGER.info(f"[plotting] Statistic has no values : {var}")
+        elif var in config["df"].columns:
             topo_sum = TopoSum(stat_to_sum=var, **config)
             figures[var] = {"dist": None, "violin": None}
             figures[var]["dist"] = defaultdict()
@@ -3,6 +3,7 @@ from __future__ import annotations
 
 from collections import defaultdict
 from pathlib import Path
+from typing import TYPE_CHECKING
 
 import numpy as np
 import pandas as pd
@@ -12,12 +13,16 @@ from topostats.filters import Filters
 from topostats.grains import Grains
 from topostats.grainstats import GrainStats
 from topostats.io import get_out_path, save_array, save_topostats_file
-from topostats.logs.logs import LOGGER_NAME, setup_logger
+from topostats.logs.logs import LOGGER_NAME, reset_grain_log_throttle, setup_logger
+from topostats.metrics import stage_timer
 from topostats.plottingfuncs import Images, add_pixel_to_nm_to_plotting_config
 from topostats.statistics import image_statistics
 from topostats.tracing.dnatracing import trace_image
 from topostats.utils import create_empty_dataframe
 
+if TYPE_CHECKING:
+    from topostats.video import StackState
+
 # pylint: disable=broad-except
 # pylint: disable=line-too-long
 # pylint: disable=too-many-arguments
@@ -38,6 +43,7 @@ def run_filters(
     core_out_path: Path,
     filter_config: dict,
     plotting_config: dict,
+    stack_state: StackState | None = None,
 ) -> np.ndarray:
     """Filter and flatten an image.
 
@@ -60,6 +66,9 @@ def run_filters(
         Dictionary of configuration for the Filters class to use when initialised.
     plotting_config: dict
         Dictionary of configuration for plotting output images.
+    stack_state: StackState | None
+        State of the video the image is a frame of, if the frame is warm the mask of the previous frame is used to
+        flatten it and the mask used is recorded for the next frame.
 
     Returns
     -------
@@ -77,7 +86,13 @@ def run_filters(
             pixel_to_nm_scaling=pixel_to_nm_scaling,
             **filter_config,
         )
-        filters.filter_image()
+        if stack_state is not None and stack_state.warm:
+            filters.filter_image(mask=stack_state.filter_mask, thresholds=stack_state.filter_thresholds)
+        else:
+            filters.filter_image()
+        if stack_state is not None:
+            stack_state.filter_mask = filters.images["mask"]
+            stack_state.filter_thresholds = filters.thresholds
 
         # Optionally plot filter stage
         if plotting_config["run"]:
@@ -130,6 +145,7 @@ def run_grains(  # noqa: C901
     core_out_path: Path,
     plotting_config: dict,
     grains_config: dict,
+    stack_state: StackState | None = None,
 ):
     """Find grains within an image.
 
@@ -151,17 +167,28 @@ def run_grains(  # noqa: C901
         Dictionary of configuration for plotting images.
     grains_config:
         Dictionary of configuration for the Grains class to use when initialised.
+    stack_state: StackState | None
+        State of the video the image is a frame of, if the frame is warm the thresholds of the previous frame are used
+        to find grains and the thresholds used are recorded for the next frame.
 
     Returns
     -------
-    Union[dict, None]
-        Either None in the case of error or grain finding being disabled or a dictionary
-        with keys of "above" and or "below" containing binary masks depicting where grains
-        have been detected.
+    tuple[Union[dict, None], Union[dict, None]]
+        Either (None, None) in the case of error or grain finding being disabled or two dictionaries with keys of
+        "above" and or "below", the first containing labelled masks depicting where grains have been detected and the
+        second the GrainRegistry of those grains to be shared with later stages.
     """
     if grains_config["run"]:
         grains_config.pop("run")
 
+        # Only the stepwise segmentation keeps the image of each step, which are plotted with 'image_set: all'
+        if (
+            plotting_config["run"]
+            and plotting_config.get("image_set") == "all"
+            and grains_config.get("segmentation", "fused") == "fused"
+        ):
+            LOGGER.info(f"[{filename}] : Using the stepwise segmentation to plot the image of each step.")
+            grains_config = {**grains_config, "segmentation": "stepwise"}
         try:
             LOGGER.info(f"[{filename}] : *** Grain Finding ***")
             grains = Grains(
@@ -170,7 +197,11 @@ def run_grains(  # noqa: C901
                 pixel_to_nm_scaling=pixel_to_nm_scaling,
                 **grains_config,
             )
-            grains.find_grains()
+            grains.find_grains(
+                thresholds=stack_state.grain_thresholds if stack_state is not None and stack_state.warm else None
+            )
+            if stack_state is not None:
+                stack_state.grain_thresholds = grains.thresholds
             for direction, _ in grains.region_properties.items():
                 LOGGER.info(
                     f"[{filename}] : Grains found for direction {direction} : {len(grains.region_properties[direction])}"
@@ -213,7 +244,7 @@ def run_grains(  # noqa: C901
                     Images(
                         image,
                         filename=f"{filename}_{direction}_masked",
-                        masked_array=grains.directions[direction]["removed_small_objects"],
+                        masked_array=grains.directions[direction]["labelled_regions_02"] > 0,
                         **plotting_config["plot_dict"][plot_name],
                     ).plot_and_save()
 
@@ -227,12 +258,12 @@ def run_grains(  # noqa: C901
             for direction in grains.directions:
                 grain_masks[direction] = grains.directions[direction]["labelled_regions_02"]
 
-            return grain_masks
+            return grain_masks, dict(grains.grain_registries)
 
     # Otherwise, return None and warn grainstats is disabled
     LOGGER.info(f"[{filename}] Detection of grains disabled, returning empty data frame.")
 
-    return None
+    return None, None
 
 
 def run_grainstats(
@@ -243,6 +274,7 @@ def run_grainstats(
     grainstats_config: dict,
     plotting_config: dict,
     grain_out_path: Path,
+    grain_registries: dict = None,
 ):
     """Calculate grain statistics.
 
@@ -266,6 +298,9 @@ def run_grainstats(
         Dictionary of configuration for plotting images.
     grain_out_path:
         Directory to save optional grain statistics visual information to.
+    grain_registries: dict
+        Dictionary of GrainRegistry for the grain masks, keys "above" or "below", as returned by run_grains(). If None,
+        or a direction is missing, the region properties of the grains are calculated.
 
     Returns
     -------
@@ -302,6 +337,7 @@ def run_grainstats(
                         base_output_dir=grain_out_path,
                         image_name=filename,
                         plot_opts=grain_plot_dict,
+                        grain_registry=(grain_registries or {}).get(direction),
                         **grainstats_config,
                     ).calculate_stats()
                     grainstats_dict[direction]["threshold"] = direction
@@ -357,6 +393,7 @@ def run_dnatracing(  # noqa: C901
     dnatracing_config: dict,
     plotting_config: dict,
     results_df: pd.DataFrame = None,
+    grain_registries: dict = None,
 ):
     """Calculate DNA traces.
 
@@ -387,6 +424,9 @@ def run_dnatracing(  # noqa: C901
         Dictionary configuration for plotting images.
     results_df: pd.DataFrame
         Pandas DataFrame containing grain statistics.
+    grain_registries: dict
+        Dictionary of GrainRegistry for the grain masks, keys "above" or "below", as returned by run_grains(). If None,
+        or a direction is missing, the region properties and crops of the grains are calculated.
 
     Returns
     -------
@@ -410,6 +450,11 @@ def run_dnatracing(  # noqa: C901
                     grains_mask=grain_masks[direction],
                     filename=filename,
                     pixel_to_nm_scaling=pixel_to_nm_scaling,
+                    grain_registry=(grain_registries or {}).get(direction),
+                    # Grain statistics are only needed to select the grains to trace
+                    grainstats=results_df[results_df["threshold"] == direction]
+                    if dnatracing_config.get("trace_filter") and "threshold" in results_df.columns
+                    else None,
                     **dnatracing_config,
                 )
                 tracing_stats[direction] = tracing_results["statistics"]
@@ -523,6 +568,7 @@ def process_scan(
     dnatracing_config: dict,
     plotting_config: dict,
     output_dir: str | Path = "output",
+    stack_state: StackState | None = None,
 ) -> tuple[dict, pd.DataFrame, dict]:
     """Process a single image, filtering, finding grains and calculating their statistics.
 
@@ -545,7 +591,9 @@ def process_scan(
     output_dir : Union[str, Path]
         Directory to save output to, it will be created if it does not exist. If it already exists then it is possible
         that output will be over-written.
-
+    stack_state : StackState | None
+        State carried between the frames of a video when processing them as a sequence, see
+        ``topostats.video.process_stack()``.
 
     Returns
     -------
@@ -553,6 +601,7 @@ def process_scan(
         TopoStats dictionary object, DataFrame containing grain statistics and dna tracing statistics,
         and dictionary containing general image statistics
     """
+    reset_grain_log_throttle()
     core_out_path, filter_out_path, grain_out_path = get_out_paths(
         image_path=topostats_object["img_path"],
         base_dir=base_dir,
@@ -564,59 +613,67 @@ def process_scan(
     plotting_config = add_pixel_to_nm_to_plotting_config(plotting_config, topostats_object["pixel_to_nm_scaling"])
 
     # Flatten Image
-    image_flattened = run_filters(
-        unprocessed_image=topostats_object["image_original"],
-        pixel_to_nm_scaling=topostats_object["pixel_to_nm_scaling"],
-        filename=topostats_object["filename"],
-        filter_out_path=filter_out_path,
-        core_out_path=core_out_path,
-        filter_config=filter_config,
-        plotting_config=plotting_config,
-    )
+    with stage_timer("filter"):
+        image_flattened = run_filters(
+            unprocessed_image=topostats_object["image_original"],
+            pixel_to_nm_scaling=topostats_object["pixel_to_nm_scaling"],
+            filename=topostats_object["filename"],
+            filter_out_path=filter_out_path,
+            core_out_path=core_out_path,
+            filter_config=filter_config,
+            plotting_config=plotting_config,
+            stack_state=stack_state,
+        )
     # Use flattened image if one is returned, else use original image
     topostats_object["image_flattened"] = (
         image_flattened if image_flattened is not None else topostats_object["image_original"]
     )
 
     # Find Grains :
-    grain_masks = run_grains(
-        image=topostats_object["image_flattened"],
-        pixel_to_nm_scaling=topostats_object["pixel_to_nm_scaling"],
-        filename=topostats_object["filename"],
-        grain_out_path=grain_out_path,
-        core_out_path=core_out_path,
-        plotting_config=plotting_config,
-        grains_config=grains_config,
-    )
+    with stage_timer("grains"):
+        grain_masks, grain_registries = run_grains(
+            image=topostats_object["image_flattened"],
+            pixel_to_nm_scaling=topostats_object["pixel_to_nm_scaling"],
+            filename=topostats_object["filename"],
+            grain_out_path=grain_out_path,
+            core_out_path=core_out_path,
+            plotting_config=plotting_config,
+            grains_config=grains_config,
+            stack_state=stack_state,
+        )
     # Update grain masks if new grain masks are returned. Else keep old grain masks. Topostats object's "grain_masks"
     # defaults to an empty dictionary so this is safe.
     topostats_object["grain_masks"] = grain_masks if grain_masks is not None else topostats_object["grain_masks"]
 
     if "above" in topostats_object["grain_masks"].keys() or "below" in topostats_object["grain_masks"].keys():
         # Grainstats :
-        results_df = run_grainstats(
-            image=topostats_object["image_flattened"],
-            pixel_to_nm_scaling=topostats_object["pixel_to_nm_scaling"],
-            grain_masks=topostats_object["grain_masks"],
-            filename=topostats_object["filename"],
-            grainstats_config=grainstats_config,
-            plotting_config=plotting_config,
-            grain_out_path=grain_out_path,
-        )
+        with stage_timer("grainstats"):
+            results_df = run_grainstats(
+                image=topostats_object["image_flattened"],
+                pixel_to_nm_scaling=topostats_object["pixel_to_nm_scaling"],
+                grain_masks=topostats_object["grain_masks"],
+                filename=topostats_object["filename"],
+                grainstats_config=grainstats_config,
+                plotting_config=plotting_config,
+                grain_out_path=grain_out_path,
+                grain_registries=grain_registries,
+            )
 
         # DNAtracing
-        results_df = run_dnatracing(
-            image=topostats_object["image_flattened"],
-            pixel_to_nm_scaling=topostats_object["pixel_to_nm_scaling"],
-            grain_masks=topostats_object["grain_masks"],
-            filename=topostats_object["filename"],
-            core_out_path=core_out_path,
-            grain_out_path=grain_out_path,
-            image_path=topostats_object["img_path"],
-            plotting_config=plotting_config,
-            dnatracing_config=dnatracing_config,
-            results_df=results_df,
-        )
+        with stage_timer("dnatracing"):
+            results_df = run_dnatracing(
+                image=topostats_object["image_flattened"],
+                pixel_to_nm_scaling=topostats_object["pixel_to_nm_scaling"],
+                grain_masks=topostats_object["grain_masks"],
+                filename=topostats_object["filename"],
+                core_out_path=core_out_path,
+                grain_out_path=grain_out_path,
+                image_path=topostats_object["img_path"],
+                plotting_config=plotting_config,
+                dnatracing_config=dnatracing_config,
+                results_df=results_df,
+                grain_registries=grain_registries,
+            )
 
     else:
         results_df = create_empty_dataframe()
@@ -636,7 +693,7 @@ def process_scan(
         pixel_to_nm_scaling=topostats_object["pixel_to_nm_scaling"],
     )
 
-    # Save the topostats dictionary object to .topostats file.
+    # Save the topostats dictionary object to .topostats file, timed as the 'save' stage where it is written.
     save_topostats_file(
         output_dir=core_out_path, filename=str(topostats_object["filename"]), topostats_object=topostats_object
     )
@@ -0,0 +1,134 @@
+"""Accumulate the statistics of many images in typed columns, making a single DataFrame when they are saved.
+
+Each image processed returns small DataFrames of its grain, tracing and image statistics. Concatenating hundreds of
+thousands of them at the end of a run, or holding them until then, costs far more than the handful of rows each holds.
+``ResultsTable`` copies the columns of each DataFrame into preallocated NumPy arrays as results arrive, growing them
+geometrically, and builds one DataFrame from the arrays when the statistics are written.
+
+The types of the columns of grain and tracing statistics are taken from ``ALL_STATISTICS_COLUMNS``, other columns take
+the type of the first values added to them. As with ``pd.concat()`` rows without a value in a column are missing
+(NaN), integer columns with missing values become floating point and boolean columns become objects.
+"""
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+from topostats.utils import ALL_STATISTICS_COLUMNS
+
+# Columns of grain and tracing statistics that are not floating point numbers
+OBJECT_STATISTICS_COLUMNS = ("image", "basename", "threshold", "circular")
+STATISTICS_DTYPES = {
+    column: np.dtype(object if column in OBJECT_STATISTICS_COLUMNS else float) for column in ALL_STATISTICS_COLUMNS
+}
+STATISTICS_DTYPES["molecule_number"] = np.dtype(np.int64)
+STATISTICS_INDEX = ["image", "threshold", "molecule_number"]
+
+
+class ResultsTable:
+    """Columnar store of rows of statistics that are appended a DataFrame at a time.
+
+    Parameters
+    ----------
+    dtypes: dict | None
+        Types of columns, by name, that are known in advance e.g. ``STATISTICS_DTYPES``. Columns are only included once
+        they have been added.
+    capacity: int
+        Number of rows to allocate initially, the columns are doubled in length whenever they are full.
+    """
+
+    def __init__(self, dtypes: dict | None = None, capacity: int = 1024):
+        """Initialise the class."""
+        self.dtypes = {} if dtypes is None else dict(dtypes)
+        self.capacity = max(capacity, 1)
+        self.n_rows = 0
+        self.columns = {}
+
+    def __len__(self) -> int:
+        """Return the number of rows in the table."""
+        return self.n_rows
+
+    def append(self, df: pd.DataFrame) -> None:
+        """Append the rows of a DataFrame, including named index levels as columns.
+
+        Parameters
+        ----------
+        df: pd.DataFrame
+            Rows to append, columns missing from it are missing for these rows and columns new to the table are missing
+            for the earlier rows.
+        """
+        index_levels = {
+            name: df.index.get_level_values(level) for level, name in enumerate(df.index.names) if name is not None
+        }
+        columns = {name: (values.to_numpy(), values.dtype) for name, values in index_levels.items()}
+        # Taking all columns as one array, and their types, is much quicker than taking each column of a small DataFrame
+        values = df.to_numpy()
+        columns.update(
+            (name, (values[:, position], dtype)) for position, (name, dtype) in enumerate(zip(df.columns, df.dtypes))
+        )
+        start, stop = self.n_rows, self.n_rows + len(df)
+        if stop > self.capacity:
+            self._grow(stop)
+        for name, (values, dtype) in columns.items():
+            # Columns of empty DataFrames are untyped, they are treated as missing values
+            if name not in self.columns:
+                self._add_column(name, dtype if len(values) else np.dtype(float))
+            if len(values):
+                self._fit(name, dtype)
+                self.columns[name][start:stop] = values
+        for name in self.columns.keys() - columns.keys():
+            self._fill_missing(name, start, stop)
+        self.n_rows = stop
+
+    def to_dataframe(self, index: str | list[str] | None = None) -> pd.DataFrame:
+        """Build a DataFrame of the rows in the table.
+
+        Parameters
+        ----------
+        index: str | list[str] | None
+            Column(s) to set as the index, if present, None for a range index.
+
+        Returns
+        -------
+        pd.DataFrame
+            Rows of the table, with columns in the order they were first added.
+        """
+        df = pd.DataFrame({name: column[: self.n_rows] for name, column in self.columns.items()})
+        if index is not None:
+            index = [index] if isinstance(index, str) else list(index)
+            if all(name in df.columns for name in index):
+                df = df.set_index(index)
+        return df
+
+    def _grow(self, n_rows: int) -> None:
+        """Lengthen the columns to hold at least n_rows."""
+        while self.capacity < n_rows:
+            self.capacity *= 2
+        for name, column in self.columns.items():
+            grown = np.empty(self.capacity, dtype=column.dtype)
+            grown[: self.n_rows] = column[: self.n_rows]
+            self.columns[name] = grown
+
+    def _add_column(self, name: str, dtype: np.dtype) -> None:
+        """Add a column, of its known type or that of its first values, missing for the rows already in the table."""
+        dtype = self.dtypes.get(name, dtype if dtype.kind in "biuf" else np.dtype(object))
+        self.columns[name] = np.empty(self.capacity, dtype=dtype)
+        self._fill_missing(name, 0, self.n_rows)
+
+    def _fit(self, name: str, dtype: np.dtype) -> None:
+        """Change the type of a column, if needed, so it can hold values of another type."""
+        column = self.columns[name]
+        if column.dtype == object or np.can_cast(dtype, column.dtype, casting="same_kind"):
+            return
+        common = np.result_type(column.dtype, dtype) if dtype.kind in "biuf" else np.dtype(object)
+        self.columns[name] = column.astype(common if common.kind in "iuf" else object)
+
+    def _fill_missing(self, name: str, start: int, stop: int) -> None:
+        """Mark rows of a column as missing, changing integer columns to floats and boolean columns to objects."""
+        if start == stop:
+            return
+        if self.columns[name].dtype.kind in "iu":
+            self.columns[name] = self.columns[name].astype(float)
+        elif self.columns[name].dtype.kind == "b":
+            self.columns[name] = self.columns[name].astype(object)
+        self.columns[name][start:stop] = np.nan
@@ -2,10 +2,11 @@
 
 This provides an entry point for running TopoStats as a command line programme.
 """
+from __future__ import annotations
+
 import importlib.resources as pkg_resources
 import logging
 import sys
-from collections import defaultdict
 from functools import partial
 from multiprocessing import Pool
 from pathlib import Path
@@ -15,19 +16,38 @@ import pandas as pd
 import yaml
 from tqdm import tqdm
 
+from topostats.discovery import MANIFEST_FILENAME, FileDiscovery, parse_shard, select_shard
+from topostats.executor import (
+    FAILURES_FILENAME,
+    estimate_image_memory,
+    imap_fault_tolerant,
+    read_failures,
+    resolve_cores,
+    resolve_memory_budget,
+    write_failures,
+)
 from topostats.io import (
-    LoadScans,
-    find_files,
+    prefetch_scans,
     read_yaml,
     save_folder_grainstats,
+    with_background_writes,
     write_config_with_comments,
     write_yaml,
 )
-from topostats.logs.logs import LOGGER_NAME
+from topostats.logs.logs import LOGGER_NAME, log_queue, worker_log_initialiser
+from topostats.metrics import measure, report_metrics
 from topostats.plotting import toposum
 from topostats.processing import check_run_steps, completion_message, process_scan
+from topostats.results import STATISTICS_DTYPES, STATISTICS_INDEX, ResultsTable
 from topostats.utils import update_config, update_plotting_config
-from topostats.validation import DEFAULT_CONFIG_SCHEMA, PLOTTING_SCHEMA, SUMMARY_SCHEMA, validate_config
+from topostats.validation import (
+    DEFAULT_CONFIG_SCHEMA,
+    PLOTTING_SCHEMA,
+    SUMMARY_SCHEMA,
+    validate_config,
+    validate_trace_filter,
+)
+from topostats.video import group_frames, process_stack
 
 # We already setup the logger in __init__.py and it is idempotent so calling it here returns the same object as from
 # __init__.py
@@ -43,8 +63,41 @@ LOGGER = logging.getLogger(LOGGER_NAME)
 # pylint: disable=too-many-nested-blocks
 
 
-def run_topostats(args=None):  # noqa: C901
-    """Find and process all files."""
+SHARDS_DIRNAME = "shards"
+
+
+def get_shard_dir(output_dir: Path, shard: str) -> Path:
+    """Directory a shard saves its statistics, manifest and configuration to.
+
+    Parameters
+    ----------
+    output_dir: Path
+        Output directory shared by all shards.
+    shard: str
+        Shard, 'i/N'.
+
+    Returns
+    -------
+    Path
+        Directory of the shard, 'shards/shard_<i>_of_<N>' of the output directory.
+    """
+    index, n_shards = parse_shard(shard)
+    return Path(output_dir) / SHARDS_DIRNAME / f"shard_{index}_of_{n_shards}"
+
+
+def prepare_config(args) -> dict:
+    """Load, update and validate the configuration and the plotting dictionary.
+
+    Parameters
+    ----------
+    args: Namespace
+        Command line arguments, these over-ride values in the configuration file.
+
+    Returns
+    -------
+    dict
+        Validated configuration with the plotting dictionary loaded.
+    """
     # Parse command line options, load config (or default) and update with command line options
     if args.config_file is not None:
         config = read_yaml(args.config_file)
@@ -65,6 +118,7 @@ def run_topostats(args=None):  # noqa: C901
         LOGGER.setLevel("INFO")
     # Validate configuration
     validate_config(config, schema=DEFAULT_CONFIG_SCHEMA, config_type="YAML configuration file")
+    validate_trace_filter(config["grainstats"], config["dnatracing"])
 
     # Write sample configuration if asked to do so and exit
     if args.create_config_file and args.config_file:
@@ -92,16 +146,160 @@ def run_topostats(args=None):  # noqa: C901
     )
     # Update the config["plotting"]["plot_dict"] with plotting options
     config["plotting"] = update_plotting_config(config["plotting"])
+    return config
+
+
+def summarise_results(results: pd.DataFrame, config: dict, summary_config_file: str | None = None) -> dict | None:
+    """Make summary plots and statistics of the results, if enabled in the configuration.
+
+    Parameters
+    ----------
+    results: pd.DataFrame
+        Grain and tracing statistics of all images.
+    config: dict
+        TopoStats configuration.
+    summary_config_file: str | None
+        Path to a YAML configuration file for summary plots, if None that in the configuration, or the default, is
+        used.
+
+    Returns
+    -------
+    dict | None
+        Configuration of the summary plots, None if they are disabled.
+    """
+    if not config["summary_stats"]["run"]:
+        return None
+    # Load summary plots/statistics configuration and validate, location depends on command line args or value in
+    # any config file given, if neither are provided the default topostats/summary_config.yaml is loaded
+    if summary_config_file is None:
+        summary_config_file = config["summary_stats"]["config"]
+    if summary_config_file is not None:
+        summary_config = read_yaml(summary_config_file)
+    else:
+        summary_yaml = pkg_resources.open_text(__package__, "summary_config.yaml")
+        summary_config = yaml.safe_load(summary_yaml.read())
+
+    # Do not pass command line arguments to toposum as they clash with process command line arguments
+    summary_config = update_config(summary_config, {})
+
+    validate_config(summary_config, SUMMARY_SCHEMA, config_type="YAML summarisation config")
+    # We never want to load data from CSV as we are using the data that has just been processed.
+    summary_config.pop("csv_file")
+
+    # Load variable to label mapping
+    plotting_yaml = pkg_resources.open_text(__package__, "var_to_label.yaml")
+    summary_config["var_to_label"] = yaml.safe_load(plotting_yaml.read())
+    LOGGER.info("[plotting] Default variable to labels mapping loaded.")
+
+    # If we don't have a dataframe or we do and it is all NaN there is nothing to plot
+    if isinstance(results, pd.DataFrame) and not results.isna().values.all():
+        if results.shape[0] > 1:
+            # If summary_config["output_dir"] does not match or is not a sub-dir of config["output_dir"] it
+            # needs creating
+            summary_config["output_dir"] = config["output_dir"] / "summary_distributions"
+            summary_config["output_dir"].mkdir(parents=True, exist_ok=True)
+            LOGGER.info(f"Summary plots and statistics will be saved to : {summary_config['output_dir']}")
+
+            # Plot summaries
+            summary_config["df"] = results.reset_index()
+            toposum(summary_config)
+        else:
+            LOGGER.warning(
+                "There are fewer than two grains that have been detected, so"
+                " summary plots cannot be made for this image."
+            )
+    else:
+        LOGGER.warning(
+            "There are no results to plot, either...\n\n"
+            "* you have disabled grains/grainstats/dnatracing.\n"
+            "* no grains have been detected across all scans.\n"
+            "* there have been errors.\n\n"
+            "If you are not expecting to detect grains please consider disabling"
+            "grains/grainstats/dnatracing/plotting/summary_stats. If you are expecting to detect grains"
+            " please check log-files for further information."
+        )
+    return summary_config
+
+
+def save_statistics(
+    results: pd.DataFrame, config: dict, stats_dir: Path | None = None, folder_statistics: bool = True
+) -> int:
+    """Write the grain and tracing statistics of all images to CSV, along with those of each folder.
+
+    Parameters
+    ----------
+    results: pd.DataFrame
+        Grain and tracing statistics of all images.
+    config: dict
+        TopoStats configuration.
+    stats_dir: Path | None
+        Directory to save 'all_statistics.csv' to, the output directory if None.
+    folder_statistics: bool
+        Whether to save the statistics of each folder to the output directory.
+
+    Returns
+    -------
+    int
+        Number of images with statistics.
+    """
+    stats_dir = config["output_dir"] if stats_dir is None else stats_dir
+    # Write statistics to CSV if there is data.
+    if isinstance(results, pd.DataFrame) and not results.isna().values.all():
+        results.reset_index(inplace=True)
+        results.set_index(["image", "threshold", "molecule_number"], inplace=True)
+        results.to_csv(stats_dir / "all_statistics.csv", index=True)
+        if folder_statistics:
+            save_folder_grainstats(config["output_dir"], config["base_dir"], results)
+        results.reset_index(inplace=True)  # So we can access unique image names
+        images_processed = len(results["image"].unique())
+    else:
+        images_processed = 0
+        LOGGER.warning("There are no grainstats or dnatracing statistics to write to CSV.")
+    return images_processed
+
+
+def run_topostats(args=None):  # noqa: C901
+    """Find and process all files."""
+    config = prepare_config(args)
 
     LOGGER.info(f"Configuration file loaded from      : {args.config_file}")
     LOGGER.info(f"Scanning for images in              : {config['base_dir']}")
     LOGGER.info(f"Output directory                    : {str(config['output_dir'])}")
     LOGGER.info(f"Looking for images with extension   : {config['file_ext']}")
-    img_files = find_files(config["base_dir"], file_ext=config["file_ext"])
+    # Shards save their statistics, manifest and configuration to their own directory, see topostats.merge
+    stats_dir = config["output_dir"]
+    if config["shard"] is not None:
+        stats_dir = get_shard_dir(config["output_dir"], config["shard"])
+        stats_dir.mkdir(parents=True, exist_ok=True)
+    discovery = FileDiscovery(
+        config["base_dir"],
+        file_ext=config["file_ext"],
+        include=config["discovery"]["include"],
+        exclude=config["discovery"]["exclude"],
+        manifest_file=stats_dir / MANIFEST_FILENAME if config["discovery"]["manifest"] else None,
+        workers=config["discovery"]["workers"],
+    )
+    img_files = discovery.discover()
     LOGGER.info(f"Images with extension {config['file_ext']} in {config['base_dir']} : {len(img_files)}")
+    if config["discovery"]["only_new"]:
+        img_files = discovery.get_new_files()
+        LOGGER.info(f"Images that are new since the manifest was saved : {len(img_files)}")
+    if config["discovery"]["only_failed"] is not None:
+        failed_files = read_failures(config["discovery"]["only_failed"])
+        img_files = [img_file for img_file in img_files if img_file in failed_files]
+        LOGGER.info(f"Images in {config['discovery']['only_failed']} : {len(img_files)}")
+    if config["shard"] is not None:
+        img_files = select_shard(img_files, config["base_dir"], config["shard"])
+        LOGGER.info(f"Images in shard {config['shard']} : {len(img_files)}")
     if len(img_files) == 0:
-        LOGGER.error(f"No images with extension {config['file_ext']} in {config['base_dir']}")
-        LOGGER.error("Please check your configuration and directories.")
+        if config["shard"] is not None:
+            # There can be more shards than images, a shard without any is complete so it does not hold up merging
+            LOGGER.warning(f"No images in shard {config['shard']}, writing empty statistics.")
+            pd.DataFrame(index=pd.Index([], name="image")).to_csv(stats_dir / "image_stats.csv")
+            discovery.save_manifest()
+        else:
+            LOGGER.error(f"No images with extension {config['file_ext']} in {config['base_dir']}")
+            LOGGER.error("Please check your configuration and directories.")
         sys.exit()
     LOGGER.info(f'Thresholding method (Filtering)     : {config["filter"]["threshold_method"]}')
     LOGGER.info(f'Thresholding method (Grains)        : {config["grains"]["threshold_method"]}')
@@ -118,112 +316,140 @@ def run_topostats(args=None):  # noqa: C901
         output_dir=config["output_dir"],
     )
 
-    all_scan_data = LoadScans(img_files, **config["loading"])
-    all_scan_data.get_data()
-    # Get a dictionary of all the image data dictionaries.
-    # Keys are the image names
-    # Values are the individual image data dictionaries
-    scan_data_dict = all_scan_data.img_dict
+    # In video mode the frames of each file are processed in order by a single process, see topostats.video
+    if config["video"]["run"]:
+        processing_function = partial(
+            process_stack,
+            base_dir=config["base_dir"],
+            filter_config=config["filter"],
+            grains_config=config["grains"],
+            grainstats_config=config["grainstats"],
+            dnatracing_config=config["dnatracing"],
+            plotting_config=config["plotting"],
+            output_dir=config["output_dir"],
+            tolerance=config["video"]["tolerance"],
+        )
+    io_threads = config["executor"]["io_threads"]
+    if io_threads > 0:
+        processing_function = partial(with_background_writes, processing_function, threads=io_threads)
+    cores = resolve_cores(config["cores"])
+    memory_budget = resolve_memory_budget(config["memory_budget"])
+    LOGGER.info(f"Processing images using {cores} processes.")
+
+    # Scans are loaded a file at a time, ahead of the images being processed, on io_threads threads, and jobs are made
+    # as workers become free so only the images waiting to be processed are held in memory. The name and file of each
+    # job are recorded as it is made to report failures.
+    failures = []
+    job_names = []
+    job_sources = []
+
+    def prepare_jobs(metrics, pbar):
+        """Load each scan, yielding its images (or videos in video mode) and recording files that are skipped."""
+        for scan in prefetch_scans(img_files, **config["loading"], threads=io_threads):
+            for image, reason in scan.skipped.items():
+                failures.append(
+                    {
+                        "img_path": scan.source_files[image],
+                        "image": image,
+                        "status": "skipped",
+                        "attempts": 0,
+                        "error": reason,
+                    }
+                )
+                if metrics is not None:
+                    metrics.observe_failure("skipped")
+            scan_jobs = group_frames(scan.img_dict) if config["video"]["run"] else list(scan.img_dict.values())
+            for job in scan_jobs:
+                # Frames of a video are processed together so fail together
+                job_names.append((job[0] if config["video"]["run"] else job)["filename"])
+                job_sources.append(scan.img_paths[0])
+                if metrics is not None:
+                    metrics.observe_queued()
+                # Files may hold any number of images, so the progress bar counts jobs as they are made
+                pbar.total += 1
+                pbar.refresh()
+                yield job
+
+    def estimate_memory(job) -> int:
+        """Estimate the peak memory of a job from the dimensions of its image(s) and the stages that are enabled."""
+        frames = job if config["video"]["run"] else [job]
+        return max(estimate_image_memory(frame["image_original"].shape, config) for frame in frames)
 
-    with Pool(processes=config["cores"]) as pool:
-        results = defaultdict()
-        image_stats_all = defaultdict()
+    # Images that fail or time out are retried and then recorded in the failures manifest rather than ending the run.
+    # Workers send their log records to a single listener in this process rather than writing to the streams directly.
+    # Metrics, if enabled, are served and/or written to a file while processing, see topostats.metrics.
+    with log_queue() as queue, report_metrics(config["metrics"], total_jobs=0, output_dir=stats_dir) as metrics:
+        pool_factory = partial(
+            Pool,
+            processes=cores,
+            initializer=worker_log_initialiser,
+            initargs=(queue, LOGGER.level),
+            maxtasksperchild=config["executor"]["max_tasks_per_child"],
+        )
+        if metrics is not None:
+            processing_function = partial(measure, processing_function)
+        # Statistics are accumulated in columns as each image completes and made into DataFrames once all are done
+        results = ResultsTable(dtypes=STATISTICS_DTYPES)
+        image_stats_all = ResultsTable()
         with tqdm(
-            total=len(img_files),
+            total=0,
             desc=f"Processing images from {config['base_dir']}, results are under {config['output_dir']}",
         ) as pbar:
-            for img, result, individual_image_stats_df in pool.imap_unordered(
+            for index, outcome, failure in imap_fault_tolerant(
+                pool_factory,
                 processing_function,
-                scan_data_dict.values(),
+                prepare_jobs(metrics, pbar),
+                estimates=estimate_memory,
+                memory_budget=memory_budget,
+                processes=cores,
+                timeout=config["executor"]["timeout"],
+                retries=config["executor"]["retries"],
             ):
-                results[str(img)] = result
                 pbar.update()
-
-                # Add the dataframe to the results dict
-                image_stats_all[str(img)] = individual_image_stats_df
+                if failure is not None:
+                    LOGGER.error(f"[{job_names[index]}] Processing {failure['status']} : {failure['error']}")
+                    failures.append({"img_path": job_sources[index], "image": job_names[index], **failure})
+                    if metrics is not None:
+                        metrics.observe_failure(failure["status"])
+                    continue
+                if metrics is not None:
+                    outcome, measurement = outcome
+                img, result, individual_image_stats_df = outcome
+                results.append(result)
+                image_stats_all.append(individual_image_stats_df)
+                if metrics is not None:
+                    metrics.observe_job(
+                        images=len(individual_image_stats_df), grains=len(result), measurement=measurement
+                    )
 
                 # Display completion message for the image
                 LOGGER.info(f"[{img.name}] Processing completed.")
 
-    LOGGER.info(f"Saving image stats to : {config['output_dir']}/image_stats.csv.")
-    # Concatenate all the dictionary's values into a dataframe. Ignore the keys since
-    # the dataframes have the file names in them already.
-    image_stats_all_df = pd.concat(image_stats_all.values())
-    image_stats_all_df.to_csv(config["output_dir"] / "image_stats.csv")
+    write_failures(failures, stats_dir / FAILURES_FILENAME)
+    if len(image_stats_all) == 0:
+        LOGGER.error(f"No images were processed successfully, see : {stats_dir / FAILURES_FILENAME}")
+        sys.exit(1)
+    LOGGER.info(f"Saving image stats to : {stats_dir}/image_stats.csv.")
+    image_stats_all.to_dataframe(index="image").to_csv(stats_dir / "image_stats.csv")
 
-    try:
-        results = pd.concat(results.values())
-    except ValueError as error:
+    results = results.to_dataframe(index=STATISTICS_INDEX)
+    if len(results) == 0:
         LOGGER.error("No grains found in any images, consider adjusting your thresholds.")
-        LOGGER.error(error)
-
-    # Summary Statistics and Plots
-    if config["summary_stats"]["run"]:
-        # Load summary plots/statistics configuration and validate, location depends on command line args or value in
-        # any config file given, if neither are provided the default topostats/summary_config.yaml is loaded
-        if args.summary_config is not None:
-            summary_config = read_yaml(args.summary_config)
-        elif config["summary_stats"]["config"] is not None:
-            summary_config = read_yaml(config["summary_stats"]["config"])
-        else:
-            summary_yaml = pkg_resources.open_text(__package__, "summary_config.yaml")
-            summary_config = yaml.safe_load(summary_yaml.read())
-
-        # Do not pass command line arguments to toposum as they clash with process command line arguments
-        summary_config = update_config(summary_config, {})
-
-        validate_config(summary_config, SUMMARY_SCHEMA, config_type="YAML summarisation config")
-        # We never want to load data from CSV as we are using the data that has just been processed.
-        summary_config.pop("csv_file")
-
-        # Load variable to label mapping
-        plotting_yaml = pkg_resources.open_text(__package__, "var_to_label.yaml")
-        summary_config["var_to_label"] = yaml.safe_load(plotting_yaml.read())
-        LOGGER.info("[plotting] Default variable to labels mapping loaded.")
-
-        # If we don't have a dataframe or we do and it is all NaN there is nothing to plot
-        if isinstance(results, pd.DataFrame) and not results.isna().values.all():
-            if results.shape[0] > 1:
-                # If summary_config["output_dir"] does not match or is not a sub-dir of config["output_dir"] it
-                # needs creating
-                summary_config["output_dir"] = config["output_dir"] / "summary_distributions"
-                summary_config["output_dir"].mkdir(parents=True, exist_ok=True)
-                LOGGER.info(f"Summary plots and statistics will be saved to : {summary_config['output_dir']}")
-
-                # Plot summaries
-                summary_config["df"] = results.reset_index()
-                toposum(summary_config)
-            else:
-                LOGGER.warning(
-                    "There are fewer than two grains that have been detected, so"
-                    " summary plots cannot be made for this image."
-                )
-        else:
-            LOGGER.warning(
-                "There are no results to plot, either...\n\n"
-                "* you have disabled grains/grainstats/dnatracing.\n"
-                "* no grains have been detected across all scans.\n"
-                "* there have been errors.\n\n"
-                "If you are not expecting to detect grains please consider disabling"
-                "grains/grainstats/dnatracing/plotting/summary_stats. If you are expecting to detect grains"
-                " please check log-files for further information."
-            )
-    else:
-        summary_config = None
 
-    # Write statistics to CSV if there is data.
-    if isinstance(results, pd.DataFrame) and not results.isna().values.all():
-        results.reset_index(inplace=True)
-        results.set_index(["image", "threshold", "molecule_number"], inplace=True)
-        results.to_csv(config["output_dir"] / "all_statistics.csv", index=True)
-        save_folder_grainstats(config["output_dir"], config["base_dir"], results)
-        results.reset_index(inplace=True)  # So we can access unique image names
-        images_processed = len(results["image"].unique())
+    if config["shard"] is None:
+        summary_config = summarise_results(results, config, summary_config_file=args.summary_config)
+        images_processed = save_statistics(results, config)
     else:
-        images_processed = 0
-        LOGGER.warning("There are no grainstats or dnatracing statistics to write to CSV.")
+        summary_config = None
+        images_processed = save_statistics(results, config, stats_dir=stats_dir, folder_statistics=False)
+        LOGGER.info(
+            f"Shard {config['shard']} complete, once all shards are complete run 'topostats merge' with the same"
+            " output directory to combine their statistics and make summary plots."
+        )
+    # Record the images found so that the next search can reuse it
+    discovery.save_manifest()
     # Write config to file
     config["plotting"].pop("plot_dict")
-    write_yaml(config, output_dir=config["output_dir"])
+    write_yaml(config, output_dir=stats_dir)
     LOGGER.debug(f"Images processed : {images_processed}")
     completion_message(config, img_files, summary_config, images_processed)
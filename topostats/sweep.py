@@ -0,0 +1,343 @@
+"""Process images with a grid of configurations, sharing the stages that the configurations have in common.
+
+The grid, the ``sweep`` section of the configuration, maps options of the 'filter', 'grains', 'grainstats' and
+'dnatracing' stages, given as dotted keys (e.g. ``grains.threshold_std_dev.above``), to lists of values. Every
+combination of values is a sweep point. Each image is loaded once and the stages are run in order for each point, but a
+stage is only run if it has not already been run with the same configuration of it and all the stages before it. A
+threshold sweep therefore flattens each image once and a tracing sweep also finds grains once. Statistics are tagged
+with the ``sweep_point`` they are from.
+"""
+from __future__ import annotations
+
+import itertools
+import json
+import logging
+import sys
+from copy import deepcopy
+from functools import partial
+from multiprocessing import Pool
+from pathlib import Path
+
+import pandas as pd
+from schema import Schema
+
+from topostats.discovery import FileDiscovery
+from topostats.executor import (
+    FAILURES_FILENAME,
+    estimate_image_memory,
+    imap_fault_tolerant,
+    resolve_cores,
+    resolve_memory_budget,
+    write_failures,
+)
+from topostats.io import prefetch_scans
+from topostats.logs.logs import LOGGER_NAME, log_queue, reset_grain_log_throttle, worker_log_initialiser
+from topostats.plottingfuncs import add_pixel_to_nm_to_plotting_config
+from topostats.processing import get_out_paths, run_dnatracing, run_filters, run_grains, run_grainstats
+from topostats.statistics import image_statistics
+from topostats.utils import create_empty_dataframe
+from topostats.validation import DEFAULT_CONFIG_SCHEMA, validate_config, validate_trace_filter
+
+LOGGER = logging.getLogger(LOGGER_NAME)
+
+SWEEP_STAGES = ("filter", "grains", "grainstats", "dnatracing")
+
+# pylint: disable=too-many-arguments
+# pylint: disable=too-many-locals
+
+
+def expand_grid(config: dict, grid: dict) -> list[dict]:
+    """Expand a grid of options into the overrides of each sweep point.
+
+    Parameters
+    ----------
+    config: dict
+        TopoStats configuration, options in the grid must already be present in it.
+    grid: dict
+        Dictionary of dotted keys, e.g. 'grains.threshold_std_dev.above', to lists of values.
+
+    Returns
+    -------
+    list[dict]
+        Dictionaries of dotted keys to values, one for each combination of values.
+
+    Raises
+    ------
+    ValueError
+        If an option is not of a stage that can be swept or is not in the configuration.
+    """
+    for dotted_key in grid:
+        stage, *keys = dotted_key.split(".")
+        if stage not in SWEEP_STAGES or not keys:
+            raise ValueError(
+                f"Cannot sweep '{dotted_key}', only options of the {', '.join(SWEEP_STAGES)} stages can be swept."
+            )
+        section = config[stage]
+        for key in keys:
+            if not isinstance(section, dict) or key not in section:
+                raise ValueError(f"Cannot sweep '{dotted_key}', it is not an option in the configuration.")
+            section = section[key]
+    return [dict(zip(grid.keys(), values)) for values in itertools.product(*grid.values())]
+
+
+def apply_overrides(config: dict, overrides: dict) -> dict:
+    """Copy the configuration of each stage with the overrides of a sweep point applied.
+
+    Parameters
+    ----------
+    config: dict
+        TopoStats configuration.
+    overrides: dict
+        Dictionary of dotted keys to values.
+
+    Returns
+    -------
+    dict
+        Dictionary of the configuration of each stage in SWEEP_STAGES.
+    """
+    stage_configs = {stage: deepcopy(config[stage]) for stage in SWEEP_STAGES}
+    for dotted_key, value in overrides.items():
+        stage, *keys = dotted_key.split(".")
+        section = stage_configs[stage]
+        for key in keys[:-1]:
+            section = section[key]
+        section[keys[-1]] = value
+    for stage, stage_config in stage_configs.items():
+        validate_config(
+            stage_config, schema=Schema(DEFAULT_CONFIG_SCHEMA.schema[stage]), config_type=f"sweep '{stage}'"
+        )
+    validate_trace_filter(stage_configs["grainstats"], stage_configs["dnatracing"])
+    return stage_configs
+
+
+def _stage_key(stage_config: dict) -> str:
+    """Key identifying the configuration of a stage."""
+    return json.dumps(stage_config, sort_keys=True, default=str)
+
+
+def sweep_scan(
+    topostats_object: dict,
+    sweep_points: list[dict],
+    base_dir: str | Path,
+    plotting_config: dict,
+    output_dir: str | Path = "output",
+) -> tuple[Path, pd.DataFrame, pd.DataFrame]:
+    """Process a single image with the configuration of each sweep point, running each distinct stage once.
+
+    Outputs of a stage are saved under 'point_<n>' of the output directory, where n is the first sweep point that ran
+    it.
+
+    Parameters
+    ----------
+    topostats_object: dict
+        Image data dictionary, as produced by ``LoadScans.get_data()``.
+    sweep_points: list[dict]
+        Configuration of each stage for each sweep point, see ``apply_overrides()``.
+    base_dir: str | Path
+        Directory images were found in.
+    plotting_config: dict
+        Dictionary of configuration options for plotting figures.
+    output_dir: str | Path
+        Directory to save output to.
+
+    Returns
+    -------
+    tuple[Path, pd.DataFrame, pd.DataFrame]
+        Path of the image, grain and tracing statistics and image statistics of every sweep point with the
+        'sweep_point' they are from.
+    """
+    reset_grain_log_throttle()
+    filename = topostats_object["filename"]
+    pixel_to_nm_scaling = topostats_object["pixel_to_nm_scaling"]
+    plotting_config = add_pixel_to_nm_to_plotting_config(plotting_config, pixel_to_nm_scaling)
+    flattened = {}
+    grains = {}
+    grainstats = {}
+    statistics = {}
+    all_results = []
+    all_image_stats = []
+    for sweep_point, stage_configs in enumerate(sweep_points):
+        keys = tuple(_stage_key(stage_configs[stage]) for stage in SWEEP_STAGES)
+        core_out_path, filter_out_path, grain_out_path = get_out_paths(
+            image_path=topostats_object["img_path"],
+            base_dir=base_dir,
+            output_dir=Path(output_dir) / f"point_{sweep_point}",
+            filename=filename,
+            plotting_config=plotting_config,
+        )
+        if keys[:1] not in flattened:
+            image_flattened = run_filters(
+                unprocessed_image=topostats_object["image_original"],
+                pixel_to_nm_scaling=pixel_to_nm_scaling,
+                filename=filename,
+                filter_out_path=filter_out_path,
+                core_out_path=core_out_path,
+                filter_config=deepcopy(stage_configs["filter"]),
+                plotting_config=deepcopy(plotting_config),
+            )
+            flattened[keys[:1]] = image_flattened if image_flattened is not None else topostats_object["image_original"]
+        image = flattened[keys[:1]]
+        if keys[:2] not in grains:
+            grains[keys[:2]] = run_grains(
+                image=image,
+                pixel_to_nm_scaling=pixel_to_nm_scaling,
+                filename=filename,
+                grain_out_path=grain_out_path,
+                core_out_path=core_out_path,
+                plotting_config=deepcopy(plotting_config),
+                grains_config=deepcopy(stage_configs["grains"]),
+            )
+        grain_masks, grain_registries = grains[keys[:2]]
+        grain_masks = grain_masks if grain_masks is not None else {}
+        if keys not in statistics:
+            if "above" in grain_masks or "below" in grain_masks:
+                if keys[:3] not in grainstats:
+                    grainstats[keys[:3]] = run_grainstats(
+                        image=image,
+                        pixel_to_nm_scaling=pixel_to_nm_scaling,
+                        grain_masks=grain_masks,
+                        filename=filename,
+                        grainstats_config=deepcopy(stage_configs["grainstats"]),
+                        plotting_config=deepcopy(plotting_config),
+                        grain_out_path=grain_out_path,
+                        grain_registries=grain_registries,
+                    )
+                results_df = run_dnatracing(
+                    image=image,
+                    pixel_to_nm_scaling=pixel_to_nm_scaling,
+                    grain_masks=grain_masks,
+                    filename=filename,
+                    core_out_path=core_out_path,
+                    grain_out_path=grain_out_path,
+                    image_path=topostats_object["img_path"],
+                    plotting_config=deepcopy(plotting_config),
+                    dnatracing_config=deepcopy(stage_configs["dnatracing"]),
+                    results_df=grainstats[keys[:3]].copy(),
+                    grain_registries=grain_registries,
+                )
+            else:
+                results_df = create_empty_dataframe()
+            image_stats = image_statistics(
+                image=image,
+                filename=filename,
+                results_df=results_df,
+                pixel_to_nm_scaling=pixel_to_nm_scaling,
+            )
+            statistics[keys] = (results_df, image_stats)
+        results_df, image_stats = statistics[keys]
+        all_results.append(results_df.assign(sweep_point=sweep_point))
+        all_image_stats.append(image_stats.assign(sweep_point=sweep_point))
+    LOGGER.info(
+        f"[{filename}] : {len(sweep_points)} sweep points processed with {len(flattened)} filter, {len(grains)} grain "
+        f"finding, {len(grainstats)} grainstats and {len(statistics)} tracing runs."
+    )
+    return topostats_object["img_path"], pd.concat(all_results), pd.concat(all_image_stats)
+
+
+def run_sweep(args=None) -> None:
+    """Find images and process them with every point of the sweep in the configuration.
+
+    Statistics of all images and sweep points are saved to 'sweep_statistics.csv' and 'sweep_image_stats.csv' and the
+    options of each sweep point to 'sweep_points.csv' in the output directory. Images that could not be loaded or
+    processed are recorded in 'failures.csv'.
+
+    Parameters
+    ----------
+    args: Namespace
+        Command line arguments.
+    """
+    # pylint: disable=import-outside-toplevel
+    from topostats.run_topostats import prepare_config
+
+    config = prepare_config(args)
+    if not config["sweep"]:
+        LOGGER.error("No options to sweep, please add them to the 'sweep' section of your configuration file.")
+        sys.exit()
+    overrides = expand_grid(config, config["sweep"])
+    sweep_points = [apply_overrides(config, point_overrides) for point_overrides in overrides]
+    LOGGER.info(f"Sweeping {len(sweep_points)} points of : {', '.join(config['sweep'])}")
+    img_files = FileDiscovery(
+        base_dir=config["base_dir"],
+        file_ext=config["file_ext"],
+        include=config["discovery"]["include"],
+        exclude=config["discovery"]["exclude"],
+        workers=config["discovery"]["workers"],
+    ).discover()
+    if len(img_files) == 0:
+        LOGGER.error(f"No images with extension {config['file_ext']} in {config['base_dir']}")
+        sys.exit()
+
+    memory_budget = resolve_memory_budget(config["memory_budget"])
+    cores = resolve_cores(config["cores"])
+    processing_function = partial(
+        sweep_scan,
+        sweep_points=sweep_points,
+        base_dir=config["base_dir"],
+        plotting_config=config["plotting"],
+        output_dir=config["output_dir"],
+    )
+    # As when processing, scans are loaded ahead of the images being processed and images that fail are retried and
+    # then recorded in the failures manifest rather than ending the sweep
+    failures = []
+    job_names = []
+    job_sources = []
+
+    def prepare_jobs():
+        """Load each scan, yielding its images and recording files that are skipped."""
+        for scan in prefetch_scans(img_files, **config["loading"], threads=config["executor"]["io_threads"]):
+            for image, reason in scan.skipped.items():
+                failures.append(
+                    {
+                        "img_path": scan.source_files[image],
+                        "image": image,
+                        "status": "skipped",
+                        "attempts": 0,
+                        "error": reason,
+                    }
+                )
+            for topostats_object in scan.img_dict.values():
+                job_names.append(topostats_object["filename"])
+                job_sources.append(topostats_object["source_file"])
+                yield topostats_object
+
+    results = []
+    image_stats = []
+    with log_queue() as queue:
+        pool_factory = partial(
+            Pool,
+            processes=cores,
+            initializer=worker_log_initialiser,
+            initargs=(queue, LOGGER.level),
+            maxtasksperchild=config["executor"]["max_tasks_per_child"],
+        )
+        for index, outcome, failure in imap_fault_tolerant(
+            pool_factory,
+            processing_function,
+            prepare_jobs(),
+            estimates=lambda job: estimate_image_memory(job["image_original"].shape, config),
+            memory_budget=memory_budget,
+            processes=cores,
+            timeout=config["executor"]["timeout"],
+            retries=config["executor"]["retries"],
+        ):
+            if failure is not None:
+                LOGGER.error(f"[{job_names[index]}] Processing {failure['status']} : {failure['error']}")
+                failures.append({"img_path": job_sources[index], "image": job_names[index], **failure})
+                continue
+            img, result, individual_image_stats_df = outcome
+            results.append(result)
+            image_stats.append(individual_image_stats_df)
+            LOGGER.info(f"[{img.name}] Processing completed.")
+
+    write_failures(failures, config["output_dir"] / FAILURES_FILENAME)
+    if not image_stats:
+        LOGGER.error(f"No images were processed successfully, see : {config['output_dir'] / FAILURES_FILENAME}")
+        sys.exit(1)
+    pd.DataFrame(overrides).rename_axis("sweep_point").to_csv(config["output_dir"] / "sweep_points.csv")
+    pd.concat(image_stats).to_csv(config["output_dir"] / "sweep_image_stats.csv")
+    results = pd.concat(results)
+    results.to_csv(config["output_dir"] / "sweep_statistics.csv")
+    LOGGER.info(
+        f"Statistics of {len(image_stats)} images for {len(sweep_points)} sweep points saved to : "
+        f"{config['output_dir']}"
+    )
@@ -121,3 +121,10 @@ class Colormap:
     def blu():
         """Set RGBA colour map of just the colour blue."""
         return ListedColormap([[32 / 256, 226 / 256, 205 / 256]], "blu", N=256)
+
+
+# Register the custom colormaps with matplotlib so they can be referred to by name. This is done when the theme is first
+# used rather than on importing topostats so that matplotlib is only loaded when plotting.
+for _name in ("nanoscope", "gwyddion"):
+    if _name not in mpl.colormaps:
+        mpl.colormaps.register(cmap=Colormap(_name).get_cmap())
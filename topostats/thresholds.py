@@ -1,9 +1,22 @@
-"""Functions for calculating thresholds."""
+"""Functions for calculating thresholds.
+
+Thresholds are calculated by a ``ThresholdEngine`` which computes the histogram, mean and standard deviation of an image
+once and shares them between the thresholds it is asked for, caching each threshold it returns. An engine is created for
+each call of ``topostats.utils.get_thresholds()``, so the above and below thresholds of an image share them but nothing
+is shared between calls, e.g. between Filters and Grains which threshold different images.
+Very large images can be subsampled, thresholds are then calculated from a fixed random sample of ``max_pixels`` pixels.
+By the Dvoretzky-Kiefer-Wolfowitz inequality the cumulative histogram of a sample of n pixels differs from that of the
+image by more than e with probability at most 2exp(-2ne^2), for one million pixels this is less than 1 in 10^5 for
+e = 0.0025, and the error of the mean is of the order of the standard deviation / sqrt(n).
+"""
 # pylint: disable=no-name-in-module
+from __future__ import annotations
+
 import logging
 from collections.abc import Callable
 
 import numpy as np
+from skimage.exposure import histogram
 from skimage.filters import threshold_mean, threshold_minimum, threshold_otsu, threshold_triangle, threshold_yen
 
 from topostats.logs.logs import LOGGER_NAME
@@ -14,11 +27,129 @@ LOGGER = logging.getLogger(LOGGER_NAME)
 # pylint: disable=unused-argument
 
 
+SUBSAMPLE_SEED = 4761
+
+
+class ThresholdEngine:
+    """Calculate thresholds of an image, sharing its histogram and moments between methods.
+
+    Parameters
+    ----------
+    image : np.ndarray
+        Image to threshold.
+    max_pixels : int | None
+        Maximum number of pixels thresholds are calculated from, larger images are subsampled. If None all pixels are
+        used and thresholds are identical to those of the skimage methods.
+    """
+
+    def __init__(self, image: np.ndarray, max_pixels: int | None = None):
+        """Initialise the class."""
+        self.image = np.asarray(image)
+        self.max_pixels = max_pixels
+        self._sample = None
+        self._histograms = {}
+        self._statistics = {}
+        self._thresholds = {}
+
+    @property
+    def sample(self) -> np.ndarray:
+        """Pixels thresholds are calculated from, all pixels unless the image is larger than max_pixels.
+
+        Returns
+        -------
+        np.ndarray
+            1D array of pixels.
+        """
+        if self._sample is None:
+            pixels = self.image.reshape(-1)
+            if self.max_pixels is not None and pixels.size > self.max_pixels:
+                rng = np.random.default_rng(SUBSAMPLE_SEED)
+                pixels = pixels[np.sort(rng.integers(0, pixels.size, int(self.max_pixels)))]
+                LOGGER.debug(f"Thresholds calculated from {pixels.size} of {self.image.size} pixels.")
+            self._sample = pixels
+        return self._sample
+
+    def get_histogram(self, nbins: int = 256) -> tuple[np.ndarray, np.ndarray]:
+        """Histogram of the pixels spanning their range, calculated once for each number of bins.
+
+        Parameters
+        ----------
+        nbins : int
+            Number of bins.
+
+        Returns
+        -------
+        tuple[np.ndarray, np.ndarray]
+            Counts and bin centres, as returned by ``skimage.exposure.histogram()``.
+        """
+        if nbins not in self._histograms:
+            self._histograms[nbins] = histogram(self.sample, nbins, source_range="image")
+        return self._histograms[nbins]
+
+    def _statistic(self, name: str, func: Callable) -> float:
+        """Calculate a statistic of the pixels once.
+
+        Parameters
+        ----------
+        name : str
+            Name the statistic is cached under.
+        func : Callable
+            Function returning the statistic of an array.
+
+        Returns
+        -------
+        float
+            Statistic of the pixels.
+        """
+        if name not in self._statistics:
+            self._statistics[name] = func(self.sample)
+        return self._statistics[name]
+
+    @property
+    def mean(self) -> float:
+        """Mean of the pixels."""
+        return self._statistic("mean", threshold_mean)
+
+    @property
+    def std(self) -> float:
+        """Standard deviation of the pixels, ignoring NaN."""
+        return self._statistic("std", np.nanstd)
+
+    def _is_uniform(self) -> bool:
+        """Whether all pixels have the same value."""
+        return self._statistic("min", np.min) == self._statistic("max", np.max)
+
+    def threshold(self, method: str = "otsu", otsu_threshold_multiplier: float = None, **kwargs) -> float:
+        """Threshold of the image, calculated once for each method and set of arguments.
+
+        Parameters
+        ----------
+        method : str
+            Threshold method to use, currently supports otsu (default), mean, minimum, yen and triangle.
+        otsu_threshold_multiplier : float
+            Factor by which the Otsu threshold is scaled.
+        **kwargs : dict
+            Additional keyword arguments to pass to skimage methods.
+
+        Returns
+        -------
+        float
+            Threshold of image using specified method.
+        """
+        key = (method, otsu_threshold_multiplier, tuple(sorted(kwargs.items())))
+        if key not in self._thresholds:
+            thresholder = _get_threshold(method)
+            self._thresholds[key] = thresholder(self, otsu_threshold_multiplier=otsu_threshold_multiplier, **kwargs)
+        return self._thresholds[key]
+
+
 def threshold(image: np.ndarray, method: str = None, otsu_threshold_multiplier: float = None, **kwargs: dict) -> float:
     """Thresholding for producing masks.
 
     Parameters
     ----------
+    image : np.ndarray | ThresholdEngine
+        Image to threshold, or a ThresholdEngine of the image to reuse the statistics it has already calculated.
     method : str
         Method to use for thresholding, currently supported methods are otsu (default), mean and minimum.
     **kwargs : dict
@@ -29,8 +160,8 @@ def threshold(image: np.ndarray, method: str = None, otsu_threshold_multiplier:
     float
         Threshold of image using specified method.
     """
-    thresholder = _get_threshold(method)
-    return thresholder(image, otsu_threshold_multiplier=otsu_threshold_multiplier, **kwargs)
+    engine = image if isinstance(image, ThresholdEngine) else ThresholdEngine(image)
+    return engine.threshold(method, otsu_threshold_multiplier=otsu_threshold_multiplier, **kwargs)
 
 
 def _get_threshold(method: str = "otsu") -> Callable:
@@ -64,21 +195,25 @@ def _get_threshold(method: str = "otsu") -> Callable:
     raise ValueError(method)
 
 
-def _threshold_otsu(image: np.ndarray, otsu_threshold_multiplier: float = None, **kwargs) -> float:
-    return threshold_otsu(image, **kwargs) * otsu_threshold_multiplier
+def _threshold_otsu(engine: ThresholdEngine, otsu_threshold_multiplier: float = None, nbins: int = 256) -> float:
+    if engine._is_uniform():  # pylint: disable=protected-access
+        return engine.sample[0] * otsu_threshold_multiplier
+    return threshold_otsu(hist=engine.get_histogram(nbins)) * otsu_threshold_multiplier
 
 
-def _threshold_mean(image: np.ndarray, otsu_threshold_multiplier: float = None, **kwargs) -> float:
-    return threshold_mean(image, **kwargs)
+def _threshold_mean(engine: ThresholdEngine, otsu_threshold_multiplier: float = None) -> float:
+    return engine.mean
 
 
-def _threshold_minimum(image: np.ndarray, otsu_threshold_multiplier: float = None, **kwargs) -> float:
-    return threshold_minimum(image, **kwargs)
+def _threshold_minimum(
+    engine: ThresholdEngine, otsu_threshold_multiplier: float = None, nbins: int = 256, **kwargs
+) -> float:
+    return threshold_minimum(hist=engine.get_histogram(nbins), **kwargs)
 
 
-def _threshold_yen(image: np.ndarray, otsu_threshold_multiplier: float = None, **kwargs) -> float:
-    return threshold_yen(image, **kwargs)
+def _threshold_yen(engine: ThresholdEngine, otsu_threshold_multiplier: float = None, nbins: int = 256) -> float:
+    return threshold_yen(hist=engine.get_histogram(nbins))
 
 
-def _threshold_triangle(image: np.ndarray, otsu_threshold_multiplier: float = None, **kwargs) -> float:
-    return threshold_triangle(image, **kwargs)
+def _threshold_triangle(engine: ThresholdEngine, otsu_threshold_multiplier: float = None, **kwargs) -> float:
+    return threshold_triangle(engine.sample, **kwargs)
@@ -7,22 +7,29 @@ import math
 from multiprocessing import Pool
 import os
 from pathlib import Path
+import time
+import traceback
 from typing import Dict, List, Union, Tuple
 import warnings
 
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
-import seaborn as sns
 from scipy import ndimage, spatial, interpolate as interp
 from skimage import morphology
 from skimage.filters import gaussian
-import skimage.measure as skimage_measure
 from tqdm import tqdm
 
-from topostats.logs.logs import LOGGER_NAME
+from topostats.grains import GrainRegistry
+from topostats.logs.logs import GRAIN_LOG, LOGGER_NAME
 from topostats.tracing.skeletonize import get_skeleton
-from topostats.tracing.tracingfuncs import genTracingFuncs, getSkeleton, reorderTrace
+from topostats.tracing.tracingfuncs import (
+    TracingLimitExceeded,
+    check_tracing_limits,
+    genTracingFuncs,
+    getSkeleton,
+    reorderTrace,
+)
 from topostats.utils import bound_padded_coordinates_to_image
 
 LOGGER = logging.getLogger(LOGGER_NAME)
@@ -66,6 +73,11 @@ class dnaTrace:
         spline_circular_smoothing: float = 0.0,
         spline_quiet: bool = True,
         spline_degree: int = 3,
+        spline_method: str = "average",
+        max_grain_time: float = None,
+        max_skeleton_pixels: int = None,
+        max_ordering_iterations: int = None,
+        gauss_image: np.ndarray = None,
     ):
         """Initialise the class.
 
@@ -98,6 +110,18 @@ class dnaTrace:
             Suppresses scipy splining warnings
         spline_degree: int = 3,
             Degree of the spline
+        spline_method: str = "average",
+            Method of splining, 'average' averages splines fitted to interleaved subsamples of the fitted trace,
+            'single' fits a single spline to the whole fitted trace which is faster, see get_splined_traces().
+        max_grain_time: float = None,
+            Maximum time in seconds to spend tracing the grain, if None there is no limit.
+        max_skeleton_pixels: int = None,
+            Maximum number of pixels in the skeleton of the grain, if None there is no limit.
+        max_ordering_iterations: int = None,
+            Maximum number of iterations ordering the skeleton may take, if None there is no limit.
+        gauss_image: np.ndarray = None,
+            Cropped image that has already been Gaussian filtered with the tracing sigma (0.7nm), in the same units as
+            image. If given the filter is not applied to the grain, see trace_image().
         """
         self.image = image * 1e-9 if convert_nm_to_m else image
         self.grain = grain
@@ -110,7 +134,10 @@ class dnaTrace:
         self.number_of_columns = self.image.shape[1]
         self.sigma = 0.7 / (self.pixel_to_nm_scaling * 1e9)
 
-        self.gauss_image = None
+        if gauss_image is None:
+            self.gauss_image = None
+        else:
+            self.gauss_image = gauss_image * 1e-9 if convert_nm_to_m else gauss_image
         self.grain = grain
         self.disordered_trace = None
         self.ordered_trace = None
@@ -127,6 +154,14 @@ class dnaTrace:
         self.spline_circular_smoothing: float = spline_circular_smoothing
         self.spline_quiet: bool = spline_quiet
         self.spline_degree: int = spline_degree
+        self.spline_method: str = spline_method
+
+        # Limits beyond which tracing of the grain is abandoned
+        self.max_grain_time: float = max_grain_time
+        self.max_skeleton_pixels: int = max_skeleton_pixels
+        self.max_ordering_iterations: int = max_ordering_iterations
+        self.deadline: float = None
+        self.skip_reason: str = None
 
         self.neighbours = 5  # The number of neighbours used for the curvature measurement
 
@@ -136,28 +171,62 @@ class dnaTrace:
         LOGGER.debug(f"[{self.filename}] Performing DNA Tracing")
 
     def trace_dna(self):
-        """Perform DNA tracing."""
-        self.gaussian_filter()
-        self.get_disordered_trace()
-        if self.disordered_trace is None:
-            LOGGER.info(f"[{self.filename}] : Grain failed to Skeletonise")
-        elif len(self.disordered_trace) >= self.min_skeleton_size:
-            self.linear_or_circular(self.disordered_trace)
-            self.get_ordered_traces()
-            self.linear_or_circular(self.ordered_trace)
-            self.get_fitted_traces()
-            self.get_splined_traces()
-            # self.find_curvature()
-            # self.saveCurvature()
-            self.measure_contour_length()
-            self.measure_end_to_end_distance()
-        else:
-            LOGGER.info(f"[{self.filename}] [{self.n_grain}] : Grain skeleton pixels < {self.min_skeleton_size}")
+        """Perform DNA tracing.
+
+        If the grain is not traced the reason is recorded in skip_reason, one of 'skeletonisation_failed',
+        'skeleton_too_small' or, if tracing exceeds one of the limits on the grain, 'time', 'skeleton_pixels' or
+        'ordering_iterations'. The time limit is checked between each step of tracing and during ordering, so a single
+        step that is slow is not interrupted.
+        """
+        self.deadline = None if self.max_grain_time is None else time.perf_counter() + self.max_grain_time
+        try:
+            if self.gauss_image is None:
+                self.gaussian_filter()
+            self.get_disordered_trace()
+            check_tracing_limits(0, deadline=self.deadline)
+            if self.disordered_trace is None:
+                LOGGER.info("[%s] : Grain failed to Skeletonise", self.filename, extra=GRAIN_LOG)
+                self.skip_reason = "skeletonisation_failed"
+            elif len(self.disordered_trace) >= self.min_skeleton_size:
+                if self.max_skeleton_pixels is not None and len(self.disordered_trace) > self.max_skeleton_pixels:
+                    raise TracingLimitExceeded(
+                        "skeleton_pixels",
+                        f"skeleton of {len(self.disordered_trace)} pixels exceeds {self.max_skeleton_pixels} pixels",
+                    )
+                self.linear_or_circular(self.disordered_trace)
+                self.get_ordered_traces()
+                self.linear_or_circular(self.ordered_trace)
+                check_tracing_limits(0, deadline=self.deadline)
+                self.get_fitted_traces()
+                check_tracing_limits(0, deadline=self.deadline)
+                self.get_splined_traces()
+                # self.find_curvature()
+                # self.saveCurvature()
+                self.measure_contour_length()
+                self.measure_end_to_end_distance()
+            else:
+                LOGGER.info(
+                    "[%s] [%s] : Grain skeleton pixels < %s",
+                    self.filename,
+                    self.n_grain,
+                    self.min_skeleton_size,
+                    extra=GRAIN_LOG,
+                )
+                self.skip_reason = "skeleton_too_small"
+        except TracingLimitExceeded as limit:
+            LOGGER.warning(f"[{self.filename}] [{self.n_grain}] : Grain skipped, {limit}.")
+            self.skip_reason = limit.reason
+            self.ordered_trace = None
+            self.fitted_trace = None
+            self.splined_trace = None
+            self.contour_length = np.nan
+            self.end_to_end_distance = np.nan
+            self.mol_is_circular = np.nan
 
     def gaussian_filter(self, **kwargs) -> np.array:
         """Apply Gaussian filter"""
         self.gauss_image = gaussian(self.image, sigma=self.sigma, **kwargs)
-        LOGGER.info(f"[{self.filename}] [{self.n_grain}] : Gaussian filter applied.")
+        LOGGER.info("[%s] [%s] : Gaussian filter applied.", self.filename, self.n_grain, extra=GRAIN_LOG)
 
     def get_disordered_trace(self):
         """Create a skeleton for each of the grains in the image.
@@ -167,10 +236,13 @@ class dnaTrace:
         and to try to better trace from looped molecules"""
         smoothed_grain = ndimage.binary_dilation(self.grain, iterations=1).astype(self.grain.dtype)
 
-        sigma = 0.01 / (self.pixel_to_nm_scaling * 1e9)
-        very_smoothed_grain = ndimage.gaussian_filter(smoothed_grain, sigma)
-
-        LOGGER.info(f"[{self.filename}] [{self.n_grain}] : Skeletonising using {self.skeletonisation_method} method.")
+        LOGGER.info(
+            "[%s] [%s] : Skeletonising using %s method.",
+            self.filename,
+            self.n_grain,
+            self.skeletonisation_method,
+            extra=GRAIN_LOG,
+        )
         try:
             if self.skeletonisation_method == "topostats":
                 dna_skeleton = getSkeleton(
@@ -190,7 +262,7 @@ class dnaTrace:
         except IndexError as e:
             # Some gwyddion grains touch image border causing IndexError
             # These grains are deleted
-            LOGGER.info(f"[{self.filename}] [{self.n_grain}] : Grain failed to skeletonise.")
+            LOGGER.info("[%s] [%s] : Grain failed to skeletonise.", self.filename, self.n_grain, extra=GRAIN_LOG)
             # raise e
 
     def linear_or_circular(self, traces):
@@ -215,17 +287,23 @@ class dnaTrace:
 
     def get_ordered_traces(self):
         if self.mol_is_circular:
-            self.ordered_trace, trace_completed = reorderTrace.circularTrace(self.disordered_trace)
+            self.ordered_trace, trace_completed = reorderTrace.circularTrace(
+                self.disordered_trace, max_iterations=self.max_ordering_iterations, deadline=self.deadline
+            )
 
             if not trace_completed:
                 self.mol_is_circular = False
                 try:
-                    self.ordered_trace = reorderTrace.linearTrace(self.ordered_trace.tolist())
+                    self.ordered_trace = reorderTrace.linearTrace(
+                        self.ordered_trace.tolist(), max_iterations=self.max_ordering_iterations, deadline=self.deadline
+                    )
                 except UnboundLocalError:
                     pass
 
         elif not self.mol_is_circular:
-            self.ordered_trace = reorderTrace.linearTrace(self.disordered_trace.tolist())
+            self.ordered_trace = reorderTrace.linearTrace(
+                self.disordered_trace.tolist(), max_iterations=self.max_ordering_iterations, deadline=self.deadline
+            )
 
     def get_fitted_traces(self):
         """Create trace coordinates (for each identified molecule) that are adjusted to lie
@@ -342,19 +420,83 @@ class dnaTrace:
             List of tuples with consecutive duplicates removed.
         """
 
-        duplicates_removed = []
-        for index, tup in enumerate(tuple_list):
-            if index == 0 or not np.array_equal(tuple_list[index - 1], tup):
-                duplicates_removed.append(tup)
-        return np.array(duplicates_removed)
+        coordinates = np.asarray(tuple_list)
+        if len(coordinates) < 2:
+            return coordinates
+        # Keep the first coordinate and any that differ from their predecessor
+        keep = np.ones(len(coordinates), dtype=bool)
+        keep[1:] = np.any(coordinates[1:] != coordinates[:-1], axis=tuple(range(1, coordinates.ndim)))
+        return coordinates[keep]
+
+    @staticmethod
+    def fit_single_spline(
+        trace: np.ndarray, knot_spacing: int, degree: int, circular: bool, ev_array: np.ndarray
+    ) -> np.ndarray:
+        """Fit a single least-squares spline to a trace with a knot every knot_spacing points.
+
+        A knot every knot_spacing points gives the same flexibility as the splines fitted to every knot_spacing'th
+        point that are averaged by get_splined_traces() but only one spline is fitted and evaluated.
+
+        Parameters
+        ----------
+        trace : np.ndarray
+            Nx2 array of coordinates.
+        knot_spacing : int
+            Number of points between knots, at least two.
+        degree : int
+            Degree of the spline.
+        circular : bool
+            Whether the trace is a closed loop, if so the spline is periodic.
+        ev_array : np.ndarray
+            Positions, between 0 and 1, along the trace to evaluate the spline at.
+
+        Returns
+        -------
+        np.ndarray
+            Coordinates of the spline evaluated at ev_array.
+        """
+        # Scipy cannot handle duplicate consecutive x, y tuples, so remove them.
+        trace = dnaTrace.remove_duplicate_consecutive_tuples(tuple_list=trace)
+        if circular:
+            # Traces of loops from reorderTrace.circularTrace() are already closed, the closing point is only added once
+            if len(trace) > 1 and np.array_equal(trace[0], trace[-1]):
+                trace = trace[:-1]
+            trace = np.vstack((trace, trace[:1]))
+        # Parameterise by the normalised distance along the trace
+        distance = np.concatenate(([0], np.cumsum(np.linalg.norm(np.diff(trace, axis=0), axis=1))))
+        u = distance / distance[-1]
+        if circular:
+            # Wrap points from each end of the loop around the other so the spline is continuous where it joins
+            pad = min((degree + 1) * knot_spacing, len(trace) - 1)
+            u = np.concatenate((u[-pad - 1 : -1] - 1, u, u[1 : pad + 1] + 1))
+            trace = np.vstack((trace[-pad - 1 : -1], trace, trace[1 : pad + 1]))
+        # At most len(u) - degree - 1 interior knots can be fitted. A knot at every point interpolates the pixelated
+        # trace and is ill conditioned, so knots are at least two points apart.
+        n_knots = min(len(u) // max(knot_spacing, 2), len(u) - degree - 1)
+        interior_knots = u[np.linspace(0, len(u) - 1, n_knots + 2).round().astype(int)[1:-1]]
+        knots = np.concatenate(([u[0]] * (degree + 1), interior_knots, [u[-1]] * (degree + 1)))
+        spline = interp.make_lsq_spline(u, trace, knots, k=degree)
+        splined_trace = spline(ev_array)
+        if circular:
+            # The ends of the evaluation range are the same point of the loop
+            splined_trace[-1] = splined_trace[0]
+        return splined_trace
 
     def get_splined_traces(
         self,
     ) -> None:
         """Gets a splined version of the fitted trace - useful for finding the radius of gyration etc.
 
-        This function actually calculates the average of several splines which is important for getting a good fit on
-        the lower res data
+        With the default 'average' spline_method this calculates the average of several splines, each fitted to every
+        step_size_px'th point of the fitted trace, which is important for getting a good fit on the lower res data.
+
+        The 'single' spline_method fits one least-squares spline, with a knot every step_size_px points, to all the
+        points of the fitted trace (see fit_single_spline()) and is around ten times faster. On the molecules in
+        tests/resources (dnatracing_image_* and minicircle_cropped_flattened) it follows the fitted trace more closely,
+        the mean distance of the fitted trace from the spline being 0.18-0.56nm compared to 0.28-0.92nm for the
+        averaged splines, which cut corners and, for linear molecules, stop short of the ends. As a result contour
+        lengths are longer, by 3-8% for circular molecules and 25% for the linear molecule. The smoothing parameters
+        are not used by the 'single' method, the knot spacing determines how smooth the spline is.
         """
 
         # Fitted traces are Nx2 numpy arrays of coordinates
@@ -405,6 +547,16 @@ class dnaTrace:
         # in the spline is controlled by the ev_array variable.
         ev_array = np.linspace(0, 1, fitted_trace_length * step_size_px)
 
+        if self.spline_method == "single":
+            self.splined_trace = self.fit_single_spline(
+                trace=fitted_trace,
+                knot_spacing=step_size_px,
+                degree=self.spline_degree,
+                circular=mol_is_circular,
+                ev_array=ev_array,
+            )
+            return
+
         # Find as many splines as there are steps in step size, this allows for a better spline to be obtained
         # by averaging the splines. Think of this like weaving a lot of splines together along the course of
         # the trace. Example spline coordinate indexes: [1, 2, 3, 4, 1, 2, 3, 4, 1, 2, 3, 4], where spline
@@ -412,7 +564,7 @@ class dnaTrace:
         # starting at position 1, etc...
         for i in range(step_size_px):
             # Sample the fitted trace at every step_size_px pixels
-            sampled = [fitted_trace[j, :] for j in range(i, fitted_trace_length, step_size_px)]
+            sampled = fitted_trace[i::step_size_px]
 
             # Scipy.splprep cannot handle duplicate consecutive x, y tuples, so remove them.
             # Get rid of any consecutive duplicates in the sampled coordinates
@@ -651,6 +803,8 @@ class dnaTrace:
 
     def plotCurvature(self, dna_num):
         """Plot the curvature of the chosen molecule as a function of the contour length (in metres)"""
+        # Seaborn is slow to import and only used here
+        import seaborn as sns  # pylint: disable=import-outside-toplevel
 
         curvature = np.array(self.curvature[dna_num])
         length = len(curvature)
@@ -735,8 +889,16 @@ def trace_image(
     spline_step_size: float = 7e-9,
     spline_linear_smoothing: float = 5.0,
     spline_circular_smoothing: float = 0.0,
+    spline_method: str = "average",
+    max_grain_time: float = None,
+    max_skeleton_pixels: int = None,
+    max_ordering_iterations: int = None,
+    gaussian_whole_image: bool = False,
     pad_width: int = 1,
     cores: int = 1,
+    grain_registry: GrainRegistry = None,
+    trace_filter: dict = None,
+    grainstats: pd.DataFrame = None,
 ) -> Dict:
     """Processor function for tracing image.
 
@@ -761,44 +923,93 @@ def trace_image(
         Smoothness of circular splines
     spline_linear_smoothing: float = 5.0,
         Smoothness of linear splines
+    spline_method: str = "average",
+        Method of splining, 'average' or 'single', see dnaTrace.get_splined_traces().
+    max_grain_time: float
+        Maximum time in seconds to spend tracing each grain, if None there is no limit.
+    max_skeleton_pixels: int
+        Maximum number of pixels in the skeleton of a grain, if None there is no limit.
+    max_ordering_iterations: int
+        Maximum number of iterations ordering the skeleton of a grain may take, if None there is no limit.
+    gaussian_whole_image: bool
+        Apply the tracing Gaussian filter to the whole image once and crop each grain from it, rather than filtering
+        each cropped grain. Heights near the edge of crops then come from the surrounding image rather than the edge of
+        the crop and its padding so results differ slightly.
     pad_width: int
         Number of cells to pad arrays by, required to handle instances where grains touch the bounding box edges.
     cores : int
         Number of cores to process with.
+    grain_registry: GrainRegistry
+        Registry of the grains in grains_mask found in image, if None one is created. Region properties and crops are
+        taken from the registry so they are not calculated again.
+    trace_filter: dict
+        Limits on the grain statistics of grains to trace, see grains_outside_limits(). Grains outside them are not
+        traced. If None, or grainstats is None, all grains are traced.
+    grainstats: pd.DataFrame
+        Grain statistics of the grains in grains_mask, indexed by molecule number, as calculated by GrainStats.
 
     Returns
     -------
     pd.DataFrame
-        Statistics from skeletonising and tracing the grains in the image.
+        Statistics from skeletonising and tracing the grains in the image. Grains that exceed one of the limits, that
+        are outside the limits of the trace filter or that raise an error, are skipped without affecting the other
+        grains and the reason is recorded in 'tracing_skip_reason' (see dnaTrace.trace_dna(),
+        grains_outside_limits() and 'error' for errors).
 
     """
     # Check both arrays are the same shape
     if image.shape != grains_mask.shape:
         raise ValueError(f"Image shape ({image.shape}) and Mask shape ({grains_mask.shape}) should match.")
 
-    cropped_images, cropped_masks = prep_arrays(image, grains_mask, pad_width)
-    region_properties = skimage_measure.regionprops(grains_mask)
-    grain_anchors = [grain_anchor(image.shape, list(grain.bbox), pad_width) for grain in region_properties]
+    if grain_registry is None:
+        grain_registry = GrainRegistry(grains_mask, image=image)
+    cropped_images, cropped_masks = grain_registry.get_crops(pad_width)
+    grain_anchors = [grain_anchor(image.shape, list(bbox), pad_width) for bbox in grain_registry.bounding_boxes]
+    if gaussian_whole_image:
+        # Same sigma as dnaTrace.gaussian_filter(), cropped and padded as the image is
+        cropped_gauss_images = grain_registry.crop(gaussian(image, sigma=0.7 / pixel_to_nm_scaling), pad_width)
+    else:
+        cropped_gauss_images = [None] * len(cropped_images)
     n_grains = len(cropped_images)
     LOGGER.info(f"[{filename}] : Calculating statistics for {n_grains} grains.")
+    skip_reasons = {}
+    if trace_filter and grainstats is not None:
+        skip_reasons = grains_outside_limits(grainstats, trace_filter)
+        LOGGER.info(f"[{filename}] : {len(skip_reasons)} of {n_grains} grains are outside the trace filter limits.")
     n_grain = 0
     results = {}
     ordered_traces = []
     splined_traces = []
-    for cropped_image, cropped_mask in zip(cropped_images, cropped_masks):
-        result = trace_grain(
-            cropped_image,
-            cropped_mask,
-            pixel_to_nm_scaling,
-            filename,
-            min_skeleton_size,
-            skeletonisation_method,
-            spline_step_size,
-            spline_linear_smoothing,
-            spline_circular_smoothing,
-            n_grain,
-        )
-        LOGGER.info(f"[{filename}] : Traced grain {n_grain + 1} of {n_grains}")
+    for cropped_image, cropped_mask, cropped_gauss_image in zip(cropped_images, cropped_masks, cropped_gauss_images):
+        if n_grain in skip_reasons:
+            result = untraced_grain(filename, skip_reasons[n_grain])
+        else:
+            try:
+                result = trace_grain(
+                    cropped_image,
+                    cropped_mask,
+                    pixel_to_nm_scaling,
+                    filename,
+                    min_skeleton_size,
+                    skeletonisation_method,
+                    spline_step_size,
+                    spline_linear_smoothing,
+                    spline_circular_smoothing,
+                    n_grain,
+                    spline_method=spline_method,
+                    max_grain_time=max_grain_time,
+                    max_skeleton_pixels=max_skeleton_pixels,
+                    max_ordering_iterations=max_ordering_iterations,
+                    cropped_gauss_image=cropped_gauss_image,
+                )
+            except Exception:  # pylint: disable=broad-except
+                # Limits on tracing are handled by dnaTrace, anything else is a fault in tracing this grain that should
+                # not stop the others being traced but needs the traceback to be fixed
+                LOGGER.error(
+                    f"[{filename}] [{n_grain}] : Grain skipped, error whilst tracing :\n{traceback.format_exc()}"
+                )
+                result = untraced_grain(filename, "error")
+            LOGGER.info("[%s] : Traced grain %s of %s", filename, n_grain + 1, n_grains, extra=GRAIN_LOG)
         ordered_traces.append(result.pop("ordered_trace"))
         splined_traces.append(result.pop("splined_trace"))
         results[n_grain] = result
@@ -822,6 +1033,63 @@ def trace_image(
     }
 
 
+def grains_outside_limits(grainstats: pd.DataFrame, trace_filter: dict) -> dict[int, str]:
+    """Find the grains with statistics outside the limits of a trace filter, so they need not be traced.
+
+    Parameters
+    ----------
+    grainstats: pd.DataFrame
+        Grain statistics, indexed by molecule number, as calculated by GrainStats.
+    trace_filter: dict
+        Lower and upper limits, either of which may be None, of grain statistics keyed by the statistic e.g.
+        ``{"area": [1.0e-16, None], "aspect_ratio": [None, 3.0]}``. Grains with a missing value for a statistic are not
+        excluded by it.
+
+    Returns
+    -------
+    dict[int, str]
+        Molecule numbers of grains outside the limits mapped to the reason, '<statistic>_outside_limits' for the first
+        statistic outside its limits.
+    """
+    skip_reasons = {}
+    for statistic, (lower, upper) in trace_filter.items():
+        values = grainstats[statistic].astype(float)
+        outside = pd.Series(False, index=grainstats.index)
+        if lower is not None:
+            outside |= values < lower
+        if upper is not None:
+            outside |= values > upper
+        for molecule_number in grainstats.index[outside]:
+            skip_reasons.setdefault(int(molecule_number), f"{statistic}_outside_limits")
+    return skip_reasons
+
+
+def untraced_grain(filename: str, skip_reason: str) -> dict:
+    """Results, as returned by trace_grain(), of a grain that is not traced.
+
+    Parameters
+    ----------
+    filename: str
+        File being processed.
+    skip_reason: str
+        Reason the grain is not traced.
+
+    Returns
+    -------
+    dict
+        Dictionary of missing statistics and traces with the reason the grain was not traced.
+    """
+    return {
+        "image": filename,
+        "contour_length": np.nan,
+        "circular": np.nan,
+        "end_to_end_distance": np.nan,
+        "tracing_skip_reason": skip_reason,
+        "ordered_trace": None,
+        "splined_trace": None,
+    }
+
+
 def round_splined_traces(splined_traces: list):
     """Round a list of floating point coordinates to integer floating point coordinates.
     Note that if a trace has failed and is None, it will be skipped, so the indexes will NOT be correct.
@@ -926,7 +1194,7 @@ def trace_mask(
                 np.max(ordered_trace[:, 0]) + grain_anchor[0] > image_shape[0]
                 or np.max(ordered_trace[:, 1]) + grain_anchor[1] > image_shape[1]
             ):
-                LOGGER.info(f"Grain {grain_number} has a trace that breaches the image bounds. Skipping.")
+                LOGGER.info("Grain %s has a trace that breaches the image bounds. Skipping.", grain_number)
                 continue
             ordered_trace[:, 0] = ordered_trace[:, 0] + grain_anchor[0]
             ordered_trace[:, 1] = ordered_trace[:, 1] + grain_anchor[1]
@@ -956,16 +1224,7 @@ def prep_arrays(image: np.ndarray, labelled_grains_mask: np.ndarray, pad_width:
     Tuple
         Returns a tuple of two lists, each consisting of cropped arrays.
     """
-    # Get bounding boxes for each grain
-    region_properties = skimage_measure.regionprops(labelled_grains_mask)
-    # Subset image and grains then zip them up
-    cropped_images = [crop_array(image, grain.bbox, pad_width) for grain in region_properties]
-    cropped_images = [np.pad(grain, pad_width=pad_width) for grain in cropped_images]
-    cropped_masks = [crop_array(labelled_grains_mask, grain.bbox, pad_width) for grain in region_properties]
-    cropped_masks = [np.pad(grain, pad_width=pad_width) for grain in cropped_masks]
-    # Flip every labelled region to be 1 instead of its label
-    cropped_masks = [np.where(grain == 0, 0, 1) for grain in cropped_masks]
-    return (cropped_images, cropped_masks)
+    return GrainRegistry(labelled_grains_mask, image=image).get_crops(pad_width)
 
 
 def grain_anchor(array_shape: tuple, bounding_box: list, pad_width: int) -> list:
@@ -1001,6 +1260,11 @@ def trace_grain(
     spline_linear_smoothing: float = 5.0,
     spline_circular_smoothing: float = 0.0,
     n_grain: int = None,
+    spline_method: str = "average",
+    max_grain_time: float = None,
+    max_skeleton_pixels: int = None,
+    max_ordering_iterations: int = None,
+    cropped_gauss_image: np.ndarray = None,
 ) -> Dict:
     """Trace an individual grain.
 
@@ -1037,12 +1301,23 @@ def trace_grain(
         Smoothness of linear splines
     n_grain: int
         Grain number being processed.
+    spline_method: str = "average",
+        Method of splining, 'average' or 'single', see dnaTrace.get_splined_traces().
+    max_grain_time: float
+        Maximum time in seconds to spend tracing the grain, if None there is no limit.
+    max_skeleton_pixels: int
+        Maximum number of pixels in the skeleton of the grain, if None there is no limit.
+    max_ordering_iterations: int
+        Maximum number of iterations ordering the skeleton may take, if None there is no limit.
+    cropped_gauss_image: np.ndarray
+        Cropped array, as cropped_image, from the image after applying the tracing Gaussian filter to it. If None the
+        filter is applied to cropped_image.
 
     Returns
     =======
     Dictionary
-        Dictionary of the contour length, whether the image is circular or linear, the end-to-end distance and an array
-    of coordinates.
+        Dictionary of the contour length, whether the image is circular or linear, the end-to-end distance, the reason
+    the grain was not traced (None if it was) and an array of coordinates.
     """
     dnatrace = dnaTrace(
         image=cropped_image,
@@ -1054,7 +1329,12 @@ def trace_grain(
         spline_step_size=spline_step_size,
         spline_linear_smoothing=spline_linear_smoothing,
         spline_circular_smoothing=spline_circular_smoothing,
+        spline_method=spline_method,
         n_grain=n_grain,
+        max_grain_time=max_grain_time,
+        max_skeleton_pixels=max_skeleton_pixels,
+        max_ordering_iterations=max_ordering_iterations,
+        gauss_image=cropped_gauss_image,
     )
     dnatrace.trace_dna()
     return {
@@ -1062,6 +1342,7 @@ def trace_grain(
         "contour_length": dnatrace.contour_length,
         "circular": dnatrace.mol_is_circular,
         "end_to_end_distance": dnatrace.end_to_end_distance,
+        "tracing_skip_reason": dnatrace.skip_reason,
         "ordered_trace": dnatrace.ordered_trace,
         "splined_trace": dnatrace.splined_trace,
     }
@@ -1,6 +1,47 @@
 import numpy as np
 import matplotlib.pyplot as plt
 import math
+import time
+
+
+class TracingLimitExceeded(Exception):
+    """Raised when tracing a grain exceeds one of its limits.
+
+    Parameters
+    ----------
+    reason: str
+        Code for the limit that was exceeded, recorded in the statistics of the grain.
+    message: str
+        Description of the limit that was exceeded.
+    """
+
+    def __init__(self, reason: str, message: str):
+        """Initialise the exception."""
+        super().__init__(message)
+        self.reason = reason
+
+
+def check_tracing_limits(iteration: int, max_iterations: int = None, deadline: float = None) -> None:
+    """Check an ordering iteration against the maximum number of iterations and the deadline for tracing a grain.
+
+    Parameters
+    ----------
+    iteration: int
+        Number of the current iteration.
+    max_iterations: int
+        Maximum number of iterations, if None there is no limit.
+    deadline: float
+        Time, from ``time.perf_counter()``, by which tracing must have finished, if None there is no limit.
+
+    Raises
+    ------
+    TracingLimitExceeded
+        If either limit has been exceeded.
+    """
+    if max_iterations is not None and iteration > max_iterations:
+        raise TracingLimitExceeded("ordering_iterations", f"ordering exceeded {max_iterations} iterations")
+    if deadline is not None and time.perf_counter() > deadline:
+        raise TracingLimitExceeded("time", "tracing exceeded the time limit")
 
 
 class getSkeleton:
@@ -577,16 +618,116 @@ class getSkeleton:
             pass
 
 
+class PointIndex:
+    """Grid-bucket spatial index of integer coordinates supporting membership tests, deletion and nearest queries.
+
+    Points are held in square buckets of cell_size pixels so that finding the points within a small search window only
+    looks at the buckets that overlap it rather than every remaining point. Coordinates are tested with
+    ``[x, y] in index`` so an index can be passed in place of a list of points to the neighbour functions of
+    genTracingFuncs.
+    """
+
+    def __init__(self, points, cell_size: int = 8):
+        """Initialise the index.
+
+        Parameters
+        ----------
+        points:
+            Iterable of [x, y] integer coordinates.
+        cell_size: int
+            Width of the square buckets in pixels.
+        """
+        self.cell_size = cell_size
+        self.buckets = {}
+        self.size = 0
+        for point in points:
+            self.add(point)
+
+    def _bucket(self, x, y) -> tuple:
+        """Key of the bucket a coordinate falls in."""
+        return (x // self.cell_size, y // self.cell_size)
+
+    def add(self, point) -> None:
+        """Add a point to the index."""
+        x, y = int(point[0]), int(point[1])
+        bucket = self.buckets.setdefault(self._bucket(x, y), set())
+        if (x, y) not in bucket:
+            bucket.add((x, y))
+            self.size += 1
+
+    def remove(self, point) -> None:
+        """Remove a point from the index, points not in the index are ignored."""
+        x, y = int(point[0]), int(point[1])
+        bucket = self.buckets.get(self._bucket(x, y))
+        if bucket is not None and (x, y) in bucket:
+            bucket.remove((x, y))
+            self.size -= 1
+
+    def __contains__(self, point) -> bool:
+        """Whether a point is in the index."""
+        x, y = point
+        return (x, y) in self.buckets.get(self._bucket(x, y), ())
+
+    def __len__(self) -> int:
+        """Number of points in the index."""
+        return self.size
+
+    def within(self, x, y, radius: int) -> np.ndarray:
+        """Points within a square window, i.e. within a Chebyshev distance, of a coordinate.
+
+        Parameters
+        ----------
+        x, y:
+            Centre of the window.
+        radius: int
+            Half width of the window.
+
+        Returns
+        -------
+        np.ndarray
+            Nx2 array of points sorted by x then y.
+        """
+        points = [
+            point
+            for bucket_x in range((x - radius) // self.cell_size, (x + radius) // self.cell_size + 1)
+            for bucket_y in range((y - radius) // self.cell_size, (y + radius) // self.cell_size + 1)
+            for point in self.buckets.get((bucket_x, bucket_y), ())
+            if abs(point[0] - x) <= radius and abs(point[1] - y) <= radius
+        ]
+        return np.asarray(sorted(points), dtype=int).reshape(-1, 2)
+
+    def nearest_within(self, x, y, max_radius: int) -> np.ndarray:
+        """Points in the smallest square window, of half width 1 to max_radius, around a coordinate that has any.
+
+        Parameters
+        ----------
+        x, y:
+            Centre of the window.
+        max_radius: int
+            Largest half width of the window to search.
+
+        Returns
+        -------
+        np.ndarray
+            Nx2 array of points sorted by x then y, empty if there are none within max_radius.
+        """
+        points = self.within(x, y, max_radius)
+        if len(points) == 0:
+            return points
+        distance = np.abs(points - [x, y]).max(axis=1)
+        return points[distance <= max(distance.min(), 1)]
+
+
 class reorderTrace:
     @staticmethod
-    def linearTrace(trace_coordinates):
+    def linearTrace(trace_coordinates, max_iterations: int = None, deadline: float = None):
         """My own function to order the points from a linear trace.
 
         This works by checking the local neighbours for a given pixel (starting
         at one of the ends). If this pixel has only one neighbour in the array
         of unordered points, this must be the next pixel in the trace -- and it
         is added to the ordered points trace and removed from the
-        remaining_unordered_coords array.
+        index of remaining points.
 
         If there is more than one neighbouring pixel, a fairly simple function
         (checkVectorsCandidatePoints) finds which pixel incurs the smallest
@@ -594,49 +735,56 @@ class reorderTrace:
         the next point.
 
         This process is repeated until all the points are placed in the ordered
-        trace array or the other end point is reached."""
+        trace array or the other end point is reached.
+
+        TracingLimitExceeded is raised if ordering takes more than max_iterations
+        iterations or passes the deadline (from time.perf_counter()), see
+        check_tracing_limits()."""
 
         try:
             trace_coordinates = trace_coordinates.tolist()
         except AttributeError:  # array is already a python list
             pass
 
+        # Points are looked up, and the remaining points removed, in spatial indexes rather than by searching lists
+        trace_index = PointIndex(trace_coordinates)
+
         # Find one of the end points
         for i, (x, y) in enumerate(trace_coordinates):
-            if genTracingFuncs.countNeighbours(x, y, trace_coordinates) == 1:
+            if genTracingFuncs.countNeighbours(x, y, trace_index) == 1:
                 ordered_points = [[x, y]]
                 trace_coordinates.pop(i)
+                trace_index.remove([x, y])
                 break
 
-        remaining_unordered_coords = trace_coordinates[:]
+        remaining_index = PointIndex(trace_coordinates)
 
-        while remaining_unordered_coords:
+        iteration = 0
+        while len(remaining_index):
+            iteration += 1
+            check_tracing_limits(iteration, max_iterations, deadline)
             if len(ordered_points) > len(trace_coordinates):
                 break
 
             x_n, y_n = ordered_points[-1]  # get the last point to be added to the array and find its neighbour
 
-            no_of_neighbours, neighbour_array = genTracingFuncs.countandGetNeighbours(
-                x_n, y_n, remaining_unordered_coords
-            )
+            no_of_neighbours, neighbour_array = genTracingFuncs.countandGetNeighbours(x_n, y_n, remaining_index)
 
             if (
                 no_of_neighbours == 1
             ):  # if there's only one candidate - its the next point add it to array and delete from candidate points
                 ordered_points.append(neighbour_array[0])
-                remaining_unordered_coords.pop(remaining_unordered_coords.index(neighbour_array[0]))
+                remaining_index.remove(neighbour_array[0])
                 continue
             elif no_of_neighbours > 1:
                 best_next_pixel = genTracingFuncs.checkVectorsCandidatePoints(x_n, y_n, ordered_points, neighbour_array)
                 ordered_points.append(best_next_pixel)
-                remaining_unordered_coords.pop(remaining_unordered_coords.index(best_next_pixel))
+                remaining_index.remove(best_next_pixel)
                 continue
             elif no_of_neighbours == 0:
                 # nn, neighbour_array_all_coords = genTracingFuncs.countandGetNeighbours(x_n, y_n, trace_coordinates)
                 # best_next_pixel = genTracingFuncs.checkVectorsCandidatePoints(x_n, y_n, ordered_points, neighbour_array_all_coords)
-                best_next_pixel = genTracingFuncs.findBestNextPoint(
-                    x_n, y_n, ordered_points, remaining_unordered_coords
-                )
+                best_next_pixel = genTracingFuncs.findBestNextPoint(x_n, y_n, ordered_points, remaining_index)
 
                 if not best_next_pixel:
                     return np.array(ordered_points)
@@ -644,57 +792,64 @@ class reorderTrace:
                 ordered_points.append(best_next_pixel)
 
             # If the tracing has reached the other end of the trace then its finished
-            if genTracingFuncs.countNeighbours(x_n, y_n, trace_coordinates) == 1:
+            if genTracingFuncs.countNeighbours(x_n, y_n, trace_index) == 1:
                 break
 
         return np.array(ordered_points)
 
     @staticmethod
-    def circularTrace(trace_coordinates):
+    def circularTrace(trace_coordinates, max_iterations: int = None, deadline: float = None):
         """An alternative implementation of the linear tracing algorithm but
-        with some adaptations to work with circular dna molecules"""
+        with some adaptations to work with circular dna molecules
+
+        TracingLimitExceeded is raised if ordering takes more than max_iterations
+        iterations or passes the deadline (from time.perf_counter()), see
+        check_tracing_limits()."""
 
         try:
             trace_coordinates = trace_coordinates.tolist()
         except AttributeError:  # array is already a python list
             pass
 
-        remaining_unordered_coords = trace_coordinates[:]
+        # Points are looked up, and the remaining points removed, in spatial indexes rather than by searching lists
+        trace_index = PointIndex(trace_coordinates)
+        remaining_index = PointIndex(trace_coordinates)
 
         # Find a sensible point to start of the end points
-        for i, (x, y) in enumerate(trace_coordinates):
-            if genTracingFuncs.countNeighbours(x, y, trace_coordinates) == 2:
+        for x, y in trace_coordinates:
+            if genTracingFuncs.countNeighbours(x, y, trace_index) == 2:
                 ordered_points = [[x, y]]
-                remaining_unordered_coords.pop(i)
+                remaining_index.remove([x, y])
                 break
 
         # Randomly choose one of the neighbouring points as the next point
         x_n = ordered_points[0][0]
         y_n = ordered_points[0][1]
-        no_of_neighbours, neighbour_array = genTracingFuncs.countandGetNeighbours(x_n, y_n, remaining_unordered_coords)
+        no_of_neighbours, neighbour_array = genTracingFuncs.countandGetNeighbours(x_n, y_n, remaining_index)
         ordered_points.append(neighbour_array[0])
-        remaining_unordered_coords.pop(remaining_unordered_coords.index(neighbour_array[0]))
+        remaining_index.remove(neighbour_array[0])
 
         count = 0
 
-        while remaining_unordered_coords:
+        iteration = 0
+        while len(remaining_index):
+            iteration += 1
+            check_tracing_limits(iteration, max_iterations, deadline)
             x_n, y_n = ordered_points[-1]  # get the last point to be added to the array and find its neighbour
 
-            no_of_neighbours, neighbour_array = genTracingFuncs.countandGetNeighbours(
-                x_n, y_n, remaining_unordered_coords
-            )
+            no_of_neighbours, neighbour_array = genTracingFuncs.countandGetNeighbours(x_n, y_n, remaining_index)
 
             if (
                 no_of_neighbours == 1
             ):  # if there's only one candidate - its the next point add it to array and delete from candidate points
                 ordered_points.append(neighbour_array[0])
-                remaining_unordered_coords.pop(remaining_unordered_coords.index(neighbour_array[0]))
+                remaining_index.remove(neighbour_array[0])
                 continue
 
             elif no_of_neighbours > 1:
                 best_next_pixel = genTracingFuncs.checkVectorsCandidatePoints(x_n, y_n, ordered_points, neighbour_array)
                 ordered_points.append(best_next_pixel)
-                remaining_unordered_coords.pop(remaining_unordered_coords.index(best_next_pixel))
+                remaining_index.remove(best_next_pixel)
                 continue
 
             elif len(ordered_points) > len(trace_coordinates):
@@ -711,7 +866,7 @@ class reorderTrace:
 
             elif no_of_neighbours == 0:
                 # Check if the tracing is finished
-                nn, neighbour_array_all_coords = genTracingFuncs.countandGetNeighbours(x_n, y_n, trace_coordinates)
+                nn, neighbour_array_all_coords = genTracingFuncs.countandGetNeighbours(x_n, y_n, trace_index)
                 if ordered_points[0] in neighbour_array_all_coords:
                     break
 
@@ -723,9 +878,7 @@ class reorderTrace:
                 # Maybe at a crossing with all neighbours deleted - this is crucially a point where errors often occur
                 else:
                     # best_next_pixel = genTracingFuncs.checkVectorsCandidatePoints(x_n, y_n, ordered_points, remaining_unordered_coords)
-                    best_next_pixel = genTracingFuncs.findBestNextPoint(
-                        x_n, y_n, ordered_points, remaining_unordered_coords
-                    )
+                    best_next_pixel = genTracingFuncs.findBestNextPoint(x_n, y_n, ordered_points, remaining_index)
 
                     if not best_next_pixel:
                         return np.array(ordered_points), False
@@ -925,28 +1078,21 @@ class genTracingFuncs:
 
     @staticmethod
     def findBestNextPoint(x, y, ordered_points, candidate_points):
-        ordered_points = np.array(ordered_points)
-        candidate_points = np.array(candidate_points)
+        """Find the next point of a trace that has no direct neighbours, searching windows of half width 1 to 7.
 
-        ordered_points = ordered_points.tolist()
-        candidate_points = candidate_points.tolist()
+        The candidates in the smallest window containing any are considered, if there is more than one the point that
+        incurs the smallest change in angle is chosen (see checkVectorsCandidatePoints). candidate_points can be a
+        list of coordinates or, to avoid indexing them on every call, a PointIndex."""
+        if not isinstance(candidate_points, PointIndex):
+            candidate_points = PointIndex(candidate_points)
+        points_in_array = candidate_points.nearest_within(x, y, 7)
 
-        for i in range(1, 8):
-            # build array of coordinates from which to check
-            coords_to_check = genTracingFuncs.makeGrid(x, y, i)
-            # check for potential points in the larger search area
-            points_in_array = genTracingFuncs.returnPointsInArray(coords_to_check, candidate_points)
-
-            # Make a decision depending on how many points are found
-            if not points_in_array:
-                continue
-            elif len(points_in_array) == 1:
-                best_next_point = points_in_array[0]
-                return best_next_point
-            else:
-                best_next_point = genTracingFuncs.checkVectorsCandidatePoints(x, y, ordered_points, points_in_array)
-                return best_next_point
-        return None
+        # Make a decision depending on how many points are found
+        if len(points_in_array) == 0:
+            return None
+        if len(points_in_array) == 1:
+            return points_in_array[0].tolist()
+        return genTracingFuncs.checkVectorsCandidatePoints(x, y, ordered_points, points_in_array)
 
     @staticmethod
     def checkVectorsCandidatePoints(x, y, ordered_points, candidate_points):
@@ -981,15 +1127,11 @@ class genTracingFuncs:
 
         ref_theta = math.atan2(dx, dy)
 
-        x_y_theta = []
-
-        for x_n, y_n in candidate_points:
-            x = x_n - x_ref_2
-            y = y_n - y_ref_2
-
-            theta = math.atan2(x, y)
-
-            x_y_theta.append([x_n, y_n, abs(theta - ref_theta)])
-
-        ordered_x_y_theta = sorted(x_y_theta, key=lambda x: x[2])
-        return [ordered_x_y_theta[0][0], ordered_x_y_theta[0][1]]
+        # There are at most eight candidates, the neighbouring pixels, so a single np.arctan2() over them is around
+        # twice as slow as math.atan2() on each because of the cost of creating the arrays. The two can also differ in
+        # the last digit, changing which of two candidates with the same change in angle is chosen. min() chooses the
+        # first of any such candidates, as np.argmin() does, without converting the changes to an array.
+        x_n, y_n = min(
+            candidate_points, key=lambda point: abs(math.atan2(point[0] - x_ref_2, point[1] - y_ref_2) - ref_theta)
+        )
+        return [int(x_n), int(y_n)]
@@ -11,7 +11,7 @@ import numpy.typing as npt
 import pandas as pd
 
 from topostats.logs.logs import LOGGER_NAME
-from topostats.thresholds import threshold
+from topostats.thresholds import ThresholdEngine, threshold
 
 LOGGER = logging.getLogger(LOGGER_NAME)
 
@@ -180,10 +180,14 @@ def get_thresholds(  # noqa: C901
     otsu_threshold_multiplier: float = None,
     threshold_std_dev: dict = None,
     absolute: dict = None,
+    max_pixels: int | None = None,
     **kwargs,
 ) -> dict:
     """Obtain thresholds for masking data points.
 
+    The histogram, mean and standard deviation of the image are calculated once for this call and shared between the
+    below and above thresholds, they are not kept between calls.
+
     Parameters
     ----------
     image : np.ndarray
@@ -194,6 +198,9 @@ def get_thresholds(  # noqa: C901
         Dict of above and below thresholds for the standard deviation method.
     absolute : tuple
         Dict of below and above thresholds.
+    max_pixels : int | None
+        Maximum number of pixels thresholds are calculated from, larger images are subsampled (see
+        ``topostats.thresholds.ThresholdEngine``). If None all pixels are used.
     **kwargs:
 
     Returns
@@ -202,14 +209,15 @@ def get_thresholds(  # noqa: C901
         Dictionary of thresholds, contains keys 'below' and optionally 'above'.
     """
     thresholds = defaultdict()
+    engine = ThresholdEngine(image, max_pixels=max_pixels)
     if threshold_method == "otsu":
-        thresholds["above"] = threshold(image, method="otsu", otsu_threshold_multiplier=otsu_threshold_multiplier)
+        thresholds["above"] = threshold(engine, method="otsu", otsu_threshold_multiplier=otsu_threshold_multiplier)
     elif threshold_method == "std_dev":
         try:
             if threshold_std_dev["below"] is not None:
-                thresholds["below"] = threshold(image, method="mean") - threshold_std_dev["below"] * np.nanstd(image)
+                thresholds["below"] = threshold(engine, method="mean") - threshold_std_dev["below"] * engine.std
             if threshold_std_dev["above"] is not None:
-                thresholds["above"] = threshold(image, method="mean") + threshold_std_dev["above"] * np.nanstd(image)
+                thresholds["above"] = threshold(engine, method="mean") + threshold_std_dev["above"] * engine.std
         except TypeError as typeerror:
             raise typeerror
     elif threshold_method == "absolute":
@@ -3,7 +3,7 @@ import logging
 import os
 from pathlib import Path
 
-from schema import And, Optional, Or, Schema, SchemaError
+from schema import And, Optional, Or, Regex, Schema, SchemaError
 
 from topostats.logs.logs import LOGGER_NAME
 
@@ -11,6 +11,29 @@ LOGGER = logging.getLogger(LOGGER_NAME)
 
 # pylint: disable=line-too-long
 
+# Statistics calculated by GrainStats, see topostats.grainstats.GRAIN_STATISTICS
+GRAIN_STATISTICS_NAMES = (
+    "centre_x",
+    "centre_y",
+    "radius_min",
+    "radius_max",
+    "radius_mean",
+    "radius_median",
+    "height_min",
+    "height_max",
+    "height_median",
+    "height_mean",
+    "volume",
+    "area",
+    "area_cartesian_bbox",
+    "smallest_bounding_width",
+    "smallest_bounding_length",
+    "smallest_bounding_area",
+    "aspect_ratio",
+    "max_feret",
+    "min_feret",
+)
+
 
 def validate_config(config: dict, schema: Schema, config_type: str) -> None:
     """Validate configuration.
@@ -33,6 +56,29 @@ def validate_config(config: dict, schema: Schema, config_type: str) -> None:
         ) from schema_error
 
 
+def validate_trace_filter(grainstats_config: dict, dnatracing_config: dict) -> None:
+    """Validate the statistics of the tracing filter are calculated by GrainStats.
+
+    Statistics that are not calculated are missing for every grain, which would let every grain through the filter.
+
+    Parameters
+    ----------
+    grainstats_config: dict
+        The 'grainstats' section of the configuration.
+    dnatracing_config: dict
+        The 'dnatracing' section of the configuration.
+    """
+    statistics = grainstats_config.get("statistics", "all")
+    if statistics == "all":
+        return
+    not_calculated = sorted(set(dnatracing_config.get("trace_filter") or {}) - set(statistics))
+    if not_calculated:
+        raise SchemaError(
+            f"Invalid value in config for 'dnatracing.trace_filter', {not_calculated} are not in "
+            "'grainstats.statistics' so are not calculated."
+        )
+
+
 DEFAULT_CONFIG_SCHEMA = Schema(
     {
         "base_dir": Path,
@@ -44,17 +90,129 @@ DEFAULT_CONFIG_SCHEMA = Schema(
             "error",
             error="Invalid value in config for 'log_level', valid values are 'info' (default), 'debug', 'error' or 'warning",
         ),
-        "cores": lambda n: 1 <= n <= os.cpu_count(),
+        "cores": Or(
+            "auto",
+            And(int, lambda n: 1 <= n <= os.cpu_count()),
+            error="Invalid value in config for 'cores', valid values are 'auto' or an integer between 1 and the number of CPUs",
+        ),
+        "memory_budget": Or(
+            None,
+            "auto",
+            And(Or(int, float), lambda n: n > 0),
+            error="Invalid value in config for 'memory_budget', valid values are 'null', 'auto' or a number > 0",
+        ),
+        "shard": Or(
+            None,
+            And(
+                str,
+                Regex(r"^\d+/\d+$"),
+                lambda shard: 1 <= int(shard.split("/")[0]) <= int(shard.split("/")[1]),
+            ),
+            error="Invalid value in config for 'shard', valid values are 'null' or 'i/N' where 1 <= i <= N",
+        ),
         "file_ext": Or(
-            ".spm",
-            ".asd",
-            ".jpk",
-            ".ibw",
-            ".gwy",
-            ".topostats",
-            error="Invalid value in config for 'file_ext', valid values are '.spm', '.jpk', '.ibw', '.gwy', '.topostats', or '.asd'.",
+            Or(".spm", ".asd", ".jpk", ".ibw", ".gwy", ".topostats"),
+            [Or(".spm", ".asd", ".jpk", ".ibw", ".gwy", ".topostats")],
+            error="Invalid value in config for 'file_ext', valid values are '.spm', '.jpk', '.ibw', '.gwy', '.topostats', or '.asd' or a list of these.",
         ),
-        "loading": {"channel": str},
+        "discovery": {
+            "include": Or(
+                None,
+                [str],
+                error="Invalid value in config for 'discovery.include', valid values are a list of glob patterns",
+            ),
+            "exclude": Or(
+                None,
+                [str],
+                error="Invalid value in config for 'discovery.exclude', valid values are a list of glob patterns",
+            ),
+            "workers": And(
+                int,
+                lambda n: n >= 1,
+                error="Invalid value in config for 'discovery.workers', valid values are integers >= 1",
+            ),
+            "manifest": Or(
+                True,
+                False,
+                error="Invalid value in config for 'discovery.manifest', valid values are 'True' or 'False'",
+            ),
+            "only_new": Or(
+                True,
+                False,
+                error="Invalid value in config for 'discovery.only_new', valid values are 'True' or 'False'",
+            ),
+            "only_failed": Or(
+                None,
+                str,
+                error="Invalid value in config for 'discovery.only_failed', valid values are 'null' or a path",
+            ),
+        },
+        "executor": {
+            "timeout": Or(
+                None,
+                And(Or(int, float), lambda n: n > 0),
+                error="Invalid value in config for 'executor.timeout', valid values are 'null' or a number > 0",
+            ),
+            "retries": And(
+                int,
+                lambda n: n >= 0,
+                error="Invalid value in config for 'executor.retries', valid values are integers >= 0",
+            ),
+            "max_tasks_per_child": Or(
+                None,
+                And(int, lambda n: n >= 1),
+                error=(
+                    "Invalid value in config for 'executor.max_tasks_per_child', valid values are 'null' or integers"
+                    " >= 1"
+                ),
+            ),
+            "io_threads": And(
+                int,
+                lambda n: n >= 0,
+                error="Invalid value in config for 'executor.io_threads', valid values are integers >= 0",
+            ),
+        },
+        "metrics": {
+            "port": Or(
+                None,
+                And(int, lambda n: 0 <= n <= 65535),
+                error="Invalid value in config for 'metrics.port', valid values are 'null' or a port number",
+            ),
+            "file": Or(
+                None,
+                str,
+                error="Invalid value in config for 'metrics.file', valid values are 'null' or a path",
+            ),
+            "interval": And(
+                Or(int, float),
+                lambda n: n > 0,
+                error="Invalid value in config for 'metrics.interval', valid values are numbers > 0",
+            ),
+            "window": And(
+                Or(int, float),
+                lambda n: n > 0,
+                error="Invalid value in config for 'metrics.window', valid values are numbers > 0",
+            ),
+        },
+        "loading": {
+            "channel": Or(
+                str,
+                And([str], lambda channels: len(channels) > 0),
+                error="Invalid value in config for 'loading.channel', valid values are a channel or a list of channels",
+            )
+        },
+        "video": {
+            "run": Or(
+                True,
+                False,
+                error="Invalid value in config for 'video.run', valid values are 'True' or 'False'",
+            ),
+            "tolerance": And(
+                Or(int, float),
+                lambda n: n >= 0,
+                error="Invalid value in config for 'video.tolerance', valid values are int or float >= 0",
+            ),
+        },
         "filter": {
             "run": Or(
                 True,
@@ -92,6 +250,11 @@ DEFAULT_CONFIG_SCHEMA = Schema(
                     ),
                 ),
             },
+            "threshold_max_pixels": Or(
+                None,
+                And(int, lambda n: n > 0),
+                error="Invalid value in config for 'filter.threshold_max_pixels', valid values are null or int > 0",
+            ),
             "gaussian_size": float,
             "gaussian_mode": Or(
                 "nearest",
@@ -143,6 +306,11 @@ DEFAULT_CONFIG_SCHEMA = Schema(
                     ),
                 ),
             },
+            "threshold_max_pixels": Or(
+                None,
+                And(int, lambda n: n > 0),
+                error="Invalid value in config for 'grains.threshold_max_pixels', valid values are null or int > 0",
+            ),
             "absolute_area_threshold": {
                 "above": [
                     Or(
@@ -176,6 +344,11 @@ DEFAULT_CONFIG_SCHEMA = Schema(
                 False,
                 error="Invalid value in config for 'grains.remove_edge_intersecting_grains', valid values are 'True' or 'False'",
             ),
+            "segmentation": Or(
+                "fused",
+                "stepwise",
+                error="Invalid value in config for 'grains.segmentation', valid values are 'fused' or 'stepwise'",
+            ),
         },
         "grainstats": {
             "run": Or(
@@ -191,6 +364,15 @@ DEFAULT_CONFIG_SCHEMA = Schema(
                 float,
                 int,
             ),
+            "statistics": Or(
+                "all",
+                And(
+                    [Or(*GRAIN_STATISTICS_NAMES)],
+                    lambda statistics: len(statistics) > 0,
+                ),
+                error="Invalid value in config for 'grainstats.statistics', valid values are 'all' or a list of grain"
+                " statistics e.g. [area, height_max, volume], see the documentation for the statistics available",
+            ),
         },
         "dnatracing": {
             "run": Or(
@@ -210,7 +392,46 @@ DEFAULT_CONFIG_SCHEMA = Schema(
             "spline_step_size": lambda n: n > 0.0,
             "spline_linear_smoothing": lambda n: n >= 0.0,
             "spline_circular_smoothing": lambda n: n >= 0.0,
+            "spline_method": Or(
+                "average",
+                "single",
+                error="Invalid value in config for 'dnatracing.spline_method', valid values are 'average' or 'single'",
+            ),
+            "max_grain_time": Or(
+                None,
+                And(Or(int, float), lambda n: n > 0),
+                error="Invalid value in config for 'dnatracing.max_grain_time', valid values are null or > 0",
+            ),
+            "max_skeleton_pixels": Or(
+                None,
+                And(int, lambda n: n > 0),
+                error="Invalid value in config for 'dnatracing.max_skeleton_pixels', valid values are null or int > 0",
+            ),
+            "max_ordering_iterations": Or(
+                None,
+                And(int, lambda n: n > 0),
+                error=(
+                    "Invalid value in config for 'dnatracing.max_ordering_iterations', valid values are null or int > 0"
+                ),
+            ),
+            "gaussian_whole_image": Or(
+                True,
+                False,
+                error=(
+                    "Invalid value in config for 'dnatracing.gaussian_whole_image', valid values are 'True' or 'False'"
+                ),
+            ),
             "pad_width": lambda n: n > 0.0,
+            "trace_filter": Schema(
+                {
+                    Optional(Or(*GRAIN_STATISTICS_NAMES)): And(
+                        [Or(None, int, float)],
+                        lambda limits: len(limits) == 2,
+                    )
+                },
+                error="Invalid value in config for 'dnatracing.trace_filter', valid values are grain statistics mapped to"
+                " [lower, upper] limits, either of which may be 'null' e.g. {{area: [1.0e-16, null]}}",
+            ),
             # "cores": lambda n: n > 0.0,
         },
         "plotting": {
@@ -296,6 +517,35 @@ DEFAULT_CONFIG_SCHEMA = Schema(
                 ),
             ),
         },
+        "watch": {
+            "poll_interval": And(
+                Or(int, float),
+                lambda n: n > 0,
+                error="Invalid value in config for watch.poll_interval, valid values are numbers > 0",
+            ),
+            "settle_time": And(
+                Or(int, float),
+                lambda n: n >= 0,
+                error="Invalid value in config for watch.settle_time, valid values are numbers >= 0",
+            ),
+            "use_inotify": Or(
+                True,
+                False,
+                error="Invalid value in config for watch.use_inotify, valid values are 'True' or 'False'",
+            ),
+            "retries": And(
+                int,
+                lambda n: n >= 0,
+                error="Invalid value in config for watch.retries, valid values are integers >= 0",
+            ),
+        },
+        "sweep": {
+            Optional(str): And(
+                list,
+                lambda values: len(values) > 0,
+                error="Invalid value in config for 'sweep', options must be mapped to non-empty lists of values",
+            ),
+        },
     }
 )
 
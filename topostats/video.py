@@ -0,0 +1,182 @@
+"""Process the frames of high-speed AFM videos (.asd stacks) as a sequence.
+
+Consecutive frames of a video are normally nearly identical, so rather than flattening and thresholding every frame
+from scratch the mask used to flatten a frame and the thresholds grains were found with are carried over to the next
+frame. They are only derived afresh when the mean or standard deviation of a frame shifts by more than a tolerance from
+those of the last frame they were derived for, or the shape of the frame changes. The statistics of all frames of a
+stack are saved to a single table.
+"""
+from __future__ import annotations
+
+import logging
+from copy import deepcopy
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from topostats.io import get_out_path
+from topostats.logs.logs import LOGGER_NAME
+from topostats.processing import process_scan
+
+LOGGER = logging.getLogger(LOGGER_NAME)
+
+# pylint: disable=too-many-arguments
+# pylint: disable=too-many-locals
+
+
+class StackState:
+    """The filter mask and grain thresholds carried from one frame of a stack to the next.
+
+    Parameters
+    ----------
+    tolerance: float
+        Largest shift of the mean, or change of the standard deviation, of a frame, as a fraction of the standard
+        deviation of the last frame that was flattened and thresholded afresh, for which the mask and thresholds are
+        reused.
+    """
+
+    def __init__(self, tolerance: float = 0.1):
+        """Initialise the class."""
+        self.tolerance = tolerance
+        self.reference = None
+        self.warm = False
+        self.filter_mask = None
+        self.filter_thresholds = None
+        self.grain_thresholds = None
+        self.frames_refitted = 0
+
+    def update(self, image: np.ndarray) -> bool:
+        """Compare a frame to the last refitted frame to decide whether it can reuse its mask and thresholds.
+
+        Parameters
+        ----------
+        image: np.ndarray
+            Unprocessed frame.
+
+        Returns
+        -------
+        bool
+            Whether the frame is warm, if not the mask and thresholds are cleared and the frame becomes the reference
+            later frames are compared to.
+        """
+        mean = float(np.nanmean(image))
+        std = float(np.nanstd(image))
+        if self.reference is None or self.filter_mask is None:
+            self.warm = False
+        else:
+            reference_shape, reference_mean, reference_std = self.reference
+            self.warm = (
+                image.shape == reference_shape
+                and abs(mean - reference_mean) <= self.tolerance * reference_std
+                and abs(std - reference_std) <= self.tolerance * reference_std
+            )
+        if not self.warm:
+            self.reference = (image.shape, mean, std)
+            self.filter_mask = None
+            self.filter_thresholds = None
+            self.grain_thresholds = None
+            self.frames_refitted += 1
+        return self.warm
+
+
+def group_frames(scan_data_dict: dict) -> list[list[dict]]:
+    """Group the frames of each channel of each file, in order, so that each stack can be processed as a sequence.
+
+    Parameters
+    ----------
+    scan_data_dict: dict
+        Dictionary of image data dictionaries, as produced by ``LoadScans.get_data()``, frames of .asd files are
+        separate entries.
+
+    Returns
+    -------
+    list[list[dict]]
+        Image data dictionaries of each channel of each file, files that are not videos have a single frame.
+    """
+    stacks = {}
+    for topostats_object in scan_data_dict.values():
+        # Each frame has its own 'img_path', the file and channel it was loaded from identify the stack it belongs to
+        stack = (str(topostats_object["source_file"]), topostats_object["channel"])
+        stacks.setdefault(stack, []).append(topostats_object)
+    return list(stacks.values())
+
+
+def process_stack(
+    topostats_objects: list[dict],
+    base_dir: str | Path,
+    filter_config: dict,
+    grains_config: dict,
+    grainstats_config: dict,
+    dnatracing_config: dict,
+    plotting_config: dict,
+    output_dir: str | Path = "output",
+    tolerance: float = 0.1,
+) -> tuple[Path, pd.DataFrame, pd.DataFrame]:
+    """Process the frames of a stack in order, reusing the mask and thresholds of the previous frame when unchanged.
+
+    Each frame is processed by ``process_scan()`` and the grain and tracing statistics of all frames are saved to
+    '<stack>_video_statistics.csv' alongside the processed frames.
+
+    Parameters
+    ----------
+    topostats_objects: list[dict]
+        Image data dictionaries of the frames of the stack, in order.
+    base_dir: str | Path
+        Directory to recursively search for files, if not specified the current directory is scanned.
+    filter_config: dict
+        Dictionary of configuration options for running the Filter stage.
+    grains_config: dict
+        Dictionary of configuration options for running the Grain detection stage.
+    grainstats_config: dict
+        Dictionary of configuration options for running the Grain Statistics stage.
+    dnatracing_config: dict
+        Dictionary of configuration options for running the DNA Tracing stage.
+    plotting_config: dict
+        Dictionary of configuration options for plotting figures.
+    output_dir: str | Path
+        Directory to save output to.
+    tolerance: float
+        Shift in the statistics of a frame above which it is flattened and thresholded afresh, see ``StackState``.
+
+    Returns
+    -------
+    tuple[Path, pd.DataFrame, pd.DataFrame]
+        Path of the file the stack was loaded from, grain and tracing statistics and image statistics of all frames
+        with the 'frame' they are from. Image statistics also record whether the frame was 'refitted'.
+    """
+    stack_state = StackState(tolerance=tolerance)
+    img_path = Path(topostats_objects[0]["source_file"])
+    # Frames are named '<stack>_<frame>', where the stack is the file, or the file and channel if several are loaded
+    stack_name = topostats_objects[0]["filename"]
+    if len(topostats_objects) > 1:
+        stack_name = stack_name.rsplit("_", 1)[0]
+    all_results = []
+    all_image_stats = []
+    for frame, topostats_object in enumerate(topostats_objects):
+        warm = stack_state.update(topostats_object["image_original"])
+        # Stages remove keys from their configuration so each frame needs its own copy
+        _, results_df, image_stats = process_scan(
+            topostats_object=topostats_object,
+            base_dir=base_dir,
+            filter_config=deepcopy(filter_config),
+            grains_config=deepcopy(grains_config),
+            grainstats_config=deepcopy(grainstats_config),
+            dnatracing_config=deepcopy(dnatracing_config),
+            plotting_config=deepcopy(plotting_config),
+            output_dir=output_dir,
+            stack_state=stack_state,
+        )
+        all_results.append(results_df.assign(frame=frame))
+        all_image_stats.append(image_stats.assign(frame=frame, refitted=not warm))
+    results = pd.concat(all_results)
+    image_stats = pd.concat(all_image_stats)
+    LOGGER.info(
+        f"[{stack_name}] : {len(topostats_objects)} frames processed, {stack_state.frames_refitted} flattened and "
+        "thresholded afresh."
+    )
+    if len(topostats_objects) > 1:
+        video_out_path = get_out_path(img_path, base_dir, output_dir).parent / "processed"
+        video_out_path.mkdir(parents=True, exist_ok=True)
+        results.to_csv(video_out_path / f"{stack_name}_video_statistics.csv", index=True)
+    return img_path, results, image_stats
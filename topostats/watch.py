@@ -0,0 +1,484 @@
+"""Watch a directory and process images as they are written by the instrument.
+
+Rather than searching the whole directory tree and starting a new pool of workers for each run, a single pool is kept
+warm for the lifetime of the watcher and only new files are loaded and processed. Statistics are appended to the
+``all_statistics.csv`` and ``image_stats.csv`` files in the output directory as each batch completes.
+
+New files are detected using inotify (via the optional `watchdog <https://pypi.org/project/watchdog/>`_ package) when
+it is available, otherwise the directory tree is polled, listing only the directories that have changed. Either way a
+file is only processed once its size and modification time have been unchanged for ``settle_time`` seconds so that
+partially written scans are not loaded. Files that can not be loaded or processed are retried once they have settled
+again, up to ``retries`` times.
+"""
+from __future__ import annotations
+
+import csv
+import logging
+import os
+import threading
+import time
+from functools import partial
+from multiprocessing import Pool
+from pathlib import Path
+
+import pandas as pd
+
+from topostats.executor import (
+    _guarded_call,
+    estimate_image_memory,
+    imap_with_memory_budget,
+    resolve_cores,
+    resolve_memory_budget,
+)
+from topostats.io import LoadScans
+from topostats.logs.logs import LOGGER_NAME, log_queue, worker_log_initialiser
+from topostats.processing import process_scan
+from topostats.run_topostats import prepare_config
+
+try:
+    from watchdog.observers import Observer
+except ImportError:
+    Observer = None
+
+LOGGER = logging.getLogger(LOGGER_NAME)
+
+# Seconds within which a directory modified when it was listed is listed again, as file systems may record
+# modification times coarsely and a file written in the same tick would not change it.
+DIRECTORY_MTIME_RESOLUTION = 2.0
+
+# pylint: disable=too-many-arguments
+# pylint: disable=too-many-instance-attributes
+
+
+class _EventCollector:
+    """Collect the paths of files created, modified or moved into a watched directory.
+
+    Implements the ``dispatch()`` method ``watchdog`` observers call for each file system event.
+    """
+
+    def __init__(self, file_ext: tuple):
+        """Initialise the class.
+
+        Parameters
+        ----------
+        file_ext: tuple
+            File extensions of images to collect.
+        """
+        self.file_ext = file_ext
+        self.lock = threading.Lock()
+        self.paths = set()
+
+    def dispatch(self, event) -> None:
+        """Record the path of a file system event if it is an image.
+
+        Parameters
+        ----------
+        event: watchdog.events.FileSystemEvent
+            Event raised by the observer.
+        """
+        if event.is_directory:
+            return
+        path = Path(getattr(event, "dest_path", "") or event.src_path)
+        if path.suffix in self.file_ext:
+            with self.lock:
+                self.paths.add(path)
+
+    def drain(self) -> set:
+        """Return and clear the paths collected since the last call.
+
+        Returns
+        -------
+        set
+            Paths of images that have been created or modified.
+        """
+        with self.lock:
+            paths, self.paths = self.paths, set()
+        return paths
+
+
+class FolderWatcher:
+    """Detect new, completely written, images under a directory.
+
+    Parameters
+    ----------
+    base_dir: Path
+        Directory to watch (recursively) for images.
+    file_ext: str | list[str]
+        File extension, or list of file extensions, of images.
+    settle_time: float
+        Seconds a file's size and modification time must be unchanged before it is considered complete.
+    use_inotify: bool
+        Whether to use inotify (requires ``watchdog``) to detect changes, if False or ``watchdog`` is not installed the
+        directory tree is polled.
+    exclude: Path
+        Directory (typically the output directory) under which files are ignored.
+    retries: int
+        Number of times a file that can not be loaded or processed is retried, once it has settled again.
+    """
+
+    def __init__(
+        self,
+        base_dir: Path,
+        file_ext: str | list[str],
+        settle_time: float = 2.0,
+        use_inotify: bool = True,
+        exclude: Path | None = None,
+        retries: int = 3,
+    ):
+        """Initialise the class."""
+        self.base_dir = Path(base_dir)
+        self.file_ext = (file_ext,) if isinstance(file_ext, str) else tuple(file_ext)
+        self.settle_time = settle_time
+        self.use_inotify = use_inotify and Observer is not None
+        self.exclude = Path(exclude).resolve() if exclude is not None else None
+        self.retries = retries
+        self.candidates = {}
+        self.processed = set()
+        self.failures = {}
+        # Directories that have been listed mapped to their modification time, when they were listed and their
+        # sub-directories
+        self.directories = {}
+        self.observer = None
+        self.events = _EventCollector(self.file_ext)
+
+    def start(self) -> None:
+        """Start watching, images already present are treated as new."""
+        if self.use_inotify:
+            self.observer = Observer()
+            self.observer.schedule(self.events, str(self.base_dir), recursive=True)
+            self.observer.start()
+            LOGGER.info(f"Watching {self.base_dir} for new images using inotify.")
+        else:
+            LOGGER.info(f"Watching {self.base_dir} for new images by polling.")
+        self._add_candidates(self._scan())
+
+    def stop(self) -> None:
+        """Stop watching."""
+        if self.observer is not None:
+            self.observer.stop()
+            self.observer.join()
+            self.observer = None
+
+    def _scan(self) -> set:
+        """Walk the directory tree for images, listing only directories that have changed since they were listed.
+
+        Adding, removing or renaming a file changes the modification time of its directory, so the files of unchanged
+        directories are already known. Each directory is still checked on every scan, but only with a ``stat()``.
+
+        Returns
+        -------
+        set
+            Paths of the images in directories that have changed, including all images on the first scan.
+        """
+        paths = set()
+        directories = [self.base_dir]
+        while directories:
+            directory = directories.pop()
+            try:
+                mtime = directory.stat().st_mtime_ns
+            except FileNotFoundError:
+                self.directories.pop(directory, None)
+                continue
+            listed_mtime, listed_at, subdirectories = self.directories.get(directory, (None, None, []))
+            if mtime != listed_mtime or listed_at - mtime / 1e9 < DIRECTORY_MTIME_RESOLUTION:
+                listed_at = time.time()
+                subdirectories = []
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            if self.exclude is None or Path(entry.path).resolve() != self.exclude:
+                                subdirectories.append(Path(entry.path))
+                        elif entry.name.endswith(self.file_ext):
+                            paths.add(Path(entry.path))
+                self.directories[directory] = (mtime, listed_at, subdirectories)
+            directories.extend(subdirectories)
+        return paths
+
+    def _excluded(self, path: Path) -> bool:
+        """Whether a path is under the excluded directory."""
+        return self.exclude is not None and self.exclude in path.resolve().parents
+
+    def _add_candidates(self, paths: set) -> None:
+        """Track paths that have not been processed until they are completely written."""
+        for path in paths:
+            if path not in self.processed and path not in self.candidates and not self._excluded(path):
+                self.candidates[path] = (None, None)
+
+    def poll(self, now: float | None = None) -> list[Path]:
+        """Return images that have finished being written since the last poll.
+
+        Parameters
+        ----------
+        now: float | None
+            Current time (from ``time.monotonic()``), defaults to the time of the call.
+
+        Returns
+        -------
+        list[Path]
+            Sorted list of images that are ready to be processed, these are marked as processed.
+        """
+        now = time.monotonic() if now is None else now
+        self._add_candidates(self.events.drain() if self.observer is not None else self._scan())
+        ready = []
+        for path, (previous, since) in list(self.candidates.items()):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                del self.candidates[path]
+                continue
+            signature = (stat.st_size, stat.st_mtime_ns)
+            if signature != previous:
+                self.candidates[path] = (signature, now)
+            elif now - since >= self.settle_time:
+                ready.append(path)
+                del self.candidates[path]
+                self.processed.add(path)
+        return sorted(ready)
+
+    def retry(self, paths: set) -> None:
+        """Return files that could not be loaded or processed to those pending, unless they have been retried enough.
+
+        Parameters
+        ----------
+        paths: set
+            Paths of files that failed.
+        """
+        for path in sorted(paths):
+            self.failures[path] = self.failures.get(path, 0) + 1
+            if self.failures[path] > self.retries:
+                LOGGER.error(f"[{path}] Failed {self.failures[path]} times, no longer retrying.")
+                continue
+            LOGGER.warning(f"[{path}] Failed, retrying once it has settled ({self.failures[path]} of {self.retries}).")
+            self.processed.discard(path)
+            self.candidates[path] = (None, None)
+
+
+def append_to_csv(df: pd.DataFrame, csv_file: Path) -> None:
+    """Append a dataframe to a CSV file, writing the header only if the file does not exist yet.
+
+    The columns of batches can be in a different order, e.g. when a batch starts with an image without grains, so
+    they are matched to the header of the existing file. Columns not in the header are dropped.
+
+    Parameters
+    ----------
+    df: pd.DataFrame
+        Data to append.
+    csv_file: Path
+        CSV file to append to.
+    """
+    if not csv_file.is_file():
+        df.to_csv(csv_file)
+        return
+    with csv_file.open(encoding="utf-8", newline="") as existing:
+        header = next(csv.reader(existing), [])
+    # The index levels are written before the columns
+    columns = header[df.index.nlevels :]
+    dropped = [column for column in df.columns if column not in columns]
+    if dropped:
+        LOGGER.warning(f"Columns {dropped} are not in {csv_file} and are not appended.")
+    df.reindex(columns=columns).to_csv(csv_file, mode="a", header=False)
+
+
+def _process_image(processing_function, topostats_object: dict) -> tuple:
+    """Process an image, capturing any exception so that the other images of the batch are unaffected.
+
+    Parameters
+    ----------
+    processing_function: Callable
+        Function applied to the loaded image.
+    topostats_object: dict
+        Loaded image, see ``LoadScans.add_to_dict()``.
+
+    Returns
+    -------
+    tuple
+        The file the image was loaded from, the result of processing it and None, or None and a description of the
+        exception it raised.
+    """
+    return (topostats_object["source_file"], *_guarded_call(processing_function, topostats_object))
+
+
+def process_batch(
+    img_files: list[Path],
+    pool,
+    processing_function,
+    config: dict,
+    memory_budget: int | None,
+    processes: int,
+) -> tuple[int, set]:
+    """Load and process a batch of new images, appending their statistics to the output CSV files.
+
+    Files are retried as a whole, so the statistics of a file that could not be loaded, or any image of which could not
+    be processed, are not appended.
+
+    Parameters
+    ----------
+    img_files: list[Path]
+        Images to process.
+    pool: multiprocessing.pool.Pool
+        Pool of workers to process images with.
+    processing_function: Callable
+        Function applied to each loaded image, typically ``process_scan`` with the configuration bound.
+    config: dict
+        TopoStats configuration dictionary.
+    memory_budget: int | None
+        Memory budget in bytes, None disables admission control.
+    processes: int
+        Number of processes in the pool.
+
+    Returns
+    -------
+    tuple[int, set]
+        Number of images processed and the files that failed.
+    """
+    scans = LoadScans(img_files, **config["loading"])
+    scans.get_data(skip_errors=True)
+    # Channels that are missing or images that are too small are skipped whatever the attempt, files that raised an
+    # error (e.g. are corrupt or were not completely written) may load when retried
+    failed = {
+        scans.source_files[image] for image, reason in scans.skipped.items() if reason.startswith("Could not be loaded")
+    }
+    scan_data = [
+        topostats_object
+        for topostats_object in scans.img_dict.values()
+        if topostats_object["source_file"] not in failed
+    ]
+    estimates = [
+        estimate_image_memory(topostats_object["image_original"].shape, config) for topostats_object in scan_data
+    ]
+    outcomes = []
+    for source_file, outcome, error in imap_with_memory_budget(
+        pool,
+        partial(_process_image, processing_function),
+        scan_data,
+        estimates=estimates,
+        memory_budget=memory_budget,
+        processes=processes,
+    ):
+        if error is not None:
+            LOGGER.error(f"[{source_file}] Processing failed : {error}")
+            failed.add(source_file)
+        else:
+            outcomes.append((source_file, outcome))
+    results = []
+    image_stats = []
+    for source_file, (img, result, individual_image_stats_df) in outcomes:
+        if source_file not in failed:
+            results.append(result)
+            image_stats.append(individual_image_stats_df)
+            LOGGER.info(f"[{img.name}] Processing completed.")
+    if image_stats:
+        append_to_csv(pd.concat(image_stats), config["output_dir"] / "image_stats.csv")
+    if results:
+        results = pd.concat(results)
+        if not results.isna().values.all():
+            results.reset_index(inplace=True)
+            results.set_index(["image", "threshold", "molecule_number"], inplace=True)
+            append_to_csv(results, config["output_dir"] / "all_statistics.csv")
+    return len(image_stats), failed
+
+
+def watch(
+    watcher: FolderWatcher,
+    pool,
+    processing_function,
+    config: dict,
+    memory_budget: int | None,
+    processes: int,
+    poll_interval: float,
+    max_polls: int | None = None,
+) -> int:
+    """Poll the watcher and process new images until interrupted.
+
+    Parameters
+    ----------
+    watcher: FolderWatcher
+        Watcher that has been started.
+    pool: multiprocessing.pool.Pool
+        Pool of workers to process images with.
+    processing_function: Callable
+        Function applied to each loaded image.
+    config: dict
+        TopoStats configuration dictionary.
+    memory_budget: int | None
+        Memory budget in bytes, None disables admission control.
+    processes: int
+        Number of processes in the pool.
+    poll_interval: float
+        Seconds to wait between polls.
+    max_polls: int | None
+        Stop after this many polls, None (default) watches until interrupted.
+
+    Returns
+    -------
+    int
+        Number of images processed.
+    """
+    images_processed = 0
+    polls = 0
+    while max_polls is None or polls < max_polls:
+        img_files = watcher.poll()
+        if img_files:
+            LOGGER.info(f"Found {len(img_files)} new image(s) to process.")
+            try:
+                processed, failed = process_batch(
+                    img_files, pool, processing_function, config, memory_budget, processes
+                )
+                images_processed += processed
+            except Exception as error:  # pylint: disable=broad-except
+                # A single bad batch should not stop the watcher.
+                LOGGER.error(f"Failed to process {[str(img_file) for img_file in img_files]} : {error}")
+                failed = set(img_files)
+            watcher.retry(failed)
+        polls += 1
+        time.sleep(poll_interval)
+    return images_processed
+
+
+def run_watch(args=None) -> None:
+    """Watch a directory and process images as they are written."""
+    config = prepare_config(args)
+    processing_function = partial(
+        process_scan,
+        base_dir=config["base_dir"],
+        filter_config=config["filter"],
+        grains_config=config["grains"],
+        grainstats_config=config["grainstats"],
+        dnatracing_config=config["dnatracing"],
+        plotting_config=config["plotting"],
+        output_dir=config["output_dir"],
+    )
+    memory_budget = resolve_memory_budget(config["memory_budget"])
+    cores = resolve_cores(config["cores"])
+    watcher = FolderWatcher(
+        base_dir=config["base_dir"],
+        file_ext=config["file_ext"],
+        settle_time=config["watch"]["settle_time"],
+        use_inotify=config["watch"]["use_inotify"],
+        exclude=config["output_dir"],
+        retries=config["watch"]["retries"],
+    )
+    LOGGER.info(f"Output directory                    : {str(config['output_dir'])}")
+    LOGGER.info(f"Looking for images with extension   : {config['file_ext']}")
+    LOGGER.info(f"Processing images using {cores} processes, press Ctrl+C to stop.")
+    # The pool is created once and reused for every batch so workers (which inherit the modules already imported by
+    # this process) are ready as soon as a scan is written.
+    with log_queue() as queue, Pool(
+        processes=cores, initializer=worker_log_initialiser, initargs=(queue, LOGGER.level)
+    ) as pool:
+        watcher.start()
+        try:
+            watch(
+                watcher,
+                pool,
+                processing_function,
+                config,
+                memory_budget=memory_budget,
+                processes=cores,
+                poll_interval=config["watch"]["poll_interval"],
+            )
+        except KeyboardInterrupt:
+            LOGGER.info("Stopped watching.")
+        finally:
+            watcher.stop()
+    LOGGER.info(f"Images found whilst watching : {len(watcher.processed)}")